@@ -50,6 +50,17 @@ def check_alerts(record: dict, config: dict):
                 'timestamp': ts,
                 'issue': f'High acceleration magnitude ({mag:.2f})',
             })
+    # 802.11 capture: deauthentication bursts
+    elif sensor == 'dot11':
+        dot11_thresh = thresholds.get('dot11', {})
+        deauth_max = dot11_thresh.get('deauth_max')
+        deauths = record.get('deauths')
+        if deauth_max is not None and isinstance(deauths, (int, float)) and deauths > deauth_max:
+            alerts.append({
+                'sensor': 'dot11',
+                'timestamp': ts,
+                'issue': f'Deauthentication burst ({deauths} frames in one interval)',
+            })
     # Network I/O: detect high throughput
     if sensor == 'netio':
         net_thresh = thresholds.get('netio', {})
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Offline ingest benchmark for the 802.11 capture sensor.
+
+Replays a pcap through Dot11Aggregator and reports frames per second.
+Without a pcap argument a synthetic capture (beacons, probe requests,
+probe responses, deauths and some data frames that must be rejected) is
+generated first.
+
+Usage: python bench_dot11_replay.py [capture.pcap] [--frames N] [--bssids N]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from scapy.layers.dot11 import (
+    Dot11, Dot11Beacon, Dot11Deauth, Dot11Elt, Dot11ProbeReq, Dot11ProbeResp, RadioTap,
+)
+from scapy.utils import PcapReader, PcapWriter
+
+from sensors.dot11 import Dot11Aggregator, replay_pcap
+
+
+def _mac(prefix, i):
+    return f"{prefix}:{(i >> 16) & 0xff:02x}:{(i >> 8) & 0xff:02x}:{i & 0xff:02x}"
+
+
+def synthetic_frames(count, bssids=200, clients=100, seed=1):
+    """Yield a realistic mix of management frames plus ~5% data frames"""
+    rng = random.Random(seed)
+    for n in range(count):
+        radiotap = RadioTap(present="dBm_AntSignal", dBm_AntSignal=-rng.randint(30, 90))
+        roll = rng.random()
+        b = rng.randrange(bssids)
+        bssid = _mac("02:00:00", b)
+        ssid = Dot11Elt(ID=0, info=f"net-{b:04d}".encode())
+        ds = Dot11Elt(ID=3, info=bytes([1 + b % 11]))
+        if roll < 0.75:
+            yield radiotap / Dot11(type=0, subtype=8, addr1="ff:ff:ff:ff:ff:ff", addr2=bssid, addr3=bssid) \
+                / Dot11Beacon(cap="ESS+privacy") / ssid / ds
+        elif roll < 0.85:
+            client = _mac("02:10:00", rng.randrange(clients))
+            yield radiotap / Dot11(type=0, subtype=4, addr1="ff:ff:ff:ff:ff:ff", addr2=client, addr3="ff:ff:ff:ff:ff:ff") \
+                / Dot11ProbeReq() / ssid
+        elif roll < 0.92:
+            client = _mac("02:10:00", rng.randrange(clients))
+            yield radiotap / Dot11(type=0, subtype=5, addr1=client, addr2=bssid, addr3=bssid) \
+                / Dot11ProbeResp() / ssid / ds
+        elif roll < 0.95:
+            client = _mac("02:10:00", rng.randrange(clients))
+            yield radiotap / Dot11(type=0, subtype=12, addr1=client, addr2=bssid, addr3=bssid) / Dot11Deauth(reason=7)
+        else:
+            yield radiotap / Dot11(type=2, subtype=0, addr1=bssid, addr2=_mac("02:10:00", n % clients), addr3=bssid)
+
+
+def write_synthetic_pcap(path, count, bssids):
+    with PcapWriter(path, linktype=127, sync=False) as writer:  # DLT_IEEE802_11_RADIO
+        for frame in synthetic_frames(count, bssids):
+            writer.write(frame)
+
+
+def dissect_baseline(path, limit):
+    """Frames/s when every frame goes through full scapy dissection first"""
+    aggregator = Dot11Aggregator()
+    frames = 0
+    start = time.perf_counter()
+    with PcapReader(path) as reader:
+        for pkt in reader:
+            aggregator.handle_packet(pkt)
+            frames += 1
+            if frames >= limit:
+                break
+    elapsed = time.perf_counter() - start
+    return frames / elapsed if elapsed > 0 else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark 802.11 pcap ingest")
+    parser.add_argument("pcap", nargs="?", help="pcap to replay (default: generate a synthetic one)")
+    parser.add_argument("--frames", type=int, default=20000, help="Synthetic frame count")
+    parser.add_argument("--bssids", type=int, default=200, help="Synthetic BSSID count")
+    parser.add_argument("--baseline", type=int, default=2000,
+                        help="Frames to push through full scapy dissection for comparison (0 to skip)")
+    args = parser.parse_args()
+
+    path = args.pcap
+    tmp = None
+    if path is None:
+        tmp = tempfile.NamedTemporaryFile(suffix=".pcap", delete=False)
+        tmp.close()
+        path = tmp.name
+        print(f"Generating {args.frames} synthetic frames ({args.bssids} BSSIDs)...")
+        write_synthetic_pcap(path, args.frames, args.bssids)
+    try:
+        aggregator = Dot11Aggregator(max_bssids=max(512, args.bssids))
+        stats = replay_pcap(path, aggregator)
+        snapshot = aggregator.snapshot()
+        print(f"Replayed {stats['frames']} frames ({stats['matched']} management) in {stats['elapsed']:.2f}s")
+        print(f"Ingest rate: {stats['frames_per_second']:.0f} frames/s")
+        print(
+            f"BSSIDs: {len(snapshot['bssids'])}  probing clients: {len(snapshot['probes'])}  "
+            f"beacons: {snapshot['beacons']}  deauths: {snapshot['deauths']}"
+        )
+        if args.baseline:
+            print(f"Scapy dissection baseline: {dissect_baseline(path, args.baseline):.0f} frames/s")
+    finally:
+        if tmp is not None:
+            os.unlink(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Throughput comparison for the two-tier LLM triage cascade.
+
+Runs a stream of mostly routine records (with a share of suspicious ones:
+drone-like Bluetooth devices, deauthentication floods, evil-twin SSIDs)
+through LLMWorkerPool against the stand-in Ollama server in
+mock_ollama.py, where the heavy model costs much more per prompt token
+than the small screening model. Compares analysing every record with the
+heavy model against the cascade with a rules-only screen and with a
+small-model screen, reporting wall time, per-tier latency, escalation
+rate and how many suspicious records reached the heavy model.
+
+Usage: python bench_llm_cascade.py [--records N] [--suspicious FRACTION]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from mock_ollama import MockOllama
+from llm_pool import LLMWorkerPool
+from prompts import SCREEN_INSTRUCTION
+
+HEAVY_MODEL = "heavy"
+SCREEN_MODEL = "small"
+
+
+def responder(payload):
+    prompt = payload["prompt"]
+    if prompt.startswith(SCREEN_INSTRUCTION):
+        suspicious = "Drone" in prompt or "Open" in prompt
+        return json.dumps({"score": 0.9 if suspicious else 0.1, "reason": "triage"})
+    return json.dumps({"anomaly": False, "reason": "routine", "threat_level": "low", "recommendation": "none"})
+
+
+def workload(count, suspicious, seed=7):
+    rng = random.Random(seed)
+    mac = lambda: ":".join(f"{rng.getrandbits(8):02X}" for _ in range(6))
+    records = []
+    for i in range(count):
+        flagged = rng.random() < suspicious
+        kind = rng.choice(["wifi", "bluetooth", "dot11"])
+        now = time.time()
+        if kind == "wifi":
+            networks = [
+                {"ssid": f"Office-{n}", "bssid": mac().lower(), "rssi": rng.randint(-88, -55),
+                 "channel": rng.choice([1, 6, 11]), "security": "WPA2 Personal"}
+                for n in range(8)
+            ]
+            if flagged:
+                networks.append({"ssid": "Office-0", "bssid": mac().lower(), "rssi": -50, "channel": 6,
+                                 "security": "Open"})
+            record = {"sensor": "wifi", "timestamp": now, "networks": networks}
+        elif kind == "bluetooth":
+            devices = [
+                {"address": mac(), "name": rng.choice([None, "Phone", "Watch", "Speaker"]),
+                 "rssi": rng.randint(-95, -60)}
+                for _ in range(10)
+            ]
+            if flagged:
+                devices.append({"address": mac(), "name": "Drone-Ctrl", "rssi": -60})
+            record = {"sensor": "bluetooth", "timestamp": now, "devices": devices}
+        else:
+            deauths = rng.randint(40, 200) if flagged else rng.randint(0, 2)
+            record = {"sensor": "dot11", "timestamp": now, "frames": 4000, "beacons": 3800, "deauths": deauths}
+        records.append((i, flagged, record))
+    return records
+
+
+async def run(mode, url, records, workers):
+    verdicts = {}
+    config = {"url": url, "workers": workers, "deadline": 600, "max_queue": len(records)}
+    if mode != "heavy only":
+        config["cascade"] = {"enabled": True, "screen": mode, "screen_model": SCREEN_MODEL, "threshold": 0.5}
+    pool = LLMWorkerPool(
+        HEAVY_MODEL, config, on_result=lambda record, analysis, ctx: verdicts.__setitem__(ctx, analysis)
+    )
+    pool.start()
+    start = time.perf_counter()
+    for i, _, record in records:
+        pool.submit(record, context=i)
+    while len(verdicts) < len(records):
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - start
+    stats = pool.stats()
+    await pool.stop()
+    flagged = [i for i, suspicious, _ in records if suspicious]
+    caught = sum(1 for i in flagged if verdicts[i].get("details", {}).get("tier") != "screen")
+    return elapsed, stats, caught, len(flagged)
+
+
+async def main_async(args):
+    mock = MockOllama(responder, prompt_cost={HEAVY_MODEL: 0.2, SCREEN_MODEL: 0.01}, token_delay=0.0005)
+    port = await mock.start()
+    url = f"http://127.0.0.1:{port}"
+    records = workload(args.records, args.suspicious)
+    print(f"{args.records} records, {args.suspicious:.0%} suspicious, {args.workers} workers")
+    print(f"{'mode':<12} {'wall s':>7} {'rec/s':>7} {'escalated':>10} {'screen ms':>10} {'full ms':>8} {'caught':>8}")
+    baseline = None
+    for mode in ("heavy only", "rules", "model"):
+        elapsed, stats, caught, flagged = await run(mode, url, records, args.workers)
+        cascade = stats.get("cascade")
+        if cascade:
+            rate = f"{cascade['escalation_rate']:.0%}"
+            screen_ms = f"{cascade['tiers']['screen']['avg_time'] * 1000:.1f}"
+            full_ms = f"{cascade['tiers']['full']['avg_time'] * 1000:.1f}"
+        else:
+            rate, screen_ms, full_ms = "100%", "-", f"{stats['avg_latency'] * 1000:.1f}"
+        baseline = baseline or elapsed
+        print(f"{mode:<12} {elapsed:>7.2f} {args.records / elapsed:>7.1f} {rate:>10} {screen_ms:>10} "
+              f"{full_ms:>8} {caught:>4}/{flagged:<3}  ({baseline / elapsed:.1f}x)")
+    await mock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM triage cascade against a mock Ollama")
+    parser.add_argument("--records", type=int, default=200)
+    parser.add_argument("--suspicious", type=float, default=0.1, help="Fraction of suspicious records")
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the compiled OUI index.
+
+Builds a synthetic registry of MA-L/MA-M/MA-S assignments (default ~50k
+vendors, roughly the size of the real IEEE export), compiles it, and
+reports index size, dict-equivalent heap size and lookup latency with and
+without the LRU cache.
+
+Usage: python bench_oui_lookup.py [--vendors N] [csv ...]
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+from sensors import oui
+
+
+def write_synthetic_csv(path, vendors, seed=1):
+    rng = random.Random(seed)
+    used = set()
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Registry", "Assignment", "Organization Name", "Organization Address"])
+        for i in range(vendors):
+            registry, digits = rng.choices((("MA-L", 6), ("MA-M", 7), ("MA-S", 9)), (70, 20, 10))[0]
+            while True:
+                # Keep the locally administered bit clear, as the IEEE does
+                assignment = f"{rng.getrandbits(digits * 4) & ~(0x2 << (digits * 4 - 8)):0{digits}X}"
+                if (registry, assignment) not in used:
+                    used.add((registry, assignment))
+                    break
+            writer.writerow([registry, assignment, f"Vendor {i % (vendors // 3 or 1)} Inc.", "Somewhere"])
+
+
+def _dict_size(csv_paths):
+    """Approximate heap cost of holding the same registry in a dict"""
+    entries = {}
+    for path in csv_paths:
+        oui._read_registry(path, entries)
+    table = {f"{prefix:X}": name for (_, prefix), name in entries.items()}
+    size = sys.getsizeof(table)
+    size += sum(sys.getsizeof(k) for k in table)
+    size += sum(sys.getsizeof(v) for v in set(table.values()))
+    return size
+
+
+def _per_call(fn, macs, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for mac in macs:
+            fn(mac)
+        best = min(best, (time.perf_counter() - start) / len(macs))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OUI index lookups")
+    parser.add_argument("csv", nargs="*", help="IEEE CSV exports (default: synthetic registry)")
+    parser.add_argument("--vendors", type=int, default=50000, help="Synthetic registry size")
+    parser.add_argument("--lookups", type=int, default=100000, help="Lookups per measurement")
+    args = parser.parse_args()
+
+    tmpdir = tempfile.mkdtemp()
+    csv_paths = args.csv
+    if not csv_paths:
+        csv_paths = [os.path.join(tmpdir, "registry.csv")]
+        write_synthetic_csv(csv_paths[0], args.vendors)
+    index_path = os.path.join(tmpdir, "oui.idx")
+
+    start = time.perf_counter()
+    counts = oui.compile_index(csv_paths, index_path)
+    print(f"Compiled {sum(counts[k] for k in ('ma_l', 'ma_m', 'ma_s'))} prefixes "
+          f"({counts['vendors']} vendor names) in {time.perf_counter() - start:.2f}s")
+    print(f"Index file: {os.path.getsize(index_path) / 1024:.0f} KiB   "
+          f"dict equivalent: {_dict_size(csv_paths) / 1024:.0f} KiB")
+
+    oui.load_index(index_path)
+    rng = random.Random(2)
+    macs = [":".join(f"{rng.getrandbits(8) & 0xFC:02X}" if i == 0 else f"{rng.getrandbits(8):02X}"
+                     for i in range(6)) for _ in range(args.lookups)]
+
+    index = oui._index
+    uncached = _per_call(lambda mac: index.lookup_prefix(int(mac.replace(":", "")[:9], 16)), macs)
+    oui.lookup.cache_clear()
+    hot = [macs[i % 500] for i in range(args.lookups)]
+    cached = _per_call(oui.lookup, hot)
+    print(f"Index lookup (no cache): {uncached * 1e9:.0f} ns   "
+          f"lookup() with warm LRU: {cached * 1e9:.0f} ns   cache: {oui.cache_info()}")
+    oui.close_index()
+    for name in os.listdir(tmpdir):
+        os.unlink(os.path.join(tmpdir, name))
+    os.rmdir(tmpdir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Prompt size report for per-sensor prompts and compact record encoding.
+
+Builds representative records for each sensor (a crowded Wi-Fi scan, a
+busy Bluetooth table, IMU, netio, association and 802.11 capture records)
+and compares the original prompt (all-sensor instruction plus
+json.dumps(record)) with the per-sensor prompt and compact encoding, in
+characters and estimated tokens.
+
+Usage: python bench_prompt_size.py [--devices N]
+"""
+import argparse
+import json
+import random
+import time
+
+import prompts
+
+
+def sample_records(devices, seed=1):
+    rng = random.Random(seed)
+    now = time.time()
+    mac = lambda: ":".join(f"{rng.getrandbits(8):02X}" for _ in range(6))
+    return {
+        "wifi": {
+            "sensor": "wifi", "timestamp": now, "hardware_status": "available", "error": None,
+            "networks": [
+                {"ssid": f"Network-{i}", "bssid": mac().lower(), "rssi": rng.randint(-90, -35),
+                 "noise": -92, "channel": rng.choice([1, 6, 11, 36, 149]),
+                 "security": rng.choice(["WPA2 Personal", "WPA3 Personal", "Open"]),
+                 "phy_mode": "802.11ax", "network_type": "Infrastructure", "connected": i == 0}
+                for i in range(devices)
+            ],
+        },
+        "bluetooth": {
+            "sensor": "bluetooth", "timestamp": now, "hardware_status": "available", "error": None, "adverts": 812,
+            "devices": [
+                {"address": mac(), "name": rng.choice([None, "iPhone", "Watch", "Tile", "JBL Flip 5"]),
+                 "rssi": rng.randint(-95, -40), "rssi_avg": rng.uniform(-95, -40), "adverts": rng.randint(1, 60),
+                 "first_seen": now - rng.uniform(0, 600), "last_seen": now - rng.uniform(0, 5)}
+                for _ in range(devices)
+            ],
+        },
+        "imu": {
+            "sensor": "imu", "timestamp": now, "hardware_status": "available", "error": None,
+            "accel": {"x": rng.gauss(0, 0.02), "y": rng.gauss(0, 0.02), "z": 9.81 + rng.gauss(0, 0.02)},
+            "gyro": {"x": rng.gauss(0, 0.001), "y": rng.gauss(0, 0.001), "z": rng.gauss(0, 0.001)},
+            "mag": {"x": 22.123456, "y": -4.987654, "z": 41.5},
+        },
+        "netio": {"sensor": "netio", "timestamp": now, "rate_sent": 15324.8123, "rate_recv": 98234.1267},
+        "assoc": {"sensor": "assoc", "timestamp": now, "ssid": "Network-0"},
+        "dot11": {
+            "sensor": "dot11", "timestamp": now, "hardware_status": "available", "error": None,
+            "frames": 5123, "beacons": 4800, "probe_requests": 250, "probe_responses": 40, "deauths": 3,
+            "bssids": [
+                {"bssid": mac().lower(), "ssid": f"Network-{i}", "channel": 6, "rssi": rng.randint(-90, -35),
+                 "rssi_max": -40, "beacons": rng.randint(10, 50), "probe_responses": rng.randint(0, 5), "deauths": 0}
+                for i in range(devices // 2)
+            ],
+        },
+    }
+
+
+def legacy_prompt(record):
+    return f"{prompts.FULL_INSTRUCTION}\n\nRecord:\n{json.dumps(record)}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare analysis prompt sizes")
+    parser.add_argument("--devices", type=int, default=30, help="Devices per Wi-Fi/Bluetooth record")
+    args = parser.parse_args()
+
+    records = sample_records(args.devices)
+    print(f"{'sensor':<10} {'before chars':>12} {'tokens':>7} {'after chars':>12} {'tokens':>7} {'saved':>6}")
+    total_before = total_after = 0
+    rows = [(name, legacy_prompt(r), prompts.analysis_prompt(r)) for name, r in records.items()]
+    items = list(enumerate(records.values(), 1))
+    rows.append((
+        "batch",
+        "".join(legacy_prompt(r) for _, r in items),
+        prompts.batch_prompt(items),
+    ))
+    for name, before, after in rows:
+        tb, ta = prompts.estimate_tokens(before), prompts.estimate_tokens(after)
+        if name != "batch":
+            total_before += tb
+            total_after += ta
+        print(f"{name:<10} {len(before):>12} {tb:>7} {len(after):>12} {ta:>7} {1 - ta / tb:>6.0%}")
+    print(f"Per-record prompts: {total_before} -> {total_after} estimated tokens "
+          f"({1 - total_after / total_before:.0%} fewer); 'batch' is all six records in one prompt "
+          f"versus six separate original prompts")
+
+
+if __name__ == "__main__":
+    main()
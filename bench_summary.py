@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Summary latency as the device count grows.
+
+Fills a summary window with Wi-Fi and Bluetooth scans of N devices and
+summarizes it against the stand-in Ollama server in mock_ollama.py (prompt
+processing cost proportional to prompt tokens), once as a single prompt of
+raw records and once through MapReduceSummarizer.
+
+Usage: python bench_summary.py [--scans N] [--devices 50 200 800]
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+from llm_client import summary_prompt
+from mock_ollama import MockOllama
+from ollama_client import OllamaClient
+from prompts import estimate_tokens
+from summarizer import MapReduceSummarizer, chunks, rollup
+
+
+def window(devices, scans, seed=3):
+    rng = random.Random(seed)
+    records = []
+    for scan in range(scans):
+        ts = 1_700_000_000 + scan * 3.3
+        present = [i for i in range(devices) if rng.random() < 0.9]
+        records.append({"sensor": "wifi", "timestamp": ts, "networks": [
+            {"ssid": f"Net-{i}", "bssid": f"02:00:00:00:{i // 256:02x}:{i % 256:02x}",
+             "rssi": rng.randint(-90, -40), "channel": 6, "security": "WPA2 Personal"} for i in present
+        ]})
+        records.append({"sensor": "bluetooth", "timestamp": ts, "devices": [
+            {"address": f"AA:00:00:00:{i // 256:02X}:{i % 256:02X}", "name": None,
+             "rssi": rng.randint(-95, -50)} for i in present
+        ]})
+    return records
+
+
+async def main_async(args):
+    events = json.dumps({"events": []})
+    mock = MockOllama(lambda payload: events, prompt_cost={"*": args.cost}, token_delay=0)
+    port = await mock.start()
+    client = OllamaClient({"url": f"http://127.0.0.1:{port}", "pool_size": 4})
+    summarizer = MapReduceSummarizer(client.summarize, {"parallel": 4})
+    print(f"{'devices':>8} {'raw tokens':>11} {'raw s':>7} {'parts':>6} {'part tokens':>12} {'map-reduce s':>13}")
+    for devices in args.devices:
+        records = window(devices, args.scans)
+        raw_tokens = estimate_tokens(summary_prompt(records))
+        start = time.perf_counter()
+        await client.summarize(records, "m")
+        raw = time.perf_counter() - start
+        parts = chunks(rollup(records), summarizer.chunk_tokens, summarizer.max_chunks)
+        largest = max(estimate_tokens(json.dumps(p)) for p in parts)
+        start = time.perf_counter()
+        await summarizer.summarize(records, "m")
+        reduced = time.perf_counter() - start
+        print(f"{devices:>8} {raw_tokens:>11} {raw:>7.2f} {len(parts):>6} {largest:>12} {reduced:>13.2f}")
+    await client.close()
+    await mock.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare raw and map-reduce summary latency")
+    parser.add_argument("--scans", type=int, default=30, help="Scans per sensor in the window")
+    parser.add_argument("--devices", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--cost", type=float, default=0.005, help="Mock seconds per 1000 prompt tokens")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
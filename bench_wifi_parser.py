@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the macOS Wi-Fi output parsers.
+
+Compares the previous multi-pass parsing (lookahead windows over
+splitlines(), list.index() based interface detection) with the single-pass
+parsers in sensors/wifi_parser.py, on the captured
+system_profiler_output.txt and on synthetic outputs with thousands of
+networks. Note the legacy loop only extracted SSID and RSSI while the
+single-pass parser also returns channel, band, width, security, PHY mode and
+noise, so comparable timings there mean more data for the same cost.
+
+Usage: python bench_wifi_parser.py [--repeat N]
+"""
+import argparse
+import os
+import re
+import time
+
+from sensors.wifi_parser import find_wifi_device, parse_system_profiler, unique_by_ssid
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def legacy_parse_system_profiler(output):
+    """The parsing loop formerly inlined in WiFiSensor._scan_mac_wifi"""
+    networks = []
+    lines = output.splitlines()
+    unique_networks = set()
+
+    in_current_section = False
+    for i, line in enumerate(lines):
+        if "Current Network Information:" in line:
+            in_current_section = True
+            continue
+        if in_current_section and line.startswith("            ") and line.strip().endswith(":"):
+            if not any(prop in line for prop in ["Channel:", "Security:", "PHY Mode:", "Network Type:"]):
+                ssid = line.strip().rstrip(':')
+                rssi = -65
+                for j in range(i, min(i+10, len(lines))):
+                    if "Signal / Noise:" in lines[j]:
+                        signal_match = re.search(r"Signal / Noise:\s*(-\d+)\s*dBm", lines[j])
+                        if signal_match:
+                            rssi = int(signal_match.group(1))
+                            break
+                networks.append({"ssid": ssid, "rssi": rssi, "connected": True})
+                unique_networks.add(ssid)
+                break
+
+    in_other_networks = False
+    for i, line in enumerate(lines):
+        if "Other Local Wi-Fi Networks:" in line:
+            in_other_networks = True
+            continue
+        if in_other_networks and line.startswith("            ") and line.strip().endswith(":"):
+            ssid = line.strip().rstrip(':')
+            if not any(prop in line for prop in ["Channel:", "Security:", "PHY Mode:", "Network Type:"]):
+                is_network = False
+                for j in range(1, 5):
+                    if i + j < len(lines) and "PHY Mode:" in lines[i + j]:
+                        is_network = True
+                        break
+                if is_network and ssid not in unique_networks:
+                    rssi = -75
+                    for j in range(i, min(i+10, len(lines))):
+                        if "Signal / Noise:" in lines[j]:
+                            signal_match = re.search(r"Signal / Noise:\s*(-\d+)\s*dBm", lines[j])
+                            if signal_match:
+                                rssi = int(signal_match.group(1))
+                                break
+                    networks.append({"ssid": ssid, "rssi": rssi, "connected": False})
+                    unique_networks.add(ssid)
+    return networks
+
+
+def legacy_find_wifi_device(output):
+    """The interface lookup formerly in WiFiSensor._detect_platform"""
+    wifi_interface = None
+    for line in output.splitlines():
+        if "Wi-Fi" in line or "AirPort" in line:
+            match = re.search(r"Device:\s*([^\s]+)", next(iter([l for l in output.splitlines() if "Device:" in l and output.splitlines().index(l) > output.splitlines().index(line)]), ""))
+            if match:
+                wifi_interface = match.group(1)
+                break
+    if not wifi_interface:
+        for line in output.splitlines():
+            if "Device: en" in line:
+                match = re.search(r"Device:\s*([^\s]+)", line)
+                if match:
+                    wifi_interface = match.group(1)
+                    break
+    return wifi_interface
+
+
+def synthetic_system_profiler(count):
+    """system_profiler-shaped output with one connected and `count` other networks"""
+    lines = [
+        "Wi-Fi:",
+        "",
+        "      Interfaces:",
+        "        en0:",
+        "          Card Type: Wi-Fi  (0x14E4, 0x4387)",
+        "          Status: Connected",
+        "          Current Network Information:",
+        "            corp-net:",
+        "              PHY Mode: 802.11ax",
+        "              Channel: 36 (5GHz, 80MHz)",
+        "              Network Type: Infrastructure",
+        "              Security: WPA2 Personal",
+        "              Signal / Noise: -52 dBm / -93 dBm",
+        "          Other Local Wi-Fi Networks:",
+    ]
+    for i in range(count):
+        band, channel = (("2GHz", 1 + i % 11) if i % 3 else ("5GHz", 36 + 4 * (i % 8)))
+        lines += [
+            f"            net-{i:05d}:",
+            "              PHY Mode: 802.11ax",
+            f"              Channel: {channel} ({band}, 20MHz)",
+            "              Network Type: Infrastructure",
+            "              Security: WPA2/WPA3 Personal",
+            f"              Signal / Noise: -{40 + i % 50} dBm / -95 dBm",
+        ]
+    lines += ["        awdl0:", "          Status: Off"]
+    return "\n".join(lines) + "\n"
+
+
+def synthetic_hardware_ports(count):
+    """networksetup -listallhardwareports output with `count` ports before Wi-Fi"""
+    lines = []
+    for i in range(count):
+        lines += [f"Hardware Port: Thunderbolt {i}", f"Device: en{i + 1}", "Ethernet Address: N/A", ""]
+    lines += ["Hardware Port: Wi-Fi", "Device: en0", "Ethernet Address: 00:00:00:00:00:00", ""]
+    return "\n".join(lines)
+
+
+def _time(fn, arg, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _report(label, legacy, new, arg, repeat):
+    old_t = _time(legacy, arg, repeat)
+    new_t = _time(new, arg, repeat)
+    speedup = old_t / new_t if new_t else float("inf")
+    print(f"{label:<40} legacy {old_t * 1000:9.3f} ms   single-pass {new_t * 1000:9.3f} ms   x{speedup:6.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark Wi-Fi output parsers")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs per case (best time is reported)")
+    args = parser.parse_args()
+
+    def new_profiler(text):
+        return unique_by_ssid(parse_system_profiler(text))
+
+    with open(os.path.join(HERE, "system_profiler_output.txt")) as f:
+        captured = f.read()
+    _report("system_profiler_output.txt", legacy_parse_system_profiler, new_profiler, captured, args.repeat)
+    for count in (1000, 5000):
+        text = synthetic_system_profiler(count)
+        _report(f"synthetic system_profiler ({count} nets)", legacy_parse_system_profiler, new_profiler, text, args.repeat)
+    for count in (50, 500):
+        text = synthetic_hardware_ports(count)
+        _report(f"hardware ports ({count} ports)", legacy_find_wifi_device, find_wifi_device, text, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
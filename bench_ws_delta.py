@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Full-record vs delta WebSocket payloads as the device count grows.
+
+Simulates Bluetooth snapshots of N devices in which a fraction (`--churn`)
+change RSSI each scan and a few come and go, and reports the average
+message size and the time to diff and serialize each form.
+
+Usage: python bench_ws_delta.py [--scans N] [--devices 50 200 800] [--churn 0.1]
+"""
+import argparse
+import random
+import time
+
+from ws_delta import DeltaEncoder
+from ws_hub import encode
+
+
+def snapshots(devices, scans, churn, seed=5):
+    rng = random.Random(seed)
+    table = {f"AA:00:00:00:{i // 256:02X}:{i % 256:02X}": rng.randint(-95, -45) for i in range(devices)}
+    next_id = devices
+    for scan in range(scans):
+        for address in rng.sample(sorted(table), int(devices * churn)):
+            table[address] = rng.randint(-95, -45)
+        # A device leaves and a new one arrives every few scans
+        if scan % 3 == 0:
+            del table[rng.choice(sorted(table))]
+            table[f"BB:00:00:00:{next_id // 256:02X}:{next_id % 256:02X}"] = -70
+            next_id += 1
+        yield {"sensor": "bluetooth", "timestamp": 1_700_000_000 + scan * 3.0, "adverts": scan * 40,
+               "devices": [{"address": a, "name": None, "rssi": r, "vendor": "Apple"} for a, r in table.items()],
+               "hardware_status": "available", "error": None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare full and delta WebSocket payloads")
+    parser.add_argument("--scans", type=int, default=60)
+    parser.add_argument("--devices", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--churn", type=float, default=0.1, help="Fraction of devices changing RSSI per scan")
+    parser.add_argument("--keyframe", type=int, default=30, help="Versions between full keyframes")
+    args = parser.parse_args()
+    print(f"{'devices':>8} {'full B':>8} {'delta B':>8} {'ratio':>6} {'full ms':>8} {'delta ms':>9}")
+    for devices in args.devices:
+        encoder = DeltaEncoder({"keyframe_interval": args.keyframe})
+        full_bytes = delta_bytes = 0
+        full_time = delta_time = 0.0
+        for record in snapshots(devices, args.scans, args.churn):
+            start = time.perf_counter()
+            full_bytes += len(encode({"record": record}))
+            full_time += time.perf_counter() - start
+            start = time.perf_counter()
+            version, delta = encoder.update("bluetooth", record)
+            # Keyframes go out as full records
+            delta_bytes += len(encode({"delta": delta} if delta is not None else {"record": record}))
+            delta_time += time.perf_counter() - start
+        n = args.scans
+        print(f"{devices:>8} {full_bytes // n:>8} {delta_bytes // n:>8} {full_bytes / delta_bytes:>6.1f} "
+              f"{full_time / n * 1000:>8.3f} {delta_time / n * 1000:>9.3f}")
+
+
+if __name__ == "__main__":
+    main()
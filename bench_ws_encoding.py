@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+WebSocket payload size and encode cost per sensor type and encoding.
+
+Builds a stream of dashboard messages for each sensor (IMU samples, a
+Wi-Fi scan, a crowded Bluetooth table) and reports the average bytes per
+message as JSON text and as binary (ws_codec), each with and without
+permessage-deflate, plus the time to encode and to compress one message.
+Deflate is simulated the way the extension runs by default: raw deflate
+with the compression context kept across messages of one connection.
+
+Usage: python bench_ws_encoding.py [--messages N] [--devices 200]
+"""
+import argparse
+import random
+import time
+import zlib
+
+from ws_codec import pack
+from ws_hub import encode
+
+
+def imu(rng, n):
+    return {"sensor": "imu", "timestamp": 1_700_000_000 + n * 0.1,
+            "accel": {axis: rng.gauss(0, 0.05) + (9.81 if axis == "z" else 0) for axis in "xyz"},
+            "gyro": {axis: rng.gauss(0, 0.01) for axis in "xyz"},
+            "mag": {axis: rng.gauss(30, 1) for axis in "xyz"},
+            "hardware_status": "available", "error": None}
+
+
+def wifi(rng, n, networks=30):
+    return {"sensor": "wifi", "timestamp": 1_700_000_000 + n * 3.0, "networks": [
+        {"ssid": f"Network-{i}", "bssid": f"02:00:00:00:00:{i:02x}", "rssi": rng.randint(-90, -40),
+         "channel": str(rng.choice([1, 6, 11, 36, 44])), "security": "WPA2 Personal"} for i in range(networks)
+    ], "hardware_status": "available", "error": None}
+
+
+def bluetooth(rng, n, devices):
+    return {"sensor": "bluetooth", "timestamp": 1_700_000_000 + n * 5.0, "adverts": rng.randint(500, 5000),
+            "devices": [{"address": f"{0x40 | i % 64:02X}:11:22:33:{i // 256:02X}:{i % 256:02X}",
+                         "name": "Unknown", "rssi": rng.randint(-95, -45), "rssi_avg": round(rng.uniform(-95, -45), 1),
+                         "adverts": rng.randint(1, 40), "first_seen": 1_700_000_000.0 + i,
+                         "last_seen": 1_700_000_000 + n * 5.0, "randomized": True} for i in range(devices)],
+            "hardware_status": "available", "error": None}
+
+
+def deflated(payloads):
+    # Context takeover: one compressor per connection, sync-flushed per message
+    compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+    sizes = []
+    start = time.perf_counter()
+    for payload in payloads:
+        data = payload.encode("utf-8") if isinstance(payload, str) else payload
+        chunk = compressor.compress(data) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        sizes.append(len(chunk) - 4)  # The extension strips the trailing 00 00 ff ff
+    return sum(sizes) / len(sizes), (time.perf_counter() - start) / len(payloads)
+
+
+def encoded(messages, encoder):
+    start = time.perf_counter()
+    payloads = [encoder(message) for message in messages]
+    elapsed = (time.perf_counter() - start) / len(messages)
+    size = sum(len(p.encode("utf-8") if isinstance(p, str) else p) for p in payloads) / len(payloads)
+    return payloads, size, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare JSON and binary WebSocket payloads")
+    parser.add_argument("--messages", type=int, default=100, help="Messages per sensor")
+    parser.add_argument("--devices", type=int, default=200, help="Bluetooth devices in range")
+    args = parser.parse_args()
+    rng = random.Random(11)
+    streams = {
+        "imu": [imu(rng, n) for n in range(args.messages)],
+        "wifi": [wifi(rng, n) for n in range(args.messages)],
+        "bluetooth": [bluetooth(rng, n, args.devices) for n in range(args.messages)],
+    }
+    print(f"{'sensor':>10} {'encoding':>8} {'bytes':>8} {'+deflate':>9} {'encode us':>10} {'deflate us':>11}")
+    for sensor, records in streams.items():
+        messages = [{"record": record, "record_id": n, "version": n + 1, "timestamp": record["timestamp"],
+                     "seq": n + 1} for n, record in enumerate(records)]
+        for name, encoder in (("json", encode), ("binary", pack)):
+            payloads, size, encode_time = encoded(messages, encoder)
+            compressed, deflate_time = deflated(payloads)
+            print(f"{sensor:>10} {name:>8} {size:>8.0f} {compressed:>9.0f} {encode_time * 1e6:>10.1f} "
+                  f"{deflate_time * 1e6:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
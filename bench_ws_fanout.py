@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Dashboard fan-out with many clients and a few slow ones.
+
+Publishes a burst of sensor messages to N simulated WebSocket clients, a
+few of which take `--slow-delay` seconds per send, once with the old
+serial loop (await send_json per client) and once through BroadcastHub.
+Reports how long the broadcaster was blocked and the delivery lag seen by
+the healthy clients.
+
+Usage: python bench_ws_fanout.py [--clients 60] [--slow 3] [--messages 200]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from ws_hub import BroadcastHub
+
+
+class SimulatedClient:
+    def __init__(self, delay):
+        self.delay = delay
+        self.lags = []
+
+    async def _deliver(self, message):
+        await asyncio.sleep(self.delay)
+        self.lags.append(time.monotonic() - message["sent"])
+
+    async def send_json(self, message):
+        # Starlette serializes per client
+        json.dumps(message, separators=(",", ":"))
+        await self._deliver(message)
+
+    async def send_text(self, text):
+        await self._deliver(json.loads(text))
+
+    async def close(self, code=1000, reason=""):
+        pass
+
+
+def message(n):
+    return {"sensor": "wifi", "timestamp": time.time(), "sent": time.monotonic(), "n": n, "data": {
+        "networks": [{"ssid": f"Net-{i}", "bssid": f"02:00:00:00:00:{i:02x}", "rssi": -60, "channel": 6}
+                     for i in range(40)]
+    }}
+
+
+async def serial(clients, args):
+    start = time.perf_counter()
+    for n in range(args.messages):
+        msg = message(n)
+        for ws in clients:
+            await ws.send_json(msg)
+        await asyncio.sleep(args.interval)
+    return time.perf_counter() - start
+
+
+async def hub(clients, args):
+    broadcast = BroadcastHub({"max_queue": args.max_queue})
+    for ws in clients:
+        broadcast.register(ws)
+    start = time.perf_counter()
+    for n in range(args.messages):
+        broadcast.publish(message(n))
+        await asyncio.sleep(args.interval)
+    blocked = time.perf_counter() - start
+    fast = [ws for ws in clients if not ws.delay]
+    while any(len(ws.lags) < args.messages for ws in fast):
+        await asyncio.sleep(0.01)
+    await broadcast.close()
+    return blocked
+
+
+async def main_async(args):
+    print(f"{'mode':>8} {'broadcaster s':>14} {'fast p50 ms':>12} {'fast p99 ms':>12} {'slow delivered':>15}")
+    for name, run in (("serial", serial), ("hub", hub)):
+        clients = [SimulatedClient(args.slow_delay if i < args.slow else 0) for i in range(args.clients)]
+        blocked = await run(clients, args)
+        lags = sorted(lag for ws in clients if not ws.delay for lag in ws.lags)
+        p50 = statistics.median(lags) * 1000
+        p99 = lags[int(len(lags) * 0.99) - 1] * 1000
+        delivered = sum(len(ws.lags) for ws in clients if ws.delay) / max(1, args.slow)
+        print(f"{name:>8} {blocked:>14.2f} {p50:>12.1f} {p99:>12.1f} {delivered:>15.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare serial and queued WebSocket fan-out")
+    parser.add_argument("--clients", type=int, default=60)
+    parser.add_argument("--slow", type=int, default=3, help="Clients with slow sends")
+    parser.add_argument("--slow-delay", type=float, default=0.05, help="Seconds per send for slow clients")
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.005, help="Seconds between published messages")
+    parser.add_argument("--max-queue", type=int, default=32)
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
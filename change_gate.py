@@ -0,0 +1,233 @@
+import math
+import time
+
+import metrics
+
+GATE_RECORDS = metrics.counter(
+    "llm_gate_records_total", "Records seen by the change gate", ["sensor", "decision"]
+)
+
+# Sensor -> (device list field, identity fields in order of preference)
+DEVICE_LISTS = {
+    "wifi": ("networks", ("bssid", "ssid")),
+    "bluetooth": ("devices", ("address",)),
+    "dot11": ("bssids", ("bssid",)),
+}
+# Fields kept when a new device is reported in a diff
+DEVICE_FIELDS = ("ssid", "bssid", "address", "name", "vendor", "rssi", "channel", "security", "randomized", "deauths")
+
+
+def _magnitude(vector) -> float:
+    if not isinstance(vector, dict):
+        return 0.0
+    return math.sqrt(sum(float(vector.get(axis) or 0.0) ** 2 for axis in ("x", "y", "z")))
+
+
+class _DeviceBaseline:
+    __slots__ = ("rssi", "missing")
+
+    def __init__(self, rssi):
+        self.rssi = rssi
+        self.missing = 0
+
+
+class ChangeGate:
+    """
+    Per-sensor change detector in front of LLM analysis.
+
+    Each sensor keeps a rolling baseline and check() returns a compact diff
+    record only when something material changed, or None otherwise:
+      - device lists (Wi-Fi, Bluetooth, 802.11): devices added, devices
+        missing for `absence` consecutive records, and RSSI moves of at
+        least `rssi_hysteresis` dB from the last reported level
+      - 802.11 also: the interval's deauthentication count crossing
+        `deauth_threshold` either way, or moving by more than `rate_change`
+        (fraction) from the last reported count while above it, so a flood
+        against an unchanged set of BSSIDs still gets through
+      - IMU: accelerometer magnitude more than `accel_threshold` away from
+        its moving average, or gyro magnitude above `gyro_threshold`
+      - netio: send/receive rate more than `rate_change` (fraction) away
+        from its moving average
+      - anything else: a change in any top-level field
+    The first record from each sensor, and one every `heartbeat` seconds
+    (0 disables), is forwarded in full. A change in hardware_status is
+    always forwarded.
+    """
+    def __init__(self, config: dict = None):
+        config = config or {}
+        self.rssi_hysteresis = float(config.get("rssi_hysteresis", 10))
+        self.absence = max(1, int(config.get("absence", 2)))
+        self.accel_threshold = float(config.get("accel_threshold", 0.5))
+        self.gyro_threshold = float(config.get("gyro_threshold", 0.5))
+        self.rate_change = float(config.get("rate_change", 0.5))
+        self.min_rate = float(config.get("min_rate", 10240))
+        self.deauth_threshold = float(config.get("deauth_threshold", 10))
+        self.alpha = float(config.get("alpha", 0.2))
+        self.heartbeat = float(config.get("heartbeat", 900))
+        self._devices = {}
+        self._averages = {}
+        self._fields = {}
+        self._deauths = {}
+        self._status = {}
+        self._last_forward = {}
+        self.forwarded = {}
+        self.suppressed = {}
+
+    def check(self, record: dict, now: float = None):
+        """
+        Compare a record with its sensor's baseline. Returns the record to
+        analyse (a diff, or the full record on heartbeat) or None.
+        """
+        now = time.time() if now is None else now
+        sensor = record.get("sensor") or "unknown"
+        status = record.get("hardware_status")
+        status_changed = sensor in self._status and self._status[sensor] != status
+        self._status[sensor] = status
+
+        if sensor in DEVICE_LISTS:
+            change = self._device_diff(sensor, record)
+            if sensor == "dot11":
+                change.update(self._deauth_diff(sensor, record))
+        elif sensor == "imu":
+            change = self._imu_diff(record)
+        elif sensor == "netio":
+            change = self._netio_diff(record)
+        else:
+            change = self._field_diff(sensor, record)
+
+        heartbeat_due = self.heartbeat > 0 and now - self._last_forward.get(sensor, 0.0) >= self.heartbeat
+        if sensor not in self._last_forward:
+            result = dict(record, gate="baseline")
+        elif heartbeat_due:
+            result = dict(record, gate="heartbeat")
+        elif change or status_changed:
+            result = {
+                "sensor": sensor,
+                "timestamp": record.get("timestamp"),
+                "hardware_status": status,
+                "change": change or {},
+            }
+            if record.get("error"):
+                result["error"] = record["error"]
+            if status_changed:
+                result["change"]["hardware_status"] = status
+        else:
+            self.suppressed[sensor] = self.suppressed.get(sensor, 0) + 1
+            GATE_RECORDS.inc(sensor=sensor, decision="suppressed")
+            return None
+        self._last_forward[sensor] = now
+        self.forwarded[sensor] = self.forwarded.get(sensor, 0) + 1
+        GATE_RECORDS.inc(sensor=sensor, decision="forwarded")
+        return result
+
+    def stats(self) -> dict:
+        total_forwarded = sum(self.forwarded.values())
+        total = total_forwarded + sum(self.suppressed.values())
+        return {
+            "forwarded": dict(self.forwarded),
+            "suppressed": dict(self.suppressed),
+            "forward_rate": total_forwarded / total if total else 0.0,
+        }
+
+    def _device_diff(self, sensor: str, record: dict) -> dict:
+        list_field, key_fields = DEVICE_LISTS[sensor]
+        baseline = self._devices.setdefault(sensor, {})
+        seen = set()
+        added, shifted = [], []
+        for item in record.get(list_field) or []:
+            if not isinstance(item, dict):
+                continue
+            key = next((item[k] for k in key_fields if item.get(k)), None)
+            if key is None or key in seen:
+                continue
+            seen.add(key)
+            rssi = item.get("rssi")
+            entry = baseline.get(key)
+            if entry is None:
+                baseline[key] = _DeviceBaseline(rssi)
+                added.append({k: item[k] for k in DEVICE_FIELDS if item.get(k) is not None})
+                continue
+            entry.missing = 0
+            if isinstance(rssi, (int, float)):
+                if not isinstance(entry.rssi, (int, float)):
+                    entry.rssi = rssi
+                elif abs(rssi - entry.rssi) >= self.rssi_hysteresis:
+                    shifted.append({"id": key, "from": entry.rssi, "to": rssi})
+                    entry.rssi = rssi
+        removed = []
+        for key in list(baseline):
+            if key in seen:
+                continue
+            entry = baseline[key]
+            entry.missing += 1
+            if entry.missing >= self.absence:
+                removed.append(key)
+                del baseline[key]
+        change = {}
+        if added:
+            change["added"] = added
+        if removed:
+            change["removed"] = removed
+        if shifted:
+            change["rssi_shift"] = shifted
+        if change:
+            change["count"] = len(seen)
+        return change
+
+    def _deauth_diff(self, sensor: str, record: dict) -> dict:
+        deauths = record.get("deauths")
+        if not isinstance(deauths, (int, float)):
+            return {}
+        last = self._deauths.get(sensor)
+        flood = deauths >= self.deauth_threshold
+        # Below the threshold the count just tracks the background level
+        if last is None or not flood and last < self.deauth_threshold:
+            self._deauths[sensor] = deauths
+            return {}
+        if flood and last >= self.deauth_threshold and abs(deauths - last) <= self.rate_change * last:
+            return {}
+        self._deauths[sensor] = deauths
+        return {"deauths": {"from": last, "to": deauths, "frames": record.get("frames")}}
+
+    def _excursion(self, key: str, value: float) -> float:
+        """
+        Update the moving average for `key` and return the value's distance from it.
+        """
+        average = self._averages.get(key)
+        if average is None:
+            self._averages[key] = value
+            return 0.0
+        self._averages[key] = average + self.alpha * (value - average)
+        return value - average
+
+    def _imu_diff(self, record: dict) -> dict:
+        accel = _magnitude(record.get("accel"))
+        gyro = _magnitude(record.get("gyro"))
+        deviation = self._excursion("imu.accel", accel)
+        change = {}
+        if abs(deviation) > self.accel_threshold:
+            change["accel_magnitude"] = round(accel, 3)
+            change["accel_baseline"] = round(accel - deviation, 3)
+        if gyro > self.gyro_threshold:
+            change["gyro_magnitude"] = round(gyro, 3)
+        return change
+
+    def _netio_diff(self, record: dict) -> dict:
+        change = {}
+        for field in ("rate_sent", "rate_recv"):
+            value = record.get(field)
+            if not isinstance(value, (int, float)):
+                continue
+            deviation = self._excursion(f"netio.{field}", value)
+            average = value - deviation
+            if abs(deviation) > max(self.min_rate, self.rate_change * average):
+                change[field] = {"from": round(average), "to": round(value)}
+        return change
+
+    def _field_diff(self, sensor: str, record: dict) -> dict:
+        fields = {k: v for k, v in record.items() if k not in ("sensor", "timestamp", "hardware_status")}
+        previous = self._fields.get(sensor)
+        self._fields[sensor] = fields
+        if previous is None:
+            return fields
+        return {k: v for k, v in fields.items() if previous.get(k) != v}
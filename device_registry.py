@@ -0,0 +1,209 @@
+import collections
+import itertools
+import json
+import os
+import threading
+import time
+
+import metrics
+
+REGISTRY_ENTRIES = metrics.gauge("device_registry_entries", "Devices held in the registry", ["table"])
+REGISTRY_EVICTIONS = metrics.counter(
+    "device_registry_evictions_total", "Devices dropped from the registry", ["table", "reason"]
+)
+
+
+class DeviceEntry:
+    __slots__ = ("first_seen", "last_seen", "count", "vendor", "name")
+
+    def __init__(self, first_seen: float, last_seen: float, count: int = 0, vendor: str = None, name: str = None):
+        self.first_seen = first_seen
+        self.last_seen = last_seen
+        self.count = count
+        self.vendor = vendor
+        self.name = name
+
+    def to_dict(self, key: str) -> dict:
+        return {
+            "id": key,
+            "name": self.name,
+            "vendor": self.vendor,
+            "first_seen": self.first_seen,
+            "last_seen": self.last_seen,
+            "count": self.count,
+        }
+
+
+class _Table:
+    """
+    Entries in least-recently-seen order with a TTL and a size cap.
+    """
+    def __init__(self, name: str, ttl: float, max_entries: int):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.entries = collections.OrderedDict()
+        REGISTRY_ENTRIES.set_function(lambda: len(self.entries), table=name)
+
+    def expire(self, now: float):
+        cutoff = now - self.ttl
+        while self.entries:
+            key, entry = next(iter(self.entries.items()))
+            if entry.last_seen >= cutoff:
+                break
+            del self.entries[key]
+            REGISTRY_EVICTIONS.inc(table=self.name, reason="ttl")
+
+    def trim(self):
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            REGISTRY_EVICTIONS.inc(table=self.name, reason="lru")
+
+
+class DeviceRegistry:
+    """
+    Devices seen recently, for novelty detection and the dashboard.
+
+    Each kind (wifi, bluetooth, ...) has its own table keyed by SSID or
+    address. A device is new when it is not in its table, so one that has
+    not been seen for `ttl` seconds is reported again. Randomized
+    (locally administered) addresses rotate every few minutes and go to a
+    separate table with the shorter `randomized_ttl`. Each table holds at
+    most `max_entries` devices; beyond that the least recently seen are
+    dropped. save()/load() checkpoint the tables to `path`.
+    """
+    def __init__(self, config: dict = None):
+        config = config or {}
+        self.ttl = float(config.get("ttl", 86400))
+        self.randomized_ttl = float(config.get("randomized_ttl", 900))
+        self.max_entries = max(1, int(config.get("max_entries", 5000)))
+        self.path = config.get("path")
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def _table(self, name: str) -> _Table:
+        table = self._tables.get(name)
+        if table is None:
+            ttl = self.randomized_ttl if name.endswith("/random") else self.ttl
+            table = self._tables[name] = _Table(name, ttl, self.max_entries)
+        return table
+
+    @staticmethod
+    def _name(kind: str, randomized: bool) -> str:
+        return f"{kind}/random" if randomized else kind
+
+    def observe(self, kind: str, key: str, now: float = None, vendor: str = None, name: str = None,
+                randomized: bool = False) -> bool:
+        """
+        Record a sighting. Returns True if the device is new (never seen,
+        or expired since it was last seen).
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            table = self._table(self._name(kind, randomized))
+            table.expire(now)
+            entry = table.entries.get(key)
+            new = entry is None
+            if new:
+                entry = table.entries[key] = DeviceEntry(now, now)
+                table.trim()
+            else:
+                table.entries.move_to_end(key)
+            entry.last_seen = now
+            entry.count += 1
+            if vendor:
+                entry.vendor = vendor
+            if name:
+                entry.name = name
+            return new
+
+    def get(self, kind: str, key: str):
+        with self._lock:
+            for name in (kind, self._name(kind, True)):
+                table = self._tables.get(name)
+                if table is not None and key in table.entries:
+                    return table.entries[key]
+        return None
+
+    def devices(self, kind: str = None, limit: int = 100, now: float = None) -> list:
+        """
+        Unexpired devices, most recently seen first.
+        """
+        now = time.time() if now is None else now
+        found = []
+        with self._lock:
+            for name, table in self._tables.items():
+                table_kind = name.split("/", 1)[0]
+                if kind is not None and table_kind != kind:
+                    continue
+                table.expire(now)
+                randomized = name.endswith("/random")
+                # Tables are in last-seen order, so each contributes at most its newest `limit`
+                for key, entry in itertools.islice(reversed(table.entries.items()), limit):
+                    found.append({"kind": table_kind, "randomized": randomized, **entry.to_dict(key)})
+        found.sort(key=lambda d: d["last_seen"], reverse=True)
+        return found[:limit]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {name: len(table.entries) for name, table in self._tables.items()}
+
+    def load(self, now: float = None) -> int:
+        """
+        Restore unexpired entries from `path`. Returns the number loaded.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Device registry load error: {e}")
+            return 0
+        tables = saved.get("tables") if isinstance(saved, dict) else None
+        if not isinstance(tables, dict):
+            print(f"Device registry load error: no device tables in {self.path}")
+            return 0
+        now = time.time() if now is None else now
+        loaded = skipped = 0
+        with self._lock:
+            for name, rows in tables.items():
+                if not isinstance(rows, list):
+                    skipped += 1
+                    continue
+                table = self._table(name)
+                for row in rows:
+                    # Truncated or older-format rows are skipped, not fatal
+                    try:
+                        key, first_seen, last_seen, count, vendor, device_name = row
+                        if last_seen < now - table.ttl:
+                            continue
+                        table.entries[key] = DeviceEntry(float(first_seen), float(last_seen), int(count),
+                                                         vendor, device_name)
+                    except (TypeError, ValueError):
+                        skipped += 1
+                        continue
+                    loaded += 1
+                table.trim()
+        if skipped:
+            print(f"Device registry load: skipped {skipped} malformed entries in {self.path}")
+        return loaded
+
+    def save(self):
+        """
+        Write every table to `path` (least recently seen first, so LRU
+        order survives a restart).
+        """
+        if not self.path:
+            return
+        with self._lock:
+            tables = {
+                name: [[k, e.first_seen, e.last_seen, e.count, e.vendor, e.name] for k, e in table.entries.items()]
+                for name, table in self._tables.items()
+            }
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"tables": tables}, f, separators=(",", ":"))
+        os.replace(tmp, self.path)
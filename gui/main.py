@@ -2,19 +2,27 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import asyncio
-import re
+import itertools
 import re
 import time
 import os
 
 from config import load_config, CONFIG_PATH
-from sensors.oui import lookup as oui_lookup
+from sensors.oui import is_locally_administered, load_index as load_oui_index, lookup as oui_lookup
 import yaml
 from sensors.wifi import WifiSensor
 from sensors.bluetooth import BluetoothSensor
 from sensors.imu import ImuSensor
-from llm_client import analyze
+from sensors.dot11 import Dot11Sensor
+from sensors.runner import command_stats, set_concurrency, DEFAULT_CONCURRENCY
+from llm_pool import LLMWorkerPool
+from record_store import RecordStore
+from summary_buffer import SummaryBuffer
+from device_registry import DeviceRegistry
+from ws_hub import BroadcastHub
+from ws_delta import DeltaEncoder
 from alerts import check_alerts
+import metrics
 
 app = FastAPI()
 
@@ -22,7 +30,7 @@ app = FastAPI()
 static_dir = os.path.join(os.path.dirname(__file__), "static")
 app.mount("/static", StaticFiles(directory=static_dir), name="static")
 
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse
 import json
 from typing import Optional
 
@@ -39,32 +47,59 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Connected WebSocket clients
-clients: set[WebSocket] = set()
+# Connected WebSocket clients, each with its own bounded send queue
+hub = BroadcastHub()
+# Per-sensor record versions and deltas for delta-mode clients
+deltas = DeltaEncoder()
 ## Programmatic state tracking
-known_ssids: set[str] = set()
-known_bt: set[str] = set()
+# Recently seen Wi-Fi networks and Bluetooth devices, for novelty alerts
+device_registry = DeviceRegistry()
 known_assoc: Optional[str] = None
-# Buffer for periodic summaries
-summary_buffer: list[dict] = []
+# Bounded buffer for periodic summaries, sized from config at startup
+summary_buffer = SummaryBuffer()
 # Background tasks
 background_tasks = set()
 # Queue for incoming sensor data
 queue: asyncio.Queue = asyncio.Queue()
-# Tracking and summary buffers
-known_ssids: set[str] = set()
-known_bt: set[str] = set()
-summary_buffer: list[dict] = []
+# Worker pool running LLM analysis, created at startup when a model is set
+llm_pool: Optional[LLMWorkerPool] = None
+# Durable record history, created at startup unless storage is disabled
+record_store: Optional[RecordStore] = None
+
+# Pipeline metrics exposed on /metrics
+STAGE_SECONDS = metrics.histogram("broadcaster_stage_seconds", "Time spent in each broadcaster stage", ["stage"])
+PROCESSED = metrics.counter("broadcaster_records_total", "Records consumed by the broadcaster", ["sensor"])
+ALERTS = metrics.counter("broadcaster_alerts_total", "Alerts raised by the broadcaster", ["sensor", "source"])
+RECORD_AGE = metrics.histogram(
+    "broadcaster_record_age_seconds", "Delay from sensor timestamp to broadcast", ["sensor"]
+)
+WS_CLIENTS = metrics.gauge("websocket_clients", "Connected WebSocket clients")
+WS_CLIENTS.set_function(lambda: len(hub))
+metrics.gauge("broadcaster_queue_depth", "Records waiting for the broadcaster").set_function(lambda: queue.qsize())
+# Monotonic IDs linking records to their follow-up analysis messages
+_record_ids = itertools.count(1)
 
 @app.on_event("startup")
 async def startup_event():
     config = load_config()
     llm_model = config.get("llm", {}).get("model")
     alert_conf = config.get("alerts", {}) or {}
+    set_concurrency((config.get("commands") or {}).get("concurrency", DEFAULT_CONCURRENCY))
+    load_oui_index(config.get("oui", {}).get("index"))
+    global device_registry
+    registry_conf = {"path": "data/devices.json", **(config.get("devices", {}) or {})}
+    device_registry = DeviceRegistry(registry_conf)
+    device_registry.load()
+    checkpoint_task = asyncio.create_task(
+        _checkpoint_registry(float(registry_conf.get("checkpoint_interval", 300)))
+    )
+    background_tasks.add(checkpoint_task)
+    checkpoint_task.add_done_callback(background_tasks.discard)
     SENSOR_CLASSES = {
         "wifi": WifiSensor,
         "bluetooth": BluetoothSensor,
         "imu": ImuSensor,
+        "dot11": Dot11Sensor,
     }
     for name, cls in SENSOR_CLASSES.items():
         conf = config.get(name, {})
@@ -73,13 +108,42 @@ async def startup_event():
         background_tasks.add(task)
         task.add_done_callback(background_tasks.discard)
     
+    global hub, deltas
+    hub = BroadcastHub(config.get("websocket"))
+    deltas = DeltaEncoder(config.get("websocket"))
+    
     summary_interval = config.get('summary_interval', 300)
+    global summary_buffer
+    summary_buffer = SummaryBuffer(config.get("summary_buffer"), window=summary_interval)
     # Start broadcaster and periodic summary tasks
     broadcaster_task = asyncio.create_task(_broadcaster(llm_model, alert_conf))
     background_tasks.add(broadcaster_task)
     broadcaster_task.add_done_callback(background_tasks.discard)
     
-    summary_task = asyncio.create_task(_summary_scheduler(llm_model, summary_interval))
+    global llm_pool
+    if llm_model:
+        llm_pool = LLMWorkerPool(llm_model, config.get("llm", {}), on_result=_publish_analysis)
+        for task in llm_pool.start():
+            background_tasks.add(task)
+            task.add_done_callback(background_tasks.discard)
+    
+    global record_store
+    storage_conf = config.get("storage", {}) or {}
+    if storage_conf.get("enabled", True):
+        try:
+            record_store = RecordStore(storage_conf.get("path", "data/history.db"), storage_conf)
+            # Not a background task: shutdown lets it drain instead of cancelling it
+            record_store.start()
+        except Exception as e:
+            print(f"Record storage disabled: {e}")
+            record_store = None
+    if record_store is not None:
+        metrics.gauge("storage_pending_records", "Records waiting to be written to history").set_function(
+            lambda: record_store.stats()["pending"] if record_store is not None else 0
+        )
+    
+    summary_conf = config.get("llm", {}).get("summary")
+    summary_task = asyncio.create_task(_summary_scheduler(llm_model, summary_interval, summary_conf))
     background_tasks.add(summary_task)
     summary_task.add_done_callback(background_tasks.discard)
 
@@ -87,11 +151,7 @@ async def startup_event():
 async def shutdown_event():
     print("Shutting down server...")
     # Close all WebSocket connections
-    for websocket in clients.copy():
-        try:
-            await websocket.close(code=1000, reason="Server shutdown")
-        except Exception as e:
-            print(f"Error closing WebSocket: {e}")
+    await hub.close(code=1000, reason="Server shutdown")
     
     # Cancel all background tasks
     for task in background_tasks:
@@ -104,12 +164,93 @@ async def shutdown_event():
     if background_tasks:
         await asyncio.gather(*background_tasks, return_exceptions=True)
     
+    # Persist the analysis cache
+    if llm_pool is not None:
+        await llm_pool.stop()
+    
+    # Flush records that have not reached the database yet
+    if record_store is not None:
+        await record_store.stop()
+    
+    try:
+        device_registry.save()
+    except OSError as e:
+        print(f"Device registry save error: {e}")
+    
     print("Server shutdown complete. All resources released.")
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
+@app.get("/llm/stats")
+async def llm_stats():
+    """
+    Report LLM worker pool queue depth, wait times and drop counters.
+    """
+    if llm_pool is None:
+        return {"enabled": False}
+    return {"enabled": True, **llm_pool.stats()}
+
+@app.get("/commands/stats")
+async def commands_stats():
+    """
+    Report per-command latency statistics for sensor tool invocations.
+    """
+    return command_stats()
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    Prometheus text exposition of pipeline counters, gauges and histograms.
+    """
+    return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+@app.get("/ws/stats")
+async def ws_stats():
+    """
+    Report per-client WebSocket queue depth, lag and dropped messages.
+    """
+    return hub.stats()
+
+@app.get("/storage/stats")
+async def storage_stats():
+    """
+    Report record store backlog and batch write timings.
+    """
+    if record_store is None:
+        return {"enabled": False}
+    return {"enabled": True, **record_store.stats()}
+
+@app.get("/history")
+async def history(sensor: str, device: Optional[str] = None, start: Optional[float] = None,
+                  end: Optional[float] = None, points: int = 500):
+    """
+    Downsampled history for a sensor, or for one device of that sensor
+    (SSID/BSSID/address as `device`). Defaults to the last hour.
+    """
+    if record_store is None:
+        return {"enabled": False}
+    end = end if end is not None else time.time()
+    start = start if start is not None else end - 3600
+    return await asyncio.to_thread(record_store.history, sensor, start, end, points, device)
+
+@app.get("/history/devices")
+async def history_devices(sensor: str, limit: int = 500):
+    """
+    Devices recorded for a sensor, most recently seen first.
+    """
+    if record_store is None:
+        return {"enabled": False}
+    return await asyncio.to_thread(record_store.devices, sensor, limit)
+
+@app.get("/devices")
+async def devices(kind: Optional[str] = None, limit: int = 100):
+    """
+    Recently seen devices from the registry, most recent first.
+    """
+    return {"counts": device_registry.stats(), "devices": device_registry.devices(kind, limit)}
+
 @app.get("/settings")
 async def get_settings():
     """
@@ -136,23 +277,37 @@ async def websocket_endpoint(websocket: WebSocket):
     try:
         await websocket.accept()
         print(f"WebSocket connection accepted from {client_info}")
-        clients.add(websocket)
-        print(f"Total active WebSocket connections: {len(clients)}")
+        hub.register(websocket, client_info)
+        print(f"Total active WebSocket connections: {len(hub)}")
         
         # Send a test message to confirm connection is working
-        await websocket.send_json({
+        hub.send(websocket, {
             "status": "connected", 
             "timestamp": time.time(),
             "message": "WebSocket connection established"
         })
         print(f"Sent connection confirmation to {client_info}")
         
-        # Keep the connection alive
+        # Subscription and resume point may come in the URL:
+        # /ws?sensors=bluetooth&rate=1&mode=delta&encoding=binary&since=<last seq seen>&run=<its run>
+        params = websocket.query_params
+        if any(key in params for key in ("sensors", "rate", "mode", "encoding")):
+            hub.send(websocket, _subscribe(websocket, {
+                "sensors": params["sensors"].split(",") if params.get("sensors") else None,
+                "max_rate": params.get("rate"),
+                "mode": params.get("mode", "full"),
+                "encoding": params.get("encoding", "json"),
+            }))
+        since = params.get("since")
+        # What the client missed since `since`, or current sensor state for a new one
+        sent = hub.resume(websocket, int(since) if since and since.isdigit() else None, params.get("run"))
+        print(f"Sent {sent} {'missed' if since else 'snapshot'} messages to {client_info}")
+        
+        # Keep the connection alive and handle subscription requests
         while True:
             data = await websocket.receive_text()
             print(f"Received message from {client_info}: {data[:50]}..." if len(data) > 50 else f"Received message from {client_info}: {data}")
-            # Echo back to confirm receipt
-            await websocket.send_json({"status": "received", "timestamp": time.time()})
+            hub.send(websocket, _client_request(websocket, data))
     except WebSocketDisconnect:
         print(f"WebSocket disconnected from {client_info}")
     except Exception as e:
@@ -160,13 +315,45 @@ async def websocket_endpoint(websocket: WebSocket):
         import traceback
         traceback.print_exc()
     finally:
-        if websocket in clients:
-            clients.discard(websocket)
-            print(f"Removed {client_info} from clients. Remaining active connections: {len(clients)}")
+        await hub.unregister(websocket)
+        print(f"Removed {client_info} from clients. Remaining active connections: {len(hub)}")
+
+def _client_request(websocket: WebSocket, data: str) -> dict:
+    """
+    Handle one message from a dashboard client and return the reply.
+
+    {"type": "subscribe", "sensors": ["bluetooth"], "max_rate": 1, "mode": "delta",
+     "encoding": "binary"}
+    limits the client to those sensors (omit for all), at most `max_rate`
+    updates per second per sensor (omit for every record), with full
+    records or deltas against the previous one, sent as JSON text (the
+    default) or binary frames. Anything else is echoed as received.
+    """
+    try:
+        request = json.loads(data)
+    except ValueError:
+        request = None
+    if not isinstance(request, dict) or request.get("type") != "subscribe":
+        return {"status": "received", "timestamp": time.time()}
+    return _subscribe(websocket, request)
+
+def _subscribe(websocket: WebSocket, request: dict) -> dict:
+    """
+    Apply a subscription request and return the reply for the client.
+    """
+    try:
+        subscription = hub.subscribe(
+            websocket, request.get("sensors"), request.get("max_rate"), request.get("mode", "full"),
+            request.get("encoding", "json"),
+        )
+    except (TypeError, ValueError) as e:
+        return {"type": "error", "message": f"Invalid subscription: {e}", "timestamp": time.time()}
+    return {"type": "subscribed", **subscription, "timestamp": time.time()}
 
 async def _broadcaster(llm_model, alert_conf):
     """
-    Consume sensor records, run LLM analysis and rule checks, and broadcast to all clients.
+    Consume sensor records, run rule checks, and broadcast to all clients
+    immediately. LLM analysis is handed off to the LLM worker pool.
     """
     print("Broadcaster started and waiting for sensor data...")
     while True:
@@ -174,6 +361,8 @@ async def _broadcaster(llm_model, alert_conf):
         record = await queue.get()
         sensor_type = record.get('sensor', 'unknown')
         print(f"Received {sensor_type} data")
+        PROCESSED.inc(sensor=sensor_type)
+        stage_start = time.perf_counter()
         
         # Buffer for periodic summaries
         summary_buffer.append(record)
@@ -186,13 +375,12 @@ async def _broadcaster(llm_model, alert_conf):
                 ssid = net.get('ssid')
                 bssid = net.get('bssid') if isinstance(net, dict) else None
                 # New network detection
-                if ssid and ssid not in known_ssids:
+                if ssid and device_registry.observe('wifi', ssid):
                     prog_alerts.append({
                         'sensor': 'wifi',
                         'timestamp': ts,
                         'issue': f'New Wi-Fi network detected: {ssid}'
                     })
-                    known_ssids.add(ssid)
                 # Drone-like SSID detection
                 if ssid and re.search(r'(drone|mavic|dji|parrot|bebop)', ssid, re.IGNORECASE):
                     prog_alerts.append({
@@ -204,17 +392,22 @@ async def _broadcaster(llm_model, alert_conf):
             for dev in record.get('devices', []):
                 addr = dev.get('address')
                 name = dev.get('name') or ''
-                # Vendor lookup
-                vendor = oui_lookup(addr)
+                # Vendor lookup (randomized addresses have no vendor)
+                randomized = is_locally_administered(addr)
+                if randomized:
+                    dev['randomized'] = True
+                vendor = None if randomized else oui_lookup(addr)
+                if vendor:
+                    dev['vendor'] = vendor
                 vendor_str = f" (vendor: {vendor})" if vendor else ''
                 # New device detection
-                if addr and addr not in known_bt:
+                if addr and device_registry.observe('bluetooth', addr, vendor=vendor, name=name,
+                                                    randomized=randomized):
                     prog_alerts.append({
                         'sensor': 'bluetooth',
                         'timestamp': ts,
                         'issue': f'New Bluetooth device detected: {name or addr}{vendor_str}'
                     })
-                    known_bt.add(addr)
                 # Drone-like device detection (by name or vendor)
                 if ((name and re.search(r'(drone|mavic|dji|parrot|bebop)', name, re.IGNORECASE))
                         or vendor in ['DJI', 'Parrot']):
@@ -231,18 +424,21 @@ async def _broadcaster(llm_model, alert_conf):
                         'issue': f'Nearby smartphone detected: {name}{vendor_str}'
                     })
         
-        # Run LLM analysis if model is configured
-        analysis = None
-        if llm_model:
-            try:
-                analysis = await asyncio.to_thread(analyze, record, llm_model)
-            except Exception as e:
-                print(f"LLM analysis error: {e}")
+        now = time.perf_counter()
+        STAGE_SECONDS.observe(now - stage_start, stage="detect")
+        stage_start = now
         
         # Check for alerts based on rules
-        alerts = []
+        alerts = list(prog_alerts)
         if alert_conf and alert_conf.get("thresholds"):
-            alerts = check_alerts(record, alert_conf["thresholds"])
+            alerts.extend(check_alerts(record, alert_conf))
+        now = time.perf_counter()
+        STAGE_SECONDS.observe(now - stage_start, stage="rules")
+        stage_start = now
+        if prog_alerts:
+            ALERTS.inc(len(prog_alerts), sensor=sensor_type, source="detector")
+        if len(alerts) > len(prog_alerts):
+            ALERTS.inc(len(alerts) - len(prog_alerts), sensor=sensor_type, source="rules")
         
         # Prepare message to send to clients
         # Ensure all required fields are present in the record
@@ -256,20 +452,22 @@ async def _broadcaster(llm_model, alert_conf):
         # Ensure hardware_status is always present
         if 'hardware_status' not in record:
             record['hardware_status'] = 'unknown'
-            
+        
+        record_id = next(_record_ids)
+        version, delta = deltas.update(sensor_type, record)
         message = {
             "record": record,
+            "record_id": record_id,
+            "version": version,
             "timestamp": time.time(),
         }
-        
-        # Debug logging of the message content
-        print(f"Message content for {record.get('sensor', 'unknown')}:")
-        import json
-        print(json.dumps(message, indent=2, default=str))
-        if analysis:
-            message["analysis"] = analysis
+        if delta is not None:
+            delta = {"sensor": sensor_type, "delta": delta, "base": version - 1, **message}
+            del delta["record"]
         if alerts:
             message["alerts"] = alerts
+            if delta is not None:
+                delta["alerts"] = alerts
             # Also add to summary buffer for periodic summaries
             for alert in alerts:
                 summary_buffer.append({
@@ -278,60 +476,104 @@ async def _broadcaster(llm_model, alert_conf):
                     "description": alert["issue"] if "issue" in alert else alert.get("reason", "Unknown alert")
                 })
         
-        client_count = len(clients)
-        print(f"Preparing to broadcast {record.get('sensor', 'unknown')} data to {client_count} clients")
+        # Hand the record to the analysis pool without waiting for the model
+        if llm_pool is not None:
+            llm_pool.submit(record, record_id)
+        # Persist in the background; the store batches writes off the live path
+        if record_store is not None:
+            record_store.submit(record)
+        now = time.perf_counter()
+        STAGE_SECONDS.observe(now - stage_start, stage="dispatch")
+        stage_start = now
         
-        # Only proceed if there are clients connected
+        client_count = len(hub)
         if client_count == 0:
-            print("No WebSocket clients connected. Data will not be displayed.")
-            continue
-            
-        # Make a copy of the clients set to avoid modification during iteration
-        current_clients = list(clients)
-        successful_broadcasts = 0
-        
-        # Broadcast to all connected clients
-        for ws in current_clients:
-            try:
-                await ws.send_json(message)
-                successful_broadcasts += 1
-            except WebSocketDisconnect:
-                print(f"Client disconnected during broadcast")
-                clients.discard(ws)
-            except Exception as e:
-                print(f"Error broadcasting to client: {str(e)}")
-                # Client might be disconnected, remove it
-                clients.discard(ws)
-        
-        print(f"Successfully broadcasted {record.get('sensor', 'unknown')} data to {successful_broadcasts}/{client_count} clients")
+            print("No WebSocket clients connected. Keeping data for the next client's snapshot.")
+        successful_broadcasts = await _broadcast(message, sensor_type, coalesce=True, version=version, delta=delta)
+        STAGE_SECONDS.observe(time.perf_counter() - stage_start, stage="broadcast")
+        if isinstance(record.get("timestamp"), (int, float)):
+            RECORD_AGE.observe(max(0.0, time.time() - record["timestamp"]), sensor=sensor_type)
+        print(f"Queued {sensor_type} data for {successful_broadcasts}/{client_count} clients")
+
+
+async def _publish_analysis(record: dict, analysis: dict, record_id: int):
+    """
+    Push an LLM analysis result as a follow-up message tied to the
+    original record ID.
+    """
+    if not analysis:
+        return
+    message = {
+        "type": "analysis",
+        "record_id": record_id,
+        "sensor": record.get("sensor"),
+        "timestamp": time.time(),
+        "analysis": analysis,
+    }
+    if isinstance(analysis, dict) and analysis.get("anomaly"):
+        alert = {
+            "sensor": record.get("sensor"),
+            "timestamp": record.get("timestamp"),
+            "reason": analysis.get("reason"),
+        }
+        message["alerts"] = [alert]
+        summary_buffer.append({
+            "timestamp": record.get("timestamp"),
+            "type": f"{record.get('sensor', 'unknown')}_analysis",
+            "description": alert["reason"] or "LLM anomaly",
+        })
+    await _broadcast(message, record.get("sensor"))
+
+
+async def _broadcast(message: dict, topic: str = None, **options) -> int:
+    """
+    Queue a message for every client subscribed to `topic` (all clients
+    when None). The hub serializes it once and per-client sender tasks
+    deliver it, so a slow client never holds up the others. Returns the
+    number of clients it was queued for.
+    """
+    return hub.publish(message, topic, **options)
 
     
-async def _summary_scheduler(llm_model, interval: int):
+async def _checkpoint_registry(interval: float):
+    """
+    Periodically write the device registry to disk for fast restarts.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(device_registry.save)
+        except OSError as e:
+            print(f"Device registry save error: {e}")
+
+
+async def _summary_scheduler(llm_model, interval: int, summary_conf: dict = None):
     """
     Periodically summarize buffered sensor data and broadcast summary to clients.
+    The buffer is rolled up and summarized in token-budgeted parts.
     """
     # Import here to avoid circular issues
     from llm_client import summarize
+    from summarizer import MapReduceSummarizer
     while True:
         await asyncio.sleep(interval)
-        if not summary_buffer or not llm_model:
+        if not llm_model:
+            # Nothing will summarize these; don't hold on to them
+            summary_buffer.drain()
+            continue
+        if not summary_buffer:
             continue
         # Collect and clear buffer
-        records = list(summary_buffer)
-        summary_buffer.clear()
+        records = summary_buffer.drain()
+        # Reuse the analysis pool's connections when it has a client
+        if llm_pool is not None and llm_pool.client is not None:
+            summarizer = MapReduceSummarizer(llm_pool.client.summarize, summary_conf)
+        else:
+            summarizer = MapReduceSummarizer(summarize, summary_conf)
         try:
-            summary = summarize(records, llm_model)
+            summary = await summarizer.summarize(records, llm_model)
         except Exception as e:
             print(f"Summary generation error: {e}")
             continue
-        message = {"summary": summary, "timestamp": time.time()}
-        disconnected = set()
-        # Create a copy of the clients set to safely iterate over it
-        for ws in list(clients):
-            try:
-                await ws.send_json(message)
-            except Exception:
-                disconnected.add(ws)
-        for ws in disconnected:
-            clients.discard(ws)
-        # End of record broadcasting loop
\ No newline at end of file
+        message = {"type": "summary", "summary": summary, "timestamp": time.time()}
+        await _broadcast(message)
\ No newline at end of file
@@ -0,0 +1,181 @@
+import collections
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+
+import metrics
+
+CACHE_LOOKUPS = metrics.counter("llm_cache_lookups_total", "LLM analysis cache lookups", ["result"])
+CACHE_ENTRIES = metrics.gauge("llm_cache_entries", "Analyses held in the LLM cache")
+
+# Fields that change on every reading without changing what the model sees
+DEFAULT_IGNORE = (
+    "timestamp", "first_seen", "last_seen", "adverts",
+    "rssi_sum", "rssi_count", "beacons", "probe_responses", "replay",
+)
+# Signal levels are bucketed into bands so small fluctuations share a key
+RSSI_FIELDS = ("rssi", "rssi_avg", "rssi_max", "noise")
+
+
+def _canonical(value) -> str:
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), default=str)
+
+
+def normalize(value, rssi_band: int = 5, precision: int = 1, ignore=DEFAULT_IGNORE, key=None):
+    """
+    Reduce a record to the parts that matter for analysis: ignored fields
+    and nulls are dropped, RSSI-like values are floored to `rssi_band` dB,
+    other floats are rounded to `precision` digits and lists are sorted.
+    """
+    if isinstance(value, dict):
+        return {
+            k: normalize(v, rssi_band, precision, ignore, k)
+            for k, v in value.items()
+            if k not in ignore and v is not None
+        }
+    if isinstance(value, (list, tuple, set)):
+        items = [normalize(v, rssi_band, precision, ignore) for v in value]
+        return sorted(items, key=_canonical)
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        if key in RSSI_FIELDS and rssi_band > 0:
+            return int(math.floor(value / rssi_band) * rssi_band)
+        if isinstance(value, float):
+            return round(value, precision)
+    return value
+
+
+def fingerprint(record: dict, model: str = "", rssi_band: int = 5, precision: int = 1, ignore=DEFAULT_IGNORE) -> str:
+    """
+    Stable cache key for a record analysed by `model`.
+    """
+    normalized = normalize(record, rssi_band, precision, ignore)
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(model.encode())
+    digest.update(b"\0")
+    digest.update(_canonical(normalized).encode())
+    return digest.hexdigest()
+
+
+def cacheable(analysis) -> bool:
+    """
+    Only well-formed analyses are cached; failures and unparsed output are retried.
+    """
+    if not isinstance(analysis, dict) or "raw_output" in analysis or analysis.get("downgraded"):
+        return False
+    return not str(analysis.get("reason", "")).startswith("LLM analysis failed")
+
+
+class AnalysisCache:
+    """
+    LRU + TTL cache of LLM analyses keyed by a normalized record fingerprint.
+
+    In a stable RF environment consecutive scans differ only in timestamps
+    and a few dB of RSSI, so they normalize to the same key and reuse the
+    previous analysis instead of waiting on the model. Entries expire after
+    `ttl` seconds so a long-lived environment is still re-analysed now and
+    then. With `path` set, entries are saved as JSON on save() and loaded
+    on load(), so a restart starts warm. Safe to use from worker threads.
+    """
+    def __init__(self, config: dict = None):
+        config = config or {}
+        self.max_entries = max(1, int(config.get("max_entries", 1024)))
+        self.ttl = float(config.get("ttl", 600))
+        self.rssi_band = int(config.get("rssi_band", 5))
+        self.precision = int(config.get("precision", 1))
+        self.ignore = tuple(DEFAULT_IGNORE) + tuple(config.get("ignore_fields", ()))
+        self.path = config.get("path")
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        CACHE_ENTRIES.set_function(lambda: len(self._entries))
+
+    def key(self, record: dict, model: str = "") -> str:
+        return fingerprint(record, model, self.rssi_band, self.precision, self.ignore)
+
+    def get(self, key: str, now: float = None):
+        """
+        Cached analysis for `key`, or None on a miss or expired entry.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                del self._entries[key]
+                self.expired += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                CACHE_LOOKUPS.inc(result="miss")
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        CACHE_LOOKUPS.inc(result="hit")
+        return entry[1]
+
+    def put(self, key: str, analysis: dict, now: float = None):
+        if not cacheable(analysis):
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            self._entries[key] = (now + self.ttl, analysis)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "expired": self.expired,
+            "evictions": self.evictions,
+        }
+
+    def load(self) -> int:
+        """
+        Restore unexpired entries from `path`. Returns the number loaded.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path) as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"LLM cache load error: {e}")
+            return 0
+        now = time.time()
+        with self._lock:
+            for key, expires, analysis in saved.get("entries", []):
+                if expires > now:
+                    self._entries[key] = (expires, analysis)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            return len(self._entries)
+
+    def save(self):
+        """
+        Write unexpired entries to `path` (oldest first, so LRU order survives).
+        """
+        if not self.path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [[k, e, a] for k, (e, a) in self._entries.items() if e > now]
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"entries": entries}, f)
+        os.replace(tmp, self.path)
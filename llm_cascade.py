@@ -0,0 +1,214 @@
+import asyncio
+import math
+import re
+import time
+
+import metrics
+from llm_client import extract_json_from_text
+from prompts import screen_prompt
+
+CASCADE_SECONDS = metrics.histogram("llm_cascade_tier_seconds", "Time spent in each cascade tier", ["tier"])
+CASCADE_RECORDS = metrics.counter("llm_cascade_records_total", "Cascade decisions", ["decision"])
+
+DRONE_PATTERN = re.compile(r"(drone|mavic|dji|parrot|bebop|anafi|skydio)", re.IGNORECASE)
+SURVEILLANCE_PATTERN = re.compile(r"(cam|spy|surveil|tracker|airtag|tile|hidden)", re.IGNORECASE)
+
+
+def _devices(record: dict) -> list:
+    devices = []
+    for field in ("networks", "devices", "bssids"):
+        devices.extend(d for d in record.get(field) or [] if isinstance(d, dict))
+    change = record.get("change")
+    if isinstance(change, dict):
+        devices.extend(d for d in change.get("added") or [] if isinstance(d, dict))
+    return devices
+
+
+def _magnitude(vector) -> float:
+    if not isinstance(vector, dict):
+        return 0.0
+    return math.sqrt(sum(float(vector.get(axis) or 0.0) ** 2 for axis in ("x", "y", "z")))
+
+
+def rule_score(record: dict):
+    """
+    Cheap threat score in [0, 1] from fixed heuristics, with the reasons
+    that contributed. Signals are combined as independent probabilities.
+    """
+    signals = []
+    sensor = record.get("sensor")
+    security_by_ssid = {}
+    for dev in _devices(record):
+        label = dev.get("ssid") or dev.get("name") or ""
+        rssi = dev.get("rssi")
+        if DRONE_PATTERN.search(label) or dev.get("vendor") in ("DJI", "Parrot"):
+            signals.append((0.8, f"drone-like device {label or dev.get('address')}"))
+        elif SURVEILLANCE_PATTERN.search(label):
+            signals.append((0.4, f"possible surveillance/tracker device {label}"))
+        if isinstance(rssi, (int, float)) and rssi > -45:
+            signals.append((0.35, f"very strong signal from {label or dev.get('address') or dev.get('bssid')}"))
+        security = str(dev.get("security") or "")
+        if sensor == "wifi" and re.search(r"\b(open|none|wep)\b", security, re.IGNORECASE):
+            signals.append((0.3, f"weak security on {label}"))
+        if dev.get("ssid") and security:
+            security_by_ssid.setdefault(dev["ssid"], set()).add(security)
+        if isinstance(dev.get("deauths"), (int, float)) and dev["deauths"] > 0:
+            signals.append((0.5, f"deauthentication frames from {dev.get('bssid')}"))
+    for ssid, securities in security_by_ssid.items():
+        if len(securities) > 1:
+            signals.append((0.7, f"SSID {ssid} advertised with different security settings"))
+    # 802.11 records carry the interval's frame totals at the top level
+    deauths = record.get("deauths")
+    if isinstance(deauths, (int, float)) and deauths >= 10:
+        signals.append((0.8, f"{deauths} deauthentication frames"))
+    change = record.get("change")
+    if isinstance(change, dict):
+        if len(change.get("added") or []) >= 3:
+            signals.append((0.3, "several new devices appeared"))
+        if change.get("rssi_shift"):
+            signals.append((0.2, "signal strength shifts"))
+    if sensor == "imu":
+        gyro = _magnitude(record.get("gyro"))
+        accel = _magnitude(record.get("accel"))
+        # Platforms report acceleration in g or in m/s^2
+        gravity = 1.0 if accel < 4 else 9.81
+        if gyro > 0.5:
+            signals.append((0.5, f"rotation ({gyro:.2f})"))
+        if accel and abs(accel - gravity) > 0.3 * gravity:
+            signals.append((0.5, f"acceleration excursion ({accel:.2f})"))
+    if sensor == "netio" and isinstance(record.get("rate_sent"), (int, float)) and record["rate_sent"] > 5e6:
+        signals.append((0.4, "high upload rate"))
+    score = 1.0
+    for weight, _ in signals:
+        score *= 1.0 - weight
+    return 1.0 - score, [reason for _, reason in signals]
+
+
+class TriageCascade:
+    """
+    Two-tier analysis: every record is screened cheaply and only records
+    scoring at least `threshold` are escalated to the full model.
+
+    `screen: rules` scores records with rule_score() alone; `screen: model`
+    also asks the small `screen_model` for a 0-1 score and uses the higher
+    of the two, so the rules act as a floor under the small model. A
+    screening failure escalates the record rather than dropping it.
+    Records screened out get a low-threat verdict that records their score.
+    """
+    def __init__(self, config: dict = None, client=None, analyze_fn=None, analyze_batch_fn=None):
+        config = config or {}
+        self.threshold = float(config.get("threshold", 0.5))
+        self.screen = config.get("screen", "rules")
+        self.screen_model = config.get("screen_model")
+        self.screen_num_predict = int(config.get("screen_num_predict", 64))
+        if self.screen == "model" and (client is None or not self.screen_model):
+            raise ValueError("cascade screen: model needs a client and cascade.screen_model")
+        self.client = client
+        self.analyze_fn = analyze_fn
+        self.analyze_batch_fn = analyze_batch_fn
+        self.tiers = {
+            "screen": {"calls": 0, "total_time": 0.0},
+            "full": {"calls": 0, "total_time": 0.0},
+        }
+        self.screened_out = 0
+        self.escalated = 0
+        self.screen_failures = 0
+
+    def _observe(self, tier: str, elapsed: float, calls: int = 1):
+        entry = self.tiers[tier]
+        entry["calls"] += calls
+        entry["total_time"] += elapsed
+        CASCADE_SECONDS.observe(elapsed, tier=tier)
+
+    async def score(self, record: dict):
+        """
+        Screening score and reason for one record.
+        """
+        start = time.perf_counter()
+        score, reasons = rule_score(record)
+        reason = "; ".join(reasons) or "no rule matched"
+        if self.screen == "model":
+            try:
+                text = await self.client.generate(
+                    self.screen_model, screen_prompt(record), "screen", self.screen_num_predict
+                )
+                result = extract_json_from_text(text)
+                model_score = min(1.0, max(0.0, float(result["score"])))
+                if model_score > score:
+                    score, reason = model_score, str(result.get("reason") or reason)
+            except Exception as e:
+                self.screen_failures += 1
+                score, reason = 1.0, f"screening failed ({e}); escalated"
+        self._observe("screen", time.perf_counter() - start)
+        return score, reason
+
+    def _screened_verdict(self, score: float, reason: str) -> dict:
+        self.screened_out += 1
+        CASCADE_RECORDS.inc(decision="screened_out")
+        return {
+            "anomaly": False,
+            "reason": f"Screened as routine (score {score:.2f}): {reason}",
+            "threat_level": "low",
+            "recommendation": "No action required",
+            "details": {"tier": "screen", "screen_score": round(score, 3)},
+        }
+
+    def _escalated(self, analysis, score: float):
+        self.escalated += 1
+        CASCADE_RECORDS.inc(decision="escalated")
+        if isinstance(analysis, dict):
+            details = analysis.get("details")
+            if not isinstance(details, dict):
+                details = analysis["details"] = {}
+            details["tier"] = "full"
+            details["screen_score"] = round(score, 3)
+        return analysis
+
+    async def analyze(self, record: dict, model: str) -> dict:
+        score, reason = await self.score(record)
+        if score < self.threshold:
+            return self._screened_verdict(score, reason)
+        start = time.perf_counter()
+        analysis = await self.analyze_fn(record, model)
+        self._observe("full", time.perf_counter() - start)
+        return self._escalated(analysis, score)
+
+    async def analyze_batch(self, items, model: str) -> dict:
+        scores = await asyncio.gather(*(self.score(record) for _, record in items))
+        results = {}
+        escalate = []
+        for (record_id, record), (score, reason) in zip(items, scores):
+            if score < self.threshold:
+                results[record_id] = self._screened_verdict(score, reason)
+            else:
+                escalate.append((record_id, record, score))
+        if not escalate:
+            return results
+        start = time.perf_counter()
+        if len(escalate) == 1 or self.analyze_batch_fn is None:
+            verdicts = await asyncio.gather(*(self.analyze_fn(record, model) for _, record, _ in escalate))
+            verdicts = {record_id: v for (record_id, _, _), v in zip(escalate, verdicts)}
+        else:
+            verdicts = await self.analyze_batch_fn([(i, r) for i, r, _ in escalate], model)
+        self._observe("full", time.perf_counter() - start, len(escalate))
+        for record_id, _, score in escalate:
+            results[record_id] = self._escalated(verdicts.get(record_id), score)
+        return results
+
+    def stats(self) -> dict:
+        total = self.screened_out + self.escalated
+        return {
+            "screen": self.screen,
+            "threshold": self.threshold,
+            "escalated": self.escalated,
+            "screened_out": self.screened_out,
+            "escalation_rate": self.escalated / total if total else 0.0,
+            "screen_failures": self.screen_failures,
+            "tiers": {
+                tier: {
+                    "calls": entry["calls"],
+                    "avg_time": entry["total_time"] / entry["calls"] if entry["calls"] else 0.0,
+                }
+                for tier, entry in self.tiers.items()
+            },
+        }
@@ -1,8 +1,211 @@
-import subprocess
+"""
+Ollama response validation and a blocking client.
+
+Analysis prompts are assembled per sensor in prompts.py. The summary
+prompt and the parse_* validators here are shared with the asyncio
+client in ollama_client.py, which the LLM worker pool uses. analyze() and
+summarize() here are the blocking equivalents for scripts and tests.
+Both clients request JSON-format output, cap num_predict, parse the token
+stream incrementally and stop reading as soon as a complete JSON object
+has arrived, and share a circuit breaker so a dead Ollama server costs one
+fast failure per record instead of a connection attempt plus an
+`ollama run` spawn.
+"""
+import functools
+import inspect
 import json
-import requests
-import time
 import re
+import threading
+import time
+
+import requests
+
+import metrics
+from prompts import FULL_INSTRUCTION, analysis_prompt, batch_prompt, estimate_tokens  # noqa: F401
+
+OLLAMA_URL = "http://localhost:11434"
+# Tokens the model may generate per call; a verdict fits well inside these
+ANALYZE_NUM_PREDICT = 512
+SUMMARY_NUM_PREDICT = 2048
+REQUEST_TIMEOUT = 120
+# Tokens read past a complete JSON object (waiting for "done", which keeps
+# the connection reusable) before the stream is cut off
+EARLY_STOP_GRACE = 3
+
+LLM_REQUESTS = metrics.counter("llm_requests_total", "LLM calls by outcome", ["kind", "outcome"])
+LLM_SECONDS = metrics.histogram("llm_request_seconds", "LLM call latency", ["kind"])
+LLM_EARLY_STOPS = metrics.counter(
+    "llm_early_stops_total", "Generations cut off once a complete JSON object arrived", ["kind"]
+)
+LLM_PROMPT_BYTES = metrics.histogram(
+    "llm_prompt_bytes", "Prompt size sent to the model", ["kind"],
+    buckets=(1024, 2048, 4096, 8192, 16384, 32768, 65536, 131072, 262144),
+)
+BREAKER_STATE = metrics.gauge("llm_circuit_open", "1 while an Ollama server's circuit breaker is open", ["backend"])
+
+def _outcome(result) -> str:
+    """
+    Classify a structured analyze()/summarize() result for metrics.
+    """
+    if isinstance(result, dict) and isinstance(result.get("events"), list) and result["events"]:
+        result = result["events"][0]
+    if isinstance(result, dict) and result and all(isinstance(k, int) for k in result):
+        # analyze_batch: {record id: verdict}
+        result = next(iter(result.values()))
+    if not isinstance(result, dict):
+        return "ok"
+    if result.get("type") == "error" or str(result.get("reason", "")).startswith("LLM analysis failed"):
+        return "error"
+    if "raw_output" in result:
+        return "unparsed"
+    return "ok"
+
+def instrumented(kind):
+    """
+    Record latency and outcome of every call to the wrapped LLM function.
+    Works for both plain and coroutine functions.
+    """
+    def decorator(fn):
+        def finish(start, result):
+            LLM_SECONDS.observe(time.perf_counter() - start, kind=kind)
+            LLM_REQUESTS.inc(kind=kind, outcome=_outcome(result))
+            return result
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = await fn(*args, **kwargs)
+                except BaseException:
+                    LLM_SECONDS.observe(time.perf_counter() - start, kind=kind)
+                    LLM_REQUESTS.inc(kind=kind, outcome="exception")
+                    raise
+                return finish(start, result)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except Exception:
+                LLM_SECONDS.observe(time.perf_counter() - start, kind=kind)
+                LLM_REQUESTS.inc(kind=kind, outcome="exception")
+                raise
+            return finish(start, result)
+        return wrapper
+    return decorator
+
+class CircuitBreaker:
+    """
+    Stops calls to a failing server.
+
+    After `failure_threshold` consecutive failures the breaker opens and
+    allow() returns False for `reset_timeout` seconds. Then a single trial
+    call is let through (half-open): success closes the breaker, failure
+    opens it again. `name` labels the breaker's state metric.
+    """
+    def __init__(self, failure_threshold: int = 3, reset_timeout: float = 30.0, name: str = OLLAMA_URL):
+        self.name = name
+        self.failure_threshold = max(1, int(failure_threshold))
+        self.reset_timeout = float(reset_timeout)
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half_open" and not self.trial_running:
+                self.trial_running = True
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+        BREAKER_STATE.set(0, backend=self.name)
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self.trial_running = False
+            if self.opened_at is not None or self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+                BREAKER_STATE.set(1, backend=self.name)
+
+    def abandon(self):
+        """
+        Release a half-open trial that ended without a verdict (e.g. cancelled).
+        """
+        with self._lock:
+            self.trial_running = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "failures": self.failures, "rejected": self.rejected}
+
+# Guards the blocking calls in this module. OllamaClient builds its own
+# breaker per backend (from its config) unless one is passed in.
+breaker = CircuitBreaker()
+
+class JSONObjectStream:
+    """
+    Incremental detector for the end of the first top-level JSON object in
+    a stream of text fragments. feed() returns True once the object is
+    complete, so the caller can stop generation instead of waiting for the
+    model to pad its output up to num_predict.
+    """
+    def __init__(self):
+        self.parts = []
+        self.depth = 0
+        self.started = False
+        self.in_string = False
+        self.escaped = False
+        self.complete = False
+
+    def feed(self, fragment: str) -> bool:
+        self.parts.append(fragment)
+        if self.complete:
+            return True
+        for ch in fragment:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif ch == '"':
+                self.in_string = self.started
+            elif ch == "{":
+                self.depth += 1
+                self.started = True
+            elif ch == "}" and self.started:
+                self.depth -= 1
+                if self.depth == 0:
+                    self.complete = True
+                    return True
+        return False
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
 
 def extract_json_from_text(text):
     """
@@ -38,323 +241,278 @@ def extract_json_from_text(text):
     # If all else fails, return None
     return None
 
-def analyze(record: dict, model: str):
+# The all-sensor instruction; per-sensor prompts are assembled in prompts.py
+ANALYZE_INSTRUCTION = FULL_INSTRUCTION
+
+SUMMARY_INSTRUCTION = (
+    "You are a military-grade cybersecurity and situational awareness analyst reviewing recent sensor data from Wi-Fi, Bluetooth, IMU, and network I/O.\n\n"
+    "This analysis is for a critical military application where accuracy and precision are essential.\n\n"
+
+    "ANALYZE WIFI DATA FOR SECURITY THREATS:\n"
+    "- Evil Twin Attacks: Look for duplicate SSIDs with different security settings\n"
+    "- Rogue Access Points: Identify unexpected networks or those with suspicious naming patterns\n"
+    "- Deauthentication Attacks: Note networks that repeatedly appear and disappear\n"
+    "- Weak Security: Flag networks using outdated security (WEP, Open)\n"
+    "- Signal Anomalies: Identify unusually strong signals that could indicate close proximity\n"
+    "- Surveillance Networks: Look for SSIDs matching patterns used by surveillance equipment\n"
+    "- Historical Changes: Compare with previous scans to identify new or missing networks\n\n"
+
+    "ANALYZE BLUETOOTH DATA FOR SECURITY THREATS:\n"
+    "- Proximity Threats: Identify devices with very strong signal strength (RSSI > -50dBm)\n"
+    "- Suspicious Devices: Flag devices with names suggesting drones, cameras, or surveillance equipment\n"
+    "- Persistent Trackers: Note devices that consistently appear across multiple scans\n"
+    "- Spoofed Devices: Identify devices that may be impersonating known trusted devices\n"
+    "- Bluetooth Beacons: Detect unexpected beacon activity in secure areas\n"
+    "- Unknown Manufacturers: Flag devices with unrecognized manufacturer data\n"
+    "- Bluetooth Sniffers: Look for devices that might be capturing Bluetooth traffic\n\n"
+
+    "CORRELATE DATA ACROSS SENSORS:\n"
+    "- Look for relationships between WiFi and Bluetooth anomalies\n"
+    "- Consider physical movement patterns from IMU data that coincide with network changes\n"
+    "- Identify patterns suggesting coordinated surveillance or monitoring\n"
+    "- Flag situations where multiple low-risk indicators combine to suggest higher risk\n\n"
+
+    "IMPORTANT: Your response MUST be a valid JSON object with EXACTLY this structure:\n"
+    "{ \"events\": [ \n"
+    "    { \n"
+    "        \"timestamp\": (number, current unix timestamp),\n"
+    "        \"type\": (string, specific event type - e.g., 'evil_twin_detected', 'rogue_ap', 'suspicious_bluetooth', 'proximity_alert'),\n"
+    "        \"sensor\": (string, which sensor detected this - 'wifi', 'bluetooth', 'imu', or 'correlated'),\n"
+    "        \"level\": (string, must be one of: \"info\", \"warning\", \"critical\") - assess based on military security standards,\n"
+    "        \"description\": (string, precise factual description),\n"
+    "        \"affected_devices\": (array of strings, identifiers of relevant devices/networks),\n"
+    "        \"recommendation\": (string, specific action based on military security protocols)\n"
+    "    }\n"
+    "]}\n\n"
+    "If no events are detected, return an empty events array.\n\n"
+    "DO NOT include any explanations, markdown formatting, or text outside the JSON object. "
+    "DO NOT fabricate or invent data that is not present in the records."
+)
+
+def summary_prompt(records: list, instruction: str = None) -> str:
+    return f"{instruction or SUMMARY_INSTRUCTION}\n\nRecords:\n{json.dumps(records)}"
+
+def analysis_error(reason: str, recommendation: str = "Check if Ollama is running correctly") -> dict:
+    return {
+        "anomaly": False,
+        "reason": f"LLM analysis failed: {reason}",
+        "threat_level": "low",
+        "recommendation": recommendation,
+    }
+
+def summary_error(description: str, recommendation: str = "Check if Ollama is running correctly") -> dict:
+    return {
+        "events": [
+            {
+                "timestamp": time.time(),
+                "type": "error",
+                "level": "warning",
+                "description": f"LLM summary failed: {description}",
+                "recommendation": recommendation,
+            }
+        ]
+    }
+
+def parse_analysis(text: str) -> dict:
     """
-    Sends the record to the local Ollama LLM for analysis.
+    Validate model output as an analysis verdict.
     """
-    # Construct an enhanced instruction prompt for anomaly detection with emphasis on security and JSON format
-    instruction = (
-        "You are a military-grade security analyst monitoring sensor data from a Software Defined Radio system. "
-        "For the following record, analyze if there are any security implications or anomalies with absolute precision, "
-        "including both cybersecurity threats AND physical security threats. "
-        "This is for a military application where accuracy is critical.\n\n"
-        
-        "For WiFi data, analyze for:\n"
-        "- Rogue/unauthorized access points (unexpected SSIDs or duplicate SSIDs with different security)\n"
-        "- Evil twin attacks (duplicate networks with similar names but different security settings)\n"
-        "- Unusual signal strengths (unexpectedly strong signals that might indicate proximity)\n"
-        "- Open networks in secure areas (potential security risk)\n"
-        "- Networks with weak security protocols (WEP, open)\n"
-        "- Suspicious naming patterns that might indicate surveillance\n"
-        "- Sudden appearance of new networks in previously stable environments\n"
-        "- Disappearance of previously stable networks (could indicate jamming)\n"
-        "- PHYSICAL THREATS: Unusual density of devices in an area (indicating gathering of people)\n"
-        "- PHYSICAL THREATS: Movement patterns of devices suggesting unauthorized physical approach\n"
-        "- PHYSICAL THREATS: New devices appearing in typically empty or secure spaces\n\n"
-        
-        "For Bluetooth data, analyze for:\n"
-        "- Unexpected devices with very strong signal strength (indicating close proximity)\n"
-        "- Devices with suspicious names (surveillance equipment, drones, unknown devices)\n"
-        "- Devices that appear to be spoofing legitimate device names\n"
-        "- Persistent unknown devices that follow location changes\n"
-        "- Bluetooth devices with unusual manufacturer data\n"
-        "- Patterns suggesting Bluetooth tracking or surveillance\n"
-        "- Bluetooth beacons in unexpected locations\n"
-        "- PHYSICAL THREATS: Devices that remain in proximity for extended periods (possible surveillance)\n"
-        "- PHYSICAL THREATS: Devices showing movement patterns that suggest following or circling\n"
-        "- PHYSICAL THREATS: Sudden appearance of multiple new devices (possible group approach)\n\n"
-        
-        "For IMU data, analyze for:\n"
-        "- PHYSICAL THREATS: Unusual vibrations or movements that might indicate someone approaching\n"
-        "- PHYSICAL THREATS: Unexpected orientation changes that might indicate physical tampering\n"
-        "- PHYSICAL THREATS: Movement patterns consistent with being carried by someone unauthorized\n"
-        "- PHYSICAL THREATS: Sudden impacts or shocks that might indicate attempted access\n\n"
-        
-        "When analyzing for physical threats, consider:\n"
-        "- Correlations between different sensor types (e.g., Bluetooth proximity + IMU movement)\n"
-        "- Timing patterns that might indicate coordinated physical approach\n"
-        "- Signal strength changes that suggest movement toward or away from the device\n"
-        "- Persistence of signals that might indicate sustained surveillance\n\n"
-        
-        "IMPORTANT: Your response MUST be a valid JSON object with EXACTLY these keys:\n"
-        "- 'anomaly': boolean (true/false) - indicate if there is a potential security threat (cyber or physical)\n"
-        "- 'reason': string (precise, factual description of the finding)\n"
-        "- 'threat_level': string (must be one of: 'low', 'medium', 'high') - assess based on military security standards\n"
-        "- 'threat_type': string (must be one of: 'cyber', 'physical', 'both') - indicate the nature of the threat\n"
-        "- 'recommendation': string (specific action to take based on military security protocols)\n"
-        "- 'details': object (containing specific findings that led to this assessment, including physical threat indicators)\n\n"
-        
-        "If you cannot make a determination due to insufficient data, indicate this clearly in the 'reason' field "
-        "and set 'anomaly' to false and 'threat_level' to 'low'.\n\n"
-        
-        "DO NOT include any explanations, markdown formatting, or text outside the JSON object. "
-        "DO NOT fabricate or invent data that is not present in the record."
-    )
-    payload = json.dumps(record)
-    prompt = f"{instruction}\n\nRecord:\n{payload}"
+    json_result = extract_json_from_text(text)
+    if json_result:
+        # Validate that the JSON has the required keys
+        required_keys = ['anomaly', 'reason', 'threat_level', 'recommendation']
+        if all(key in json_result for key in required_keys):
+            # Add details field if it doesn't exist
+            if 'details' not in json_result:
+                json_result['details'] = {}
+            return json_result
     
-    # Use the Ollama API directly - this is the most reliable method
-    try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={"model": model, "prompt": prompt}
-        )
-        response.raise_for_status()  # Raise exception for HTTP errors
-        
-        # Extract the generated text from the streaming response
-        result_text = ""
-        for line in response.iter_lines():
-            if line:
-                try:
-                    data = json.loads(line)
-                    if "response" in data:
-                        result_text += data["response"]
-                except json.JSONDecodeError:
-                    continue
-        
-        # Try to parse the result as JSON using our enhanced extraction
-        json_result = extract_json_from_text(result_text)
-        if json_result:
-            # Validate that the JSON has the required keys
-            required_keys = ['anomaly', 'reason', 'threat_level', 'recommendation']
-            if all(key in json_result for key in required_keys):
-                # Add details field if it doesn't exist
-                if 'details' not in json_result:
-                    json_result['details'] = {}
-                return json_result
-        
-        # If we couldn't extract valid JSON or it's missing required keys
-        return {
-            "anomaly": False, 
-            "reason": "Analysis could not be completed in proper format - original analysis data preserved in raw_output", 
-            "raw_output": result_text.strip(),
-            "threat_level": "low",
-            "recommendation": "Manual review required - automated analysis failed to produce structured results"
-        }
-            
-    except requests.RequestException as e:
-        # If API fails, try CLI as fallback
+    # If we couldn't extract valid JSON or it's missing required keys
+    return {
+        "anomaly": False, 
+        "reason": "Analysis could not be completed in proper format - original analysis data preserved in raw_output", 
+        "raw_output": text.strip(),
+        "threat_level": "low",
+        "recommendation": "Manual review required - automated analysis failed to produce structured results"
+    }
+
+def parse_batch_analysis(text: str, ids) -> dict:
+    """
+    Map a batch response back to {record id: verdict}. Records the model
+    skipped or answered malformed get an error verdict.
+    """
+    json_result = extract_json_from_text(text)
+    verdicts = json_result.get("verdicts") if isinstance(json_result, dict) else None
+    if isinstance(json_result, list):
+        verdicts = json_result
+    results = {}
+    required_keys = ['anomaly', 'reason', 'threat_level', 'recommendation']
+    for verdict in verdicts if isinstance(verdicts, list) else []:
+        if not isinstance(verdict, dict) or not all(key in verdict for key in required_keys):
+            continue
         try:
-            # Use the correct format for Ollama CLI (no --prompt flag)
-            result = subprocess.run(
-                ["ollama", "run", model, prompt],
-                capture_output=True,
-                text=True,
-                timeout=30  # Set a reasonable timeout
+            record_id = int(verdict.pop("id"))
+        except (KeyError, TypeError, ValueError):
+            continue
+        if record_id in ids and record_id not in results:
+            verdict.setdefault("details", {})
+            results[record_id] = verdict
+    for record_id in ids:
+        if record_id not in results:
+            results[record_id] = analysis_error(
+                "batch response had no verdict for this record", "Record will be analysed again if it recurs"
             )
-            
-            if result.returncode != 0:
-                return {
-                    "anomaly": False,
-                    "reason": f"LLM analysis failed: {result.stderr}",
-                    "threat_level": "low",
-                    "recommendation": "Check if Ollama is running correctly"
-                }
-                
-            # Try to parse the result as JSON using our enhanced extraction
-            json_result = extract_json_from_text(result.stdout)
-            if json_result:
-                # Validate that the JSON has the required keys
-                required_keys = ['anomaly', 'reason', 'threat_level', 'recommendation']
-                if all(key in json_result for key in required_keys):
-                    return json_result
-            
-            # If we couldn't extract valid JSON or it's missing required keys
-            return {
-                "anomaly": False, 
-                "reason": "Analysis could not be completed in proper format - original analysis data preserved in raw_output", 
-                "raw_output": result.stdout.strip(),
-                "threat_level": "low",
-                "recommendation": "Manual review required - automated analysis failed to produce structured results"
-            }
-                
-        except Exception as cli_error:
-            return {
-                "anomaly": False,
-                "reason": f"LLM analysis failed: {str(cli_error)}",
-                "threat_level": "low",
-                "recommendation": "Check if Ollama is installed and running"
-            }
-    
-def summarize(records: list, model: str, instruction: str = None):
+    return results
+
+def parse_summary(text: str) -> dict:
     """
-    Summarize a batch of sensor records using the LLM.
-    Returns the parsed JSON or raw text summary.
+    Validate model output as a summary event list.
     """
-    if instruction is None:
-        instruction = (
-            "You are a military-grade cybersecurity and situational awareness analyst reviewing recent sensor data from Wi-Fi, Bluetooth, IMU, and network I/O.\n\n"
-            "This analysis is for a critical military application where accuracy and precision are essential.\n\n"
-            
-            "ANALYZE WIFI DATA FOR SECURITY THREATS:\n"
-            "- Evil Twin Attacks: Look for duplicate SSIDs with different security settings\n"
-            "- Rogue Access Points: Identify unexpected networks or those with suspicious naming patterns\n"
-            "- Deauthentication Attacks: Note networks that repeatedly appear and disappear\n"
-            "- Weak Security: Flag networks using outdated security (WEP, Open)\n"
-            "- Signal Anomalies: Identify unusually strong signals that could indicate close proximity\n"
-            "- Surveillance Networks: Look for SSIDs matching patterns used by surveillance equipment\n"
-            "- Historical Changes: Compare with previous scans to identify new or missing networks\n\n"
+    json_result = extract_json_from_text(text)
+    if json_result and 'events' in json_result and isinstance(json_result['events'], list):
+        # Validate that the JSON has the required structure
+        valid_events = True
+        for event in json_result['events']:
+            required_keys = ['timestamp', 'type', 'level', 'description', 'recommendation']
+            if not all(key in event for key in required_keys):
+                valid_events = False
+                break
             
-            "ANALYZE BLUETOOTH DATA FOR SECURITY THREATS:\n"
-            "- Proximity Threats: Identify devices with very strong signal strength (RSSI > -50dBm)\n"
-            "- Suspicious Devices: Flag devices with names suggesting drones, cameras, or surveillance equipment\n"
-            "- Persistent Trackers: Note devices that consistently appear across multiple scans\n"
-            "- Spoofed Devices: Identify devices that may be impersonating known trusted devices\n"
-            "- Bluetooth Beacons: Detect unexpected beacon activity in secure areas\n"
-            "- Unknown Manufacturers: Flag devices with unrecognized manufacturer data\n"
-            "- Bluetooth Sniffers: Look for devices that might be capturing Bluetooth traffic\n\n"
+            # Add sensor field if missing
+            if 'sensor' not in event:
+                event['sensor'] = 'unknown'
             
-            "CORRELATE DATA ACROSS SENSORS:\n"
-            "- Look for relationships between WiFi and Bluetooth anomalies\n"
-            "- Consider physical movement patterns from IMU data that coincide with network changes\n"
-            "- Identify patterns suggesting coordinated surveillance or monitoring\n"
-            "- Flag situations where multiple low-risk indicators combine to suggest higher risk\n\n"
-            
-            "IMPORTANT: Your response MUST be a valid JSON object with EXACTLY this structure:\n"
-            "{ \"events\": [ \n"
-            "    { \n"
-            "        \"timestamp\": (number, current unix timestamp),\n"
-            "        \"type\": (string, specific event type - e.g., 'evil_twin_detected', 'rogue_ap', 'suspicious_bluetooth', 'proximity_alert'),\n"
-            "        \"sensor\": (string, which sensor detected this - 'wifi', 'bluetooth', 'imu', or 'correlated'),\n"
-            "        \"level\": (string, must be one of: \"info\", \"warning\", \"critical\") - assess based on military security standards,\n"
-            "        \"description\": (string, precise factual description),\n"
-            "        \"affected_devices\": (array of strings, identifiers of relevant devices/networks),\n"
-            "        \"recommendation\": (string, specific action based on military security protocols)\n"
-            "    }\n"
-            "]}\n\n"
-            "If no events are detected, return an empty events array.\n\n"
-            "DO NOT include any explanations, markdown formatting, or text outside the JSON object. "
-            "DO NOT fabricate or invent data that is not present in the records."
-        )
-    payload = json.dumps(records)
-    prompt = f"{instruction}\n\nRecords:\n{payload}"
+            # Add affected_devices field if missing
+            if 'affected_devices' not in event:
+                event['affected_devices'] = []
+        
+        if valid_events:
+            return json_result
     
-    # Use the Ollama API directly - this is the most reliable method
+    # Return a structured response even if the LLM didn't output valid JSON
+    return {
+        "events": [
+            {
+                "timestamp": time.time(),
+                "type": "summary",
+                "level": "info",
+                "description": "Analysis could not be completed in proper format - manual review required",
+                "raw_output": text.strip(),
+                "recommendation": "Escalate to security team for manual analysis of raw data"
+            }
+        ]
+    }
+
+def generate_payload(model: str, prompt: str, num_predict: int) -> dict:
+    """
+    /api/generate request body: streamed, JSON-constrained and length-capped.
+    """
+    return {
+        "model": model,
+        "prompt": prompt,
+        "stream": True,
+        "format": "json",
+        "options": {"num_predict": num_predict},
+    }
+
+_session = None
+_session_lock = threading.Lock()
+
+def _get_session() -> requests.Session:
+    """
+    One keep-alive Session for all blocking calls.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+        return _session
+
+def generate(model: str, prompt: str, kind: str, num_predict: int, url: str = OLLAMA_URL,
+             timeout: float = REQUEST_TIMEOUT) -> str:
+    """
+    Stream a generation and return the text, stopping as soon as the model
+    has produced a complete JSON object. Raises requests.RequestException
+    (and opens the breaker after repeated failures) when Ollama is unreachable.
+    """
+    LLM_PROMPT_BYTES.observe(len(prompt), kind=kind)
+    stream = JSONObjectStream()
+    grace = EARLY_STOP_GRACE
     try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={"model": model, "prompt": prompt}
-        )
-        response.raise_for_status()  # Raise exception for HTTP errors
-        
-        # Extract the generated text from the streaming response
-        result_text = ""
-        for line in response.iter_lines():
-            if line:
+        with _get_session().post(
+            f"{url}/api/generate",
+            json=generate_payload(model, prompt, num_predict),
+            stream=True,
+            timeout=timeout,
+        ) as response:
+            response.raise_for_status()  # Raise exception for HTTP errors
+            for line in response.iter_lines():
+                if not line:
+                    continue
                 try:
                     data = json.loads(line)
-                    if "response" in data:
-                        result_text += data["response"]
                 except json.JSONDecodeError:
                     continue
-        
-        # Try to parse the result as JSON using our enhanced extraction
-        json_result = extract_json_from_text(result_text)
-        if json_result and 'events' in json_result and isinstance(json_result['events'], list):
-            # Validate that the JSON has the required structure
-            valid_events = True
-            for event in json_result['events']:
-                required_keys = ['timestamp', 'type', 'level', 'description', 'recommendation']
-                if not all(key in event for key in required_keys):
-                    valid_events = False
+                if not isinstance(data, dict):
+                    continue
+                if data.get("done"):
+                    stream.feed(data.get("response", ""))
                     break
-                
-                # Add sensor field if missing
-                if 'sensor' not in event:
-                    event['sensor'] = 'unknown'
-                
-                # Add affected_devices field if missing
-                if 'affected_devices' not in event:
-                    event['affected_devices'] = []
-            
-            if valid_events:
-                return json_result
-        
-        # Return a structured response even if the LLM didn't output valid JSON
-        return {
-            "events": [
-                {
-                    "timestamp": time.time(),
-                    "type": "summary",
-                    "level": "info",
-                    "description": "Analysis could not be completed in proper format - manual review required",
-                    "raw_output": result_text.strip(),
-                    "recommendation": "Escalate to security team for manual analysis of raw data"
-                }
-            ]
-        }
-            
+                if stream.feed(data.get("response", "")):
+                    if grace > 0:
+                        grace -= 1
+                        continue
+                    # Leaving the with-block closes the connection, which stops generation
+                    LLM_EARLY_STOPS.inc(kind=kind)
+                    break
+    except requests.RequestException:
+        breaker.record_failure()
+        raise
+    except BaseException:
+        # No verdict on the backend; don't leave a half-open trial running
+        breaker.abandon()
+        raise
+    breaker.record_success()
+    return stream.text
+
+@instrumented("analyze")
+def analyze(record: dict, model: str):
+    """
+    Sends the record to the local Ollama LLM for analysis.
+    """
+    if not breaker.allow():
+        return analysis_error("Ollama unavailable (circuit open)")
+    try:
+        text = generate(model, analysis_prompt(record), "analyze", ANALYZE_NUM_PREDICT)
     except requests.RequestException as e:
-        # If API fails, try CLI as fallback
-        try:
-            # Use the correct format for Ollama CLI (no --prompt flag)
-            result = subprocess.run(
-                ["ollama", "run", model, prompt],
-                capture_output=True,
-                text=True,
-                timeout=30  # Set a reasonable timeout
-            )
-            
-            if result.returncode != 0:
-                return {
-                    "events": [
-                        {
-                            "timestamp": time.time(),
-                            "type": "error",
-                            "level": "warning",
-                            "description": f"LLM summary failed: {result.stderr}",
-                            "recommendation": "Check if Ollama is running correctly"
-                        }
-                    ]
-                }
-                
-            # Try to parse the result as JSON using our enhanced extraction
-            json_result = extract_json_from_text(result.stdout)
-            if json_result and 'events' in json_result and isinstance(json_result['events'], list):
-                # Validate that the JSON has the required structure
-                valid_events = True
-                for event in json_result['events']:
-                    required_keys = ['timestamp', 'type', 'level', 'description', 'recommendation']
-                    if not all(key in event for key in required_keys):
-                        valid_events = False
-                        break
-                
-                if valid_events:
-                    return json_result
-            
-            # Return a structured response even if the LLM didn't output valid JSON
-            return {
-                "events": [
-                    {
-                        "timestamp": time.time(),
-                        "type": "summary",
-                        "level": "info",
-                        "description": "Analysis could not be completed in proper format - manual review required",
-                        "raw_output": result.stdout.strip(),
-                        "recommendation": "Escalate to security team for manual analysis of raw data"
-                    }
-                ]
-            }
-                
-        except Exception as cli_error:
-            return {
-                "events": [
-                    {
-                        "timestamp": time.time(),
-                        "type": "error",
-                        "level": "warning",
-                        "description": f"LLM summary failed: {str(cli_error)}",
-                        "recommendation": "Check if Ollama is installed and running"
-                    }
-                ]
-            }
\ No newline at end of file
+        return analysis_error(str(e), "Check if Ollama is installed and running")
+    return parse_analysis(text)
+
+@instrumented("analyze_batch")
+def analyze_batch(items, model: str) -> dict:
+    """
+    Analyse several (id, record) pairs in one prompt.
+    Returns {id: verdict} for every id.
+    """
+    ids = [record_id for record_id, _ in items]
+    if not breaker.allow():
+        return {i: analysis_error("Ollama unavailable (circuit open)") for i in ids}
+    try:
+        text = generate(model, batch_prompt(items), "analyze_batch", ANALYZE_NUM_PREDICT * len(ids))
+    except requests.RequestException as e:
+        return {i: analysis_error(str(e), "Check if Ollama is installed and running") for i in ids}
+    return parse_batch_analysis(text, ids)
+
+@instrumented("summarize")
+def summarize(records: list, model: str, instruction: str = None):
+    """
+    Summarize a batch of sensor records using the LLM.
+    Returns the parsed JSON or raw text summary.
+    """
+    if not breaker.allow():
+        return summary_error("Ollama unavailable (circuit open)")
+    try:
+        text = generate(model, summary_prompt(records, instruction), "summarize", SUMMARY_NUM_PREDICT)
+    except requests.RequestException as e:
+        return summary_error(str(e), "Check if Ollama is installed and running")
+    return parse_summary(text)
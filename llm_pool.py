@@ -0,0 +1,370 @@
+import asyncio
+import heapq
+import inspect
+import itertools
+import json
+import time
+
+import metrics
+from change_gate import ChangeGate
+from llm_cache import AnalysisCache
+from llm_cascade import TriageCascade
+from llm_client import estimate_tokens
+from ollama_client import OllamaBackendPool, OllamaClient
+
+POOL_WAIT = metrics.histogram("llm_pool_wait_seconds", "Time records wait for an LLM worker")
+POOL_DROPPED = metrics.counter("llm_pool_dropped_total", "Records that never reached the model", ["reason"])
+POOL_QUEUE = metrics.gauge("llm_pool_queue_depth", "Records waiting for an LLM worker")
+POOL_IN_FLIGHT = metrics.gauge("llm_pool_in_flight", "LLM analyses currently running")
+BATCH_SIZE = metrics.histogram(
+    "llm_batch_records", "Records analysed per batched prompt", buckets=(1, 2, 4, 8, 16, 32)
+)
+
+
+class LLMWorkerPool:
+    """
+    Bounded pool of async workers that run LLM analysis off the event loop.
+
+    At most `workers` analyses are in flight at once. Every submitted record
+    gets a deadline and waiting records are served earliest-deadline-first.
+    Records whose deadline passes while they wait (or that are pushed out
+    when the backlog is full) are either dropped or downgraded to a
+    placeholder analysis, depending on `stale_policy`.
+
+    With `gate.enabled`, a ChangeGate replaces each record with a compact
+    diff against its sensor's baseline and records without material
+    changes never reach the model. With `cache.enabled`, records whose
+    normalized fingerprint matches a recent analysis are answered from the
+    AnalysisCache without a model call.
+
+    With `batch.enabled`, a worker that picks up a record keeps collecting
+    waiting records for up to `batch.window` seconds (or until
+    `batch.max_records` or `batch.max_tokens` is reached) and analyses them
+    in one prompt, so the long instruction is processed once per batch.
+    Each verdict is mapped back to its record by a per-batch ID.
+
+    With `cascade.enabled`, a TriageCascade screens each record first and
+    only records it scores as suspicious reach the analysis model.
+    """
+    def __init__(self, model: str, config: dict = None, on_result=None, analyze_fn=None, analyze_batch_fn=None):
+        config = config or {}
+        self.model = model
+        self.workers = max(1, int(config.get("workers", 2)))
+        self.max_queue = max(1, int(config.get("max_queue", 100)))
+        self.deadline = float(config.get("deadline", 30))
+        self.deadlines = config.get("deadlines", {}) or {}
+        self.stale_policy = config.get("stale_policy", "drop")
+        self.on_result = on_result
+        # analyze_fn may be a plain function (run on a worker thread) or a
+        # coroutine function; by default a pooled async Ollama client is used,
+        # or a backend pool when `backends` lists several servers
+        self.client = None
+        if analyze_fn is None:
+            client_conf = {"pool_size": self.workers, **config}
+            self.client = OllamaBackendPool(client_conf) if config.get("backends") else OllamaClient(client_conf)
+            analyze_fn = self.client.analyze
+            analyze_batch_fn = analyze_batch_fn or self.client.analyze_batch
+        cascade_conf = config.get("cascade", {}) or {}
+        self.cascade = None
+        if cascade_conf.get("enabled", False) and inspect.iscoroutinefunction(analyze_fn):
+            self.cascade = TriageCascade(cascade_conf, self.client, analyze_fn, analyze_batch_fn)
+            analyze_fn = self.cascade.analyze
+            analyze_batch_fn = self.cascade.analyze_batch
+        self._analyze = analyze_fn
+        self._analyze_is_async = inspect.iscoroutinefunction(analyze_fn)
+        self._analyze_batch = analyze_batch_fn
+        batch_conf = config.get("batch", {}) or {}
+        self.batch_enabled = bool(batch_conf.get("enabled", False)) and analyze_batch_fn is not None
+        self.batch_window = float(batch_conf.get("window", 0.5))
+        self.batch_max_records = max(1, int(batch_conf.get("max_records", 8)))
+        self.batch_max_tokens = max(1, int(batch_conf.get("max_tokens", 2048)))
+        self.batches = 0
+        self.batched_records = 0
+        cache_conf = config.get("cache", {}) or {}
+        self.cache = AnalysisCache(cache_conf) if cache_conf.get("enabled", False) else None
+        gate_conf = config.get("gate", {}) or {}
+        self.gate = ChangeGate(gate_conf) if gate_conf.get("enabled", False) else None
+        self._heap = []
+        self._seq = itertools.count()
+        self._wakeup = None
+        self._tasks = []
+        self.in_flight = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped_stale = 0
+        self.dropped_overflow = 0
+        self.downgraded = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_latency = 0.0
+
+    def start(self):
+        """
+        Spawn the worker tasks on the running event loop.
+        """
+        self._wakeup = asyncio.Event()
+        if self.cache is not None:
+            self.cache.load()
+        POOL_QUEUE.set_function(lambda: len(self._heap))
+        POOL_IN_FLIGHT.set_function(lambda: self.in_flight)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        return self._tasks
+
+    async def stop(self):
+        """
+        Cancel the workers and discard anything still waiting.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._heap.clear()
+        if self.client is not None:
+            await self.client.close()
+        if self.cache is not None:
+            try:
+                self.cache.save()
+            except OSError as e:
+                print(f"LLM cache save error: {e}")
+
+    def submit(self, record: dict, context=None) -> bool:
+        """
+        Queue a record for analysis without blocking.
+        `context` is passed back to on_result alongside the record.
+        Returns False if the record was rejected because the backlog is full.
+        Records the change gate suppresses count as accepted.
+        """
+        if self.gate is not None:
+            record = self.gate.check(record)
+            if record is None:
+                return True
+        now = time.monotonic()
+        deadline = now + float(self.deadlines.get(record.get("sensor"), self.deadline))
+        self.submitted += 1
+        heapq.heappush(self._heap, (deadline, next(self._seq), now, record, context))
+        if len(self._heap) > self.max_queue:
+            self._expire(now)
+        accepted = True
+        if len(self._heap) > self.max_queue:
+            # Still over capacity: shed the record with the latest deadline
+            victim = max(self._heap)
+            self._heap.remove(victim)
+            heapq.heapify(self._heap)
+            self.dropped_overflow += 1
+            POOL_DROPPED.inc(reason="overflow")
+            self._shed(victim)
+            accepted = victim[3] is not record
+        self._notify()
+        return accepted
+
+    def stats(self) -> dict:
+        """
+        Snapshot of queue depth, wait time and drop counters.
+        """
+        started = self.completed + self.failed
+        stats = {
+            "workers": self.workers,
+            "queue_depth": len(self._heap),
+            "in_flight": self.in_flight,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "failed": self.failed,
+            "dropped_stale": self.dropped_stale,
+            "dropped_overflow": self.dropped_overflow,
+            "downgraded": self.downgraded,
+            "avg_wait": self.total_wait / started if started else 0.0,
+            "max_wait": self.max_wait,
+            "avg_latency": self.total_latency / started if started else 0.0,
+        }
+        if self.batch_enabled:
+            stats["batches"] = self.batches
+            stats["avg_batch_size"] = self.batched_records / self.batches if self.batches else 0.0
+        if self.cache is not None:
+            stats["cache"] = self.cache.stats()
+        if self.gate is not None:
+            stats["gate"] = self.gate.stats()
+        if self.cascade is not None:
+            stats["cascade"] = self.cascade.stats()
+        if self.client is not None:
+            stats["client"] = self.client.stats()
+        return stats
+
+    def _notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _expire(self, now: float):
+        """
+        Remove every waiting record whose deadline has already passed.
+        """
+        fresh = []
+        for item in self._heap:
+            if item[0] < now:
+                self.dropped_stale += 1
+                POOL_DROPPED.inc(reason="stale")
+                self._shed(item)
+            else:
+                fresh.append(item)
+        heapq.heapify(fresh)
+        self._heap = fresh
+
+    def _shed(self, item):
+        """
+        Handle a record that will not reach the model.
+        """
+        if self.stale_policy != "downgrade":
+            return
+        self.downgraded += 1
+        _, _, _, record, context = item
+        analysis = {
+            "anomaly": False,
+            "reason": "LLM analysis skipped: analysis backlog exceeded this record's deadline",
+            "threat_level": "low",
+            "recommendation": "Rely on rule-based alerts for this record",
+            "downgraded": True,
+        }
+        asyncio.ensure_future(self._deliver(record, analysis, context))
+
+    async def _deliver(self, record, analysis, context):
+        if self.on_result is None:
+            return
+        try:
+            result = self.on_result(record, analysis, context)
+            if inspect.isawaitable(result):
+                await result
+        except Exception as e:
+            print(f"LLM result handler error: {e}")
+
+    def _pop_ready(self):
+        """
+        Pop the most urgent waiting record, shedding any that expired.
+        """
+        now = time.monotonic()
+        while self._heap and self._heap[0][0] < now:
+            item = heapq.heappop(self._heap)
+            self.dropped_stale += 1
+            POOL_DROPPED.inc(reason="stale")
+            self._shed(item)
+        return heapq.heappop(self._heap) if self._heap else None
+
+    async def _next_job(self):
+        while True:
+            item = self._pop_ready()
+            if item is not None:
+                return item
+            self._wakeup.clear()
+            await self._wakeup.wait()
+
+    async def _take(self, item):
+        """
+        Account for a dequeued record and answer it from the cache if possible.
+        Returns (record, context, cache key) when it still needs the model.
+        """
+        _, _, enqueued, record, context = item
+        wait = time.monotonic() - enqueued
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        POOL_WAIT.observe(wait)
+        key = None
+        if self.cache is not None:
+            key = self.cache.key(record, self.model)
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.completed += 1
+                await self._deliver(record, {**cached, "cached": True}, context)
+                return None
+        return record, context, key
+
+    async def _collect_batch(self, first) -> list:
+        """
+        Gather more records behind `first` until the window closes or the
+        record/token budget is spent.
+        """
+        jobs = [first]
+        tokens = estimate_tokens(json.dumps(first[0], default=str))
+        closes = time.monotonic() + self.batch_window
+        while len(jobs) < self.batch_max_records:
+            item = self._pop_ready()
+            if item is not None:
+                cost = estimate_tokens(json.dumps(item[3], default=str))
+                if tokens + cost > self.batch_max_tokens:
+                    heapq.heappush(self._heap, item)
+                    self._notify()
+                    break
+                job = await self._take(item)
+                if job is not None:
+                    jobs.append(job)
+                    tokens += cost
+                continue
+            remaining = closes - time.monotonic()
+            if remaining <= 0:
+                break
+            self._wakeup.clear()
+            waiter = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                await asyncio.wait({waiter}, timeout=remaining)
+            finally:
+                waiter.cancel()
+        return jobs
+
+    async def _worker(self):
+        while True:
+            job = await self._take(await self._next_job())
+            if job is None:
+                continue
+            if self.batch_enabled:
+                jobs = await self._collect_batch(job)
+                if len(jobs) > 1:
+                    await self._run_batch(jobs)
+                    continue
+            await self._run_single(*job)
+
+    async def _run_single(self, record, context, key):
+        started = time.monotonic()
+        self.in_flight += 1
+        try:
+            if self._analyze_is_async:
+                analysis = await self._analyze(record, self.model)
+            else:
+                analysis = await asyncio.to_thread(self._analyze, record, self.model)
+            self.completed += 1
+            if key is not None:
+                self.cache.put(key, analysis)
+        except Exception as e:
+            self.failed += 1
+            print(f"LLM analysis error: {e}")
+            return
+        finally:
+            self.in_flight -= 1
+            self.total_latency += time.monotonic() - started
+        await self._deliver(record, analysis, context)
+
+    async def _run_batch(self, jobs):
+        started = time.monotonic()
+        items = [(i, record) for i, (record, _, _) in enumerate(jobs, 1)]
+        self.in_flight += len(jobs)
+        self.batches += 1
+        self.batched_records += len(jobs)
+        BATCH_SIZE.observe(len(jobs))
+        try:
+            if inspect.iscoroutinefunction(self._analyze_batch):
+                verdicts = await self._analyze_batch(items, self.model)
+            else:
+                verdicts = await asyncio.to_thread(self._analyze_batch, items, self.model)
+        except Exception as e:
+            self.failed += len(jobs)
+            print(f"LLM batch analysis error: {e}")
+            return
+        finally:
+            self.in_flight -= len(jobs)
+            self.total_latency += (time.monotonic() - started) * len(jobs)
+        for i, (record, context, key) in enumerate(jobs, 1):
+            analysis = verdicts.get(i)
+            if analysis is None:
+                self.failed += 1
+                continue
+            self.completed += 1
+            if key is not None:
+                self.cache.put(key, analysis)
+            await self._deliver(record, analysis, context)
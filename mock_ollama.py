@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Stand-in Ollama server for tests and benchmarks.
+
+Implements a streaming /api/generate over plain asyncio streams (chunked
+NDJSON, keep-alive). The response text comes from a responder callable, and
+latency is simulated per model: a prompt-processing delay proportional to
+the estimated prompt tokens and a delay per streamed fragment.
+
+Usage: python mock_ollama.py [--port 11434]
+"""
+import argparse
+import asyncio
+import json
+
+from prompts import estimate_tokens
+
+DEFAULT_VERDICT = {"anomaly": False, "reason": "quiet {site}", "threat_level": "low", "recommendation": "none"}
+
+
+def default_responder(payload: dict) -> str:
+    return json.dumps(DEFAULT_VERDICT)
+
+
+class MockOllama:
+    """
+    responder(payload) returns the generated text. `prompt_cost` maps model
+    name to seconds per 1000 prompt tokens ("*" is the default) and
+    `token_delay` is the pause between streamed fragments. `padding` extra
+    whitespace fragments follow the text, as format=json generations do.
+    """
+    def __init__(self, responder=default_responder, padding=0, prompt_cost=None, token_delay=0.001):
+        self.responder = responder
+        self.padding = padding
+        self.prompt_cost = prompt_cost or {}
+        self.token_delay = token_delay
+        self.connections = 0
+        self.requests = []
+        self.disconnected_early = 0
+        self.healthy = True
+        self._server = None
+        self._handlers = set()
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> int:
+        self._server = await asyncio.start_server(self.handle, host, port)
+        return self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        if self._server is not None:
+            self._server.close()
+            for task in self._handlers:
+                task.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _respond(self, writer, payload):
+        if not self.healthy:
+            writer.write(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 0\r\n\r\n")
+            await writer.drain()
+            return
+        model = payload.get("model", "")
+        cost = self.prompt_cost.get(model, self.prompt_cost.get("*", 0.0))
+        if cost:
+            await asyncio.sleep(cost * estimate_tokens(payload.get("prompt", "")) / 1000)
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/x-ndjson\r\n"
+                     b"Transfer-Encoding: chunked\r\n\r\n")
+        text = self.responder(payload)
+        pieces = [text[i:i + 7] for i in range(0, len(text), 7)] + ["\n"] * self.padding
+        for piece in pieces:
+            chunk = json.dumps({"model": model, "response": piece, "done": False}).encode() + b"\n"
+            writer.write(b"%x\r\n%s\r\n" % (len(chunk), chunk))
+            await writer.drain()
+            await asyncio.sleep(self.token_delay)
+        chunk = json.dumps({"model": model, "response": "", "done": True}).encode() + b"\n"
+        writer.write(b"%x\r\n%s\r\n0\r\n\r\n" % (len(chunk), chunk))
+        await writer.drain()
+
+    async def handle(self, reader, writer):
+        self.connections += 1
+        task = asyncio.current_task()
+        self._handlers.add(task)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    return
+                request_line = line
+                length = 0
+                while line not in (b"\r\n", b""):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":")[1])
+                    line = await reader.readline()
+                body = await reader.readexactly(length) if length else b""
+                if request_line.startswith(b"GET"):
+                    # Health probes (/api/tags, /api/version)
+                    status = b"200 OK" if self.healthy else b"503 Service Unavailable"
+                    reply = b'{"models":[]}' if self.healthy else b""
+                    writer.write(b"HTTP/1.1 %s\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s"
+                                 % (status, len(reply), reply))
+                    await writer.drain()
+                    continue
+                payload = json.loads(body)
+                self.requests.append(payload)
+                await self._respond(writer, payload)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            self.disconnected_early += 1
+        except asyncio.CancelledError:
+            pass
+        finally:
+            self._handlers.discard(task)
+            writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in Ollama server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    args = parser.parse_args()
+
+    async def serve():
+        mock = MockOllama()
+        port = await mock.start(args.host, args.port)
+        print(f"Mock Ollama listening on {args.host}:{port}")
+        await asyncio.Event().wait()
+
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,475 @@
+"""
+Asyncio-native Ollama client with a keep-alive connection pool.
+
+Speaks just enough HTTP/1.1 over asyncio streams to drive /api/generate,
+so it needs no extra dependency and never blocks the event loop or a
+worker thread. Idle connections are reused between calls. Responses are
+read as they stream: each token fragment is fed to a JSONObjectStream and
+the connection is dropped as soon as the verdict object is complete,
+which makes Ollama abort the rest of the generation. A CircuitBreaker
+short-circuits calls while the server is down. OllamaBackendPool routes
+calls over several servers with health checks and failover.
+"""
+import asyncio
+import collections
+import json
+import ssl
+import time
+from urllib.parse import urlsplit
+
+import metrics
+from llm_client import (
+    ANALYZE_NUM_PREDICT, EARLY_STOP_GRACE, LLM_EARLY_STOPS, LLM_PROMPT_BYTES, OLLAMA_URL, REQUEST_TIMEOUT,
+    SUMMARY_NUM_PREDICT, CircuitBreaker, JSONObjectStream, analysis_error, analysis_prompt, batch_prompt,
+    generate_payload, instrumented, parse_analysis, parse_batch_analysis, parse_summary, summary_error,
+    summary_prompt,
+)
+
+BACKEND_REQUESTS = metrics.counter("llm_backend_requests_total", "Generations per Ollama backend", ["backend", "outcome"])
+BACKEND_SECONDS = metrics.histogram("llm_backend_seconds", "Generation latency per Ollama backend", ["backend"])
+BACKEND_OUTSTANDING = metrics.gauge("llm_backend_outstanding", "Generations in flight per Ollama backend", ["backend"])
+BACKEND_HEALTHY = metrics.gauge("llm_backend_healthy", "1 while an Ollama backend passes its health check", ["backend"])
+
+
+class OllamaError(Exception):
+    pass
+
+
+class _Connection:
+    __slots__ = ("reader", "writer")
+
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+
+    def close(self):
+        try:
+            self.writer.close()
+        except Exception:
+            pass
+
+
+class _OllamaAPI:
+    """
+    analyze(), analyze_batch() and summarize() on top of generate().
+    Subclasses provide generate() and available(), which is False while
+    no server may be called (circuit open).
+    """
+    num_predict = ANALYZE_NUM_PREDICT
+    summary_num_predict = SUMMARY_NUM_PREDICT
+
+    @instrumented("analyze")
+    async def analyze(self, record: dict, model: str) -> dict:
+        if not self.available():
+            return analysis_error("Ollama unavailable (circuit open)")
+        try:
+            text = await self.generate(model, analysis_prompt(record), "analyze")
+        except (OllamaError, OSError) as e:
+            return analysis_error(str(e), "Check if Ollama is installed and running")
+        return parse_analysis(text)
+
+    @instrumented("analyze_batch")
+    async def analyze_batch(self, items, model: str) -> dict:
+        """
+        Analyse several (id, record) pairs in one prompt; returns {id: verdict}.
+        """
+        ids = [record_id for record_id, _ in items]
+        if not self.available():
+            return {i: analysis_error("Ollama unavailable (circuit open)") for i in ids}
+        try:
+            text = await self.generate(model, batch_prompt(items), "analyze_batch", self.num_predict * len(ids))
+        except (OllamaError, OSError) as e:
+            return {i: analysis_error(str(e), "Check if Ollama is installed and running") for i in ids}
+        return parse_batch_analysis(text, ids)
+
+    @instrumented("summarize")
+    async def summarize(self, records: list, model: str, instruction: str = None) -> dict:
+        if not self.available():
+            return summary_error("Ollama unavailable (circuit open)")
+        try:
+            text = await self.generate(
+                model, summary_prompt(records, instruction), "summarize", self.summary_num_predict
+            )
+        except (OllamaError, OSError) as e:
+            return summary_error(str(e), "Check if Ollama is installed and running")
+        return parse_summary(text)
+
+
+class OllamaClient(_OllamaAPI):
+    """
+    Pooled async client for one Ollama server.
+
+    At most `pool_size` requests are open at once; further calls wait for a
+    free connection. Config keys (all optional): url, pool_size, timeout,
+    num_predict, summary_num_predict, breaker.failure_threshold and
+    breaker.reset_timeout.
+    """
+    def __init__(self, config: dict = None, breaker: CircuitBreaker = None):
+        config = config or {}
+        self.url = (config.get("url") or OLLAMA_URL).rstrip("/")
+        parts = urlsplit(self.url)
+        self.host = parts.hostname or "localhost"
+        self.tls = parts.scheme == "https"
+        self.port = parts.port or (443 if self.tls else 80)
+        self.pool_size = max(1, int(config.get("pool_size", 4)))
+        self.timeout = float(config.get("timeout", REQUEST_TIMEOUT))
+        self.num_predict = int(config.get("num_predict", ANALYZE_NUM_PREDICT))
+        self.summary_num_predict = int(config.get("summary_num_predict", SUMMARY_NUM_PREDICT))
+        breaker_conf = config.get("breaker", {}) or {}
+        if breaker is None:
+            breaker = CircuitBreaker(
+                breaker_conf.get("failure_threshold", 3), breaker_conf.get("reset_timeout", 30), self.url
+            )
+        self.breaker = breaker
+        self._idle = collections.deque()
+        self._slots = None
+        self.requests = 0
+        self.connections_opened = 0
+        self.reused = 0
+        self.early_stops = 0
+        self.failures = 0
+
+    def stats(self) -> dict:
+        return {
+            "url": self.url,
+            "requests": self.requests,
+            "connections_opened": self.connections_opened,
+            "reused": self.reused,
+            "idle": len(self._idle),
+            "early_stops": self.early_stops,
+            "failures": self.failures,
+            "breaker": self.breaker.stats(),
+        }
+
+    def available(self) -> bool:
+        return self.breaker.allow()
+
+    async def close(self):
+        while self._idle:
+            self._idle.popleft().close()
+
+    async def ping(self, timeout: float = None) -> bool:
+        """
+        Health probe: True if GET /api/tags answers 200. Uses its own
+        short-lived connection so it never waits behind generations.
+        """
+        conn = None
+
+        async def probe():
+            nonlocal conn
+            conn = await self._connect()
+            conn.writer.write(
+                f"GET /api/tags HTTP/1.1\r\nHost: {self.host}:{self.port}\r\nConnection: close\r\n\r\n".encode()
+            )
+            await conn.writer.drain()
+            status, headers = await self._read_head(conn)
+            async for _ in self._body(conn, headers):
+                pass
+            return status == 200
+
+        try:
+            return await asyncio.wait_for(probe(), timeout or self.timeout)
+        except (OSError, ValueError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            return False
+        finally:
+            if conn is not None:
+                conn.close()
+
+    async def _connect(self) -> _Connection:
+        reader, writer = await asyncio.open_connection(
+            self.host, self.port, ssl=ssl.create_default_context() if self.tls else None
+        )
+        self.connections_opened += 1
+        return _Connection(reader, writer)
+
+    async def _read_head(self, conn: _Connection):
+        status_line = await conn.reader.readline()
+        if not status_line:
+            raise ConnectionResetError("connection closed by server")
+        parts = status_line.decode("latin-1").split(" ", 2)
+        status = int(parts[1]) if len(parts) > 1 and parts[1].isdigit() else 0
+        headers = {}
+        while True:
+            line = await conn.reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        return status, headers
+
+    async def _body(self, conn: _Connection, headers: dict):
+        """
+        Yield body bytes as they arrive (chunked or Content-Length framing).
+        """
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            while True:
+                size_line = await conn.reader.readline()
+                size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+                if size == 0:
+                    # Trailer section ends with an empty line
+                    while (await conn.reader.readline()) not in (b"\r\n", b"\n", b""):
+                        pass
+                    return
+                data = await conn.reader.readexactly(size)
+                await conn.reader.readexactly(2)
+                yield data
+        elif "content-length" in headers:
+            remaining = int(headers["content-length"])
+            while remaining > 0:
+                data = await conn.reader.read(min(remaining, 65536))
+                if not data:
+                    raise ConnectionResetError("connection closed mid-body")
+                remaining -= len(data)
+                yield data
+        else:
+            while True:
+                data = await conn.reader.read(65536)
+                if not data:
+                    return
+                yield data
+
+    async def _request(self, conn: _Connection, payload: dict, kind: str):
+        """
+        Send one generate request and consume the stream.
+        Returns (text, reusable).
+        """
+        body = json.dumps(payload).encode()
+        head = (
+            f"POST /api/generate HTTP/1.1\r\nHost: {self.host}:{self.port}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+            "Connection: keep-alive\r\n\r\n"
+        ).encode()
+        conn.writer.write(head + body)
+        await conn.writer.drain()
+        status, headers = await self._read_head(conn)
+        if status != 200:
+            raise OllamaError(f"HTTP {status} from {self.url}")
+        stream = JSONObjectStream()
+        pending = b""
+        done = False
+        grace = EARLY_STOP_GRACE
+        async for data in self._body(conn, headers):
+            if done:
+                continue
+            pending += data
+            *lines, pending = pending.split(b"\n")
+            for line in lines:
+                if not line.strip():
+                    continue
+                try:
+                    chunk = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if chunk.get("error"):
+                    raise OllamaError(chunk["error"])
+                if chunk.get("done"):
+                    # Keep reading to the end of the body so the connection can be reused
+                    stream.feed(chunk.get("response", ""))
+                    done = True
+                    break
+                if stream.feed(chunk.get("response", "")):
+                    # A few more tokens usually bring "done" and keep the
+                    # connection reusable; past that, dropping the connection
+                    # cancels the remaining generation
+                    if grace > 0:
+                        grace -= 1
+                        continue
+                    self.early_stops += 1
+                    LLM_EARLY_STOPS.inc(kind=kind)
+                    return stream.text, False
+        return stream.text, headers.get("connection", "").lower() != "close"
+
+    async def generate(self, model: str, prompt: str, kind: str = "analyze", num_predict: int = None) -> str:
+        """
+        Run one generation and return its text. Raises OllamaError or
+        OSError on failure; the breaker records the outcome.
+        """
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.pool_size)
+        LLM_PROMPT_BYTES.observe(len(prompt), kind=kind)
+        payload = generate_payload(model, prompt, num_predict or self.num_predict)
+        self.requests += 1
+        async with self._slots:
+            for attempt in range(2):
+                reused = bool(self._idle)
+                conn = self._idle.pop() if reused else None
+                try:
+                    if conn is None:
+                        conn = await asyncio.wait_for(self._connect(), self.timeout)
+                    else:
+                        self.reused += 1
+                    text, reusable = await asyncio.wait_for(self._request(conn, payload, kind), self.timeout)
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    if conn is not None:
+                        conn.close()
+                    if reused and attempt == 0:
+                        # Idle keep-alive connection went stale; retry on a fresh one
+                        continue
+                    self._fail()
+                    raise OllamaError(f"connection to {self.url} failed: {e}") from e
+                except (OSError, OllamaError, asyncio.TimeoutError) as e:
+                    if conn is not None:
+                        conn.close()
+                    self._fail()
+                    if isinstance(e, asyncio.TimeoutError):
+                        raise OllamaError(f"timed out after {self.timeout:.0f}s") from e
+                    raise
+                except BaseException:
+                    if conn is not None:
+                        conn.close()
+                    self.breaker.abandon()
+                    raise
+                if reusable:
+                    self._idle.append(conn)
+                else:
+                    conn.close()
+                self.breaker.record_success()
+                return text
+
+    def _fail(self):
+        self.failures += 1
+        self.breaker.record_failure()
+
+
+class _Backend:
+    __slots__ = ("client", "healthy", "outstanding", "completed", "failed", "total_time", "latency", "since")
+
+    def __init__(self, client: OllamaClient):
+        self.client = client
+        self.healthy = True
+        self.outstanding = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_time = 0.0
+        # Moving average of successful call latency, used to break routing ties
+        self.latency = 0.0
+        self.since = time.monotonic()
+
+    def load(self) -> float:
+        return self.outstanding / self.client.pool_size
+
+    def stats(self) -> dict:
+        elapsed = time.monotonic() - self.since
+        return {
+            "url": self.client.url,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_latency": self.total_time / self.completed if self.completed else 0.0,
+            "ewma_latency": self.latency,
+            "throughput": self.completed / elapsed if elapsed > 0 else 0.0,
+            **{k: v for k, v in self.client.stats().items() if k != "url"},
+        }
+
+
+class OllamaBackendPool(_OllamaAPI):
+    """
+    Spreads generations over several Ollama servers.
+
+    `backends` lists URLs (or dicts of per-backend OllamaClient options such
+    as url, pool_size and timeout); other options are shared. Each request
+    goes to the healthy backend with the fewest outstanding requests
+    relative to its pool_size, ties going to the lower recent latency.
+    A request that fails or exceeds the backend's `timeout` is retried on
+    the next backend, and every backend has its own circuit breaker.
+    Every `health_interval` seconds each backend is probed with GET
+    /api/tags; backends that fail the probe only get traffic when no
+    healthy backend is left.
+    """
+    def __init__(self, config: dict):
+        config = config or {}
+        shared = {k: v for k, v in config.items() if k != "backends"}
+        self.backends = []
+        for spec in config.get("backends") or []:
+            spec = {"url": spec} if isinstance(spec, str) else dict(spec)
+            self.backends.append(_Backend(OllamaClient({**shared, **spec})))
+        if not self.backends:
+            raise ValueError("llm.backends lists no Ollama servers")
+        self.num_predict = int(config.get("num_predict", ANALYZE_NUM_PREDICT))
+        self.summary_num_predict = int(config.get("summary_num_predict", SUMMARY_NUM_PREDICT))
+        self.health_interval = float(config.get("health_interval", 10))
+        self.health_timeout = float(config.get("health_timeout", 2))
+        self.failovers = 0
+        self._health_task = None
+        for backend in self.backends:
+            BACKEND_OUTSTANDING.set_function(lambda b=backend: b.outstanding, backend=backend.client.url)
+            BACKEND_HEALTHY.set(1, backend=backend.client.url)
+
+    def available(self) -> bool:
+        return any(b.client.breaker.state != "open" for b in self.backends)
+
+    def stats(self) -> dict:
+        return {
+            "backends": [b.stats() for b in self.backends],
+            "failovers": self.failovers,
+        }
+
+    async def close(self):
+        if self._health_task is not None:
+            self._health_task.cancel()
+            await asyncio.gather(self._health_task, return_exceptions=True)
+            self._health_task = None
+        for backend in self.backends:
+            await backend.client.close()
+
+    async def check_health(self):
+        """
+        Probe every backend once and update its health flag.
+        """
+        results = await asyncio.gather(*(b.client.ping(self.health_timeout) for b in self.backends))
+        for backend, healthy in zip(self.backends, results):
+            backend.healthy = healthy
+            BACKEND_HEALTHY.set(1 if healthy else 0, backend=backend.client.url)
+
+    async def _health_loop(self):
+        while True:
+            await asyncio.sleep(self.health_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                print(f"Ollama health check error: {e}")
+
+    def _pick(self, tried):
+        candidates = [b for b in self.backends if b not in tried and b.client.breaker.state != "open"]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda b: (not b.healthy, b.load(), b.latency))
+
+    async def generate(self, model: str, prompt: str, kind: str = "analyze", num_predict: int = None) -> str:
+        """
+        Run one generation on the least loaded backend, failing over to
+        the others. Raises the last backend's error when all of them fail.
+        """
+        if self._health_task is None and self.health_interval > 0:
+            self._health_task = asyncio.ensure_future(self._health_loop())
+        tried = set()
+        error = None
+        while True:
+            backend = self._pick(tried)
+            if backend is None:
+                raise error or OllamaError("no Ollama backend available (all circuits open)")
+            tried.add(backend)
+            if not backend.client.breaker.allow():
+                continue
+            if error is not None:
+                self.failovers += 1
+            url = backend.client.url
+            backend.outstanding += 1
+            start = time.perf_counter()
+            try:
+                text = await backend.client.generate(model, prompt, kind, num_predict)
+            except (OllamaError, OSError) as e:
+                backend.failed += 1
+                BACKEND_REQUESTS.inc(backend=url, outcome="error")
+                error = e
+                continue
+            finally:
+                backend.outstanding -= 1
+            elapsed = time.perf_counter() - start
+            backend.completed += 1
+            backend.total_time += elapsed
+            backend.latency = elapsed if not backend.latency else 0.8 * backend.latency + 0.2 * elapsed
+            BACKEND_REQUESTS.inc(backend=url, outcome="ok")
+            BACKEND_SECONDS.observe(elapsed, backend=url)
+            return text
@@ -1,13 +1,19 @@
 import asyncio
+import time
 from sensors.wifi import WifiSensor
 from sensors.bluetooth import BluetoothSensor
 from sensors.imu import ImuSensor
 from sensors.netio import NetIOSensor
 from sensors.assoc import AssocSensor
-from sensors.netio import NetIOSensor
+from sensors.dot11 import Dot11Sensor
+from sensors.runner import command_stats, set_concurrency, DEFAULT_CONCURRENCY
 from config import load_config
-from llm_client import analyze
+from llm_pool import LLMWorkerPool
 from alerts import check_alerts
+import metrics
+
+STAGE_SECONDS = metrics.histogram("pipeline_stage_seconds", "Time spent in each pipeline stage", ["stage"])
+PROCESSED = metrics.counter("pipeline_records_total", "Records consumed by the pipeline", ["sensor"])
 
 SENSOR_CLASSES = {
     "wifi": WifiSensor,
@@ -15,53 +21,84 @@ SENSOR_CLASSES = {
     "imu": ImuSensor,
     "netio": NetIOSensor,
     "assoc": AssocSensor,
+    "dot11": Dot11Sensor,
 }
 
+def _report_analysis(record, analysis, context):
+    """
+    Print an LLM analysis result and any anomaly it raised.
+    """
+    print("Analysis:", analysis)
+    if isinstance(analysis, dict) and analysis.get("anomaly"):
+        print("Alerts:", [{
+            "sensor": record.get("sensor"),
+            "timestamp": record.get("timestamp"),
+            "reason": analysis.get("reason"),
+        }])
+
+async def _report_stats(pool, interval, dump_metrics=True):
+    while True:
+        await asyncio.sleep(interval)
+        if pool is not None:
+            print("LLM pool:", pool.stats())
+        print("Sensor commands:", command_stats())
+        if dump_metrics:
+            print("Metrics:\n" + metrics.render(), end="")
+
 async def main():
     config = load_config()
     # LLM model and alert configuration
-    llm_model = config.get("llm", {}).get("model")
+    llm_conf = config.get("llm", {}) or {}
+    llm_model = llm_conf.get("model")
     alert_conf = config.get("alerts", {}) or {}
+    set_concurrency((config.get("commands") or {}).get("concurrency", DEFAULT_CONCURRENCY))
     queue = asyncio.Queue()
+    metrics.gauge("pipeline_queue_depth", "Records waiting for the pipeline").set_function(queue.qsize)
     sensors = []
     for name, cls in SENSOR_CLASSES.items():
         conf = config.get(name, {})
         sensor = cls(conf)
         sensors.append(sensor)
     tasks = [asyncio.create_task(sensor.start(queue)) for sensor in sensors]
+    # LLM analysis runs in a bounded worker pool so sensors never wait on the model
+    pool = None
+    if llm_model:
+        pool = LLMWorkerPool(llm_model, llm_conf, on_result=_report_analysis)
+        tasks.extend(pool.start())
+    tasks.append(asyncio.create_task(
+        # stats_interval used to live under llm:, so older configs keep working
+        _report_stats(pool, config.get("stats_interval", llm_conf.get("stats_interval", 60)),
+                      (config.get("metrics") or {}).get("dump", True))
+    ))
     try:
         while True:
             record = await queue.get()
+            PROCESSED.inc(sensor=record.get("sensor", "unknown"))
             # Emit raw record
             print("Record:", record)
             # LLM analysis for anomaly detection
-            analysis = None
-            if llm_model:
-                try:
-                    analysis = analyze(record, llm_model)
-                    print("Analysis:", analysis)
-                except Exception as e:
-                    print(f"LLM analysis error: {e}")
-            # Gather alerts: LLM-based anomalies and rule-based thresholds
-            alerts_list = []
-            if isinstance(analysis, dict) and analysis.get("anomaly"):
-                alerts_list.append({
-                    "sensor": record.get("sensor"),
-                    "timestamp": record.get("timestamp"),
-                    "reason": analysis.get("reason"),
-                })
+            if pool is not None:
+                with STAGE_SECONDS.time(stage="dispatch"):
+                    pool.submit(record)
             # Rule-based alerts
+            alerts_list = []
+            started = time.perf_counter()
             try:
                 alerts_list.extend(check_alerts(record, alert_conf))
             except Exception as e:
                 print(f"Alert check error: {e}")
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="rules")
             if alerts_list:
                 print("Alerts:", alerts_list)
     except (KeyboardInterrupt, asyncio.CancelledError):
         print("Stopping sensors...")
         for sensor in sensors:
             sensor.stop()
+        for task in tasks:
+            task.cancel()
         await asyncio.gather(*tasks, return_exceptions=True)
+        if pool is not None:
+            await pool.stop()
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
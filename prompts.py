@@ -0,0 +1,282 @@
+"""
+Analysis prompt registry and compact record encoding.
+
+Every analysis prompt used to carry the Wi-Fi, Bluetooth and IMU
+checklists and the raw json.dumps() of the record. Prompt evaluation
+dominates latency on CPU-only hosts, so prompts are now assembled per
+sensor from registered checklists, and records are sent through a compact
+encoder: nulls and empty values dropped, floats rounded, keys abbreviated
+(with a legend of the abbreviations used) and lists of device objects
+written as a column header plus rows. `python bench_prompt_size.py`
+compares prompt sizes before and after.
+"""
+import json
+import math
+import re
+
+INTRO = (
+    "You are a military-grade security analyst monitoring sensor data from a Software Defined Radio system. "
+    "For the following record, analyze if there are any security implications or anomalies with absolute precision, "
+    "including both cybersecurity threats AND physical security threats. "
+    "This is for a military application where accuracy is critical.\n\n"
+)
+
+# Sensor type -> checklist included in prompts for records of that sensor
+CHECKLISTS = {
+    "wifi": (
+    "For WiFi data, analyze for:\n"
+    "- Rogue/unauthorized access points (unexpected SSIDs or duplicate SSIDs with different security)\n"
+    "- Evil twin attacks (duplicate networks with similar names but different security settings)\n"
+    "- Unusual signal strengths (unexpectedly strong signals that might indicate proximity)\n"
+    "- Open networks in secure areas (potential security risk)\n"
+    "- Networks with weak security protocols (WEP, open)\n"
+    "- Suspicious naming patterns that might indicate surveillance\n"
+    "- Sudden appearance of new networks in previously stable environments\n"
+    "- Disappearance of previously stable networks (could indicate jamming)\n"
+    "- PHYSICAL THREATS: Unusual density of devices in an area (indicating gathering of people)\n"
+    "- PHYSICAL THREATS: Movement patterns of devices suggesting unauthorized physical approach\n"
+    "- PHYSICAL THREATS: New devices appearing in typically empty or secure spaces\n\n"
+    ),
+    "bluetooth": (
+    "For Bluetooth data, analyze for:\n"
+    "- Unexpected devices with very strong signal strength (indicating close proximity)\n"
+    "- Devices with suspicious names (surveillance equipment, drones, unknown devices)\n"
+    "- Devices that appear to be spoofing legitimate device names\n"
+    "- Persistent unknown devices that follow location changes\n"
+    "- Bluetooth devices with unusual manufacturer data\n"
+    "- Patterns suggesting Bluetooth tracking or surveillance\n"
+    "- Bluetooth beacons in unexpected locations\n"
+    "- PHYSICAL THREATS: Devices that remain in proximity for extended periods (possible surveillance)\n"
+    "- PHYSICAL THREATS: Devices showing movement patterns that suggest following or circling\n"
+    "- PHYSICAL THREATS: Sudden appearance of multiple new devices (possible group approach)\n\n"
+    ),
+    "imu": (
+    "For IMU data, analyze for:\n"
+    "- PHYSICAL THREATS: Unusual vibrations or movements that might indicate someone approaching\n"
+    "- PHYSICAL THREATS: Unexpected orientation changes that might indicate physical tampering\n"
+    "- PHYSICAL THREATS: Movement patterns consistent with being carried by someone unauthorized\n"
+    "- PHYSICAL THREATS: Sudden impacts or shocks that might indicate attempted access\n\n"
+    ),
+    "dot11": (
+        "For raw 802.11 frame data, analyze for:\n"
+        "- Deauthentication or disassociation floods (possible jamming or handshake capture)\n"
+        "- The same SSID advertised by several BSSIDs on different channels (possible evil twin)\n"
+        "- Clients probing for many SSIDs (device history leakage, tracking)\n"
+        "- Unusually strong beacons from unknown BSSIDs (nearby rogue hardware)\n\n"
+    ),
+    "netio": (
+        "For network I/O data, analyze for:\n"
+        "- Sudden spikes in sent data (possible exfiltration)\n"
+        "- Sustained unusual receive rates (possible attack traffic)\n"
+        "- Traffic stopping abruptly (possible link disruption)\n\n"
+    ),
+    "assoc": (
+        "For Wi-Fi association data, analyze for:\n"
+        "- Unexpected changes of the associated network (possible evil twin or forced roaming)\n"
+        "- Loss of association (possible deauthentication attack)\n\n"
+    ),
+}
+
+# Included when any sensor in the prompt can indicate a physical threat
+PHYSICAL_SENSORS = ("wifi", "bluetooth", "imu")
+CORRELATION = (
+    "When analyzing for physical threats, consider:\n"
+    "- Correlations between different sensor types (e.g., Bluetooth proximity + IMU movement)\n"
+    "- Timing patterns that might indicate coordinated physical approach\n"
+    "- Signal strength changes that suggest movement toward or away from the device\n"
+    "- Persistence of signals that might indicate sustained surveillance\n\n"
+)
+
+OUTPUT_FORMAT = (
+    "IMPORTANT: Your response MUST be a valid JSON object with EXACTLY these keys:\n"
+    "- 'anomaly': boolean (true/false) - indicate if there is a potential security threat (cyber or physical)\n"
+    "- 'reason': string (precise, factual description of the finding)\n"
+    "- 'threat_level': string (must be one of: 'low', 'medium', 'high') - assess based on military security standards\n"
+    "- 'threat_type': string (must be one of: 'cyber', 'physical', 'both') - indicate the nature of the threat\n"
+    "- 'recommendation': string (specific action to take based on military security protocols)\n"
+    "- 'details': object (containing specific findings that led to this assessment, including physical threat indicators)\n\n"
+    
+    "If you cannot make a determination due to insufficient data, indicate this clearly in the 'reason' field "
+    "and set 'anomaly' to false and 'threat_level' to 'low'.\n\n"
+    
+    "DO NOT include any explanations, markdown formatting, or text outside the JSON object. "
+    "DO NOT fabricate or invent data that is not present in the record."
+)
+
+# The original all-sensor instruction, used for sensors without a checklist
+FULL_INSTRUCTION = INTRO + CHECKLISTS["wifi"] + CHECKLISTS["bluetooth"] + CHECKLISTS["imu"] + CORRELATION + OUTPUT_FORMAT
+
+CHANGE_NOTE = (
+    "Some records are change reports against the sensor's previous baseline: 'change' lists devices "
+    "added or removed and RSSI shifts (from -> to) instead of the full device list.\n\n"
+)
+
+BATCH_INSTRUCTION = (
+    "\n\nYou are given SEVERAL records, each wrapped as {\"id\": <integer>, \"record\": <record>}. "
+    "Analyze each record on its own, using the other records only as context for cross-sensor correlations. "
+    "Respond with ONE JSON object of the form {\"verdicts\": [{\"id\": <record id>, ...the keys above...}]} "
+    "holding exactly one verdict per record id."
+)
+
+# Short triage instruction for the fast screening model in the cascade
+SCREEN_INSTRUCTION = (
+    "You triage sensor records from an RF and physical security monitor. "
+    "Rate how likely this record shows a security threat: rogue or evil-twin access points, weak or open "
+    "security, surveillance or drone devices, devices very close by, deauthentication floods, unusual "
+    "motion or traffic. Respond ONLY with a JSON object {\"score\": <number 0 to 1>, \"reason\": <short string>}."
+)
+
+# Long field names and their abbreviations in encoded records
+KEY_ABBREVIATIONS = {
+    "timestamp": "ts",
+    "hardware_status": "hw",
+    "networks": "nets",
+    "devices": "devs",
+    "address": "addr",
+    "security": "sec",
+    "channel": "ch",
+    "connected": "conn",
+    "phy_mode": "phy",
+    "network_type": "ntype",
+    "randomized": "rand",
+    "vendor": "ven",
+    "rssi_avg": "rssi_a",
+    "rssi_max": "rssi_mx",
+    "first_seen": "first",
+    "last_seen": "last",
+    "adverts": "adv",
+    "accel": "acc",
+    "gyro": "gyr",
+    "rate_sent": "tx",
+    "rate_recv": "rx",
+    "beacons": "bcn",
+    "probe_responses": "presp",
+    "deauths": "deauth",
+    "rssi_shift": "shift",
+}
+# Fields rounded to whole seconds
+TIME_FIELDS = ("timestamp", "first_seen", "last_seen")
+
+
+def register_prompt(sensor: str, checklist: str):
+    """
+    Add or replace the checklist used for records from `sensor`.
+    """
+    CHECKLISTS[sensor] = checklist
+
+
+def instruction_for(sensors, change: bool = False) -> str:
+    """
+    Analysis instruction covering only the given sensor types.
+    """
+    sensors = list(dict.fromkeys(sensors))
+    if not sensors or any(s not in CHECKLISTS for s in sensors):
+        instruction = FULL_INSTRUCTION
+        return instruction.replace(OUTPUT_FORMAT, CHANGE_NOTE + OUTPUT_FORMAT) if change else instruction
+    parts = [INTRO]
+    parts.extend(CHECKLISTS[s] for s in sensors)
+    if any(s in PHYSICAL_SENSORS for s in sensors):
+        parts.append(CORRELATION)
+    if change:
+        parts.append(CHANGE_NOTE)
+    parts.append(OUTPUT_FORMAT)
+    return "".join(parts)
+
+
+def _empty(value) -> bool:
+    return value is None or value == "" or value == [] or value == {}
+
+
+def compact(value, used: set, precision: int = 1, key: str = None):
+    """
+    Compact form of a record value. Abbreviated keys are added to `used`.
+    """
+    if isinstance(value, dict):
+        result = {}
+        for k, v in value.items():
+            if _empty(v):
+                continue
+            short = KEY_ABBREVIATIONS.get(k, k)
+            if short != k:
+                used.add(k)
+            result[short] = compact(v, used, precision, k)
+        return result
+    if isinstance(value, (list, tuple, set)):
+        items = [compact(v, used, precision) for v in value]
+        if len(items) > 1 and all(isinstance(item, dict) for item in items):
+            # Uniform objects become one header plus rows
+            cols = list(dict.fromkeys(k for item in items for k in item))
+            return {"cols": cols, "rows": [[item.get(c) for c in cols] for item in items]}
+        return items
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, float):
+        if key in TIME_FIELDS:
+            return int(value)
+        if math.isfinite(value):
+            rounded = round(value, precision)
+            return int(rounded) if rounded.is_integer() else rounded
+    return value
+
+
+def encode_record(record: dict, precision: int = 1):
+    """
+    Returns (compact JSON text, legend line for the abbreviations used).
+    """
+    used = set()
+    encoded = json.dumps(compact(record, used, precision), separators=(",", ":"), default=str)
+    return encoded, legend(used)
+
+
+def legend(used) -> str:
+    keys = ", ".join(f"{KEY_ABBREVIATIONS[k]}={k}" for k in sorted(used))
+    note = "Lists of objects are given as {cols, rows}; null fills missing values."
+    return f"Keys: {keys}. {note}" if keys else note
+
+
+_TOKEN_PATTERN = re.compile(r"[A-Za-z]+|\d+|\s+|[^\sA-Za-z\d]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Approximate BPE token count: words cost one token per ~4 letters, digit
+    runs one per 3 digits, punctuation one each and whitespace is folded
+    into the following word. Not a real tokenizer, but close enough to
+    budget prompts and compare encodings.
+    """
+    tokens = 0
+    for piece in _TOKEN_PATTERN.findall(text):
+        first = piece[0]
+        if first.isspace():
+            tokens += 1 if "\n" in piece else 0
+        elif first.isalpha():
+            tokens += math.ceil(len(piece) / 4)
+        elif first.isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        else:
+            tokens += 1
+    return tokens
+
+
+def analysis_prompt(record: dict) -> str:
+    payload, keys = encode_record(record)
+    instruction = instruction_for([record.get("sensor")], change="change" in record)
+    return f"{instruction}\n\n{keys}\nRecord:\n{payload}"
+
+
+def batch_prompt(items) -> str:
+    """
+    One prompt for several (id, record) pairs.
+    """
+    used = set()
+    records = [{"id": record_id, "record": compact(record, used)} for record_id, record in items]
+    instruction = instruction_for(
+        [record.get("sensor") for _, record in items], change=any("change" in record for _, record in items)
+    )
+    payload = json.dumps(records, separators=(",", ":"), default=str)
+    return f"{instruction}{BATCH_INSTRUCTION}\n\n{legend(used)}\nRecords:\n{payload}"
+
+
+def screen_prompt(record: dict) -> str:
+    payload, keys = encode_record(record)
+    return f"{SCREEN_INSTRUCTION}\n\n{keys}\nRecord:\n{payload}"
@@ -0,0 +1,295 @@
+import asyncio
+import collections
+import contextlib
+import json
+import os
+import sqlite3
+import time
+
+# Per-device lists stored in the observations table instead of the record payload
+DEVICE_LISTS = {
+    "wifi": ("networks", ("bssid", "ssid"), "ssid"),
+    "bluetooth": ("devices", ("address",), "name"),
+    "dot11": ("bssids", ("bssid",), "ssid"),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    sensor TEXT NOT NULL,
+    hardware_status TEXT,
+    payload TEXT
+);
+CREATE INDEX IF NOT EXISTS records_sensor_ts ON records (sensor, ts);
+CREATE TABLE IF NOT EXISTS devices (
+    id INTEGER PRIMARY KEY,
+    sensor TEXT NOT NULL,
+    key TEXT NOT NULL,
+    name TEXT,
+    first_seen REAL,
+    last_seen REAL,
+    UNIQUE (sensor, key)
+);
+CREATE TABLE IF NOT EXISTS observations (
+    record_id INTEGER NOT NULL,
+    device_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    rssi REAL
+);
+CREATE INDEX IF NOT EXISTS observations_device_ts ON observations (device_id, ts);
+CREATE INDEX IF NOT EXISTS observations_ts ON observations (ts);
+"""
+
+
+class RecordStore:
+    """
+    Durable SQLite history of sensor records.
+
+    submit() only appends to an in-memory backlog, so the live path never
+    waits on disk. A single writer task drains the backlog in batched
+    transactions on a worker thread. The database runs in WAL mode so
+    history queries can read while the writer commits. Per-device readings
+    (Wi-Fi networks, Bluetooth devices, 802.11 BSSIDs) go into a normalized
+    devices/observations schema; everything else stays in the record row.
+    """
+    def __init__(self, path: str, config: dict = None):
+        config = config or {}
+        self.path = path
+        self.batch_size = max(1, int(config.get("batch_size", 200)))
+        self.flush_interval = float(config.get("flush_interval", 1.0))
+        self.retention_days = float(config.get("retention_days", 7))
+        self.max_pending = max(1, int(config.get("max_pending", 10000)))
+        self._pending = collections.deque()
+        self._wakeup = None
+        self._task = None
+        self._stopping = False
+        self._conn = None
+        self._device_ids = {}
+        self._last_prune = 0.0
+        self.written = 0
+        self.dropped = 0
+        self.batches = 0
+        self.total_write_time = 0.0
+        self.max_write_time = 0.0
+
+    def open(self):
+        """
+        Create the database and schema if needed.
+        """
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+
+    def start(self):
+        """
+        Open the database and spawn the writer task on the running loop.
+        """
+        if self._conn is None:
+            self.open()
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._writer())
+        return self._task
+
+    async def stop(self):
+        """
+        Let the writer flush anything still pending, then close the database.
+        """
+        self._stopping = True
+        if self._task is not None:
+            self._wakeup.set()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        while self._pending:
+            await asyncio.to_thread(self._write_batch, self._take_batch())
+        self.close()
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def submit(self, record: dict):
+        """
+        Queue a record for storage without blocking. When the backlog is
+        full the oldest pending record is dropped.
+        """
+        if len(self._pending) >= self.max_pending:
+            self._pending.popleft()
+            self.dropped += 1
+        self._pending.append(record)
+        if self._wakeup is not None and len(self._pending) >= self.batch_size:
+            self._wakeup.set()
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "pending": len(self._pending),
+            "written": self.written,
+            "dropped": self.dropped,
+            "batches": self.batches,
+            "avg_batch_time": self.total_write_time / self.batches if self.batches else 0.0,
+            "max_batch_time": self.max_write_time,
+        }
+
+    def _take_batch(self) -> list:
+        count = min(self.batch_size, len(self._pending))
+        return [self._pending.popleft() for _ in range(count)]
+
+    async def _writer(self):
+        while not self._stopping:
+            # asyncio.wait rather than wait_for: wait_for can swallow a
+            # cancellation that races with the event being set
+            waiter = asyncio.ensure_future(self._wakeup.wait())
+            try:
+                await asyncio.wait({waiter}, timeout=self.flush_interval)
+            finally:
+                waiter.cancel()
+            self._wakeup.clear()
+            while self._pending:
+                batch = self._take_batch()
+                try:
+                    await asyncio.to_thread(self._write_batch, batch)
+                except Exception as e:
+                    self.dropped += len(batch)
+                    print(f"Record store write error: {e}")
+                    break
+            if self.retention_days > 0 and time.time() - self._last_prune > 3600:
+                self._last_prune = time.time()
+                try:
+                    await asyncio.to_thread(self.prune)
+                except Exception as e:
+                    print(f"Record store prune error: {e}")
+
+    def _device_id(self, cur, sensor: str, key: str, name, ts: float) -> int:
+        cache_key = (sensor, key)
+        device_id = self._device_ids.get(cache_key)
+        if device_id is None:
+            cur.execute(
+                "INSERT INTO devices (sensor, key, name, first_seen, last_seen) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (sensor, key) DO UPDATE SET last_seen = excluded.last_seen",
+                (sensor, key, name, ts, ts),
+            )
+            device_id = cur.execute(
+                "SELECT id FROM devices WHERE sensor = ? AND key = ?", (sensor, key)
+            ).fetchone()[0]
+            self._device_ids[cache_key] = device_id
+        return device_id
+
+    def _write_batch(self, batch: list):
+        """
+        Write one batch in a single transaction (runs on a worker thread).
+        """
+        start = time.monotonic()
+        last_seen = {}
+        with self._conn:
+            cur = self._conn.cursor()
+            for record in batch:
+                sensor = record.get("sensor") or "unknown"
+                ts = record.get("timestamp") or time.time()
+                list_field, key_fields, name_field = DEVICE_LISTS.get(sensor, (None, (), None))
+                payload = {
+                    k: v for k, v in record.items()
+                    if k not in ("sensor", "timestamp", "hardware_status", list_field)
+                }
+                cur.execute(
+                    "INSERT INTO records (ts, sensor, hardware_status, payload) VALUES (?, ?, ?, ?)",
+                    (ts, sensor, record.get("hardware_status"), json.dumps(payload, default=str)),
+                )
+                record_id = cur.lastrowid
+                if list_field is None:
+                    continue
+                rows = []
+                for item in record.get(list_field) or []:
+                    if not isinstance(item, dict):
+                        continue
+                    key = next((item[k] for k in key_fields if item.get(k)), None)
+                    if key is None:
+                        continue
+                    device_id = self._device_id(cur, sensor, str(key), item.get(name_field), ts)
+                    last_seen[device_id] = (ts, item.get(name_field))
+                    rssi = item.get("rssi")
+                    rows.append((record_id, device_id, ts, rssi if isinstance(rssi, (int, float)) else None))
+                cur.executemany(
+                    "INSERT INTO observations (record_id, device_id, ts, rssi) VALUES (?, ?, ?, ?)", rows
+                )
+            cur.executemany(
+                "UPDATE devices SET last_seen = ?, name = COALESCE(?, name) WHERE id = ?",
+                [(ts, name, device_id) for device_id, (ts, name) in last_seen.items()],
+            )
+        elapsed = time.monotonic() - start
+        self.written += len(batch)
+        self.batches += 1
+        self.total_write_time += elapsed
+        self.max_write_time = max(self.max_write_time, elapsed)
+
+    def prune(self, now: float = None):
+        """
+        Delete records and observations older than the retention window.
+        """
+        cutoff = (time.time() if now is None else now) - self.retention_days * 86400
+        with self._conn:
+            self._conn.execute("DELETE FROM observations WHERE ts < ?", (cutoff,))
+            self._conn.execute("DELETE FROM records WHERE ts < ?", (cutoff,))
+            self._conn.execute("DELETE FROM devices WHERE last_seen < ?", (cutoff,))
+        self._device_ids.clear()
+
+    def _reader(self):
+        return contextlib.closing(sqlite3.connect(f"file:{self.path}?mode=ro", uri=True))
+
+    def devices(self, sensor: str, limit: int = 500) -> list:
+        """
+        Known devices for a sensor, most recently seen first.
+        """
+        with self._reader() as conn:
+            rows = conn.execute(
+                "SELECT key, name, first_seen, last_seen FROM devices WHERE sensor = ? "
+                "ORDER BY last_seen DESC LIMIT ?",
+                (sensor, limit),
+            ).fetchall()
+        return [{"key": k, "name": n, "first_seen": f, "last_seen": l} for k, n, f, l in rows]
+
+    def history(self, sensor: str, start: float, end: float, points: int = 500, device: str = None) -> dict:
+        """
+        Downsample history between start and end into at most `points`
+        buckets. With a device key, each bucket holds RSSI avg/min/max for
+        that device; otherwise record and observation counts for the sensor.
+        """
+        points = max(1, min(int(points), 5000))
+        bucket = max((end - start) / points, 1e-6)
+        result = {"sensor": sensor, "device": device, "start": start, "end": end, "bucket": bucket, "points": []}
+        with self._reader() as conn:
+            if device is not None:
+                row = conn.execute(
+                    "SELECT id, name FROM devices WHERE sensor = ? AND key = ?", (sensor, device)
+                ).fetchone()
+                if row is None:
+                    return result
+                result["name"] = row[1]
+                rows = conn.execute(
+                    "SELECT CAST((ts - ?) / ? AS INTEGER) AS b, COUNT(*), AVG(rssi), MIN(rssi), MAX(rssi) "
+                    "FROM observations WHERE device_id = ? AND ts >= ? AND ts < ? GROUP BY b ORDER BY b",
+                    (start, bucket, row[0], start, end),
+                ).fetchall()
+                result["points"] = [
+                    {"ts": start + b * bucket, "count": c, "rssi_avg": avg, "rssi_min": lo, "rssi_max": hi}
+                    for b, c, avg, lo, hi in rows
+                ]
+            else:
+                rows = conn.execute(
+                    "SELECT CAST((r.ts - ?) / ? AS INTEGER) AS b, COUNT(DISTINCT r.id), COUNT(o.device_id), "
+                    "COUNT(DISTINCT o.device_id) "
+                    "FROM records r LEFT JOIN observations o ON o.record_id = r.id "
+                    "WHERE r.sensor = ? AND r.ts >= ? AND r.ts < ? GROUP BY b ORDER BY b",
+                    (start, bucket, sensor, start, end),
+                ).fetchall()
+                result["points"] = [
+                    {"ts": start + b * bucket, "records": n, "observations": o, "devices": d}
+                    for b, n, o, d in rows
+                ]
+        return result
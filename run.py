@@ -29,6 +29,7 @@ def run_gui_server(port):
     import time
     import signal
     import os
+    from config import load_config
     
     # Function to open browser after a short delay
     def open_browser():
@@ -51,6 +52,9 @@ def run_gui_server(port):
     # Start browser in a separate thread
     threading.Thread(target=open_browser, daemon=True).start()
     
+    # permessage-deflate is negotiated by uvicorn, not the app
+    ws_conf = load_config().get("websocket", {}) or {}
+    
     try:
         print(f"Starting server on port {port}...")
         # Use graceful shutdown settings
@@ -62,6 +66,7 @@ def run_gui_server(port):
             log_level="info",
             access_log=True,
             timeout_keep_alive=5,  # Reduce keep-alive timeout
+            ws_per_message_deflate=ws_conf.get("deflate", True),
             loop="asyncio"
         )
     except Exception as e:
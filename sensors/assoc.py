@@ -1,16 +1,18 @@
 import asyncio
 import time
 import sys
-import subprocess
 import os
 import shutil
 from .base import SensorPlugin
+from .runner import run_command
 
 class AssocSensor(SensorPlugin):
     """
     Sensor plugin to monitor current Wi-Fi SSID association.
     Emits records with 'ssid' field.
     """
+    name = "assoc"
+
     async def start(self, queue: asyncio.Queue):
         self._running = True
         interval = self.config.get("interval", 5)
@@ -29,9 +31,8 @@ class AssocSensor(SensorPlugin):
             ssid = None
             if is_linux:
                 try:
-                    result = subprocess.run(
-                        ["nmcli", "-t", "-f", "ACTIVE,SSID", "dev", "wifi"],
-                        capture_output=True, text=True, check=False
+                    result = await run_command(
+                        ["nmcli", "-t", "-f", "ACTIVE,SSID", "dev", "wifi"], timeout=10
                     )
                     for line in result.stdout.splitlines():
                         parts = line.split(":", 1)
@@ -42,9 +43,7 @@ class AssocSensor(SensorPlugin):
                     pass
             elif is_mac and airport_cmd:
                 try:
-                    res = subprocess.run(
-                        airport_cmd + ["-I"], capture_output=True, text=True, check=False
-                    )
+                    res = await run_command(airport_cmd + ["-I"], timeout=5)
                     for line in res.stdout.splitlines():
                         if line.strip().startswith("SSID:"):
                             ssid = line.split("SSID:", 1)[1].strip()
@@ -52,5 +51,5 @@ class AssocSensor(SensorPlugin):
                 except Exception:
                     pass
             record = {"sensor": "assoc", "timestamp": time.time(), "ssid": ssid}
-            await queue.put(record)
+            await self.emit(queue, record)
             await asyncio.sleep(interval)
\ No newline at end of file
@@ -1,10 +1,23 @@
 import abc
 import asyncio
 
+import metrics
+
+RECORDS = metrics.counter("sensor_records_total", "Records emitted by each sensor", ["sensor"])
+RECORD_ERRORS = metrics.counter(
+    "sensor_record_errors_total", "Records emitted with an error or unavailable hardware", ["sensor"]
+)
+LAST_RECORD = metrics.gauge("sensor_last_record_timestamp_seconds", "Time of the last record per sensor", ["sensor"])
+QUEUE_DEPTH = metrics.gauge("sensor_queue_depth", "Records waiting in the shared sensor queue")
+SCAN_SECONDS = metrics.histogram("sensor_scan_seconds", "Time spent collecting one sensor reading", ["sensor"])
+
 class SensorPlugin(abc.ABC):
     """
     Abstract base class for sensor plugins.
     """
+    # Label used for metrics; records carry the same value in "sensor"
+    name = "sensor"
+
     def __init__(self, config: dict):
         self.config = config
         self._running = False
@@ -21,4 +34,24 @@ class SensorPlugin(abc.ABC):
         """
         Signal the sensor to stop.
         """
-        self._running = False
\ No newline at end of file
+        self._running = False
+
+    async def emit(self, queue: asyncio.Queue, record: dict):
+        """
+        Put a record on the queue and count it.
+        """
+        sensor = record.get("sensor") or self.name
+        RECORDS.inc(sensor=sensor)
+        if record.get("error") or record.get("hardware_status") in ("error", "unavailable"):
+            RECORD_ERRORS.inc(sensor=sensor)
+        timestamp = record.get("timestamp")
+        if isinstance(timestamp, (int, float)):
+            LAST_RECORD.set(timestamp, sensor=sensor)
+        await queue.put(record)
+        QUEUE_DEPTH.set(queue.qsize())
+
+    def scan_timer(self):
+        """
+        Context manager timing one reading into sensor_scan_seconds.
+        """
+        return SCAN_SECONDS.time(sensor=self.name)
@@ -1,111 +1,188 @@
 import asyncio
 import time
+from collections import OrderedDict
 from bleak import BleakScanner
 from .base import SensorPlugin
 
+
+class BLEDeviceTable:
+    """
+    In-memory per-address table fed by advertisement callbacks.
+
+    Entries are kept in least-recently-seen order so expiring idle devices
+    and evicting the stalest one when the table is full are both cheap.
+    """
+    def __init__(self, alpha: float = 0.3, ttl: float = 60, max_devices: int = 1000):
+        self.alpha = alpha
+        self.ttl = ttl
+        self.max_devices = max_devices
+        self.devices = OrderedDict()
+        self.adverts = 0  # adverts since the last snapshot
+
+    def update(self, address: str, name, rssi, now: float = None):
+        """
+        Record one advertisement.
+        """
+        now = time.time() if now is None else now
+        self.adverts += 1
+        entry = self.devices.get(address)
+        if entry is None:
+            if len(self.devices) >= self.max_devices:
+                self.devices.popitem(last=False)
+            entry = self.devices[address] = {
+                "address": address,
+                "name": name or "Unknown",
+                "rssi": rssi,
+                "rssi_avg": rssi,
+                "adverts": 0,
+                "first_seen": now,
+                "last_seen": now,
+            }
+        else:
+            self.devices.move_to_end(address)
+            if name:
+                entry["name"] = name
+            if rssi is not None:
+                entry["rssi"] = rssi
+                avg = entry["rssi_avg"]
+                entry["rssi_avg"] = rssi if avg is None else avg + self.alpha * (rssi - avg)
+            entry["last_seen"] = now
+        entry["adverts"] += 1
+
+    def expire(self, now: float = None):
+        """
+        Drop devices that have not advertised for longer than the TTL.
+        """
+        cutoff = (time.time() if now is None else now) - self.ttl
+        while self.devices:
+            address, entry = next(iter(self.devices.items()))
+            if entry["last_seen"] >= cutoff:
+                break
+            del self.devices[address]
+
+    def snapshot(self, now: float = None) -> list:
+        """
+        Expire idle devices and return a copy of every remaining entry.
+        """
+        self.expire(now)
+        self.adverts = 0
+        devices = []
+        for entry in self.devices.values():
+            device = dict(entry)
+            if device["rssi_avg"] is not None:
+                device["rssi_avg"] = round(device["rssi_avg"], 1)
+            devices.append(device)
+        return devices
+
+
 class BluetoothSensor(SensorPlugin):
+    name = "bluetooth"
+
     def __init__(self, config):
         super().__init__(config)
         self.error_count = 0
         self.last_error = None
         self.bluetooth_available = True  # Assume bluetooth is available initially
         self.logged_devices = set()  # Keep track of devices we've already logged RSSI issues for
-        
+        interval = config.get("interval", 5)
+        self.table = BLEDeviceTable(
+            alpha=config.get("rssi_alpha", 0.3),
+            ttl=config.get("device_ttl", max(60, 3 * interval)),
+            max_devices=config.get("max_devices", 1000),
+        )
+        self.scanner = None
+
+    def _estimate_rssi(self, device):
+        """
+        Guess a signal strength for devices that advertise without RSSI.
+        """
+        name = (device.name or "").lower()
+        if any(keyword in name for keyword in ['headphone', 'speaker', 'audio']):
+            rssi = -70  # Audio devices typically have medium signal strength
+        elif any(keyword in name for keyword in ['watch', 'fit', 'band']):
+            rssi = -65  # Wearables often have stronger signals
+        else:
+            rssi = -85  # Default to a more realistic value than -100
+        # Only log this once per device to reduce noise
+        if device.address not in self.logged_devices:
+            print(f"Estimated RSSI for device {device.address} ({device.name or 'Unknown'}): {rssi}")
+            self.logged_devices.add(device.address)
+        return rssi
+
+    def _on_advertisement(self, device, advertisement_data):
+        """
+        Detection callback: runs on the event loop for every advert received.
+        """
+        rssi = getattr(advertisement_data, "rssi", None)
+        if rssi is None or rssi == -100:
+            rssi = self._estimate_rssi(device)
+        name = device.name or getattr(advertisement_data, "local_name", None)
+        self.table.update(device.address, name, rssi)
+
+    async def _start_scanner(self):
+        self.scanner = BleakScanner(detection_callback=self._on_advertisement)
+        await self.scanner.start()
+
+    async def _stop_scanner(self):
+        if self.scanner is None:
+            return
+        try:
+            await self.scanner.stop()
+        except Exception as e:
+            print(f"Error stopping Bluetooth scanner: {e}")
+        self.scanner = None
+
     async def start(self, queue: asyncio.Queue):
         """
-        Uses Bleak to scan for BLE devices.
+        Runs one long-lived BLE scan and snapshots the device table into a
+        record every `interval` seconds.
         """
         self._running = True
         interval = self.config.get("interval", 5)
-        
-        while self._running:
-            dev_list = []
-            hardware_status = "available"
-            error_message = None
-            
-            # Try to get real Bluetooth data if available
-            if self.bluetooth_available:
-                try:
-                    # Use the newer approach that includes advertisement data
-                    devices = await BleakScanner.discover(timeout=interval)
-                    
-                    for d in devices:
-                        # Get RSSI from the device using multiple approaches to ensure we get a value
-                        rssi = None
-                        
-                        # Try different approaches to get RSSI based on platform and device type
-                        # First check if RSSI is directly available as an attribute
-                        if hasattr(d, 'rssi') and d.rssi is not None:
-                            rssi = d.rssi
-                        # Next try to get from advertisement_data (common in newer versions)
-                        elif hasattr(d, 'advertisement_data') and d.advertisement_data:
-                            if hasattr(d.advertisement_data, 'rssi') and d.advertisement_data.rssi is not None:
-                                rssi = d.advertisement_data.rssi
-                            # Some platforms store it in a different structure
-                            elif hasattr(d.advertisement_data, 'tx_power') and d.advertisement_data.tx_power is not None:
-                                rssi = d.advertisement_data.tx_power
-                        # If not available, try to get from the details dictionary
-                        elif hasattr(d, 'details') and d.details:
-                            if 'rssi' in d.details and d.details['rssi'] is not None:
-                                rssi = d.details['rssi']
-                            elif 'tx_power' in d.details and d.details['tx_power'] is not None:
-                                rssi = d.details['tx_power']
-                        
-                        # If we still don't have a valid RSSI, try to estimate based on device type
-                        if rssi is None or rssi == -100:
-                            # Try to make an educated guess based on device name/type
-                            if d.name and any(keyword in d.name.lower() for keyword in ['headphone', 'speaker', 'audio']):
-                                rssi = -70  # Audio devices typically have medium signal strength
-                            elif d.name and any(keyword in d.name.lower() for keyword in ['watch', 'fit', 'band']):
-                                rssi = -65  # Wearables often have stronger signals
-                            else:
-                                rssi = -85  # Default to a more realistic value than -100
-                            
-                            # Only log this once per device to reduce noise
-                            if d.address not in self.logged_devices:
-                                print(f"Estimated RSSI for device {d.address} ({d.name or 'Unknown'}): {rssi}")
-                                self.logged_devices.add(d.address)
-                            
-                        dev_list.append({
-                            "address": d.address,
-                            "name": d.name or "Unknown",
-                            "rssi": rssi,
-                        })
-                    
-                    # Reset error count if successful
-                    self.error_count = 0
-                    self.last_error = None
-                    
-                except Exception as e:
-                    self.error_count += 1
-                    self.last_error = str(e)
-                    print(f"Bluetooth scan error: {e}")
-                    
-                    # After 3 consecutive errors, mark hardware as unavailable
-                    if self.error_count >= 3:
-                        print("Bluetooth hardware unavailable.")
-                        self.bluetooth_available = False
-                        hardware_status = "unavailable"
-                        error_message = f"Hardware unavailable after multiple errors: {e}"
-                    else:
-                        hardware_status = "error"
-                        error_message = str(e)
-            else:
-                # Hardware previously marked as unavailable
-                hardware_status = "unavailable"
-                error_message = self.last_error or "Bluetooth hardware is unavailable"
-                
-            data = {
-                "sensor": "bluetooth",
-                "timestamp": time.time(),
-                "devices": dev_list,
-                "hardware_status": hardware_status,
-                "error": error_message
-            }
-            
-            await queue.put(data)
-            
-            # If hardware is unavailable, we need to sleep manually
-            # Otherwise BleakScanner.discover already waits for `timeout`
-            if not self.bluetooth_available:
-                await asyncio.sleep(interval)
\ No newline at end of file
+
+        try:
+            while self._running:
+                hardware_status = "available"
+                error_message = None
+
+                if self.bluetooth_available and self.scanner is None:
+                    try:
+                        await self._start_scanner()
+                        # Reset error count if successful
+                        self.error_count = 0
+                        self.last_error = None
+                    except Exception as e:
+                        self.scanner = None
+                        self.error_count += 1
+                        self.last_error = str(e)
+                        print(f"Bluetooth scan error: {e}")
+
+                        # After 3 consecutive errors, mark hardware as unavailable
+                        if self.error_count >= 3:
+                            print("Bluetooth hardware unavailable.")
+                            self.bluetooth_available = False
+                            hardware_status = "unavailable"
+                            error_message = f"Hardware unavailable after multiple errors: {e}"
+                        else:
+                            hardware_status = "error"
+                            error_message = str(e)
+                elif not self.bluetooth_available:
+                    # Hardware previously marked as unavailable
+                    hardware_status = "unavailable"
+                    error_message = self.last_error or "Bluetooth hardware is unavailable"
+
+                await asyncio.sleep(interval)
+
+                adverts = self.table.adverts
+                data = {
+                    "sensor": "bluetooth",
+                    "timestamp": time.time(),
+                    "devices": self.table.snapshot(),
+                    "adverts": adverts,
+                    "hardware_status": hardware_status,
+                    "error": error_message
+                }
+
+                await self.emit(queue, data)
+        finally:
+            await self._stop_scanner()
@@ -0,0 +1,430 @@
+"""
+Passive 802.11 management frame capture.
+
+Dot11Sensor streams beacons, probe requests/responses and deauthentication
+frames from a monitor-mode interface (or replays a pcap file), aggregates
+them per BSSID in memory and emits one compact record per interval:
+
+    {
+      "sensor": "dot11",
+      "timestamp": ...,
+      "source": "wlan0mon" | "capture.pcap",
+      "frames": 1532, "beacons": 1400, "probe_requests": 80,
+      "probe_responses": 40, "deauths": 12,
+      "bssids": [{"bssid", "ssid", "channel", "rssi", "rssi_avg", "rssi_max",
+                  "beacons", "probe_responses", "deauths"}, ...],
+      "probes": [{"mac", "ssids", "count", "rssi"}, ...],
+      "hardware_status": "available",
+      "error": None,
+    }
+
+Live capture puts the frame-type filter into the kernel as a BPF program so
+data frames never reach Python. Capture runs in a worker thread and the
+aggregator is shared under a lock; the event loop only takes snapshots.
+
+Frames are decoded with struct offsets rather than full scapy dissection:
+the aggregator only needs the frame type, three addresses, SSID, channel
+and signal, and building scapy layer objects for every frame caps ingest at
+around a thousand frames per second. Scapy still provides the capture
+socket, the BPF compiler and the pcap reader.
+"""
+import asyncio
+import select
+import struct
+import threading
+import time
+
+from scapy.config import conf
+from scapy.layers.dot11 import RadioTap
+from scapy.utils import RawPcapReader
+
+from .base import SensorPlugin
+
+# Management frame subtypes
+SUBTYPE_PROBE_REQ = 4
+SUBTYPE_PROBE_RESP = 5
+SUBTYPE_BEACON = 8
+SUBTYPE_DEAUTH = 12
+
+DEFAULT_BPF = (
+    "type mgt subtype beacon or type mgt subtype probe-req "
+    "or type mgt subtype probe-resp or type mgt subtype deauth"
+)
+
+# pcap link types
+DLT_IEEE802_11 = 105
+DLT_IEEE802_11_RADIO = 127
+
+ELT_SSID = 0
+ELT_DS_PARAMS = 3
+
+_COUNTERS = {
+    SUBTYPE_BEACON: "beacons",
+    SUBTYPE_PROBE_REQ: "probe_requests",
+    SUBTYPE_PROBE_RESP: "probe_responses",
+    SUBTYPE_DEAUTH: "deauths",
+}
+
+# Fixed parameters preceding the tagged IEs in each tracked subtype
+_FIXED_LEN = {
+    SUBTYPE_BEACON: 12,       # timestamp, beacon interval, capabilities
+    SUBTYPE_PROBE_RESP: 12,
+    SUBTYPE_PROBE_REQ: 0,
+}
+
+# (alignment, size) of radiotap fields 0-4, which precede dBm_AntSignal (bit 5)
+_RADIOTAP_FIELDS = ((8, 8), (1, 1), (1, 1), (2, 4), (1, 2))
+_RADIOTAP_FLAGS_FCS = 0x10
+_MGMT_HEADER_LEN = 24
+
+
+def _mac(data: bytes, offset: int) -> str:
+    return data[offset:offset + 6].hex(":")
+
+
+def parse_radiotap(data: bytes):
+    """
+    Return (header_length, rssi, has_fcs) for a radiotap-prefixed frame.
+    rssi is None when the driver does not report dBm_AntSignal.
+    """
+    length, present = struct.unpack_from("<HI", data, 2)
+    offset = 8
+    word = present
+    while word & 0x80000000:
+        (word,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+    flags = 0
+    for bit, (align, size) in enumerate(_RADIOTAP_FIELDS):
+        if present & (1 << bit):
+            offset = (offset + align - 1) & ~(align - 1)
+            if bit == 1:
+                flags = data[offset]
+            offset += size
+    rssi = None
+    if present & (1 << 5) and offset < length:
+        rssi = struct.unpack_from("b", data, offset)[0]
+    return length, rssi, bool(flags & _RADIOTAP_FLAGS_FCS)
+
+
+def parse_ies(data: bytes, offset: int, end: int):
+    """
+    Walk tagged parameters once for SSID and DS channel.
+    """
+    ssid = None
+    channel = None
+    while offset + 2 <= end:
+        elt_id = data[offset]
+        elt_len = data[offset + 1]
+        body = offset + 2
+        if body + elt_len > end:
+            break
+        if elt_id == ELT_SSID and ssid is None:
+            ssid = data[body:body + elt_len].decode(errors="replace")
+        elif elt_id == ELT_DS_PARAMS and elt_len:
+            channel = data[body]
+        if ssid is not None and channel is not None:
+            break
+        offset = body + elt_len
+    return ssid, channel
+
+
+class Dot11Aggregator:
+    """
+    Thread-safe per-BSSID / per-client counters for one capture interval.
+    Tables are capped so a flood of spoofed BSSIDs cannot grow memory
+    without bound; frames for new entries beyond the cap are still counted
+    in the totals.
+    """
+    def __init__(self, max_bssids: int = 512, max_clients: int = 512):
+        self.max_bssids = max_bssids
+        self.max_clients = max_clients
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.totals = {"frames": 0, "beacons": 0, "probe_requests": 0, "probe_responses": 0, "deauths": 0}
+        self.bssids = {}
+        self.clients = {}
+
+    def handle(self, data: bytes, radiotap: bool = True) -> bool:
+        """
+        Count one raw frame (radiotap-prefixed unless radiotap=False).
+        Returns False for frames that are not management frames of a tracked
+        subtype or are too short to decode.
+        """
+        try:
+            rssi = None
+            end = len(data)
+            offset = 0
+            if radiotap:
+                offset, rssi, has_fcs = parse_radiotap(data)
+                if has_fcs:
+                    end -= 4
+            if end - offset < _MGMT_HEADER_LEN:
+                return False
+            fc0 = data[offset]
+            if (fc0 >> 2) & 0x3 != 0:
+                return False
+            subtype = fc0 >> 4
+            if subtype not in _COUNTERS:
+                return False
+            src = _mac(data, offset + 10)
+            bssid = _mac(data, offset + 16)
+            body = offset + _MGMT_HEADER_LEN
+            if data[offset + 1] & 0x80:
+                body += 4  # +HTC field
+            ssid = channel = None
+            if subtype != SUBTYPE_DEAUTH:
+                ssid, channel = parse_ies(data, body + _FIXED_LEN[subtype], end)
+        except (struct.error, IndexError):
+            return False
+        self.add(subtype, src, bssid, ssid, channel, rssi)
+        return True
+
+    def handle_packet(self, pkt) -> bool:
+        """
+        Count a scapy packet (RadioTap or bare Dot11).
+        """
+        return self.handle(bytes(pkt), isinstance(pkt, RadioTap))
+
+    def add(self, subtype: int, src, bssid, ssid=None, channel=None, rssi=None):
+        """
+        Count a decoded management frame.
+        """
+        with self._lock:
+            self.totals["frames"] += 1
+            self.totals[_COUNTERS[subtype]] += 1
+            if subtype == SUBTYPE_PROBE_REQ:
+                self._add_probe(src, ssid, rssi)
+            else:
+                self._add_bss(subtype, bssid or src, ssid, channel, rssi)
+
+    def _add_bss(self, subtype, bssid, ssid, channel, rssi):
+        if not bssid:
+            return
+        entry = self.bssids.get(bssid)
+        if entry is None:
+            if len(self.bssids) >= self.max_bssids:
+                return
+            entry = self.bssids[bssid] = {
+                "bssid": bssid,
+                "ssid": None,
+                "channel": None,
+                "rssi": None,
+                "rssi_max": None,
+                "rssi_sum": 0,
+                "rssi_count": 0,
+                "beacons": 0,
+                "probe_responses": 0,
+                "deauths": 0,
+            }
+        entry[_COUNTERS[subtype]] += 1
+        if ssid:
+            entry["ssid"] = ssid
+        if channel is not None:
+            entry["channel"] = channel
+        if rssi is not None:
+            entry["rssi"] = rssi
+            entry["rssi_sum"] += rssi
+            entry["rssi_count"] += 1
+            if entry["rssi_max"] is None or rssi > entry["rssi_max"]:
+                entry["rssi_max"] = rssi
+
+    def _add_probe(self, mac, ssid, rssi):
+        if not mac:
+            return
+        entry = self.clients.get(mac)
+        if entry is None:
+            if len(self.clients) >= self.max_clients:
+                return
+            entry = self.clients[mac] = {"mac": mac, "ssids": set(), "count": 0, "rssi": None}
+        entry["count"] += 1
+        if ssid:
+            entry["ssids"].add(ssid)
+        if rssi is not None:
+            entry["rssi"] = rssi
+
+    def snapshot(self, reset: bool = True) -> dict:
+        """
+        Return the interval's totals and per-BSSID/per-client tables in
+        record form, strongest BSSIDs first.
+        """
+        with self._lock:
+            totals = self.totals
+            bssids = self.bssids
+            clients = self.clients
+            if reset:
+                self._reset()
+            else:
+                totals = dict(totals)
+                bssids = {k: dict(v) for k, v in bssids.items()}
+                clients = {k: dict(v, ssids=set(v["ssids"])) for k, v in clients.items()}
+
+        bss_list = []
+        for entry in bssids.values():
+            count = entry.pop("rssi_count")
+            total = entry.pop("rssi_sum")
+            entry["rssi_avg"] = round(total / count, 1) if count else None
+            bss_list.append(entry)
+        bss_list.sort(key=lambda e: e["rssi_max"] if e["rssi_max"] is not None else -1000, reverse=True)
+
+        probe_list = []
+        for entry in clients.values():
+            entry["ssids"] = sorted(entry["ssids"])
+            probe_list.append(entry)
+        probe_list.sort(key=lambda e: e["count"], reverse=True)
+
+        result = dict(totals)
+        result["bssids"] = bss_list
+        result["probes"] = probe_list
+        return result
+
+
+def replay_pcap(path: str, aggregator: Dot11Aggregator, limit: int = None, stop_event=None) -> dict:
+    """
+    Feed every frame of a pcap file through the aggregator as fast as it
+    can be read. The kernel BPF filter does not apply offline, so
+    non-management frames are rejected by Dot11Aggregator.handle().
+    Returns {"frames", "matched", "elapsed", "frames_per_second"}.
+    """
+    frames = 0
+    matched = 0
+    start = time.perf_counter()
+    with RawPcapReader(path) as reader:
+        if reader.linktype not in (DLT_IEEE802_11, DLT_IEEE802_11_RADIO):
+            raise ValueError(f"{path}: link type {reader.linktype} is not 802.11")
+        radiotap = reader.linktype == DLT_IEEE802_11_RADIO
+        handle = aggregator.handle
+        for data, _ in reader:
+            if stop_event is not None and stop_event.is_set():
+                break
+            frames += 1
+            if handle(data, radiotap):
+                matched += 1
+            if limit is not None and frames >= limit:
+                break
+    elapsed = time.perf_counter() - start
+    return {
+        "frames": frames,
+        "matched": matched,
+        "elapsed": elapsed,
+        "frames_per_second": frames / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def capture_live(interface: str, bpf: str, aggregator: Dot11Aggregator, stop_event, poll: float = 0.5):
+    """
+    Read raw frames from a monitor interface until stop_event is set.
+    Runs in a worker thread; the BPF filter is attached to the socket so
+    only tracked management frames are delivered.
+    """
+    sock = conf.L2listen(iface=interface, filter=bpf)
+    try:
+        radiotap = getattr(sock, "LL", RadioTap) is RadioTap
+        handle = aggregator.handle
+        while not stop_event.is_set():
+            ready, _, _ = select.select([sock], [], [], poll)
+            if not ready:
+                continue
+            _, data, _ = sock.recv_raw()
+            if data:
+                handle(data, radiotap)
+    finally:
+        sock.close()
+
+
+class Dot11Sensor(SensorPlugin):
+    """
+    Passive 802.11 capture sensor.
+
+    Config keys:
+      interface: monitor-mode interface to sniff (e.g. wlan0mon)
+      pcap: pcap file to replay instead of live capture
+      interval: seconds per emitted record (default 5)
+      filter: BPF filter for live capture (default: beacon/probe/deauth)
+      max_bssids / max_clients: per-interval table caps (default 512)
+    The sensor stays idle when neither interface nor pcap is configured.
+    """
+    name = "dot11"
+
+    def __init__(self, config):
+        super().__init__(config)
+        self.interface = config.get("interface")
+        self.pcap = config.get("pcap")
+        self.bpf = config.get("filter", DEFAULT_BPF)
+        self.aggregator = Dot11Aggregator(
+            config.get("max_bssids", 512),
+            config.get("max_clients", 512),
+        )
+        self._stop_event = threading.Event()
+        self.replay_stats = None
+
+    async def start(self, queue: asyncio.Queue):
+        if not self.interface and not self.pcap:
+            print("802.11 capture disabled (set dot11.interface or dot11.pcap to enable)")
+            return
+        self._running = True
+        self._stop_event.clear()
+        if self.pcap:
+            await self._run_replay(queue)
+        else:
+            await self._run_live(queue)
+
+    def _record(self, hardware_status="available", error=None, **extra):
+        record = {
+            "sensor": "dot11",
+            "timestamp": time.time(),
+            "source": self.pcap or self.interface,
+        }
+        record.update(self.aggregator.snapshot())
+        record["hardware_status"] = hardware_status
+        record["error"] = error
+        record.update(extra)
+        return record
+
+    async def _run_live(self, queue: asyncio.Queue):
+        interval = self.config.get("interval", 5)
+        capture = asyncio.create_task(
+            asyncio.to_thread(capture_live, self.interface, self.bpf, self.aggregator, self._stop_event)
+        )
+        try:
+            while self._running:
+                await asyncio.wait({capture}, timeout=interval)
+                if capture.done():
+                    error = capture.exception() if not capture.cancelled() else None
+                    await self.emit(queue, self._record("unavailable", f"802.11 capture stopped: {error}"))
+                    break
+                await self.emit(queue, self._record())
+        finally:
+            self._stop_event.set()
+            self._running = False
+
+    async def _run_replay(self, queue: asyncio.Queue):
+        interval = self.config.get("interval", 5)
+        replay = asyncio.create_task(
+            asyncio.to_thread(replay_pcap, self.pcap, self.aggregator, None, self._stop_event)
+        )
+        try:
+            while self._running and not replay.done():
+                await asyncio.wait({replay}, timeout=interval)
+                if not replay.done():
+                    await self.emit(queue, self._record())
+            if replay.done():
+                try:
+                    self.replay_stats = replay.result()
+                except Exception as e:
+                    await self.emit(queue, self._record("error", f"pcap replay failed: {e}"))
+                    return
+                print(
+                    f"pcap replay finished: {self.replay_stats['frames']} frames "
+                    f"in {self.replay_stats['elapsed']:.2f}s "
+                    f"({self.replay_stats['frames_per_second']:.0f} frames/s)"
+                )
+                await self.emit(queue, self._record(replay=self.replay_stats))
+        finally:
+            self._stop_event.set()
+            self._running = False
+
+    def stop(self):
+        super().stop()
+        self._stop_event.set()
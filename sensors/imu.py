@@ -1,11 +1,13 @@
 import asyncio
 import time
-import subprocess
 import sys
 import re
 from .base import SensorPlugin
+from .runner import run_command, run_command_sync
 
 class ImuSensor(SensorPlugin):
+    name = "imu"
+
     def __init__(self, config):
         super().__init__(config)
         self.is_mac = sys.platform == "darwin"
@@ -33,7 +35,7 @@ class ImuSensor(SensorPlugin):
     def _check_smc_available(self):
         """Check if SMC (System Management Controller) is available on Mac"""
         try:
-            result = subprocess.run(["which", "smckit"], capture_output=True, text=True)
+            result = run_command_sync(["which", "smckit"])
             return result.returncode == 0
         except Exception:
             return False
@@ -42,11 +44,7 @@ class ImuSensor(SensorPlugin):
         """Check if motion sensors are available on Mac"""
         try:
             # Try to use the Mac's built-in motion sensors via ioreg
-            result = subprocess.run(
-                ["ioreg", "-r", "-c", "SMCMotionSensor"], 
-                capture_output=True, 
-                text=True
-            )
+            result = run_command_sync(["ioreg", "-r", "-c", "SMCMotionSensor"])
             return "SMCMotionSensor" in result.stdout
         except Exception:
             return False
@@ -54,17 +52,12 @@ class ImuSensor(SensorPlugin):
     def _check_linux_sensors_available(self):
         """Check if motion sensors are available on Linux"""
         try:
-            result = subprocess.run(
-                ["find", "/sys/bus/iio/devices", "-name", "*accel*"],
-                capture_output=True,
-                text=True,
-                timeout=1
-            )
+            result = run_command_sync(["find", "/sys/bus/iio/devices", "-name", "*accel*"], timeout=1)
             return bool(result.stdout.strip())
         except Exception:
             return False
     
-    def _get_mac_motion_data(self):
+    async def _get_mac_motion_data(self):
         """Get motion sensor data from Mac's built-in sensors"""
         accel = {"x": 0.0, "y": 0.0, "z": 0.0}
         gyro = {"x": 0.0, "y": 0.0, "z": 0.0}
@@ -75,12 +68,7 @@ class ImuSensor(SensorPlugin):
         try:
             # Try to get accelerometer data
             if self.has_motion:
-                result = subprocess.run(
-                    ["ioreg", "-r", "-c", "SMCMotionSensor", "-w0"],
-                    capture_output=True,
-                    text=True,
-                    timeout=1
-                )
+                result = await run_command(["ioreg", "-r", "-c", "SMCMotionSensor", "-w0"], timeout=1)
                 
                 # Parse x, y, z acceleration values
                 x_match = re.search(r'"x" = ([\-0-9.]+)', result.stdout)
@@ -100,12 +88,7 @@ class ImuSensor(SensorPlugin):
             # Try to get orientation data using system_profiler
             if success:
                 try:
-                    orientation_result = subprocess.run(
-                        ["system_profiler", "SPDisplaysDataType"],
-                        capture_output=True,
-                        text=True,
-                        timeout=1
-                    )
+                    orientation_result = await run_command(["system_profiler", "SPDisplaysDataType"], timeout=1)
                     
                     # Look for orientation information that might indicate device position
                     if "Orientation" in orientation_result.stdout:
@@ -125,7 +108,7 @@ class ImuSensor(SensorPlugin):
         
         return success, error_msg, accel, gyro, mag
     
-    def _get_linux_motion_data(self):
+    async def _get_linux_motion_data(self):
         """Get motion sensor data from Linux sensors"""
         accel = {"x": 0.0, "y": 0.0, "z": 0.0}
         gyro = {"x": 0.0, "y": 0.0, "z": 0.0}
@@ -135,12 +118,7 @@ class ImuSensor(SensorPlugin):
         
         try:
             # Try to read from IIO sensors (common on Linux laptops)
-            result = subprocess.run(
-                ["find", "/sys/bus/iio/devices", "-name", "*accel*"],
-                capture_output=True,
-                text=True,
-                timeout=1
-            )
+            result = await run_command(["find", "/sys/bus/iio/devices", "-name", "*accel*"], timeout=1)
             
             accel_paths = result.stdout.strip().split('\n')
             if accel_paths and accel_paths[0]:
@@ -182,13 +160,14 @@ class ImuSensor(SensorPlugin):
             # Only try to get data if hardware is available
             if self.hardware_status == "available":
                 # Get actual hardware sensor data based on platform
-                if self.is_mac:
-                    success, error_msg, accel, gyro, mag = self._get_mac_motion_data()
-                elif self.is_linux:
-                    success, error_msg, accel, gyro, mag = self._get_linux_motion_data()
-                else:
-                    success = False
-                    error_msg = f"Unsupported platform: {sys.platform}"
+                with self.scan_timer():
+                    if self.is_mac:
+                        success, error_msg, accel, gyro, mag = await self._get_mac_motion_data()
+                    elif self.is_linux:
+                        success, error_msg, accel, gyro, mag = await self._get_linux_motion_data()
+                    else:
+                        success = False
+                        error_msg = f"Unsupported platform: {sys.platform}"
                 
                 # Update hardware status based on success/failure
                 if not success:
@@ -220,5 +199,5 @@ class ImuSensor(SensorPlugin):
                 "error": error_msg
             }
             
-            await queue.put(data)
+            await self.emit(queue, data)
             await asyncio.sleep(interval)
\ No newline at end of file
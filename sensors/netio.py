@@ -7,6 +7,8 @@ class NetIOSensor(SensorPlugin):
     """
     Sensor plugin to monitor network I/O and compute per-second rates.
     """
+    name = "netio"
+
     async def start(self, queue: asyncio.Queue):
         self._running = True
         interval = self.config.get("interval", 5)
@@ -24,5 +26,5 @@ class NetIOSensor(SensorPlugin):
                 "rate_sent": rate_sent,
                 "rate_recv": rate_recv,
             }
-            await queue.put(record)
+            await self.emit(queue, record)
             prev = current
\ No newline at end of file
@@ -0,0 +1,491 @@
+"""
+Native Linux Wi-Fi scanning over nl80211.
+
+Nl80211Scanner keeps one generic netlink socket open for the life of the
+sensor, triggers scans and dumps the kernel's BSS table without forking a
+process per scan. parse_scan_dump() and parse_iw_scan() are pure functions so
+both the netlink path and the `iw` fallback can be exercised against captured
+output without Wi-Fi hardware.
+"""
+import os
+import select
+import socket
+import struct
+import time
+
+NETLINK_GENERIC = 16
+
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+NLM_F_REQUEST = 0x1
+NLM_F_MULTI = 0x2
+NLM_F_ACK = 0x4
+NLM_F_DUMP = 0x300
+
+NLA_F_NESTED = 0x8000
+NLA_TYPE_MASK = 0x3FFF
+
+GENL_ID_CTRL = 0x10
+CTRL_CMD_GETFAMILY = 3
+CTRL_ATTR_FAMILY_ID = 1
+CTRL_ATTR_FAMILY_NAME = 2
+CTRL_ATTR_MCAST_GROUPS = 7
+CTRL_ATTR_MCAST_GRP_NAME = 1
+CTRL_ATTR_MCAST_GRP_ID = 2
+
+NL80211_CMD_GET_SCAN = 32
+NL80211_CMD_TRIGGER_SCAN = 33
+NL80211_CMD_NEW_SCAN_RESULTS = 34
+NL80211_CMD_SCAN_ABORTED = 35
+
+NL80211_ATTR_IFINDEX = 3
+NL80211_ATTR_SCAN_SSIDS = 45
+NL80211_ATTR_BSS = 47
+
+NL80211_BSS_BSSID = 1
+NL80211_BSS_FREQUENCY = 2
+NL80211_BSS_CAPABILITY = 5
+NL80211_BSS_INFORMATION_ELEMENTS = 6
+NL80211_BSS_SIGNAL_MBM = 7
+NL80211_BSS_SIGNAL_UNSPEC = 8
+NL80211_BSS_STATUS = 9
+NL80211_BSS_SEEN_MS_AGO = 10
+NL80211_BSS_BEACON_IES = 11
+
+NL80211_BSS_STATUS_ASSOCIATED = 1
+
+SOL_NETLINK = 270
+NETLINK_ADD_MEMBERSHIP = 1
+
+WLAN_CAPABILITY_PRIVACY = 0x0010
+
+_NLMSGHDR = struct.Struct("=IHHII")
+_GENLMSGHDR = struct.Struct("=BBH")
+_NLATTR = struct.Struct("=HH")
+
+# RSN / WPA authentication key management suite types
+_AKM_NAMES = {1: "802.1X", 2: "PSK", 8: "SAE", 12: "802.1X-SUITE-B", 18: "OWE"}
+
+
+class NetlinkError(OSError):
+    """
+    Error reported by the kernel in an NLMSG_ERROR reply.
+    """
+
+
+def freq_to_channel(freq):
+    """
+    Convert a centre frequency in MHz to (channel, band).
+    """
+    if freq is None:
+        return None, None
+    freq = int(freq)
+    if freq == 2484:
+        return 14, "2GHz"
+    if 2412 <= freq < 2484:
+        return (freq - 2407) // 5, "2GHz"
+    if 5955 <= freq <= 7115:
+        return (freq - 5950) // 5, "6GHz"
+    if 5000 <= freq < 5955:
+        return (freq - 5000) // 5, "5GHz"
+    return None, None
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def _attr(attr_type, payload: bytes) -> bytes:
+    length = _NLATTR.size + len(payload)
+    return _NLATTR.pack(length, attr_type) + payload + b"\0" * (_align(length) - length)
+
+
+def _iter_attrs(data: bytes, offset: int = 0, end: int = None):
+    """
+    Yield (type, payload) for each netlink attribute in data[offset:end].
+    """
+    end = len(data) if end is None else end
+    while offset + _NLATTR.size <= end:
+        length, attr_type = _NLATTR.unpack_from(data, offset)
+        if length < _NLATTR.size:
+            break
+        yield attr_type & NLA_TYPE_MASK, data[offset + _NLATTR.size:offset + length]
+        offset += _align(length)
+
+
+def _iter_messages(data: bytes):
+    """
+    Yield (type, flags, seq, payload) for each netlink message in a buffer.
+    """
+    offset = 0
+    while offset + _NLMSGHDR.size <= len(data):
+        length, msg_type, flags, seq, _ = _NLMSGHDR.unpack_from(data, offset)
+        if length < _NLMSGHDR.size:
+            break
+        yield msg_type, flags, seq, data[offset + _NLMSGHDR.size:offset + length]
+        offset += _align(length)
+
+
+def _security_from_suites(rsn_akms, wpa_akms, privacy):
+    """
+    Describe security the way system_profiler does ("WPA2/WPA3 Personal", "None", ...).
+    """
+    if not rsn_akms and not wpa_akms:
+        return "WEP" if privacy else "None"
+    enterprise = any(a.startswith("802.1X") for a in rsn_akms | wpa_akms)
+    kind = "Enterprise" if enterprise else "Personal"
+    versions = []
+    if wpa_akms:
+        versions.append("WPA")
+    if "PSK" in rsn_akms or "802.1X" in rsn_akms:
+        versions.append("WPA2")
+    if "SAE" in rsn_akms or "802.1X-SUITE-B" in rsn_akms:
+        versions.append("WPA3")
+    if "OWE" in rsn_akms and not versions:
+        return "OWE"
+    return f"{'/'.join(versions) or 'WPA2'} {kind}"
+
+
+def _parse_akm_list(body: bytes, offset: int):
+    """
+    Parse a (pairwise cipher list, AKM list) pair from an RSN/WPA IE body.
+    Returns the set of AKM names.
+    """
+    akms = set()
+    try:
+        offset += 4  # group cipher suite
+        (count,) = struct.unpack_from("<H", body, offset)
+        offset += 2 + 4 * count
+        (count,) = struct.unpack_from("<H", body, offset)
+        offset += 2
+        for _ in range(count):
+            suite_type = body[offset + 3]
+            akms.add(_AKM_NAMES.get(suite_type, f"AKM-{suite_type}"))
+            offset += 4
+    except (struct.error, IndexError):
+        pass
+    return akms
+
+
+def parse_ies(ies: bytes) -> dict:
+    """
+    Extract SSID, DS channel and RSN/WPA key management suites from
+    802.11 information elements.
+    """
+    info = {"ssid": None, "channel": None, "rsn": set(), "wpa": set()}
+    offset = 0
+    while offset + 2 <= len(ies):
+        eid, length = ies[offset], ies[offset + 1]
+        body = ies[offset + 2:offset + 2 + length]
+        if eid == 0:
+            info["ssid"] = body.decode("utf-8", errors="replace")
+        elif eid == 3 and length >= 1:
+            info["channel"] = body[0]
+        elif eid == 48:
+            # version (2 bytes) then cipher/AKM lists
+            info["rsn"] = _parse_akm_list(body, 2)
+        elif eid == 221 and body[:4] == b"\x00\x50\xf2\x01":
+            # Microsoft WPA vendor IE: OUI + type + version
+            info["wpa"] = _parse_akm_list(body, 6)
+        offset += 2 + length
+    return info
+
+
+def parse_bss(payload: bytes) -> dict:
+    """
+    Turn a nested NL80211_ATTR_BSS payload into a network dict.
+    """
+    bss = {}
+    for attr_type, value in _iter_attrs(payload):
+        bss[attr_type] = value
+    bssid = bss.get(NL80211_BSS_BSSID)
+    freq = struct.unpack("=I", bss[NL80211_BSS_FREQUENCY])[0] if NL80211_BSS_FREQUENCY in bss else None
+    ies = bss.get(NL80211_BSS_INFORMATION_ELEMENTS) or bss.get(NL80211_BSS_BEACON_IES) or b""
+    ie_info = parse_ies(ies)
+    capability = struct.unpack("=H", bss[NL80211_BSS_CAPABILITY][:2])[0] if NL80211_BSS_CAPABILITY in bss else 0
+    rssi = None
+    if NL80211_BSS_SIGNAL_MBM in bss:
+        rssi = int(struct.unpack("=i", bss[NL80211_BSS_SIGNAL_MBM])[0] / 100)
+    channel, band = freq_to_channel(freq)
+    network = {
+        "ssid": ie_info["ssid"] or "",
+        "bssid": ":".join(f"{b:02x}" for b in bssid) if bssid else None,
+        "rssi": rssi,
+        "frequency": freq,
+        "channel": str(channel or ie_info["channel"]) if (channel or ie_info["channel"]) else None,
+        "band": band,
+        "security": _security_from_suites(ie_info["rsn"], ie_info["wpa"], capability & WLAN_CAPABILITY_PRIVACY),
+        "connected": False,
+    }
+    if NL80211_BSS_STATUS in bss:
+        status = struct.unpack("=I", bss[NL80211_BSS_STATUS])[0]
+        network["connected"] = status == NL80211_BSS_STATUS_ASSOCIATED
+    if NL80211_BSS_SEEN_MS_AGO in bss:
+        network["seen_ms_ago"] = struct.unpack("=I", bss[NL80211_BSS_SEEN_MS_AGO])[0]
+    return network
+
+
+def parse_scan_dump(data: bytes, family_id: int = None) -> list:
+    """
+    Parse the raw bytes of an NL80211_CMD_GET_SCAN dump (one or more
+    concatenated recv() buffers) into a list of network dicts.
+    If family_id is None, any generic netlink message carrying BSS
+    attributes is accepted.
+    """
+    networks = []
+    for msg_type, _, _, payload in _iter_messages(data):
+        if msg_type in (NLMSG_DONE, NLMSG_ERROR) or msg_type < GENL_ID_CTRL:
+            continue
+        if family_id is not None and msg_type != family_id:
+            continue
+        cmd = payload[0] if payload else None
+        if cmd != NL80211_CMD_NEW_SCAN_RESULTS:
+            continue
+        for attr_type, value in _iter_attrs(payload, _GENLMSGHDR.size):
+            if attr_type == NL80211_ATTR_BSS:
+                networks.append(parse_bss(value))
+    return networks
+
+
+def parse_iw_scan(text: str) -> list:
+    """
+    Parse `iw dev <iface> scan` (or `scan dump`) output into network dicts.
+    """
+    networks = []
+    current = None
+    section = None
+    rsn, wpa, privacy = set(), set(), False
+
+    def finish():
+        if current is not None:
+            current["security"] = _security_from_suites(rsn, wpa, privacy)
+            networks.append(current)
+
+    for raw in text.splitlines():
+        line = raw.strip()
+        if raw.startswith("BSS "):
+            finish()
+            bssid = raw[4:21].lower()
+            current = {
+                "ssid": "",
+                "bssid": bssid,
+                "rssi": None,
+                "frequency": None,
+                "channel": None,
+                "band": None,
+                "security": None,
+                "connected": "-- associated" in raw,
+            }
+            section = None
+            rsn, wpa, privacy = set(), set(), False
+            continue
+        if current is None or not line:
+            continue
+        if not raw.startswith("\t\t"):
+            section = None
+        if line.startswith("freq:"):
+            freq = int(float(line.split(":", 1)[1]))
+            channel, band = freq_to_channel(freq)
+            current["frequency"] = freq
+            current["band"] = band
+            if channel:
+                current["channel"] = str(channel)
+        elif line.startswith("signal:"):
+            current["rssi"] = int(float(line.split(":", 1)[1].split()[0]))
+        elif line.startswith("SSID:"):
+            current["ssid"] = line[5:].strip()
+        elif line.startswith("capability:"):
+            privacy = "Privacy" in line
+        elif line.startswith("RSN:"):
+            section = "rsn"
+        elif line.startswith("WPA:"):
+            section = "wpa"
+        elif line.startswith("DS Parameter set: channel") and not current["channel"]:
+            current["channel"] = line.rsplit(" ", 1)[1]
+        elif section and "Authentication suites:" in line:
+            suites = set()
+            for name in line.split(":", 1)[1].split():
+                suites.add("802.1X" if name == "IEEE" or name == "802.1X" else name)
+            suites.discard("")
+            (rsn if section == "rsn" else wpa).update(s for s in suites if s in ("PSK", "SAE", "802.1X", "OWE"))
+    finish()
+    return networks
+
+
+def find_wireless_interface():
+    """
+    Return the first wireless interface listed in /sys/class/net, or None.
+    """
+    try:
+        for name in sorted(os.listdir("/sys/class/net")):
+            if os.path.isdir(f"/sys/class/net/{name}/wireless") or os.path.exists(f"/sys/class/net/{name}/phy80211"):
+                return name
+    except OSError:
+        pass
+    return None
+
+
+class Nl80211Scanner:
+    """
+    Persistent nl80211 client that triggers scans and dumps scan results.
+    Methods block on the netlink socket; call them via asyncio.to_thread.
+    """
+    def __init__(self, ifname: str):
+        self.ifname = ifname
+        self.ifindex = socket.if_nametoindex(ifname)
+        self._seq = int(time.time()) & 0xFFFFFF
+        self.sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_GENERIC)
+        self.sock.bind((0, 0))
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 20)
+        self.family_id, groups = self._resolve_family("nl80211")
+        self.scan_group = groups.get("scan")
+        # Separate socket for scan-complete notifications so they never mix with dump replies
+        self.events = None
+        if self.scan_group is not None:
+            self.events = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_GENERIC)
+            self.events.bind((0, 0))
+            self.events.setsockopt(SOL_NETLINK, NETLINK_ADD_MEMBERSHIP, self.scan_group)
+        self.can_trigger = True
+
+    def close(self):
+        for sock in (self.sock, self.events):
+            if sock is not None:
+                sock.close()
+
+    def _next_seq(self):
+        self._seq = (self._seq + 1) & 0xFFFFFFFF
+        return self._seq
+
+    def _send(self, family, cmd, flags, attrs: bytes = b""):
+        seq = self._next_seq()
+        payload = _GENLMSGHDR.pack(cmd, 1, 0) + attrs
+        self.sock.send(_NLMSGHDR.pack(_NLMSGHDR.size + len(payload), family, flags, seq, 0) + payload)
+        return seq
+
+    def _recv_until_done(self, seq, dump: bool):
+        """
+        Collect reply buffers for `seq` until NLMSG_DONE (dumps) or an ACK.
+        Returns the concatenated raw bytes.
+        """
+        chunks = []
+        while True:
+            data = self.sock.recv(1 << 16)
+            done = False
+            for msg_type, flags, msg_seq, payload in _iter_messages(data):
+                if msg_seq != seq:
+                    continue
+                if msg_type == NLMSG_ERROR:
+                    (error,) = struct.unpack_from("=i", payload)
+                    if error:
+                        raise NetlinkError(-error, os.strerror(-error))
+                    done = True
+                elif msg_type == NLMSG_DONE or not (flags & NLM_F_MULTI) and not dump:
+                    done = True
+            chunks.append(data)
+            if done:
+                return b"".join(chunks)
+
+    def _resolve_family(self, name):
+        attrs = _attr(CTRL_ATTR_FAMILY_NAME, name.encode() + b"\0")
+        seq = self._send(GENL_ID_CTRL, CTRL_CMD_GETFAMILY, NLM_F_REQUEST | NLM_F_ACK, attrs)
+        try:
+            data = self._recv_until_done(seq, dump=False)
+        except NetlinkError as e:
+            raise NetlinkError(e.errno, f"generic netlink family {name} not available (is cfg80211 loaded?)")
+        family_id, groups = None, {}
+        for msg_type, _, _, payload in _iter_messages(data):
+            if msg_type != GENL_ID_CTRL:
+                continue
+            for attr_type, value in _iter_attrs(payload, _GENLMSGHDR.size):
+                if attr_type == CTRL_ATTR_FAMILY_ID:
+                    family_id = struct.unpack("=H", value[:2])[0]
+                elif attr_type == CTRL_ATTR_MCAST_GROUPS:
+                    for _, group in _iter_attrs(value):
+                        fields = dict(_iter_attrs(group))
+                        grp_name = fields.get(CTRL_ATTR_MCAST_GRP_NAME, b"").rstrip(b"\0").decode()
+                        if CTRL_ATTR_MCAST_GRP_ID in fields:
+                            groups[grp_name] = struct.unpack("=I", fields[CTRL_ATTR_MCAST_GRP_ID])[0]
+        if family_id is None:
+            raise NetlinkError(2, f"generic netlink family {name} not found")
+        return family_id, groups
+
+    def _drain_events(self):
+        """
+        Discard queued scan notifications, such as one left over from an
+        earlier scan or from NetworkManager / wpa_supplicant scanning.
+        """
+        while select.select([self.events], [], [], 0)[0]:
+            self.events.recv(1 << 16)
+
+    def _scan_events(self, timeout: float):
+        """
+        Yield the nl80211 command of each scan notification for this
+        interface until `timeout` expires.
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            ready, _, _ = select.select([self.events], [], [], remaining)
+            if not ready:
+                return
+            data = self.events.recv(1 << 16)
+            for msg_type, _, _, payload in _iter_messages(data):
+                if msg_type != self.family_id or not payload:
+                    continue
+                attrs = dict(_iter_attrs(payload, _GENLMSGHDR.size))
+                ifindex_attr = attrs.get(NL80211_ATTR_IFINDEX)
+                if ifindex_attr and struct.unpack("=I", ifindex_attr)[0] != self.ifindex:
+                    continue
+                yield payload[0]
+
+    def trigger_scan(self, timeout: float = 10.0) -> bool:
+        """
+        Ask the driver for a fresh scan and wait for it to finish.
+        Returns False if triggering is not permitted (needs CAP_NET_ADMIN)
+        or the scan was aborted; cached results can still be dumped.
+        """
+        if not self.can_trigger or self.events is None:
+            return False
+        ifindex = _attr(NL80211_ATTR_IFINDEX, struct.pack("=I", self.ifindex))
+        # A single wildcard SSID requests an active scan
+        ssids = _attr(NL80211_ATTR_SCAN_SSIDS | NLA_F_NESTED, _attr(1, b""))
+        self._drain_events()
+        started = False
+        try:
+            seq = self._send(self.family_id, NL80211_CMD_TRIGGER_SCAN, NLM_F_REQUEST | NLM_F_ACK, ifindex + ssids)
+            self._recv_until_done(seq, dump=False)
+        except NetlinkError as e:
+            if e.errno == 1:  # EPERM: not root, fall back to cached results
+                self.can_trigger = False
+                return False
+            if e.errno == 16:  # EBUSY: a scan is already running, wait for it to finish
+                started = True
+            else:
+                raise
+        # Results only count once our scan has started: TRIGGER_SCAN, then NEW_SCAN_RESULTS
+        for cmd in self._scan_events(timeout):
+            if cmd == NL80211_CMD_TRIGGER_SCAN:
+                started = True
+            elif started and cmd == NL80211_CMD_NEW_SCAN_RESULTS:
+                return True
+            elif started and cmd == NL80211_CMD_SCAN_ABORTED:
+                return False
+        return False
+
+    def dump_raw(self) -> bytes:
+        """
+        Dump the kernel's current scan results as raw netlink bytes.
+        """
+        ifindex = _attr(NL80211_ATTR_IFINDEX, struct.pack("=I", self.ifindex))
+        seq = self._send(self.family_id, NL80211_CMD_GET_SCAN, NLM_F_REQUEST | NLM_F_DUMP, ifindex)
+        return self._recv_until_done(seq, dump=True)
+
+    def scan(self, trigger: bool = True, timeout: float = 10.0) -> list:
+        """
+        Trigger a scan (when permitted) and return the parsed BSS list.
+        """
+        if trigger:
+            self.trigger_scan(timeout)
+        return parse_scan_dump(self.dump_raw(), self.family_id)
@@ -1,8 +1,35 @@
 """
-Simple OUI (Organizationally Unique Identifier) lookup.
+OUI (Organizationally Unique Identifier) vendor lookup.
+
+The full IEEE registries (MA-L 24-bit, MA-M 28-bit and MA-S 36-bit
+assignments) are compiled from their CSV exports into a compact binary
+index:
+
+    python -m sensors.oui oui.csv mam.csv oui36.csv -o data/oui.idx
+
+MA-M and MA-S blocks are carved out of larger assignments, so the
+compiler flattens the nested prefixes into one sorted array of
+non-overlapping 36-bit range starts with a parallel array of vendor ids
+(the most specific assignment wins) plus a deduplicated UTF-8 name table.
+A 16-bit bucket table narrows each lookup to a short binary search. The
+file is memory-mapped rather than loaded into dicts, so ~50k vendors cost
+under two megabytes of page cache and almost nothing on the Python heap.
+An LRU cache sits in front.
+
+Locally administered addresses (randomized BLE/Wi-Fi MACs) have no vendor
+and are never looked up. When no index has been loaded, lookups fall back
+to the small built-in OUI_MAP.
 """
+import argparse
+import bisect
+import csv
+import mmap
+import os
+import struct
+from functools import lru_cache
 from typing import Optional
-# Sample OUI to vendor mapping. Extend as needed.
+
+# Sample OUI to vendor mapping, used when no compiled index is loaded.
 OUI_MAP = {
     '00:14:BF': 'DJI',            # DJI drones
     'E0:91:F5': 'Parrot',         # Parrot drones
@@ -12,13 +39,271 @@ OUI_MAP = {
     'A4:5E:60': 'Google, Inc.',   # Google devices
 }
 
+DEFAULT_INDEX = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "oui.idx")
+
+MAGIC = b"SDROUI01"
+# magic, range count, vendor names, name blob bytes
+_HEADER = struct.Struct("<8sIII4x")
+PREFIX_BITS = 36  # resolution of the index: the longest (MA-S) assignment
+NO_VENDOR = 0xFFFFFFFF
+# First-level table: range index where each top-16-bit bucket starts, so the
+# binary search only covers a handful of entries
+BUCKET_SHIFT = PREFIX_BITS - 16
+_REGISTRY_BITS = {"MA-L": 24, "MA-M": 28, "MA-S": 36}
+CACHE_SIZE = 4096
+
+_index = None
+
+
+def _align8(offset: int) -> int:
+    return (offset + 7) & ~7
+
+
+def _read_registry(path: str, entries: dict):
+    """
+    Add (bits, prefix) -> vendor rows from one IEEE CSV export
+    (Registry,Assignment,Organization Name,Organization Address).
+    """
+    with open(path, newline="", encoding="utf-8", errors="replace") as f:
+        for row in csv.DictReader(f):
+            bits = _REGISTRY_BITS.get((row.get("Registry") or "").strip())
+            assignment = (row.get("Assignment") or "").strip()
+            name = (row.get("Organization Name") or "").strip()
+            if bits is None or not name or len(assignment) * 4 != bits:
+                continue
+            try:
+                entries[(bits, int(assignment, 16))] = name
+            except ValueError:
+                continue
+
+
+def _flatten(intervals):
+    """
+    Turn nested [start, end) prefix ranges into sorted (start, vendor_id)
+    boundaries where each point maps to its most specific range.
+    """
+    bounds = []
+
+    def emit(pos, vendor_id):
+        if bounds and bounds[-1][0] == pos:
+            bounds.pop()
+        if bounds and bounds[-1][1] == vendor_id:
+            return
+        if bounds or vendor_id != NO_VENDOR:
+            bounds.append((pos, vendor_id))
+
+    def close_until(pos):
+        # Pop every open range ending at or before pos; the enclosing range
+        # (or nothing) resumes where each one ends
+        while stack and stack[-1][0] <= pos:
+            end, _ = stack.pop()
+            emit(end, stack[-1][1] if stack else NO_VENDOR)
+
+    stack = []  # (end, vendor_id) of the open ranges, innermost last
+    # Outer ranges first when two start at the same address
+    for start, end, vendor_id in sorted(intervals, key=lambda r: (r[0], r[0] - r[1])):
+        close_until(start)
+        stack.append((end, vendor_id))
+        emit(start, vendor_id)
+    close_until(1 << PREFIX_BITS)
+    return bounds
+
+
+def compile_index(csv_paths, out_path: str) -> dict:
+    """
+    Compile IEEE registry CSV files into the binary index at out_path.
+    Returns counts per registry and the number of distinct vendors.
+    """
+    entries = {}
+    for path in csv_paths:
+        _read_registry(path, entries)
+
+    names = []
+    name_ids = {}
+    intervals = []
+    counts = {24: 0, 28: 0, 36: 0}
+    for (bits, prefix), name in entries.items():
+        vendor_id = name_ids.get(name)
+        if vendor_id is None:
+            vendor_id = name_ids[name] = len(names)
+            names.append(name)
+        start = prefix << (PREFIX_BITS - bits)
+        intervals.append((start, start + (1 << (PREFIX_BITS - bits)), vendor_id))
+        counts[bits] += 1
+    bounds = _flatten(intervals)
+
+    blob = bytearray()
+    offsets = [0]
+    for name in names:
+        blob += name.encode("utf-8")
+        offsets.append(len(blob))
+
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(bounds), len(names), len(blob)))
+        f.write(struct.pack(f"<{len(bounds)}Q", *(start for start, _ in bounds)))
+        f.write(struct.pack(f"<{len(bounds)}I", *(vendor_id for _, vendor_id in bounds)))
+        starts = [start for start, _ in bounds]
+        buckets = [bisect.bisect_left(starts, b << BUCKET_SHIFT) for b in range((1 << 16) + 1)]
+        f.write(struct.pack(f"<{len(buckets)}I", *buckets))
+        f.write(b"\0" * (_align8(f.tell()) - f.tell()))
+        f.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        f.write(bytes(blob))
+    os.replace(tmp_path, out_path)
+    return {"ma_l": counts[24], "ma_m": counts[28], "ma_s": counts[36], "vendors": len(names)}
+
+
+class OUIIndex:
+    """
+    Read-only view over a compiled index file.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        magic, count, n_names, blob_len = _HEADER.unpack_from(view, 0)
+        if magic != MAGIC:
+            view.release()
+            self._mmap.close()
+            raise ValueError(f"{path} is not an OUI index")
+        offset = _HEADER.size
+        self._starts = view[offset:offset + 8 * count].cast("Q")
+        offset += 8 * count
+        self._vendor_ids = view[offset:offset + 4 * count].cast("I")
+        offset += 4 * count
+        self._buckets = view[offset:offset + 4 * ((1 << 16) + 1)].cast("I")
+        offset = _align8(offset + 4 * ((1 << 16) + 1))
+        self._offsets = view[offset:offset + 4 * (n_names + 1)].cast("I")
+        offset += 4 * (n_names + 1)
+        self._blob = view[offset:offset + blob_len]
+        self._views = [view, self._starts, self._vendor_ids, self._buckets, self._offsets, self._blob]
+        self.vendors = n_names
+        self._names = [None] * n_names  # decoded lazily, once per vendor
+
+    def __len__(self):
+        return len(self._starts)
+
+    def vendor(self, vendor_id: int) -> str:
+        name = self._names[vendor_id]
+        if name is None:
+            name = self._names[vendor_id] = str(
+                self._blob[self._offsets[vendor_id]:self._offsets[vendor_id + 1]], "utf-8"
+            )
+        return name
+
+    def lookup_prefix(self, prefix36: int) -> Optional[str]:
+        """
+        Vendor of the most specific assignment covering the top 36 bits of
+        a MAC address.
+        """
+        bucket = prefix36 >> BUCKET_SHIFT
+        # A range covering prefix36 may start in an earlier bucket: that is
+        # exactly the entry just before lo, which bisect_right - 1 yields
+        i = bisect.bisect_right(
+            self._starts, prefix36, self._buckets[bucket], self._buckets[bucket + 1]
+        ) - 1
+        if i < 0:
+            return None
+        vendor_id = self._vendor_ids[i]
+        return None if vendor_id == NO_VENDOR else self.vendor(vendor_id)
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mmap.close()
+
+
+def _mac_hex(mac: str) -> Optional[str]:
+    """
+    Normalize '00:14:BF:..', '00-14-bf-..' or '0014.bf..' to upper-case hex
+    digits. Returns None for anything that is not at least a 24-bit prefix
+    (e.g. the UUIDs CoreBluetooth reports instead of addresses).
+    """
+    if not mac:
+        return None
+    digits = mac.replace(":", "").replace("-", "").replace(".", "").upper()
+    if len(digits) < 6 or len(digits) > 12:
+        return None
+    try:
+        int(digits, 16)
+    except ValueError:
+        return None
+    return digits
+
+
+def is_locally_administered(mac: str) -> bool:
+    """
+    True for locally administered (typically randomized) addresses:
+    bit 1 of the first octet is set.
+    """
+    digits = _mac_hex(mac)
+    return digits is not None and bool(int(digits[:2], 16) & 0x02)
+
+
+def load_index(path: str = None) -> bool:
+    """
+    Memory-map a compiled index (DEFAULT_INDEX if path is None).
+    Returns False and keeps the built-in OUI_MAP if the file is missing or
+    invalid.
+    """
+    global _index
+    path = path or DEFAULT_INDEX
+    try:
+        index = OUIIndex(path)
+    except (OSError, ValueError) as e:
+        print(f"OUI index not loaded ({e}); using built-in vendor map")
+        return False
+    close_index()
+    _index = index
+    print(f"Loaded OUI index {path}: {len(index)} ranges, {index.vendors} vendors")
+    return True
+
+
+def close_index():
+    """
+    Unmap the current index and fall back to the built-in map.
+    """
+    global _index
+    if _index is not None:
+        _index.close()
+        _index = None
+    lookup.cache_clear()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
 def lookup(mac: str) -> Optional[str]:
     """
     Lookup vendor by MAC address prefix (OUI).
     mac: string like '00:14:BF:xx:xx:xx'
-    Returns vendor name or None.
+    Returns vendor name or None (also for locally administered addresses).
     """
-    if not mac or len(mac) < 8:
+    digits = _mac_hex(mac)
+    if digits is None or int(digits[:2], 16) & 0x02:
         return None
-    prefix = mac.upper()[0:8]
-    return OUI_MAP.get(prefix)
\ No newline at end of file
+    if _index is not None:
+        return _index.lookup_prefix(int(digits[:9].ljust(9, "0"), 16))
+    return OUI_MAP.get(f"{digits[0:2]}:{digits[2:4]}:{digits[4:6]}")
+
+
+def cache_info():
+    return lookup.cache_info()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile IEEE OUI registry CSVs into a binary index")
+    parser.add_argument("csv", nargs="+", help="IEEE MA-L / MA-M / MA-S CSV exports")
+    parser.add_argument("-o", "--output", default=DEFAULT_INDEX, help="Index file to write")
+    args = parser.parse_args()
+    counts = compile_index(args.csv, args.output)
+    size = os.path.getsize(args.output)
+    print(
+        f"Wrote {args.output}: {counts['ma_l']} MA-L, {counts['ma_m']} MA-M, {counts['ma_s']} MA-S "
+        f"prefixes, {counts['vendors']} vendors, {size / 1024:.0f} KiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Shared async command execution for sensor plugins.
+
+Sensors shell out to system tools (system_profiler, wdutil, nmcli, ioreg, ...)
+that can take seconds to answer. Running them through asyncio subprocesses
+keeps the event loop free, and a global concurrency limit stops several slow
+scans from piling up at once. Every invocation is timed so slow tools show
+up in command_stats().
+"""
+import asyncio
+import subprocess
+import time
+
+import metrics
+
+# Maximum number of sensor commands running at the same time
+DEFAULT_CONCURRENCY = 4
+
+_concurrency = DEFAULT_CONCURRENCY
+_semaphore = None
+_stats: dict = {}
+
+COMMAND_SECONDS = metrics.histogram("sensor_command_seconds", "Sensor command run time", ["command"])
+COMMAND_FAILURES = metrics.counter(
+    "sensor_command_failures_total", "Sensor commands that failed or timed out", ["command", "reason"]
+)
+
+
+def set_concurrency(limit: int):
+    """
+    Change the maximum number of concurrently running commands.
+    Takes effect for commands started after the call.
+    """
+    global _concurrency, _semaphore
+    _concurrency = max(1, int(limit))
+    _semaphore = None
+
+
+def _get_semaphore() -> asyncio.Semaphore:
+    global _semaphore
+    if _semaphore is None:
+        _semaphore = asyncio.Semaphore(_concurrency)
+    return _semaphore
+
+
+def _command_name(cmd) -> str:
+    """
+    Name used to group stats: the tool itself, skipping any sudo prefix.
+    """
+    args = [a for a in cmd if not a.startswith("-")] if cmd and cmd[0] == "sudo" else cmd
+    if cmd and cmd[0] == "sudo" and len(args) > 1:
+        return args[1]
+    return cmd[0] if cmd else "?"
+
+
+def _record(name: str, elapsed: float, returncode, timed_out: bool = False, failed: bool = False):
+    entry = _stats.get(name)
+    if entry is None:
+        entry = _stats[name] = {
+            "calls": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "total_time": 0.0,
+            "max_time": 0.0,
+            "last_time": 0.0,
+        }
+    entry["calls"] += 1
+    entry["total_time"] += elapsed
+    entry["last_time"] = elapsed
+    entry["max_time"] = max(entry["max_time"], elapsed)
+    COMMAND_SECONDS.observe(elapsed, command=name)
+    if timed_out:
+        entry["timeouts"] += 1
+        COMMAND_FAILURES.inc(command=name, reason="timeout")
+    elif failed or returncode not in (0, None):
+        entry["errors"] += 1
+        COMMAND_FAILURES.inc(command=name, reason="error")
+
+
+def command_stats() -> dict:
+    """
+    Per-command latency statistics keyed by tool name.
+    """
+    result = {}
+    for name, entry in _stats.items():
+        stats = dict(entry)
+        stats["avg_time"] = entry["total_time"] / entry["calls"] if entry["calls"] else 0.0
+        result[name] = stats
+    return result
+
+
+async def run_command(cmd, timeout: float = 5, input: str = None) -> subprocess.CompletedProcess:
+    """
+    Run a command without blocking the event loop.
+
+    Returns a subprocess.CompletedProcess with text stdout/stderr, like
+    subprocess.run(..., capture_output=True, text=True, check=False).
+    Raises subprocess.TimeoutExpired (after killing the process) if it runs
+    longer than `timeout`, and FileNotFoundError if the tool is missing.
+    """
+    name = _command_name(cmd)
+    async with _get_semaphore():
+        start = time.monotonic()
+        try:
+            process = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.PIPE if input is not None else asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except Exception:
+            _record(name, time.monotonic() - start, None, failed=True)
+            raise
+        try:
+            stdout, stderr = await asyncio.wait_for(
+                process.communicate(input.encode() if input is not None else None),
+                timeout=timeout,
+            )
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            _record(name, time.monotonic() - start, None, timed_out=True)
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        except asyncio.CancelledError:
+            process.kill()
+            await process.wait()
+            raise
+        _record(name, time.monotonic() - start, process.returncode)
+    return subprocess.CompletedProcess(
+        list(cmd),
+        process.returncode,
+        stdout=stdout.decode(errors="replace"),
+        stderr=stderr.decode(errors="replace"),
+    )
+
+
+def run_command_sync(cmd, timeout: float = 5, input: str = None) -> subprocess.CompletedProcess:
+    """
+    Blocking variant for one-off probes made while a sensor is being
+    constructed, before it has an event loop to run on. Shares the same
+    latency statistics as run_command.
+    """
+    name = _command_name(cmd)
+    start = time.monotonic()
+    try:
+        result = subprocess.run(
+            cmd, input=input, capture_output=True, text=True, check=False, timeout=timeout
+        )
+    except subprocess.TimeoutExpired:
+        _record(name, time.monotonic() - start, None, timed_out=True)
+        raise
+    except Exception:
+        _record(name, time.monotonic() - start, None, failed=True)
+        raise
+    _record(name, time.monotonic() - start, result.returncode)
+    return result
@@ -9,10 +9,14 @@ import json
 import sys
 from datetime import datetime
 from .base import SensorPlugin
+from .runner import run_command, run_command_sync
+from .wifi_parser import find_wifi_device, parse_system_profiler, parse_wdutil_info, unique_by_ssid
+from .nl80211 import Nl80211Scanner, find_wireless_interface, parse_iw_scan
 
 class WifiSensor(SensorPlugin):
     """WiFi sensor for detecting nearby networks"""
-    
+    name = "wifi"
+
     def __init__(self, config):
         """Initialize the WiFi sensor"""
         super().__init__(config)
@@ -25,7 +29,10 @@ class WifiSensor(SensorPlugin):
         self.sudo_available = False
         self.is_mac = sys.platform == "darwin"
         self.is_linux = sys.platform.startswith("linux")
+        self.is_windows = sys.platform.startswith("win")
         self.hardware_status = "unknown"
+        self.nl80211 = None
+        self.nl80211_failed = False
         
         # Get sudo password from config or environment variable
         self.sudo_password = config.get("sudo_password", None)
@@ -44,31 +51,10 @@ class WifiSensor(SensorPlugin):
             # Find the WiFi interface
             try:
                 # Get the list of network interfaces
-                result = subprocess.run(
-                    ["networksetup", "-listallhardwareports"],
-                    capture_output=True,
-                    text=True,
-                    check=False
-                )
+                result = run_command_sync(["networksetup", "-listallhardwareports"])
                 
                 # Find the Wi-Fi interface
-                wifi_interface = None
-                for line in result.stdout.splitlines():
-                    if "Wi-Fi" in line or "AirPort" in line:
-                        # The next line should contain the interface name
-                        match = re.search(r"Device:\s*([^\s]+)", next(iter([l for l in result.stdout.splitlines() if "Device:" in l and result.stdout.splitlines().index(l) > result.stdout.splitlines().index(line)]), ""))
-                        if match:
-                            wifi_interface = match.group(1)
-                            break
-                
-                if not wifi_interface:
-                    # Try another approach - look for en0 or similar
-                    for line in result.stdout.splitlines():
-                        if "Device: en" in line:
-                            match = re.search(r"Device:\s*([^\s]+)", line)
-                            if match:
-                                wifi_interface = match.group(1)
-                                break
+                wifi_interface = find_wifi_device(result.stdout)
                 
                 self.wifi_interface = wifi_interface or "en0"  # Default to en0 if not found
                 print(f"Found Wi-Fi interface: {self.wifi_interface}")
@@ -83,13 +69,7 @@ class WifiSensor(SensorPlugin):
                     
                     # Check if sudo is available without password
                     try:
-                        sudo_test = subprocess.run(
-                            ["sudo", "-n", "echo", "test"],
-                            capture_output=True,
-                            text=True,
-                            check=False,
-                            timeout=1
-                        )
+                        sudo_test = run_command_sync(["sudo", "-n", "echo", "test"], timeout=1)
                         self.sudo_available = sudo_test.returncode == 0
                         if self.sudo_available:
                             print("Passwordless sudo available for wdutil")
@@ -106,13 +86,7 @@ class WifiSensor(SensorPlugin):
                     
                 # Check if sudo is available without password
                 try:
-                    sudo_test = subprocess.run(
-                        ["sudo", "-n", "echo", "test"],
-                        capture_output=True,
-                        text=True,
-                        check=False,
-                        timeout=1
-                    )
+                    sudo_test = run_command_sync(["sudo", "-n", "echo", "test"], timeout=1)
                     self.sudo_available = sudo_test.returncode == 0
                 except:
                     self.sudo_available = False
@@ -128,9 +102,19 @@ class WifiSensor(SensorPlugin):
                 self.scan_cmd = ["networksetup"]
                 
         elif system == "Linux":
-            # Linux implementation would go here
-            self.wifi_interface = "wlan0"  # Default
-            self.scan_cmd = ["iwlist"]
+            # Scan natively over nl80211, with `iw` as a fallback
+            detected = find_wireless_interface()
+            self.wifi_interface = self.config.get("interface") or detected or "wlan0"
+            self.scan_cmd = ["nl80211"]
+            self.hardware_status = "available" if (detected or self.config.get("interface")) else "unavailable"
+            if self.hardware_status == "unavailable":
+                self.last_error = "No wireless interface found in /sys/class/net"
+            try:
+                sudo_test = run_command_sync(["sudo", "-n", "echo", "test"], timeout=1)
+                self.sudo_available = sudo_test.returncode == 0
+            except Exception:
+                self.sudo_available = False
+            print(f"WiFi interface: {self.wifi_interface} ({self.hardware_status})")
             
         elif system == "Windows":
             # Windows implementation would go here
@@ -153,13 +137,7 @@ class WifiSensor(SensorPlugin):
             
         # First, check if WiFi is enabled
         try:
-            power_result = subprocess.run(
-                ["networksetup", "-getairportpower", self.wifi_interface],
-                capture_output=True,
-                text=True,
-                check=False,
-                timeout=2
-            )
+            power_result = await run_command(["networksetup", "-getairportpower", self.wifi_interface], timeout=2)
             print(f"WiFi power status: {power_result.stdout}")
             
             if "Off" in power_result.stdout:
@@ -175,46 +153,22 @@ class WifiSensor(SensorPlugin):
                 
                 # Try to run wdutil with sudo if needed
                 if self.sudo_available or self.sudo_password:
-                    scan_result = self._run_with_sudo(
+                    scan_result = await self._run_with_sudo(
                         ["wdutil", "info"],
                         timeout=5
                     )
                 else:
                     # Try without sudo (will likely fail)
-                    scan_result = subprocess.run(
-                        ["wdutil", "info"],
-                        capture_output=True,
-                        text=True,
-                        check=False,
-                        timeout=5
-                    )
+                    scan_result = await run_command(["wdutil", "info"], timeout=5)
                 
                 # Parse the wdutil output to find networks
                 if scan_result and scan_result.stdout:
-                    print(f"wdutil info output (truncated):\n{scan_result.stdout[:300]}...")
-                    
-                    # Look for current connected network
-                    current_ssid = None
-                    
-                    # Try to find the current network in the wdutil output
-                    for line in scan_result.stdout.splitlines():
-                        if "SSID:" in line:
-                            ssid_match = re.search(r"SSID:\s*([^\n]+)", line)
-                            if ssid_match:
-                                current_ssid = ssid_match.group(1).strip()
-                                if current_ssid and not any(n.get("ssid") == current_ssid for n in networks):
-                                    print(f"Found current network: {current_ssid}")
-                                    networks.append({
-                                        "ssid": current_ssid,
-                                        "rssi": -65,  # Estimated moderate signal
-                                        "connected": True
-                                    })
-                                    break
+                    parsed = parse_wdutil_info(scan_result.stdout)
                     
                     # Try to run a scan with wdutil scan
                     print("Running wdutil scan to find available networks...")
                     try:
-                        scan_cmd_result = self._run_with_sudo(
+                        scan_cmd_result = await self._run_with_sudo(
                             ["wdutil", "scan"],
                             timeout=5
                         )
@@ -224,140 +178,30 @@ class WifiSensor(SensorPlugin):
                         await asyncio.sleep(2)
                         
                         # Get updated info after scan
-                        info_result = self._run_with_sudo(
+                        info_result = await self._run_with_sudo(
                             ["wdutil", "info"],
                             timeout=5
                         )
-                        
                         if info_result and info_result.stdout:
-                            # Look for networks section
-                            in_networks_section = False
-                            for line in info_result.stdout.splitlines():
-                                # Look for networks section
-                                if "Networks In Range:" in line or "Scan Results:" in line:
-                                    in_networks_section = True
-                                    continue
-                                
-                                # Parse network entries in the networks section
-                                if in_networks_section and ":" in line and not line.startswith(" "):
-                                    parts = line.split(":")
-                                    if len(parts) >= 2:
-                                        ssid = parts[0].strip()
-                                        details = parts[1].strip()
-                                        
-                                        # Skip if empty SSID
-                                        if not ssid:
-                                            continue
-                                        
-                                        # Create network info
-                                        network_info = {"ssid": ssid, "rssi": -75}  # Default signal strength
-                                        
-                                        # Mark as connected if this is the current network
-                                        if current_ssid and ssid == current_ssid:
-                                            network_info["connected"] = True
-                                        
-                                        # Only add if not already in the list
-                                        if not any(n.get("ssid") == ssid for n in networks):
-                                            networks.append(network_info)
-                                            print(f"Found WiFi network: {ssid}")
+                            parsed.extend(parse_wdutil_info(info_result.stdout))
                     except Exception as e:
                         print(f"Error with wdutil scan: {e}")
+                    
+                    networks.extend(self._to_records(parsed))
             
             # Try system_profiler as a fallback
             elif self.scan_cmd[0] == "system_profiler":
                 print("Scanning for available WiFi networks using system_profiler...")
                 # Run system_profiler to get WiFi info
-                scan_result = subprocess.run(
+                scan_result = await run_command(
                     ["system_profiler", "SPAirPortDataType"],
-                    capture_output=True,
-                    text=True,
-                    check=False,
                     timeout=30  # Increased timeout to handle slow responses
                 )
                 
                 # Parse the system_profiler output
                 if scan_result and scan_result.stdout:
                     print(f"system_profiler output received, length: {len(scan_result.stdout)}")
-                    # Print full output for debugging
-                    print(f"system_profiler full output:\n{scan_result.stdout}")
-                    
-                    # Completely new approach to parsing system_profiler output
-                    # We'll use a more direct approach based on the exact output format
-                    output = scan_result.stdout
-                    
-                    # Use the approach validated by our parser test
-                    # First, find the current connected network if any
-                    lines = output.splitlines()
-                    unique_networks = set()  # Use a set to track unique network names
-                    
-                    # Check for current network
-                    in_current_section = False
-                    for i, line in enumerate(lines):
-                        if "Current Network Information:" in line:
-                            in_current_section = True
-                            print("Found 'Current Network Information' section")
-                            continue
-                        
-                        if in_current_section and line.startswith("            ") and line.strip().endswith(":"):
-                            # Make sure this is a network name, not a property
-                            if not any(prop in line for prop in ["Channel:", "Security:", "PHY Mode:", "Network Type:"]):
-                                ssid = line.strip().rstrip(':')
-                                print(f"Found current network: {ssid}")
-                                
-                                # Look for signal strength
-                                rssi = -65  # Default
-                                for j in range(i, min(i+10, len(lines))):
-                                    if "Signal / Noise:" in lines[j]:
-                                        signal_match = re.search(r"Signal / Noise:\s*(-\d+)\s*dBm", lines[j])
-                                        if signal_match:
-                                            rssi = int(signal_match.group(1))
-                                            break
-                                
-                                networks.append({
-                                    "ssid": ssid,
-                                    "rssi": rssi,
-                                    "connected": True
-                                })
-                                unique_networks.add(ssid)
-                                print(f"Added current network: {ssid} (RSSI: {rssi} dBm)")
-                                break
-                    
-                    # Now look for other networks
-                    in_other_networks = False
-                    for i, line in enumerate(lines):
-                        if "Other Local Wi-Fi Networks:" in line:
-                            in_other_networks = True
-                            print("Found 'Other Local Wi-Fi Networks' section")
-                            continue
-                        
-                        if in_other_networks and line.startswith("            ") and line.strip().endswith(":"):
-                            ssid = line.strip().rstrip(':')
-                            
-                            # Skip property lines and verify this is a network by checking for PHY Mode
-                            if not any(prop in line for prop in ["Channel:", "Security:", "PHY Mode:", "Network Type:"]):
-                                is_network = False
-                                for j in range(1, 5):
-                                    if i + j < len(lines) and "PHY Mode:" in lines[i + j]:
-                                        is_network = True
-                                        break
-                                
-                                if is_network and ssid not in unique_networks:
-                                    # Look for signal strength
-                                    rssi = -75  # Default
-                                    for j in range(i, min(i+10, len(lines))):
-                                        if "Signal / Noise:" in lines[j]:
-                                            signal_match = re.search(r"Signal / Noise:\s*(-\d+)\s*dBm", lines[j])
-                                            if signal_match:
-                                                rssi = int(signal_match.group(1))
-                                                break
-                                    
-                                    networks.append({
-                                        "ssid": ssid,
-                                        "rssi": rssi,
-                                        "connected": False
-                                    })
-                                    unique_networks.add(ssid)
-                                    print(f"Added other network: {ssid} (RSSI: {rssi} dBm)")
+                    networks.extend(self._to_records(parse_system_profiler(scan_result.stdout)))
             
             # Print a summary of networks found
             print(f"WiFi scan complete. Found {len(networks)} networks.")
@@ -384,13 +228,7 @@ class WifiSensor(SensorPlugin):
                 print("NOTICE: Using deprecated airport command as last resort to get critical network data")
                 try:
                     # Try to scan with airport command
-                    airport_result = subprocess.run(
-                        [airport_path, "-s"],
-                        capture_output=True,
-                        text=True,
-                        check=False,
-                        timeout=5
-                    )
+                    airport_result = await run_command([airport_path, "-s"], timeout=5)
                     
                     # Parse the airport scan output
                     lines = airport_result.stdout.strip().split('\n')
@@ -446,13 +284,7 @@ class WifiSensor(SensorPlugin):
             if not networks:
                 try:
                     # Try to get the current network using networksetup
-                    current_result = subprocess.run(
-                        ["networksetup", "-getairportnetwork", self.wifi_interface],
-                        capture_output=True,
-                        text=True,
-                        check=False,
-                        timeout=2
-                    )
+                    current_result = await run_command(["networksetup", "-getairportnetwork", self.wifi_interface], timeout=2)
                     
                     print(f"Current network info from networksetup: {current_result.stdout}")
                     
@@ -479,7 +311,7 @@ class WifiSensor(SensorPlugin):
             # Check if the issue might be related to permissions
             if self.scan_cmd and self.scan_cmd[0] == "wdutil" and not self.sudo_available and not self.sudo_password:
                 # Prompt for sudo password
-                if self._prompt_for_sudo_password():
+                if await self._prompt_for_sudo_password():
                     # Try scanning again with the newly provided password
                     print("Retrying WiFi scan with sudo privileges...")
                     return await self._scan_mac_wifi()
@@ -491,26 +323,14 @@ class WifiSensor(SensorPlugin):
                 
                 # Check WiFi power status
                 try:
-                    power_result = subprocess.run(
-                        ["networksetup", "-getairportpower", self.wifi_interface],
-                        capture_output=True,
-                        text=True,
-                        check=False,
-                        timeout=2
-                    )
+                    power_result = await run_command(["networksetup", "-getairportpower", self.wifi_interface], timeout=2)
                     diagnostics.append(f"WiFi Power: {power_result.stdout.strip()}")
                 except Exception as e:
                     diagnostics.append(f"Error checking WiFi power: {e}")
                 
                 # Check if interface exists
                 try:
-                    ifconfig_result = subprocess.run(
-                        ["ifconfig", self.wifi_interface],
-                        capture_output=True,
-                        text=True,
-                        check=False,
-                        timeout=2
-                    )
+                    ifconfig_result = await run_command(["ifconfig", self.wifi_interface], timeout=2)
                     if ifconfig_result.returncode == 0:
                         diagnostics.append(f"Interface {self.wifi_interface} exists")
                     else:
@@ -529,30 +349,68 @@ class WifiSensor(SensorPlugin):
         
         return success, error_msg, networks
         
+    @staticmethod
+    def _to_records(parsed):
+        """
+        Reduce parsed networks to one entry per SSID, filling in the
+        estimated RSSI the dashboard expects when the tool reported none.
+        """
+        records = []
+        for net in unique_by_ssid(parsed):
+            record = {k: v for k, v in net.items() if v is not None}
+            if record.get("rssi") is None:
+                record["rssi"] = -65 if net["connected"] else -75  # Estimated signal
+            records.append(record)
+        return records
+    
     async def _scan_linux_wifi(self):
-        """Scan for WiFi networks on Linux"""
-        # Not implemented yet
-        return False, "Linux WiFi scanning not implemented", []
+        """Scan for WiFi networks on Linux via nl80211, falling back to iw"""
+        errors = []
+        
+        # Fast path: persistent netlink socket, no process per scan
+        if self.nl80211 is None and not self.nl80211_failed:
+            try:
+                self.nl80211 = Nl80211Scanner(self.wifi_interface)
+                print(f"Using nl80211 for WiFi scanning on {self.wifi_interface}")
+            except Exception as e:
+                self.nl80211_failed = True
+                print(f"nl80211 unavailable, falling back to iw: {e}")
+        if self.nl80211 is not None:
+            try:
+                # An empty list is a successful scan with nothing in range
+                return True, None, await asyncio.to_thread(self.nl80211.scan)
+            except Exception as e:
+                errors.append(f"nl80211 scan error: {e}")
+        
+        # Fallback when the scanner itself fails: parse `iw` output
+        # (a fresh scan needs root, `scan dump` does not)
+        if shutil.which("iw"):
+            for cmd in (["iw", "dev", self.wifi_interface, "scan"],
+                        ["iw", "dev", self.wifi_interface, "scan", "dump"]):
+                # _run_with_sudo reports errors, timeouts included, as a failed result
+                result = await self._run_with_sudo(cmd, timeout=15)
+                if result.returncode != 0:
+                    errors.append(f"{' '.join(cmd)} failed: {result.stderr.strip()}")
+                    continue
+                return True, None, parse_iw_scan(result.stdout)
+        else:
+            errors.append("iw not installed")
+        
+        return False, "WiFi scan failed: " + "; ".join(errors), []
     
     async def _scan_windows_wifi(self):
         """Scan for WiFi networks on Windows"""
         # Not implemented yet
         return False, "Windows WiFi scanning not implemented", []
     
-    def _prompt_for_sudo_password(self):
+    async def _prompt_for_sudo_password(self):
         """Prompt the user for sudo password if needed"""
         if self.sudo_password:
             return True
         
         # Check if passwordless sudo is available
         try:
-            sudo_test = subprocess.run(
-                ["sudo", "-n", "echo", "test"],
-                capture_output=True,
-                text=True,
-                check=False,
-                timeout=1
-            )
+            sudo_test = await run_command(["sudo", "-n", "echo", "test"], timeout=1)
             if sudo_test.returncode == 0:
                 self.sudo_available = True
                 print("Passwordless sudo is available")
@@ -565,48 +423,26 @@ class WifiSensor(SensorPlugin):
             # Use getpass to securely prompt for password
             import getpass
             print("\nWiFi scanning with wdutil requires sudo privileges.")
-            self.sudo_password = getpass.getpass("Enter sudo password: ")
+            self.sudo_password = await asyncio.to_thread(getpass.getpass, "Enter sudo password: ")
             return True if self.sudo_password else False
         except Exception as e:
             print(f"Error prompting for sudo password: {e}")
             return False
     
-    def _run_with_sudo(self, cmd, timeout=5):
+    async def _run_with_sudo(self, cmd, timeout=5):
         """Run a command with sudo privileges"""
         try:
             if self.sudo_password:
                 # Use the provided sudo password
                 sudo_cmd = ["sudo", "-S"] + cmd
-                process = subprocess.Popen(
-                    sudo_cmd,
-                    stdin=subprocess.PIPE,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
-                    text=True
-                )
-                stdout, stderr = process.communicate(input=f"{self.sudo_password}\n", timeout=timeout)
-                return subprocess.CompletedProcess(
-                    sudo_cmd, process.returncode, stdout=stdout, stderr=stderr
-                )
+                return await run_command(sudo_cmd, timeout=timeout, input=f"{self.sudo_password}\n")
             elif self.sudo_available:
                 # Use passwordless sudo
                 sudo_cmd = ["sudo", "-n"] + cmd
-                return subprocess.run(
-                    sudo_cmd,
-                    capture_output=True,
-                    text=True,
-                    check=False,
-                    timeout=timeout
-                )
+                return await run_command(sudo_cmd, timeout=timeout)
             else:
                 # No sudo available, run without sudo
-                return subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    check=False,
-                    timeout=timeout
-                )
+                return await run_command(cmd, timeout=timeout)
         except Exception as e:
             print(f"Error running command: {e}")
             return subprocess.CompletedProcess(cmd, 1, stdout="", stderr=str(e))
@@ -615,7 +451,11 @@ class WifiSensor(SensorPlugin):
         """Start the WiFi sensor"""
         self._running = True
         interval = self.config.get("interval", 5)
+        max_backoff = self.config.get("max_backoff", 300)
         sudo_prompt_shown = False
+        # After a failed scan, retry with exponential backoff instead of giving up
+        failures = 0
+        retry_at = 0.0
         
         while self._running:
             networks = []
@@ -626,19 +466,21 @@ class WifiSensor(SensorPlugin):
             if self.is_mac and self.scan_cmd and self.scan_cmd[0] == "wdutil" and not self.sudo_available and not self.sudo_password and not sudo_prompt_shown:
                 # Prompt for sudo password
                 sudo_prompt_shown = True
-                if self._prompt_for_sudo_password():
+                if await self._prompt_for_sudo_password():
                     print("Sudo password obtained. WiFi scanning will use elevated privileges.")
                 else:
                     print("No sudo password provided. WiFi scanning may be limited.")
             
-            # Only try to scan if hardware is available
-            if self.hardware_status == "available":
-                if self.is_mac:
-                    success, error_msg, networks = await self._scan_mac_wifi()
-                elif self.is_linux:
-                    success, error_msg, networks = await self._scan_linux_wifi()
-                elif self.is_windows:
-                    success, error_msg, networks = await self._scan_windows_wifi()
+            # Only try to scan if hardware is available, or is due a retry after an error
+            if self.hardware_status == "available" or (
+                    self.hardware_status == "error" and time.monotonic() >= retry_at):
+                with self.scan_timer():
+                    if self.is_mac:
+                        success, error_msg, networks = await self._scan_mac_wifi()
+                    elif self.is_linux:
+                        success, error_msg, networks = await self._scan_linux_wifi()
+                    elif self.is_windows:
+                        success, error_msg, networks = await self._scan_windows_wifi()
                 
                 # Update hardware status based on success/failure
                 if not success:
@@ -647,9 +489,12 @@ class WifiSensor(SensorPlugin):
                         self.hardware_status = "off"
                     else:
                         self.hardware_status = "error"
+                        failures += 1
+                        retry_at = time.monotonic() + min(interval * 2 ** (failures - 1), max_backoff)
                 else:
                     self.hardware_status = "available"
                     self.last_error = None
+                    failures = 0
             else:
                 # Hardware already marked as unavailable
                 error_msg = self.last_error
@@ -669,8 +514,12 @@ class WifiSensor(SensorPlugin):
             self.last_success = success
             self.last_error = error_msg
             
-            await queue.put(data)
+            await self.emit(queue, data)
             await asyncio.sleep(interval)
+        
+        if self.nl80211 is not None:
+            self.nl80211.close()
+            self.nl80211 = None
     
     def get_record(self):
         """Get a record of the current WiFi status"""
@@ -1,5 +1,4 @@
 import asyncio
-import subprocess
 import re
 import os
 import shutil
@@ -7,6 +6,8 @@ import platform
 import time
 import json
 from datetime import datetime
+from .runner import run_command, run_command_sync
+from .wifi_parser import find_wifi_device, parse_system_profiler, parse_wdutil_info, unique_by_ssid
 
 class WifiSensor:
     """WiFi sensor for detecting nearby networks"""
@@ -32,35 +33,10 @@ class WifiSensor:
             # Find the WiFi interface
             try:
                 # Get the list of network interfaces
-                result = subprocess.run(
-                    ["networksetup", "-listallhardwareports"],
-                    capture_output=True,
-                    text=True,
-                    check=False
-                )
+                result = run_command_sync(["networksetup", "-listallhardwareports"])
                 
                 # Find the Wi-Fi interface
-                wifi_interface = None
-                for line in result.stdout.splitlines():
-                    if "Wi-Fi" in line or "AirPort" in line:
-                        # The next line should contain the interface name
-                        for next_line in result.stdout.splitlines()[result.stdout.splitlines().index(line)+1:]:
-                            if "Device:" in next_line:
-                                match = re.search(r"Device:\s*([^\s]+)", next_line)
-                                if match:
-                                    wifi_interface = match.group(1)
-                                    break
-                        if wifi_interface:
-                            break
-                
-                if not wifi_interface:
-                    # Try another approach - look for en0 or similar
-                    for line in result.stdout.splitlines():
-                        if "Device: en" in line:
-                            match = re.search(r"Device:\s*([^\s]+)", line)
-                            if match:
-                                wifi_interface = match.group(1)
-                                break
+                wifi_interface = find_wifi_device(result.stdout)
                 
                 self.wifi_interface = wifi_interface or "en0"  # Default to en0 if not found
                 print(f"Found Wi-Fi interface: {self.wifi_interface}")
@@ -78,13 +54,7 @@ class WifiSensor:
                     
                 # Check if sudo is available without password
                 try:
-                    sudo_test = subprocess.run(
-                        ["sudo", "-n", "echo", "test"],
-                        capture_output=True,
-                        text=True,
-                        check=False,
-                        timeout=1
-                    )
+                    sudo_test = run_command_sync(["sudo", "-n", "echo", "test"], timeout=1)
                     self.sudo_available = sudo_test.returncode == 0
                 except:
                     self.sudo_available = False
@@ -125,13 +95,7 @@ class WifiSensor:
         
         # First, check if WiFi is enabled
         try:
-            power_result = subprocess.run(
-                ["networksetup", "-getairportpower", self.wifi_interface],
-                capture_output=True,
-                text=True,
-                check=False,
-                timeout=2
-            )
+            power_result = await run_command(["networksetup", "-getairportpower", self.wifi_interface], timeout=2)
             print(f"WiFi power status: {power_result.stdout}")
             
             if "Off" in power_result.stdout:
@@ -144,13 +108,7 @@ class WifiSensor:
         current_network = None
         try:
             # Get current network using networksetup
-            current_result = subprocess.run(
-                ["networksetup", "-getairportnetwork", self.wifi_interface],
-                capture_output=True,
-                text=True,
-                check=False,
-                timeout=2
-            )
+            current_result = await run_command(["networksetup", "-getairportnetwork", self.wifi_interface], timeout=2)
             
             print(f"Current network info:\n{current_result.stdout}")
             
@@ -183,67 +141,12 @@ class WifiSensor:
                     )
                 else:
                     print("WARNING: wdutil requires sudo privileges. Falling back to other methods.")
-                    scan_result = subprocess.run(
-                        ["wdutil", "info"],
-                        capture_output=True,
-                        text=True,
-                        check=False,
-                        timeout=5
-                    )
+                    scan_result = await run_command(["wdutil", "info"], timeout=5)
                 
                 # Check if we got any output
                 if scan_result.stdout.strip():
-                    print(f"wdutil info output (truncated):\n{scan_result.stdout[:300]}...")
-                    
                     # Parse the wdutil output to find networks
-                    scan_section = False
-                    for line in scan_result.stdout.splitlines():
-                        # Look for current network
-                        if "SSID:" in line and not scan_section:
-                            ssid_match = re.search(r"SSID:\s*([^\n]+)", line)
-                            if ssid_match and not any(n.get("ssid") == ssid_match.group(1).strip() for n in networks):
-                                current_ssid = ssid_match.group(1).strip()
-                                print(f"Found current network: {current_ssid}")
-                                networks.append({
-                                    "ssid": current_ssid,
-                                    "rssi": -65,  # Estimated moderate signal
-                                    "connected": True
-                                })
-                        
-                        # Look for scan results section
-                        if "Scan Results:" in line:
-                            scan_section = True
-                            continue
-                            
-                        if scan_section and line.strip() and ":" in line:
-                            # Parse network info
-                            parts = line.strip().split(":")
-                            if len(parts) >= 2:
-                                ssid = parts[0].strip()
-                                details = parts[1].strip()
-                                
-                                # Extract RSSI if available
-                                rssi_match = re.search(r"RSSI=(-?\d+)", details)
-                                rssi = int(rssi_match.group(1)) if rssi_match else -75
-                                
-                                # Extract channel if available
-                                channel_match = re.search(r"channel=(\d+)", details)
-                                channel = channel_match.group(1) if channel_match else None
-                                
-                                # Create network info
-                                network_info = {"ssid": ssid, "rssi": rssi}
-                                
-                                if channel:
-                                    network_info["channel"] = channel
-                                    
-                                # Mark as connected if this is the current network
-                                if current_network and ssid == current_network:
-                                    network_info["connected"] = True
-                                
-                                # Only add if not already in the list
-                                if not any(n.get("ssid") == ssid for n in networks):
-                                    networks.append(network_info)
-                                    print(f"Found WiFi network: {ssid} (RSSI: {rssi} dBm)")
+                    self._merge_networks(networks, parse_wdutil_info(scan_result.stdout))
                     
                     # If we found networks, return them
                     if networks:
@@ -259,14 +162,7 @@ class WifiSensor:
                             )
                         else:
                             print("WARNING: wdutil scan requires sudo privileges. Falling back to other methods.")
-                            scan_cmd_result = subprocess.run(
-                                ["wdutil", "scan"],
-                                capture_output=True,
-                                text=True,
-                                check=False,
-                                timeout=5
-                            )
-                        print(f"wdutil scan output:\n{scan_cmd_result.stdout}")
+                            scan_cmd_result = await run_command(["wdutil", "scan"], timeout=5)
                         
                         # Wait a moment for scan to complete
                         await asyncio.sleep(2)
@@ -278,39 +174,10 @@ class WifiSensor:
                                 timeout=5
                             )
                         else:
-                            info_result = subprocess.run(
-                                ["wdutil", "info"],
-                                capture_output=True,
-                                text=True,
-                                check=False,
-                                timeout=5
-                            )
+                            info_result = await run_command(["wdutil", "info"], timeout=5)
                         
                         # Parse the scan results
-                        scan_section = False
-                        for line in info_result.stdout.splitlines():
-                            if "Scan Results:" in line:
-                                scan_section = True
-                                continue
-                                
-                            if scan_section and line.strip() and ":" in line:
-                                # Parse network info
-                                parts = line.strip().split(":")
-                                if len(parts) >= 2:
-                                    ssid = parts[0].strip()
-                                    details = parts[1].strip()
-                                    
-                                    # Extract RSSI if available
-                                    rssi_match = re.search(r"RSSI=(-?\d+)", details)
-                                    rssi = int(rssi_match.group(1)) if rssi_match else -75
-                                    
-                                    # Create network info
-                                    network_info = {"ssid": ssid, "rssi": rssi}
-                                    
-                                    # Only add if not already in the list
-                                    if not any(n.get("ssid") == ssid for n in networks):
-                                        networks.append(network_info)
-                                        print(f"Found WiFi network: {ssid} (RSSI: {rssi} dBm)")
+                        self._merge_networks(networks, parse_wdutil_info(info_result.stdout))
                         
                         if networks:
                             return True, None, networks
@@ -325,87 +192,10 @@ class WifiSensor:
             print("Scanning for available WiFi networks using system_profiler...")
             try:
                 # Use system_profiler to get WiFi information
-                scan_result = subprocess.run(
-                    ["system_profiler", "SPAirPortDataType"],
-                    capture_output=True,
-                    text=True,
-                    check=False,
-                    timeout=5
-                )
-                
-                print(f"System profiler output (truncated):\n{scan_result.stdout[:300]}...")
+                scan_result = await run_command(["system_profiler", "SPAirPortDataType"], timeout=5)
                 
                 # Parse system_profiler output
-                in_wifi_section = False
-                in_networks_section = False
-                current_network_info = {}
-                network_info = {}
-                
-                for line in scan_result.stdout.splitlines():
-                    line = line.strip()
-                    
-                    # Check for Wi-Fi section
-                    if "Wi-Fi" in line and not in_wifi_section:
-                        in_wifi_section = True
-                        continue
-                        
-                    if not in_wifi_section:
-                        continue
-                        
-                    # Check for current network
-                    if "Current Network Information" in line:
-                        in_networks_section = True
-                        continue
-                        
-                    # Check for other visible networks
-                    if "Other Networks Information" in line:
-                        # Save current network if we have one
-                        if current_network and current_network_info:
-                            current_network_info["connected"] = True
-                            if not any(n.get("ssid") == current_network for n in networks):
-                                networks.append(current_network_info)
-                                print(f"Found connected WiFi network: {current_network}")
-                        
-                        current_network_info = {}
-                        continue
-                        
-                    # Parse network information
-                    if in_networks_section and ":" in line:
-                        key, value = line.split(":", 1)
-                        key = key.strip()
-                        value = value.strip()
-                        
-                        if key == "SSID":
-                            # If we were processing a network, add it to the list
-                            if network_info and "ssid" in network_info:
-                                if not any(n.get("ssid") == network_info["ssid"] for n in networks):
-                                    networks.append(network_info)
-                                    print(f"Found WiFi network: {network_info['ssid']}")
-                            
-                            # Start a new network
-                            network_info = {"ssid": value}
-                            
-                            # If this is the first network and we're in the Current Network section
-                            if "Current Network Information" in scan_result.stdout and not current_network_info:
-                                current_network = value
-                                current_network_info = network_info
-                        elif key == "Signal Strength" and "ssid" in network_info:
-                            # Convert signal strength to RSSI (approximate)
-                            if "High" in value:
-                                network_info["rssi"] = -50
-                            elif "Medium" in value:
-                                network_info["rssi"] = -70
-                            else:
-                                network_info["rssi"] = -85
-                        elif key == "Channel" and "ssid" in network_info:
-                            network_info["channel"] = value
-                        elif key == "Security" and "ssid" in network_info:
-                            network_info["security"] = value
-                
-                # Add the last network if we have one
-                if network_info and "ssid" in network_info and not any(n.get("ssid") == network_info["ssid"] for n in networks):
-                    networks.append(network_info)
-                    print(f"Found WiFi network: {network_info['ssid']}")
+                self._merge_networks(networks, parse_system_profiler(scan_result.stdout))
                 
                 if networks:
                     return True, None, networks
@@ -426,6 +216,19 @@ class WifiSensor:
         
         return success, error_msg, networks
         
+    @staticmethod
+    def _merge_networks(networks, parsed):
+        """Append parsed networks whose SSID is not already in the list"""
+        seen = {n.get("ssid") for n in networks}
+        for net in unique_by_ssid(parsed):
+            if net["ssid"] in seen:
+                continue
+            network_info = {k: v for k, v in net.items() if v is not None}
+            if "rssi" not in network_info:
+                network_info["rssi"] = -65 if net["connected"] else -75  # Estimated signal
+            networks.append(network_info)
+            seen.add(net["ssid"])
+    
     async def _scan_linux_wifi(self):
         """Scan for WiFi networks on Linux"""
         # Not implemented yet
@@ -441,13 +244,7 @@ class WifiSensor:
         if self.sudo_available:
             sudo_cmd = ["sudo", "-n"] + cmd
             try:
-                result = subprocess.run(
-                    sudo_cmd,
-                    capture_output=True,
-                    text=True,
-                    check=False,
-                    timeout=timeout
-                )
+                result = await run_command(sudo_cmd, timeout=timeout)
                 return result
             except Exception as e:
                 print(f"Error running command with sudo: {e}")
@@ -456,13 +253,7 @@ class WifiSensor:
         
         # Run without sudo
         try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                check=False,
-                timeout=timeout
-            )
+            result = await run_command(cmd, timeout=timeout)
             return result
         except Exception as e:
             print(f"Error running command: {e}")
@@ -0,0 +1,238 @@
+"""
+Single-pass parsers for macOS Wi-Fi tool output.
+
+parse_system_profiler() handles `system_profiler SPAirPortDataType` and
+parse_wdutil_info() handles `wdutil info`. Both walk the text once with a
+small state machine (no lookahead windows, no repeated splitlines) and return
+structured network dicts:
+
+    {"ssid", "connected", "channel", "band", "width", "security",
+     "phy_mode", "network_type", "rssi", "noise"}
+
+Fields that the tool did not report are None. Callers decide how to fill
+gaps; the parsers never invent values.
+"""
+import re
+
+CURRENT_SECTION = "Current Network Information:"
+OTHER_SECTION = "Other Local Wi-Fi Networks:"
+
+# "21 (6GHz, 80MHz)", "157 (5GHz, 20MHz)", "6 (2GHz)"
+_PROFILER_CHANNEL = re.compile(r"(\d+)\s*(?:\((\d+(?:\.\d+)?GHz)?(?:,\s*(\d+MHz))?\))?")
+# wdutil: "6g21/80", "5g36/80", "2g6/20", or "36 (5GHz, 80MHz)"
+_WDUTIL_CHANNEL = re.compile(r"(\d)g(\d+)(?:/(\d+))?")
+_DBM = re.compile(r"(-?\d+)\s*dBm")
+# wdutil scan entries: "name: RSSI=-60 channel=36 ..."
+_SCAN_RSSI = re.compile(r"RSSI=(-?\d+)")
+_SCAN_CHANNEL = re.compile(r"channel=(\d+)")
+
+
+def _new_network(ssid, connected):
+    return {
+        "ssid": ssid,
+        "connected": connected,
+        "channel": None,
+        "band": None,
+        "width": None,
+        "security": None,
+        "phy_mode": None,
+        "network_type": None,
+        "rssi": None,
+        "noise": None,
+    }
+
+
+# Properties copied verbatim into the network dict
+_PROFILER_TEXT_FIELDS = {
+    "Security": "security",
+    "PHY Mode": "phy_mode",
+    "Network Type": "network_type",
+}
+
+
+def _apply_profiler_property(net, key, value):
+    field = _PROFILER_TEXT_FIELDS.get(key)
+    if field is not None:
+        net[field] = value
+    elif key == "Channel":
+        match = _PROFILER_CHANNEL.match(value)
+        if match:
+            net["channel"], net["band"], net["width"] = match.groups()
+    elif key == "Signal / Noise":
+        levels = _DBM.findall(value)
+        if levels:
+            net["rssi"] = int(levels[0])
+        if len(levels) > 1:
+            net["noise"] = int(levels[1])
+
+
+def parse_system_profiler(text: str) -> list:
+    """
+    Parse `system_profiler SPAirPortDataType` output in a single pass.
+    Returns every network entry in order of appearance (the connected
+    network first when present), including repeated SSIDs on other channels.
+    """
+    networks = []
+    section = None          # None, "current" or "other"
+    section_indent = -1
+    name_indent = None      # indentation of SSID lines inside the section
+    net = None
+
+    for line in text.splitlines():
+        stripped = line.lstrip(" ")
+        if not stripped:
+            continue
+        indent = len(line) - len(stripped)
+        stripped = stripped.rstrip()
+
+        if section is None or indent <= section_indent:
+            section = None
+            if stripped == CURRENT_SECTION:
+                section = "current"
+            elif stripped == OTHER_SECTION:
+                section = "other"
+            else:
+                continue
+            section_indent = indent
+            name_indent = None
+            net = None
+            continue
+
+        if name_indent is None:
+            name_indent = indent
+
+        if indent <= name_indent:
+            # A property directly under the section (e.g. awdl0 status) is not a network
+            net = None
+            if stripped.endswith(":"):
+                net = _new_network(stripped[:-1], section == "current")
+                networks.append(net)
+            continue
+
+        if net is not None:
+            key, sep, value = stripped.partition(":")
+            if sep:
+                _apply_profiler_property(net, key, value.strip())
+
+    # Names without any properties are sub-headings, not networks
+    return [n for n in networks if n["phy_mode"] or n["channel"] or n["security"] or n["rssi"] is not None]
+
+
+def _apply_wdutil_channel(net, value):
+    match = _WDUTIL_CHANNEL.search(value)
+    if match:
+        net["channel"] = match.group(2)
+        net["band"] = f"{match.group(1)}GHz"
+        net["width"] = f"{match.group(3)}MHz" if match.group(3) else None
+        return
+    _apply_profiler_property(net, "Channel", value)
+
+
+def parse_wdutil_info(text: str) -> list:
+    """
+    Parse `wdutil info` output in a single pass.
+    The WIFI block describes the connected network; any "Scan Results:" or
+    "Networks In Range:" block contributes one entry per line.
+    """
+    networks = []
+    current = None
+    in_wifi = False
+    in_scan = False
+
+    for line in text.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.startswith("—") or stripped.startswith("--"):
+            continue
+        if stripped.isupper() and ":" not in stripped:
+            # Block header: WIFI, BLUETOOTH, NETWORK, ...
+            in_wifi = stripped == "WIFI"
+            in_scan = False
+            continue
+        if stripped in ("Scan Results:", "Networks In Range:"):
+            in_scan = True
+            continue
+
+        key, sep, value = stripped.partition(":")
+        if not sep:
+            continue
+        key = key.strip()
+        value = value.strip()
+
+        if in_scan:
+            if not key:
+                continue
+            entry = _new_network(key, False)
+            rssi = _SCAN_RSSI.search(value)
+            if rssi:
+                entry["rssi"] = int(rssi.group(1))
+            channel = _SCAN_CHANNEL.search(value)
+            if channel:
+                entry["channel"] = channel.group(1)
+            if current is not None and key == current["ssid"]:
+                entry["connected"] = True
+            networks.append(entry)
+            continue
+
+        if not in_wifi:
+            continue
+        if key == "SSID":
+            if value and value.lower() not in ("none", "<redacted>"):
+                current = _new_network(value, True)
+                networks.insert(0, current)
+        elif current is None:
+            continue
+        elif key == "RSSI":
+            level = _DBM.search(value)
+            if level:
+                current["rssi"] = int(level.group(1))
+        elif key == "Noise":
+            level = _DBM.search(value)
+            if level:
+                current["noise"] = int(level.group(1))
+        elif key == "Channel":
+            _apply_wdutil_channel(current, value)
+        elif key == "Security":
+            current["security"] = value
+        elif key == "PHY Mode":
+            current["phy_mode"] = value
+
+    return networks
+
+
+def unique_by_ssid(networks: list) -> list:
+    """
+    Keep the first entry for each SSID (the connected network wins because
+    parsers emit it first).
+    """
+    seen = set()
+    unique = []
+    for net in networks:
+        ssid = net.get("ssid")
+        if not ssid or ssid in seen:
+            continue
+        seen.add(ssid)
+        unique.append(net)
+    return unique
+
+
+def find_wifi_device(text: str):
+    """
+    Find the Wi-Fi interface in `networksetup -listallhardwareports` output.
+    Returns the device of the Wi-Fi/AirPort port, else the first en* device,
+    else None.
+    """
+    wifi_port = False
+    first_en = None
+    for line in text.splitlines():
+        if line.startswith("Hardware Port:"):
+            wifi_port = "Wi-Fi" in line or "AirPort" in line
+            continue
+        if line.startswith("Device:"):
+            device = line.split(":", 1)[1].strip()
+            if wifi_port and device:
+                return device
+            if first_en is None and device.startswith("en"):
+                first_en = device
+    return first_en
@@ -0,0 +1,259 @@
+import asyncio
+import inspect
+import json
+import time
+
+import metrics
+from change_gate import DEVICE_FIELDS, DEVICE_LISTS
+from llm_client import SUMMARY_INSTRUCTION, summary_error
+from prompts import estimate_tokens
+
+SUMMARY_SECONDS = metrics.histogram("llm_summary_seconds", "Time spent per summary stage", ["stage"])
+SUMMARY_CHUNKS = metrics.histogram(
+    "llm_summary_chunks", "Prompts sent per summary", buckets=(1, 2, 4, 8, 16, 32)
+)
+
+ROLLUP_NOTE = (
+    "The data below is a rollup of the monitoring window, not raw records: `window` gives its span, "
+    "`sensors` per-sensor scan counts and min/mean/max of numeric readings, `devices` one entry per "
+    "device with first/last seen, min/mean/max RSSI, how many scans saw it and how often it appeared or "
+    "disappeared between scans, and `events` the alerts raised with their counts. "
+    "It may be one part of a larger rollup; report only what this part shows."
+)
+LEVELS = {"info": 0, "warning": 1, "critical": 2}
+# Descriptive device fields carried into the rollup (latest value wins)
+DEVICE_ATTRS = tuple(f for f in DEVICE_FIELDS if f not in ("rssi", "deauths"))
+
+
+def _device_key(device: dict, fields):
+    for field in fields:
+        if device.get(field):
+            return device[field]
+    return None
+
+
+def _numeric_fields(record: dict, prefix: str = ""):
+    """
+    Numeric readings of a record, one level of nesting flattened
+    (accel.x, totals.deauths, ...).
+    """
+    for key, value in record.items():
+        if key in ("timestamp", "sensor") or isinstance(value, bool):
+            continue
+        if isinstance(value, (int, float)):
+            yield prefix + key, value
+        elif isinstance(value, dict) and not prefix:
+            yield from _numeric_fields(value, f"{key}.")
+
+
+def _stats(values) -> dict:
+    return {"min": min(values), "mean": round(sum(values) / len(values), 2), "max": max(values)}
+
+
+def rollup(records: list) -> dict:
+    """
+    Deterministic rollup of buffered records: per-sensor reading ranges,
+    per-device presence and RSSI, and deduplicated alert events.
+    """
+    scans = {}
+    events = {}
+    timestamps = []
+    for record in records:
+        ts = record.get("timestamp")
+        if isinstance(ts, (int, float)):
+            timestamps.append(ts)
+        if "sensor" in record:
+            scans.setdefault(record["sensor"], []).append(record)
+        elif "description" in record:
+            key = (record.get("type"), record.get("description"))
+            event = events.setdefault(key, {"type": key[0], "description": key[1], "count": 0,
+                                            "first_seen": ts, "last_seen": ts})
+            event["count"] += 1
+            event["last_seen"] = ts
+    sensors = {}
+    devices = []
+    for sensor, sensor_records in sorted(scans.items()):
+        sensor_records.sort(key=lambda r: r.get("timestamp") or 0)
+        readings = {}
+        for record in sensor_records:
+            for field, value in _numeric_fields(record):
+                readings.setdefault(field, []).append(value)
+        sensors[sensor] = {"scans": len(sensor_records), **{f: _stats(v) for f, v in sorted(readings.items())}}
+        if sensor in DEVICE_LISTS:
+            devices.extend(_device_rollup(sensor, sensor_records))
+    return {
+        "window": {
+            "start": min(timestamps) if timestamps else None,
+            "end": max(timestamps) if timestamps else None,
+            "records": len(records),
+        },
+        "sensors": sensors,
+        "devices": devices,
+        "events": list(events.values()),
+    }
+
+
+def slim(record: dict) -> dict:
+    """
+    Copy of a record reduced to what rollup() reads: scalar fields,
+    numeric readings one level down, and device lists with only identity,
+    RSSI and descriptive fields.
+    """
+    device_field, id_fields = DEVICE_LISTS.get(record.get("sensor"), (None, ()))
+    keep = id_fields + ("rssi",) + DEVICE_ATTRS
+    slimmed = {}
+    for key, value in record.items():
+        if value is None:
+            continue
+        if key == device_field and isinstance(value, list):
+            slimmed[key] = [
+                {k: device[k] for k in keep if device.get(k) is not None}
+                for device in value if isinstance(device, dict)
+            ]
+        elif isinstance(value, (str, int, float)):
+            slimmed[key] = value
+        elif isinstance(value, dict):
+            readings = {k: v for k, v in value.items() if isinstance(v, (int, float)) and not isinstance(v, bool)}
+            if readings:
+                slimmed[key] = readings
+    return slimmed
+
+
+def _device_rollup(sensor: str, sensor_records: list) -> list:
+    field, id_fields = DEVICE_LISTS[sensor]
+    table = {}
+    previous = set()
+    for index, record in enumerate(sensor_records):
+        ts = record.get("timestamp")
+        present = set()
+        for device in record.get(field) or []:
+            if not isinstance(device, dict):
+                continue
+            key = _device_key(device, id_fields)
+            if key is None or key in present:
+                continue
+            present.add(key)
+            entry = table.get(key)
+            if entry is None:
+                entry = table[key] = {"sensor": sensor, "id": key, "first_seen": ts, "rssi": [],
+                                      "seen": 0, "appeared": 0, "disappeared": 0}
+            entry["last_seen"] = ts
+            entry["seen"] += 1
+            if index and key not in previous:
+                entry["appeared"] += 1
+            if isinstance(device.get("rssi"), (int, float)):
+                entry["rssi"].append(device["rssi"])
+            for attr in DEVICE_ATTRS:
+                if device.get(attr) is not None and attr not in id_fields[:1]:
+                    entry[attr] = device[attr]
+        for key in previous - present:
+            table[key]["disappeared"] += 1
+        previous = present
+    devices = []
+    for entry in table.values():
+        rssi = entry.pop("rssi")
+        if rssi:
+            entry.update({f"rssi_{k}": v for k, v in _stats(rssi).items()})
+        devices.append(entry)
+    return devices
+
+
+def _priority(device: dict):
+    # Devices that came and went, then the strongest, are kept when the rollup is cut
+    return (device["appeared"] + device["disappeared"] > 0, device.get("rssi_max", -200))
+
+
+def chunks(summary: dict, max_tokens: int = 3000, max_chunks: int = 8) -> list:
+    """
+    Split a rollup into parts of about `max_tokens` estimated tokens each.
+    Every part carries the window and per-sensor overview; devices and
+    events are packed in priority order. Beyond `max_chunks` parts the
+    lowest-priority devices are left out and counted in `omitted_devices`.
+    """
+    head = {"window": summary["window"], "sensors": summary["sensors"]}
+    base = estimate_tokens(json.dumps(head, separators=(",", ":"), default=str))
+    budget = max(1, max_tokens - base)
+    items = [("events", e) for e in summary["events"]]
+    items += [("devices", d) for d in sorted(summary["devices"], key=_priority, reverse=True)]
+    parts = []
+    current, used = None, 0
+    for index, (kind, item) in enumerate(items):
+        cost = estimate_tokens(json.dumps(item, separators=(",", ":"), default=str))
+        if current is None or (used + cost > budget and used):
+            if len(parts) == max_chunks:
+                omitted = sum(1 for k, _ in items[index:] if k == "devices")
+                for part in parts:
+                    part["omitted_devices"] = omitted
+                break
+            current = {**head, "devices": [], "events": []}
+            parts.append(current)
+            used = 0
+        current[kind].append(item)
+        used += cost
+    return parts or [{**head, "devices": [], "events": []}]
+
+
+def _event_key(event: dict):
+    return (event.get("type"), event.get("sensor"), tuple(sorted(map(str, event.get("affected_devices") or []))))
+
+
+def merge(results: list) -> dict:
+    """
+    Combine partial summaries into one event list: repeated events are
+    folded together and events are ordered by level, most severe first.
+    """
+    merged = {}
+    for result in results:
+        for event in (result or {}).get("events") or []:
+            if not isinstance(event, dict):
+                continue
+            key = _event_key(event)
+            kept = merged.get(key)
+            if kept is None or LEVELS.get(event.get("level"), 0) > LEVELS.get(kept.get("level"), 0):
+                merged[key] = dict(event)
+    events = sorted(
+        merged.values(),
+        key=lambda e: (-LEVELS.get(e.get("level"), 0), e.get("timestamp") or 0),
+    )
+    return {"events": events}
+
+
+class MapReduceSummarizer:
+    """
+    Summarizes a window of records with bounded prompt sizes.
+
+    Records are rolled up deterministically (rollup()), the rollup is
+    split into token-budgeted parts (chunks()), at most `parallel` parts
+    are summarized at once and the partial event lists are merged. Since
+    the rollup has one entry per device rather than per reading, and the
+    number of parts is capped, summary time no longer grows with the
+    window's record count. summarize_fn(records, model, instruction) may
+    be a plain function (run on a worker thread) or a coroutine function.
+    """
+    def __init__(self, summarize_fn, config: dict = None):
+        config = config or {}
+        self.summarize_fn = summarize_fn
+        self.chunk_tokens = max(256, int(config.get("chunk_tokens", 3000)))
+        self.max_chunks = max(1, int(config.get("max_chunks", 8)))
+        self.parallel = max(1, int(config.get("parallel", 4)))
+        self.instruction = f"{SUMMARY_INSTRUCTION}\n\n{ROLLUP_NOTE}"
+
+    async def _summarize_part(self, part, model, slots):
+        async with slots:
+            if inspect.iscoroutinefunction(self.summarize_fn):
+                return await self.summarize_fn(part, model, self.instruction)
+            return await asyncio.to_thread(self.summarize_fn, part, model, self.instruction)
+
+    async def summarize(self, records: list, model: str) -> dict:
+        with SUMMARY_SECONDS.time(stage="rollup"):
+            parts = chunks(rollup(records), self.chunk_tokens, self.max_chunks)
+        SUMMARY_CHUNKS.observe(len(parts))
+        slots = asyncio.Semaphore(self.parallel)
+        start = time.perf_counter()
+        results = await asyncio.gather(
+            *(self._summarize_part(part, model, slots) for part in parts), return_exceptions=True
+        )
+        SUMMARY_SECONDS.observe(time.perf_counter() - start, stage="map")
+        results = [summary_error(str(r)) if isinstance(r, Exception) else r for r in results]
+        with SUMMARY_SECONDS.time(stage="reduce"):
+            return merge(results)
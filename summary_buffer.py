@@ -0,0 +1,116 @@
+import collections
+import sys
+import time
+
+import metrics
+from summarizer import slim
+
+BUFFER_BYTES = metrics.gauge("summary_buffer_bytes", "Approximate memory held by the summary buffer")
+BUFFER_ENTRIES = metrics.gauge("summary_buffer_entries", "Records held by the summary buffer", ["sensor"])
+BUFFER_THINNED = metrics.counter(
+    "summary_buffer_thinned_total", "Entries removed from the summary buffer", ["sensor", "reason"]
+)
+
+# High-rate sensors whose older samples are thinned to every Nth one;
+# other sensors keep the latest scan of each pair of older scans
+SAMPLE_SENSORS = ("imu", "netio")
+# Alert and analysis entries are buffered under this key
+EVENTS = "events"
+
+
+def deep_size(value) -> int:
+    """
+    Approximate memory used by a JSON-like value and everything it holds.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(deep_size(k) + deep_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple)):
+        size += sum(deep_size(v) for v in value)
+    return size
+
+
+class SummaryBuffer:
+    """
+    Bounded, time-windowed buffer of records for periodic summaries.
+
+    Entries are kept per sensor (alert entries under "events") and expire
+    `window` seconds after they were added. When a sensor holds more than its capacity
+    (`capacities.<sensor>`, else `capacity`), the older half of its entries
+    is downsampled instead of dropped: IMU and netio samples keep every
+    `sample_stride`-th one, scans keep the later of each pair. Records are
+    stored slimmed to the fields the summary rollup uses, and the buffer
+    tracks the approximate bytes it holds.
+    """
+    def __init__(self, config: dict = None, window: float = 300):
+        config = config or {}
+        self.window = float(config.get("window", window))
+        self.capacity = max(2, int(config.get("capacity", 600)))
+        self.capacities = {k: max(2, int(v)) for k, v in (config.get("capacities", {}) or {}).items()}
+        self.sample_stride = max(2, int(config.get("sample_stride", 2)))
+        self._entries = {}
+        self.bytes = 0
+        self.downsampled = 0
+        self.expired = 0
+        BUFFER_BYTES.set_function(lambda: self.bytes)
+
+    def __len__(self) -> int:
+        return sum(len(entries) for entries in self._entries.values())
+
+    def append(self, record: dict, now: float = None):
+        now = time.time() if now is None else now
+        key = record.get("sensor") or EVENTS
+        record = slim(record)
+        size = deep_size(record)
+        entries = self._entries.get(key)
+        if entries is None:
+            entries = self._entries[key] = collections.deque()
+            BUFFER_ENTRIES.set_function(lambda: len(entries), sensor=key)
+        entries.append((now, size, record))
+        self.bytes += size
+        self._expire(now)
+        if len(entries) > self.capacities.get(key, self.capacity):
+            self._downsample(key, entries)
+
+    def drain(self, now: float = None) -> list:
+        """
+        Remove and return every buffered record, oldest first.
+        """
+        self._expire(time.time() if now is None else now)
+        merged = sorted(
+            (entry for entries in self._entries.values() for entry in entries), key=lambda e: e[0]
+        )
+        for entries in self._entries.values():
+            entries.clear()
+        self.bytes = 0
+        return [record for _, _, record in merged]
+
+    def stats(self) -> dict:
+        return {
+            "entries": {key: len(entries) for key, entries in self._entries.items()},
+            "bytes": self.bytes,
+            "downsampled": self.downsampled,
+            "expired": self.expired,
+        }
+
+    def _expire(self, now: float):
+        cutoff = now - self.window
+        for key, entries in self._entries.items():
+            while entries and entries[0][0] < cutoff:
+                self.bytes -= entries.popleft()[1]
+                self.expired += 1
+                BUFFER_THINNED.inc(sensor=key, reason="expired")
+
+    def _downsample(self, key: str, entries: collections.deque):
+        half = len(entries) // 2
+        older = [entries.popleft() for _ in range(half)]
+        if key in SAMPLE_SENSORS:
+            kept = older[::self.sample_stride]
+        else:
+            # The later of each pair, so the newest older scan always survives
+            kept = older[1::2] + ([older[-1]] if len(older) % 2 else [])
+        removed = len(older) - len(kept)
+        self.bytes -= sum(size for _, size, _ in older) - sum(size for _, size, _ in kept)
+        self.downsampled += removed
+        BUFFER_THINNED.inc(removed, sensor=key, reason="downsampled")
+        entries.extendleft(reversed(kept))
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Tests for the BLE per-address device table
+"""
+
+from types import SimpleNamespace
+
+from sensors.bluetooth import BLEDeviceTable, BluetoothSensor
+
+
+def test_update_tracks_rssi_and_counts():
+    table = BLEDeviceTable(alpha=0.5, ttl=60)
+    table.update("AA:BB", "Watch", -60, now=100)
+    table.update("AA:BB", None, -80, now=101)
+    table.update("CC:DD", None, -50, now=102)
+    devices = {d["address"]: d for d in table.snapshot(now=103)}
+    watch = devices["AA:BB"]
+    assert watch["name"] == "Watch"
+    assert watch["rssi"] == -80
+    assert watch["rssi_avg"] == -70.0
+    assert watch["adverts"] == 2
+    assert (watch["first_seen"], watch["last_seen"]) == (100, 101)
+    assert devices["CC:DD"]["name"] == "Unknown"
+    assert table.adverts == 0
+
+
+def test_expire_and_eviction():
+    table = BLEDeviceTable(ttl=10, max_devices=2)
+    table.update("A", None, -60, now=0)
+    table.update("B", None, -60, now=5)
+    table.update("A", None, -60, now=6)   # A is now most recently seen
+    table.update("C", None, -60, now=7)   # full: evicts B
+    assert list(table.devices) == ["A", "C"]
+    assert [d["address"] for d in table.snapshot(now=16.5)] == ["C"]
+
+
+def test_callback_feeds_table():
+    sensor = BluetoothSensor({"interval": 5})
+    device = SimpleNamespace(address="11:22", name=None)
+    sensor._on_advertisement(device, SimpleNamespace(rssi=-55, local_name="Pixel 8"))
+    sensor._on_advertisement(device, SimpleNamespace(rssi=None, local_name=None))
+    entry = sensor.table.devices["11:22"]
+    assert entry["name"] == "Pixel 8"
+    assert entry["rssi"] == -85  # estimated when the advert carries no RSSI
+    assert entry["adverts"] == 2
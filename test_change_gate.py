@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Tests for the per-sensor change-detection gate in front of LLM analysis
+"""
+
+from change_gate import ChangeGate
+
+
+def _bt(*devices, status="available"):
+    return {
+        "sensor": "bluetooth",
+        "timestamp": 1000.0,
+        "devices": [{"address": a, "name": n, "rssi": r} for a, n, r in devices],
+        "hardware_status": status,
+    }
+
+
+def test_device_set_and_rssi_hysteresis():
+    gate = ChangeGate({"rssi_hysteresis": 10, "absence": 2, "heartbeat": 0})
+    assert gate.check(_bt(("AA", "Watch", -60)), now=0)["gate"] == "baseline"
+    assert gate.check(_bt(("AA", "Watch", -65)), now=1) is None  # inside hysteresis
+    diff = gate.check(_bt(("AA", "Watch", -69), ("BB", "Drone", -40)), now=2)
+    assert diff["change"]["added"] == [{"address": "BB", "name": "Drone", "rssi": -40}]
+    assert "rssi_shift" not in diff["change"] and "devices" not in diff
+    diff = gate.check(_bt(("AA", "Watch", -72), ("BB", "Drone", -40)), now=3)
+    assert diff["change"]["rssi_shift"] == [{"id": "AA", "from": -60, "to": -72}]
+    assert gate.check(_bt(("AA", "Watch", -72)), now=4) is None  # BB missing once
+    assert gate.check(_bt(("AA", "Watch", -72)), now=5)["change"]["removed"] == ["BB"]
+    assert gate.check(_bt(("AA", "Watch", -72), status="error"), now=6)["change"] == {"hardware_status": "error"}
+    assert gate.stats()["suppressed"] == {"bluetooth": 2}
+
+
+def test_imu_excursions_and_heartbeat():
+    gate = ChangeGate({"accel_threshold": 0.5, "heartbeat": 60})
+
+    def imu(z, gyro=0.0):
+        return {"sensor": "imu", "accel": {"x": 0, "y": 0, "z": z}, "gyro": {"x": 0, "y": 0, "z": gyro}}
+
+    assert gate.check(imu(9.8), now=0) is not None
+    assert all(gate.check(imu(9.8 + d), now=1) is None for d in (0.1, -0.2, 0.05))
+    assert gate.check(imu(11.0), now=2)["change"]["accel_magnitude"] == 11.0
+    assert gate.check(imu(9.8, gyro=1.0), now=3)["change"]["gyro_magnitude"] == 1.0
+    assert gate.check(imu(9.8), now=70)["gate"] == "heartbeat"
+
+
+def test_dot11_deauth_flood_with_unchanged_bssids():
+    gate = ChangeGate({"deauth_threshold": 10, "rate_change": 0.5, "heartbeat": 0})
+
+    def dot11(deauths, frames=400):
+        return {"sensor": "dot11", "frames": frames, "deauths": deauths, "hardware_status": "available",
+                "bssids": [{"bssid": "02:00:00:00:00:01", "ssid": "ops-net", "rssi": -50, "deauths": 0}]}
+
+    assert gate.check(dot11(0), now=0)["gate"] == "baseline"
+    assert gate.check(dot11(3), now=1) is None  # background noise
+    diff = gate.check(dot11(500, frames=900), now=2)
+    assert diff["change"] == {"deauths": {"from": 3, "to": 500, "frames": 900}}
+    assert gate.check(dot11(600), now=3) is None  # same flood, within rate_change
+    assert gate.check(dot11(2000), now=4)["change"]["deauths"]["from"] == 500
+    assert gate.check(dot11(0), now=5)["change"]["deauths"] == {"from": 2000, "to": 0, "frames": 400}
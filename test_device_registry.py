@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Tests for the TTL/LRU device registry
+"""
+
+import json
+import os
+import tempfile
+
+from device_registry import DeviceEntry, DeviceRegistry
+
+
+def test_novelty_ttl_and_sighting_counts():
+    registry = DeviceRegistry({"ttl": 100, "randomized_ttl": 10})
+    assert registry.observe("wifi", "Office", now=0) is True
+    assert registry.observe("wifi", "Office", now=50) is False
+    assert registry.observe("bluetooth", "AA", now=50, vendor="Apple", name="Watch") is True
+    assert registry.observe("bluetooth", "AA", now=60) is False
+    entry = registry.get("bluetooth", "AA")
+    assert (entry.first_seen, entry.last_seen, entry.count, entry.vendor, entry.name) == (50, 60, 2, "Apple", "Watch")
+    # A randomized address expires quickly; a stable one only after the full TTL
+    assert registry.observe("bluetooth", "7A", now=60, randomized=True) is True
+    assert registry.observe("bluetooth", "7A", now=75, randomized=True) is True
+    assert registry.observe("wifi", "Office", now=149) is False
+    assert registry.observe("wifi", "Office", now=250) is True
+    assert registry.get("wifi", "Office").count == 1
+    assert not hasattr(DeviceEntry(0, 0), "__dict__")
+
+
+def test_lru_cap_and_device_listing():
+    registry = DeviceRegistry({"max_entries": 3, "ttl": 1000})
+    for n, addr in enumerate(["A", "B", "C"]):
+        registry.observe("bluetooth", addr, now=n)
+    registry.observe("bluetooth", "A", now=3)
+    registry.observe("bluetooth", "D", now=4)
+    assert registry.stats() == {"bluetooth": 3}
+    assert registry.get("bluetooth", "B") is None
+    registry.observe("wifi", "Net", now=5)
+    listed = registry.devices(limit=3, now=5)
+    assert [(d["kind"], d["id"]) for d in listed] == [("wifi", "Net"), ("bluetooth", "D"), ("bluetooth", "A")]
+    assert [d["id"] for d in registry.devices("bluetooth", now=5)] == ["D", "A", "C"]
+
+
+def test_checkpoint_round_trip():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state", "devices.json")
+        registry = DeviceRegistry({"path": path, "ttl": 100, "randomized_ttl": 10})
+        registry.observe("wifi", "Old", now=0)
+        registry.observe("wifi", "Office", now=80)
+        registry.observe("bluetooth", "7A", now=85, randomized=True)
+        registry.observe("bluetooth", "AA", now=90, vendor="Apple")
+        registry.save()
+        restored = DeviceRegistry({"path": path, "ttl": 100, "randomized_ttl": 10})
+        assert restored.load(now=120) == 2
+        assert restored.get("wifi", "Old") is None and restored.get("bluetooth", "7A") is None
+        assert restored.get("bluetooth", "AA").vendor == "Apple"
+        assert restored.observe("wifi", "Office", now=121) is False
+
+
+def test_load_skips_malformed_entries():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "devices.json")
+        with open(path, "w") as f:
+            json.dump({"tables": {
+                "wifi": [["Office", 80, 90, 3, None, None], ["Short", 80, 90], None, [["list"], 80, 90, 1, None, None]],
+                "bluetooth": [["AA", 80, "late", 1, "Apple", None], ["BB", 85, 95, 2, "Apple", "Watch"]],
+                "ble": {"not": "rows"},
+            }}, f)
+        registry = DeviceRegistry({"path": path, "ttl": 100})
+        assert registry.load(now=120) == 2
+        assert registry.get("wifi", "Office").count == 3 and registry.get("bluetooth", "BB").name == "Watch"
+        # Not the checkpoint format at all
+        with open(path, "w") as f:
+            json.dump([["Office", 80, 90, 3, None, None]], f)
+        assert DeviceRegistry({"path": path}).load(now=120) == 0
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Tests for the passive 802.11 capture aggregator and pcap replay
+"""
+
+import asyncio
+import os
+import tempfile
+
+from scapy.layers.dot11 import (
+    Dot11, Dot11Beacon, Dot11Deauth, Dot11Elt, Dot11ProbeReq, RadioTap,
+)
+from scapy.utils import PcapWriter
+
+from sensors.dot11 import Dot11Aggregator, Dot11Sensor, replay_pcap
+
+AP = "02:00:00:00:00:01"
+CLIENT = "02:10:00:00:00:07"
+
+
+def _beacon(rssi, ssid=b"ops-net", channel=6):
+    return (RadioTap(present="dBm_AntSignal", dBm_AntSignal=rssi)
+            / Dot11(type=0, subtype=8, addr1="ff:ff:ff:ff:ff:ff", addr2=AP, addr3=AP)
+            / Dot11Beacon(cap="ESS+privacy")
+            / Dot11Elt(ID=0, info=ssid) / Dot11Elt(ID=3, info=bytes([channel])))
+
+
+def _frames():
+    return [
+        _beacon(-40),
+        _beacon(-50),
+        RadioTap(present="dBm_AntSignal", dBm_AntSignal=-70)
+        / Dot11(type=0, subtype=4, addr1="ff:ff:ff:ff:ff:ff", addr2=CLIENT, addr3="ff:ff:ff:ff:ff:ff")
+        / Dot11ProbeReq() / Dot11Elt(ID=0, info=b"home-wifi"),
+        RadioTap() / Dot11(type=0, subtype=12, addr1=CLIENT, addr2=AP, addr3=AP) / Dot11Deauth(reason=7),
+        # Data frame: must be ignored
+        RadioTap() / Dot11(type=2, subtype=0, addr1=AP, addr2=CLIENT, addr3=AP),
+    ]
+
+
+def _write_pcap(frames):
+    tmp = tempfile.NamedTemporaryFile(suffix=".pcap", delete=False)
+    tmp.close()
+    with PcapWriter(tmp.name, linktype=127) as writer:
+        for frame in frames:
+            writer.write(frame)
+    return tmp.name
+
+
+def test_aggregates_per_bssid():
+    agg = Dot11Aggregator()
+    handled = [agg.handle_packet(f) for f in _frames()]
+    assert handled == [True, True, True, True, False]
+    snap = agg.snapshot()
+    assert (snap["frames"], snap["beacons"], snap["probe_requests"], snap["deauths"]) == (4, 2, 1, 1)
+    assert len(snap["bssids"]) == 1
+    bss = snap["bssids"][0]
+    assert bss["bssid"] == AP
+    assert (bss["ssid"], bss["channel"]) == ("ops-net", 6)
+    assert (bss["rssi"], bss["rssi_avg"], bss["rssi_max"]) == (-50, -45.0, -40)
+    assert (bss["beacons"], bss["deauths"]) == (2, 1)
+    assert snap["probes"] == [{"mac": CLIENT, "ssids": ["home-wifi"], "count": 1, "rssi": -70}]
+    # Snapshot resets the interval
+    assert agg.snapshot()["frames"] == 0
+
+
+def test_handles_fcs_and_bare_dot11():
+    agg = Dot11Aggregator()
+    with_fcs = bytes(RadioTap(present="Flags", Flags="FCS") / _beacon(-40)[Dot11]) + b"\x00\x00\x00\x00"
+    assert agg.handle(with_fcs)
+    assert agg.handle(bytes(_beacon(-40)[Dot11]), radiotap=False)
+    assert not agg.handle(b"\x00\x00\x08\x00")
+    snap = agg.snapshot()
+    assert snap["beacons"] == 2
+    assert snap["bssids"][0]["ssid"] == "ops-net"
+
+
+def test_table_cap():
+    agg = Dot11Aggregator(max_bssids=2)
+    for i in range(5):
+        agg.add(8, f"02:00:00:00:00:{i:02x}", f"02:00:00:00:00:{i:02x}", "x", 1, -60)
+    snap = agg.snapshot()
+    assert snap["beacons"] == 5
+    assert len(snap["bssids"]) == 2
+
+
+def test_replay_pcap():
+    path = _write_pcap(_frames() * 10)
+    try:
+        agg = Dot11Aggregator()
+        stats = replay_pcap(path, agg)
+        assert (stats["frames"], stats["matched"]) == (50, 40)
+        assert stats["frames_per_second"] > 0
+        assert agg.snapshot()["beacons"] == 20
+    finally:
+        os.unlink(path)
+
+
+def test_sensor_replay_emits_record():
+    path = _write_pcap(_frames())
+    try:
+        sensor = Dot11Sensor({"pcap": path, "interval": 1})
+        queue = asyncio.Queue()
+        asyncio.run(asyncio.wait_for(sensor.start(queue), 10))
+        record = queue.get_nowait()
+        while not queue.empty():
+            record = queue.get_nowait()
+        assert record["sensor"] == "dot11"
+        assert record["hardware_status"] == "available"
+        assert record["replay"]["frames"] == 5
+        assert record["bssids"][0]["bssid"] == AP
+    finally:
+        os.unlink(path)
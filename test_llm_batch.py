@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for micro-batched LLM analysis
+"""
+
+import asyncio
+import json
+
+from llm_client import batch_prompt, parse_batch_analysis
+from llm_pool import LLMWorkerPool
+
+
+def _verdict(reason):
+    return {"anomaly": False, "reason": reason, "threat_level": "low", "recommendation": "none"}
+
+
+def test_batch_prompt_and_parse():
+    prompt = batch_prompt([(1, {"sensor": "imu"}), (2, {"sensor": "wifi"})])
+    assert '"verdicts"' in prompt and '{"id":2,"record":{"sensor":"wifi"}}' in prompt
+    assert "For IMU data" in prompt and "For WiFi data" in prompt and "For Bluetooth data" not in prompt
+    text = json.dumps({"verdicts": [dict(_verdict("b"), id=2), dict(_verdict("x"), id=9), {"id": 1}]})
+    verdicts = parse_batch_analysis(text, [1, 2])
+    assert verdicts[2]["reason"] == "b" and "id" not in verdicts[2]
+    assert verdicts[1]["reason"].startswith("LLM analysis failed")
+    assert set(verdicts) == {1, 2}
+
+
+def test_pool_batches_and_maps_results():
+    batches = []
+    results = {}
+
+    async def analyze_batch(items, model):
+        batches.append([record["n"] for _, record in items])
+        return {i: _verdict(f"record {record['n']}") for i, record in items}
+
+    async def analyze(record, model):
+        batches.append([record["n"]])
+        return _verdict(f"record {record['n']}")
+
+    async def run():
+        pool = LLMWorkerPool(
+            "m", {"workers": 1, "batch": {"enabled": True, "window": 0.05, "max_records": 4}},
+            on_result=lambda record, analysis, ctx: results.__setitem__(ctx, analysis["reason"]),
+            analyze_fn=analyze, analyze_batch_fn=analyze_batch,
+        )
+        pool.start()
+        for n in range(5):
+            pool.submit({"sensor": "imu", "n": n}, context=f"id-{n}")
+        await asyncio.sleep(0.3)
+        pool.submit({"sensor": "imu", "n": 5, "pad": "x" * 20000}, context="id-5")
+        pool.submit({"sensor": "imu", "n": 6}, context="id-6")
+        await asyncio.sleep(0.3)
+        await pool.stop()
+        return pool.stats()
+
+    stats = asyncio.run(run())
+    # Five records in one window: a full batch of four, then the remainder alone;
+    # the oversized record exceeds the token budget and is analysed on its own
+    assert batches == [[0, 1, 2, 3], [4], [5], [6]]
+    assert results == {f"id-{n}": f"record {n}" for n in range(7)}
+    assert stats["batches"] == 1 and stats["completed"] == 7
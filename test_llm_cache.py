@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the fingerprinted LLM analysis cache
+"""
+
+import asyncio
+import os
+import tempfile
+
+from llm_cache import AnalysisCache, fingerprint
+from llm_pool import LLMWorkerPool
+
+OK = {"anomaly": False, "reason": "nothing unusual", "threat_level": "low", "recommendation": "none"}
+
+
+def _scan(ts, rssi_a, rssi_b, order=1):
+    networks = [
+        {"ssid": "Office", "bssid": "aa:aa", "rssi": rssi_a, "channel": 6},
+        {"ssid": "Guest", "bssid": "bb:bb", "rssi": rssi_b, "channel": 11, "security": None},
+    ]
+    return {"sensor": "wifi", "timestamp": ts, "networks": networks[::order], "hardware_status": "available"}
+
+
+def test_fingerprint_normalization():
+    base = fingerprint(_scan(1000.0, -61, -72), "m")
+    # Timestamps, list order and RSSI jitter inside a 5 dB band do not matter
+    assert fingerprint(_scan(2000.0, -64, -71, order=-1), "m") == base
+    assert fingerprint(_scan(1000.0, -66, -72), "m") != base  # crossed into the next band
+    assert fingerprint(_scan(1000.0, -61, -72), "other-model") != base
+    added = _scan(1000.0, -61, -72)
+    added["networks"].append({"ssid": "Rogue", "bssid": "cc:cc", "rssi": -40})
+    assert fingerprint(added, "m") != base
+
+
+def test_lru_ttl_and_persistence():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "cache.json")
+        cache = AnalysisCache({"max_entries": 2, "ttl": 10, "path": path})
+        cache.put("a", OK, now=0)
+        cache.put("b", OK, now=0)
+        assert cache.get("a", now=1) == OK  # a becomes most recently used
+        cache.put("c", OK, now=1)
+        assert cache.get("b", now=1) is None
+        assert cache.get("a", now=11) is None  # expired
+        cache.put("failed", {"anomaly": False, "reason": "LLM analysis failed: timeout"})
+        assert cache.get("failed") is None
+        assert (cache.hits, cache.misses, cache.evictions, cache.expired) == (1, 3, 1, 1)
+        cache.put("d", OK)
+        cache.save()
+        restored = AnalysisCache({"path": path})
+        assert restored.load() == 1
+        assert restored.get("d") == OK
+
+
+def test_pool_serves_repeats_from_cache():
+    calls = []
+    results = []
+
+    def fake_analyze(record, model):
+        calls.append(record["timestamp"])
+        return dict(OK)
+
+    async def run():
+        pool = LLMWorkerPool("m", {"workers": 1, "cache": {"enabled": True}}, analyze_fn=fake_analyze,
+                             on_result=lambda record, analysis, ctx: results.append(analysis))
+        pool.start()
+        for i, rssi in enumerate((-61, -63, -62, -80)):
+            pool.submit(_scan(1000.0 + i, rssi, -72))
+            await asyncio.sleep(0.05)
+        await pool.stop()
+        return pool.stats()
+
+    stats = asyncio.run(run())
+    assert calls == [1000.0, 1003.0]
+    assert [bool(a.get("cached")) for a in results] == [False, True, True, False]
+    assert stats["cache"]["hits"] == 2 and stats["completed"] == 4
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Tests for the two-tier LLM triage cascade
+"""
+
+import asyncio
+import json
+
+from llm_cascade import TriageCascade, rule_score
+from mock_ollama import MockOllama
+from ollama_client import OllamaClient
+from sensors.dot11 import SUBTYPE_DEAUTH, Dot11Sensor
+
+QUIET = {"sensor": "bluetooth", "devices": [{"address": "AA", "name": "Phone", "rssi": -80}]}
+DRONE = {"sensor": "bluetooth", "devices": [{"address": "BB", "name": "DJI Mavic", "rssi": -70}]}
+
+
+def _verdict(reason):
+    return {"anomaly": True, "reason": reason, "threat_level": "high", "recommendation": "investigate"}
+
+
+def test_rule_score():
+    assert rule_score(QUIET) == (0.0, [])
+    score, reasons = rule_score(DRONE)
+    assert score >= 0.8 and "drone-like device DJI Mavic" in reasons
+    twin = {"sensor": "wifi", "networks": [
+        {"ssid": "Corp", "security": "WPA2 Personal", "rssi": -70},
+        {"ssid": "Corp", "security": "Open", "rssi": -70},
+    ]}
+    score, reasons = rule_score(twin)
+    assert score > 0.7 and any("different security" in r for r in reasons)
+    assert rule_score({"sensor": "imu", "accel": {"x": 0, "y": 0, "z": 1.0}, "gyro": {"x": 0, "y": 0, "z": 0}})[0] == 0
+    assert rule_score({"sensor": "imu", "accel": {"x": 0, "y": 0, "z": 9.8}, "gyro": {"x": 2, "y": 0, "z": 0}})[0] >= 0.5
+    sensor = Dot11Sensor({"interface": "wlan0mon"})
+    for _ in range(50):
+        sensor.aggregator.add(SUBTYPE_DEAUTH, "02:00:00:00:00:01", "02:00:00:00:00:01")
+    score, reasons = rule_score(sensor._record())
+    assert score >= 0.8 and "50 deauthentication frames" in reasons
+
+
+def test_rules_screen_escalates_only_suspicious_records():
+    calls = []
+
+    async def analyze(record, model):
+        calls.append(record)
+        return _verdict("drone")
+
+    async def analyze_batch(items, model):
+        calls.append([i for i, _ in items])
+        return {i: _verdict(f"batch {i}") for i, _ in items}
+
+    async def run():
+        cascade = TriageCascade({"threshold": 0.5}, analyze_fn=analyze, analyze_batch_fn=analyze_batch)
+        quiet = await cascade.analyze(QUIET, "m")
+        drone = await cascade.analyze(DRONE, "m")
+        batch = await cascade.analyze_batch([(1, QUIET), (2, DRONE), (3, DRONE)], "m")
+        return cascade, quiet, drone, batch
+
+    cascade, quiet, drone, batch = asyncio.run(run())
+    assert quiet["anomaly"] is False and quiet["details"] == {"tier": "screen", "screen_score": 0.0}
+    assert drone["reason"] == "drone" and drone["details"]["tier"] == "full"
+    assert calls == [DRONE, [2, 3]]
+    assert batch[1]["details"]["tier"] == "screen" and batch[3]["reason"] == "batch 3"
+    stats = cascade.stats()
+    assert stats["escalated"] == 3 and stats["screened_out"] == 2
+    assert stats["escalation_rate"] == 0.6 and stats["tiers"]["full"]["calls"] == 3
+
+
+def test_model_screen_with_rules_floor_and_fail_open():
+    def responder(payload):
+        if payload["model"] == "small":
+            return json.dumps({"score": 0.9 if "Watch" in payload["prompt"] else 0.1, "reason": "small model"})
+        return json.dumps(_verdict("heavy"))
+
+    async def run():
+        mock = MockOllama(responder)
+        port = await mock.start()
+        client = OllamaClient({"url": f"http://127.0.0.1:{port}"})
+        cascade = TriageCascade(
+            {"screen": "model", "screen_model": "small"}, client, analyze_fn=client.analyze
+        )
+        watch = {"sensor": "bluetooth", "devices": [{"address": "CC", "name": "Watch", "rssi": -80}]}
+        results = [await cascade.analyze(r, "heavy") for r in (QUIET, watch, DRONE)]
+        mock.healthy = False
+        failed = await cascade.score(QUIET)
+        await client.close()
+        await mock.close()
+        return cascade, results, failed, [r["model"] for r in mock.requests]
+
+    cascade, (quiet, watch, drone), failed, models = asyncio.run(run())
+    assert quiet["details"]["tier"] == "screen" and "small model" in quiet["reason"]
+    assert watch["reason"] == "heavy" and watch["details"]["screen_score"] == 0.9
+    # The small model scored the drone low; the rule score still escalates it
+    assert drone["reason"] == "heavy"
+    assert models == ["small", "small", "heavy", "small", "heavy", "small"]
+    assert failed[0] == 1.0 and cascade.screen_failures == 1
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded LLM worker pool (no Ollama required)
+"""
+
+import asyncio
+import time
+
+from llm_pool import LLMWorkerPool
+
+
+def _slow_analyze(delay):
+    def analyze(record, model):
+        time.sleep(delay)
+        return {"anomaly": False, "reason": f"seen {record['n']}"}
+    return analyze
+
+
+def test_concurrency_is_bounded():
+    async def run():
+        results = []
+        pool = LLMWorkerPool("m", {"workers": 3}, analyze_fn=_slow_analyze(0.2),
+                             on_result=lambda rec, analysis, ctx: results.append(ctx))
+        pool.start()
+        start = time.monotonic()
+        for n in range(6):
+            pool.submit({"sensor": "wifi", "n": n}, n)
+        while len(results) < 6:
+            await asyncio.sleep(0.01)
+        elapsed = time.monotonic() - start
+        await pool.stop()
+        return results, elapsed, pool.stats()
+
+    results, elapsed, stats = asyncio.run(run())
+    assert sorted(results) == list(range(6))
+    # Two rounds of three parallel requests
+    assert 0.35 < elapsed < 1.0
+    assert stats["completed"] == 6
+    assert stats["queue_depth"] == 0
+
+
+def test_stale_records_are_downgraded():
+    async def run():
+        results = []
+        conf = {"workers": 1, "deadline": 0.05, "stale_policy": "downgrade"}
+        pool = LLMWorkerPool("m", conf, analyze_fn=_slow_analyze(0.2),
+                             on_result=lambda rec, analysis, ctx: results.append((ctx, analysis)))
+        pool.start()
+        for n in range(3):
+            pool.submit({"sensor": "imu", "n": n}, n)
+        await asyncio.sleep(0.5)
+        await pool.stop()
+        return results, pool.stats()
+
+    results, stats = asyncio.run(run())
+    analysed = [ctx for ctx, analysis in results if not analysis.get("downgraded")]
+    downgraded = [ctx for ctx, analysis in results if analysis.get("downgraded")]
+    assert analysed == [0]
+    assert sorted(downgraded) == [1, 2]
+    assert stats["dropped_stale"] == 2
+
+
+def test_overflow_sheds_latest_deadline():
+    async def run():
+        conf = {"workers": 1, "max_queue": 2, "deadlines": {"imu": 1, "wifi": 60}}
+        pool = LLMWorkerPool("m", conf, analyze_fn=_slow_analyze(0))
+        # Not started: everything stays queued
+        accepted = [
+            pool.submit({"sensor": "wifi", "n": 0}),
+            pool.submit({"sensor": "imu", "n": 1}),
+            pool.submit({"sensor": "imu", "n": 2}),
+        ]
+        return accepted, pool.stats()
+
+    accepted, stats = asyncio.run(run())
+    assert accepted == [True, True, True]
+    assert stats["dropped_overflow"] == 1
+    assert stats["queue_depth"] == 2
+
+
+if __name__ == "__main__":
+    test_concurrency_is_bounded()
+    test_stale_records_are_downgraded()
+    test_overflow_sheds_latest_deadline()
+    print("All LLM pool tests passed")
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Tests for the Prometheus-style metrics registry and sensor instrumentation
+"""
+
+import asyncio
+
+import metrics
+from sensors.base import SensorPlugin
+
+
+class _Sensor(SensorPlugin):
+    name = "fake"
+
+    async def start(self, queue):
+        with self.scan_timer():
+            pass
+        await self.emit(queue, {"sensor": "fake", "timestamp": 1000.0, "hardware_status": "available"})
+        await self.emit(queue, {"sensor": "fake", "timestamp": 1001.0, "error": "boom"})
+
+
+def test_exposition_format():
+    registry = metrics.MetricsRegistry()
+    requests = registry.counter("test_requests_total", "Requests", ["path"])
+    requests.inc(path="/a")
+    requests.inc(2, path='/"b"')
+    depth = registry.gauge("test_depth", "Depth")
+    depth.set_function(lambda: 7)
+    latency = registry.histogram("test_seconds", "Latency", buckets=(0.1, 1))
+    for value in (0.05, 0.5, 5):
+        latency.observe(value)
+    assert registry.counter("test_requests_total", "Requests", ["path"]) is requests
+    text = registry.render()
+    assert "# TYPE test_requests_total counter" in text
+    assert 'test_requests_total{path="/a"} 1' in text
+    assert 'test_requests_total{path="/\\"b\\""} 2' in text
+    assert "test_depth 7" in text
+    assert 'test_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_seconds_bucket{le="1"} 2' in text
+    assert 'test_seconds_bucket{le="+Inf"} 3' in text
+    assert "test_seconds_count 3" in text
+    assert registry.snapshot()["test_seconds"]["-"]["count"] == 3
+    try:
+        requests.inc(method="GET")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("wrong labels accepted")
+
+
+def test_sensor_emit_counts_records():
+    queue = asyncio.Queue()
+    asyncio.run(_Sensor({}).start(queue))
+    assert queue.qsize() == 2
+    snapshot = metrics.snapshot()
+    assert snapshot["sensor_records_total"]["fake"] == 2
+    assert snapshot["sensor_record_errors_total"]["fake"] == 1
+    assert snapshot["sensor_last_record_timestamp_seconds"]["fake"] == 1001.0
+    assert snapshot["sensor_scan_seconds"]["fake"]["count"] == 1
+    assert 'sensor_records_total{sensor="fake"} 2' in metrics.render()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for routing across several Ollama backends
+"""
+
+import asyncio
+import socket
+
+from mock_ollama import MockOllama
+from ollama_client import OllamaBackendPool, OllamaError
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def _servers(*mocks):
+    return [f"http://127.0.0.1:{await mock.start()}" for mock in mocks]
+
+
+def test_least_outstanding_routing():
+    async def run():
+        fast, slow = MockOllama(token_delay=0.001), MockOllama(token_delay=0.02)
+        urls = await _servers(fast, slow)
+        pool = OllamaBackendPool({"backends": urls, "pool_size": 2, "health_interval": 0})
+        # Four concurrent calls fill both backends' two slots evenly
+        await asyncio.gather(*(pool.generate("m", "p") for _ in range(4)))
+        even = (len(fast.requests), len(slow.requests))
+        # Sequential calls all go to the backend with the lower latency
+        for _ in range(4):
+            await pool.generate("m", "p")
+        stats = pool.stats()
+        await pool.close()
+        await fast.close()
+        await slow.close()
+        return even, len(fast.requests), stats
+
+    even, fast_total, stats = asyncio.run(run())
+    assert even == (2, 2)
+    assert fast_total == 6
+    assert [b["completed"] for b in stats["backends"]] == [6, 2]
+    assert stats["backends"][0]["avg_latency"] < stats["backends"][1]["avg_latency"]
+    assert stats["failovers"] == 0
+
+
+def test_failover_on_down_and_slow_backends():
+    async def run():
+        good = MockOllama()
+        slow = MockOllama(prompt_cost={"*": 1000})
+        good_url, slow_url = await _servers(good, slow)
+        down_url = f"http://127.0.0.1:{_free_port()}"
+        pool = OllamaBackendPool({
+            "backends": [down_url, {"url": slow_url, "timeout": 0.2}, good_url],
+            "breaker": {"failure_threshold": 1, "reset_timeout": 60},
+            "health_interval": 0,
+        })
+        verdict = await pool.analyze({"sensor": "imu"}, "m")
+        # Both failing backends are now open and skipped without a connection attempt
+        again = await pool.analyze({"sensor": "imu"}, "m")
+        stats = pool.stats()
+        await pool.close()
+        good.healthy = False
+        pool = OllamaBackendPool({"backends": [good_url], "breaker": {"failure_threshold": 1}, "health_interval": 0})
+        try:
+            await pool.generate("m", "p")
+            failure = None
+        except OllamaError as e:
+            failure = str(e)
+        await pool.close()
+        await good.close()
+        await slow.close()
+        return verdict, again, stats, len(good.requests), failure
+
+    verdict, again, stats, good_requests, failure = asyncio.run(run())
+    assert verdict["reason"] == "quiet {site}" and again["reason"] == "quiet {site}"
+    down, slow, good = stats["backends"]
+    assert (down["failed"], slow["failed"], good["completed"]) == (1, 1, 2)
+    assert down["breaker"]["state"] == slow["breaker"]["state"] == "open"
+    assert stats["failovers"] == 2
+    assert good_requests == 3 and failure.startswith("HTTP 503")
+
+
+def test_health_checks_steer_traffic():
+    async def run():
+        first, second = MockOllama(), MockOllama()
+        urls = await _servers(first, second)
+        pool = OllamaBackendPool({"backends": urls, "health_interval": 0})
+        first.healthy = False
+        await pool.check_health()
+        await pool.generate("m", "p")
+        health = [b["healthy"] for b in pool.stats()["backends"]]
+        first.healthy = True
+        await pool.check_health()
+        await pool.close()
+        await first.close()
+        await second.close()
+        return health, pool.stats(), len(first.requests), len(second.requests)
+
+    health, stats, first_requests, second_requests = asyncio.run(run())
+    assert health == [False, True]
+    assert (first_requests, second_requests) == (0, 1)
+    assert all(b["healthy"] for b in stats["backends"])
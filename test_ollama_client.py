@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Tests for the pooled async Ollama client against a local stand-in server
+"""
+
+import asyncio
+import json
+
+import llm_client
+from llm_client import CircuitBreaker, JSONObjectStream
+from mock_ollama import MockOllama
+from ollama_client import OllamaClient
+
+
+def test_json_object_stream():
+    stream = JSONObjectStream()
+    assert not stream.feed('{"reason": "a } inside')
+    assert not stream.feed(' a string \\" still", "details": {')
+    assert stream.feed('}}   trailing')
+    assert json.loads(stream.text[:stream.text.index("}}") + 2])["details"] == {}
+
+
+def test_keep_alive_and_json_format():
+    async def run():
+        mock = MockOllama()
+        port = await mock.start()
+        client = OllamaClient({"url": f"http://127.0.0.1:{port}", "num_predict": 64})
+        results = [await client.analyze({"sensor": "imu"}, "tiny") for _ in range(3)]
+        await client.close()
+        await mock.close()
+        return mock, client, results
+
+    mock, client, results = asyncio.run(run())
+    assert all(r["reason"] == "quiet {site}" for r in results)
+    assert mock.connections == 1 and client.reused == 2
+    assert mock.requests[0]["format"] == "json"
+    assert mock.requests[0]["options"] == {"num_predict": 64}
+
+
+def test_early_stop_drops_padding():
+    async def run():
+        mock = MockOllama(padding=200)
+        port = await mock.start()
+        client = OllamaClient({"url": f"http://127.0.0.1:{port}"})
+        result = await client.analyze({"sensor": "imu"}, "tiny")
+        await asyncio.sleep(0.05)
+        await mock.close()
+        return mock, client, result
+
+    mock, client, result = asyncio.run(run())
+    assert result["threat_level"] == "low"
+    assert client.early_stops == 1
+    assert mock.disconnected_early == 1
+
+
+def test_circuit_breaker_short_circuits():
+    async def run():
+        server = await asyncio.start_server(lambda r, w: None, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        server.close()
+        await server.wait_closed()
+        client = OllamaClient({"url": f"http://127.0.0.1:{port}", "breaker": {"failure_threshold": 2}})
+        return client, [await client.analyze({"sensor": "imu"}, "tiny") for _ in range(5)]
+
+    client, results = asyncio.run(run())
+    assert client.connections_opened == 0 and client.failures == 2
+    assert all(r["reason"].startswith("LLM analysis failed") for r in results)
+    assert "circuit open" in results[-1]["reason"]
+    assert client.breaker.stats()["rejected"] == 3
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow() and not breaker.allow()  # one half-open trial at a time
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_blocking_generate_releases_half_open_trial(monkeypatch):
+    class Response:
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def raise_for_status(self):
+            pass
+
+        def iter_lines(self):
+            yield b'["not", "an", "object"]'
+            raise RuntimeError("stream broke")
+
+    class Session:
+        def post(self, *args, **kwargs):
+            return Response()
+
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    monkeypatch.setattr(llm_client, "breaker", breaker)
+    monkeypatch.setattr(llm_client, "_get_session", lambda: Session())
+    breaker.record_failure()
+    assert breaker.allow()  # the half-open trial
+    try:
+        llm_client.generate("tiny", "prompt", "analyze", 16)
+    except RuntimeError:
+        pass
+    assert breaker.allow()  # a later call may run the next trial
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Tests for the compiled OUI registry index
+"""
+
+import os
+import tempfile
+
+from sensors import oui
+
+REGISTRY_CSV = """Registry,Assignment,Organization Name,Organization Address
+MA-L,0014BF,DJI Technology,Shenzhen
+MA-L,E091F5,Parrot SA,Paris
+MA-L,70B3D5,IEEE Registration Authority,Piscataway
+MA-M,70B3D51,Small Sensor Co,Austin
+MA-S,70B3D5123,Tiny Radio Ltd,Leeds
+MA-L,FCFBFB,"Apple, Inc.",Cupertino
+"""
+
+
+def _build_index():
+    tmpdir = tempfile.mkdtemp()
+    csv_path = os.path.join(tmpdir, "oui.csv")
+    with open(csv_path, "w") as f:
+        f.write(REGISTRY_CSV)
+    index_path = os.path.join(tmpdir, "oui.idx")
+    counts = oui.compile_index([csv_path], index_path)
+    return tmpdir, index_path, counts
+
+
+def test_longest_prefix_match():
+    tmpdir, index_path, counts = _build_index()
+    assert counts == {"ma_l": 4, "ma_m": 1, "ma_s": 1, "vendors": 6}
+    try:
+        assert oui.load_index(index_path)
+        assert oui.lookup("00:14:bf:12:34:56") == "DJI Technology"
+        assert oui.lookup("FC-FB-FB-00-00-01") == "Apple, Inc."
+        assert oui.lookup("70:B3:D5:12:3F:FF") == "Tiny Radio Ltd"           # MA-S
+        assert oui.lookup("70:B3:D5:12:40:00") == "Small Sensor Co"          # MA-M
+        assert oui.lookup("70:B3:D5:1F:FF:FF") == "Small Sensor Co"
+        assert oui.lookup("70:B3:D5:20:00:00") == "IEEE Registration Authority"
+        assert oui.lookup("70:B3:D4:FF:FF:FF") is None
+        assert oui.lookup("00:00:00:00:00:01") is None
+        assert oui.lookup("3C:5A:B4:00:00:01") is None  # not in this registry
+    finally:
+        oui.close_index()
+        for name in os.listdir(tmpdir):
+            os.unlink(os.path.join(tmpdir, name))
+        os.rmdir(tmpdir)
+
+
+def test_locally_administered_and_fallback():
+    oui.close_index()
+    assert oui.is_locally_administered("DA:A1:19:00:00:01")
+    assert not oui.is_locally_administered("00:14:BF:00:00:01")
+    assert oui.lookup("DA:A1:19:00:00:01") is None
+    # CoreBluetooth reports UUIDs instead of addresses
+    assert oui.lookup("5D0C6B0E-3D4C-4C43-9E1F-0A7D1B9E0E11") is None
+    # Without an index the built-in map still answers
+    assert oui.lookup("00:14:BF:AA:BB:CC") == "DJI"
+    assert not oui.load_index("/nonexistent/oui.idx")
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Tests for per-sensor analysis prompts and compact record encoding
+"""
+
+import json
+
+import prompts
+
+
+def test_per_sensor_instruction():
+    netio = prompts.instruction_for(["netio"])
+    assert "For network I/O data" in netio and "For WiFi data" not in netio
+    assert "When analyzing for physical threats" not in netio
+    assert netio.endswith(prompts.OUTPUT_FORMAT)
+    bt = prompts.instruction_for(["bluetooth"], change=True)
+    assert "For Bluetooth data" in bt and "For IMU data" not in bt and prompts.CHANGE_NOTE in bt
+    assert prompts.instruction_for(["mystery"]) == prompts.FULL_INSTRUCTION
+    prompts.register_prompt("mystery", "For mystery data, analyze for:\n- anything odd\n\n")
+    try:
+        assert prompts.instruction_for(["mystery"]).startswith(prompts.INTRO + "For mystery data")
+    finally:
+        del prompts.CHECKLISTS["mystery"]
+
+
+def test_compact_encoding():
+    record = {
+        "sensor": "bluetooth",
+        "timestamp": 1700000000.987,
+        "hardware_status": "available",
+        "error": None,
+        "devices": [
+            {"address": "AA:BB", "name": "Watch", "rssi": -61, "rssi_avg": -60.4567},
+            {"address": "CC:DD", "name": None, "rssi": -80, "rssi_avg": -79.0},
+        ],
+    }
+    payload, legend = prompts.encode_record(record)
+    assert json.loads(payload) == {
+        "sensor": "bluetooth",
+        "ts": 1700000000,
+        "hw": "available",
+        "devs": {"cols": ["addr", "name", "rssi", "rssi_a"], "rows": [["AA:BB", "Watch", -61, -60.5],
+                                                                     ["CC:DD", None, -80, -79]]},
+    }
+    assert "addr=address" in legend and "hw=hardware_status" in legend
+    prompt = prompts.analysis_prompt(record)
+    assert len(prompt) < len(prompts.FULL_INSTRUCTION + json.dumps(record))
+
+
+def test_token_estimate():
+    assert prompts.estimate_tokens("") == 0
+    assert prompts.estimate_tokens('{"rssi":-61}') == 8
+    short = prompts.estimate_tokens(prompts.analysis_prompt({"sensor": "assoc", "ssid": "Office"}))
+    assert short < prompts.estimate_tokens(prompts.FULL_INSTRUCTION)
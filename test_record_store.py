@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite record store and its history queries
+"""
+
+import asyncio
+import os
+import sqlite3
+import tempfile
+
+from record_store import RecordStore
+
+
+def _records(start):
+    for i in range(120):
+        ts = start + i * 30
+        yield {
+            "sensor": "bluetooth",
+            "timestamp": ts,
+            "devices": [
+                {"address": "AA:BB", "name": "Watch", "rssi": -60 - (i % 2) * 10},
+                {"address": "CC:DD", "name": "Unknown", "rssi": -80},
+            ],
+            "hardware_status": "available",
+        }
+        yield {"sensor": "imu", "timestamp": ts, "accel": {"x": 0, "y": 0, "z": 9.8}}
+
+
+def _store_all(path, records, config=None):
+    async def run():
+        store = RecordStore(path, config or {"batch_size": 50, "retention_days": 0})
+        store.start()
+        for record in records:
+            store.submit(record)
+        await asyncio.sleep(0)
+        await store.stop()
+        return store
+    return asyncio.run(run())
+
+
+def test_batched_writes_and_schema():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db")
+        store = _store_all(path, _records(1000.0))
+        assert store.written == 240
+        assert store.batches >= 240 // 50
+        conn = sqlite3.connect(path)
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("SELECT COUNT(*) FROM records").fetchone()[0] == 240
+        assert conn.execute("SELECT COUNT(*) FROM devices").fetchone()[0] == 2
+        assert conn.execute("SELECT COUNT(*) FROM observations").fetchone()[0] == 240
+        payload = conn.execute("SELECT payload FROM records WHERE sensor = 'bluetooth' LIMIT 1").fetchone()[0]
+        assert "devices" not in payload
+        conn.close()
+
+
+def test_history_downsampling():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db")
+        store = _store_all(path, _records(1000.0))
+        result = store.history("bluetooth", 1000.0, 1000.0 + 3600, points=12, device="AA:BB")
+        assert result["name"] == "Watch"
+        assert len(result["points"]) == 12
+        first = result["points"][0]
+        assert first["count"] == 10
+        assert (first["rssi_min"], first["rssi_max"], first["rssi_avg"]) == (-70, -60, -65)
+        summary = store.history("bluetooth", 1000.0, 1000.0 + 3600, points=4)
+        assert [p["records"] for p in summary["points"]] == [30, 30, 30, 30]
+        assert summary["points"][0]["devices"] == 2
+        assert [d["key"] for d in store.devices("bluetooth")] in (["AA:BB", "CC:DD"], ["CC:DD", "AA:BB"])
+        assert store.history("bluetooth", 0, 1, device="nope")["points"] == []
+
+
+def test_prune_and_overflow():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "history.db")
+        store = RecordStore(path, {"retention_days": 1, "max_pending": 10})
+        for record in _records(1000.0):
+            store.submit(record)
+        assert store.dropped == 230
+        store.open()
+        store._write_batch(store._take_batch())
+        store.prune(now=1000.0 + 86400 + 3600 * 2)
+        conn = sqlite3.connect(path)
+        assert conn.execute("SELECT COUNT(*) FROM records").fetchone()[0] == 0
+        conn.close()
+        store.close()
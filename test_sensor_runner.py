@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for the shared async sensor command runner
+"""
+
+import asyncio
+import subprocess
+import sys
+import time
+
+from sensors import runner
+
+
+def test_run_command_captures_output():
+    result = asyncio.run(runner.run_command([sys.executable, "-c", "print('hello')"]))
+    assert result.returncode == 0
+    assert result.stdout.strip() == "hello"
+
+
+def test_run_command_passes_input():
+    code = "import sys; print(sys.stdin.read().strip()[::-1])"
+    result = asyncio.run(runner.run_command([sys.executable, "-c", code], input="abc\n"))
+    assert result.stdout.strip() == "cba"
+
+
+def test_run_command_timeout_kills_process():
+    async def run():
+        try:
+            await runner.run_command([sys.executable, "-c", "import time; time.sleep(5)"], timeout=0.2)
+        except subprocess.TimeoutExpired:
+            return True
+        return False
+
+    start = time.monotonic()
+    assert asyncio.run(run())
+    assert time.monotonic() - start < 2
+    assert runner.command_stats()[sys.executable]["timeouts"] >= 1
+
+
+def test_slow_command_does_not_block_loop():
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.05)
+                ticks += 1
+
+        task = asyncio.create_task(ticker())
+        await runner.run_command([sys.executable, "-c", "import time; time.sleep(0.5)"])
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(run()) >= 5
+
+
+def test_concurrency_limit():
+    runner.set_concurrency(2)
+    try:
+        async def run():
+            cmd = [sys.executable, "-c", "import time; time.sleep(0.3)"]
+            start = time.monotonic()
+            await asyncio.gather(*(runner.run_command(cmd) for _ in range(4)))
+            return time.monotonic() - start
+
+        # Four 0.3 s commands, two at a time
+        assert asyncio.run(run()) >= 0.55
+    finally:
+        runner.set_concurrency(runner.DEFAULT_CONCURRENCY)
+
+
+if __name__ == "__main__":
+    test_run_command_captures_output()
+    test_run_command_passes_input()
+    test_run_command_timeout_kills_process()
+    test_slow_command_does_not_block_loop()
+    test_concurrency_limit()
+    print("All runner tests passed")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tests for rollup and map-reduce summarization
+"""
+
+import asyncio
+import json
+
+from prompts import estimate_tokens
+from summarizer import MapReduceSummarizer, chunks, merge, rollup
+
+
+def _bt(ts, devices):
+    return {"sensor": "bluetooth", "timestamp": ts,
+            "devices": [{"address": a, "name": n, "rssi": r} for a, n, r in devices]}
+
+
+def test_rollup_devices_sensors_and_events():
+    records = [
+        _bt(1, [("AA", "Phone", -60), ("BB", None, -80)]),
+        _bt(2, [("AA", "Phone", -50)]),
+        {"timestamp": 2, "type": "bluetooth_alert", "description": "New Bluetooth device: BB"},
+        _bt(3, [("AA", "Phone", -70), ("BB", "Tag", -75)]),
+        {"timestamp": 3, "type": "bluetooth_alert", "description": "New Bluetooth device: BB"},
+        {"sensor": "imu", "timestamp": 3, "accel": {"x": 0.0, "y": 0.5, "z": 9.8}},
+        {"sensor": "imu", "timestamp": 4, "accel": {"x": 1.0, "y": 0.5, "z": 9.8}},
+    ]
+    summary = rollup(records)
+    assert summary["window"] == {"start": 1, "end": 4, "records": 7}
+    assert summary["sensors"]["bluetooth"] == {"scans": 3}
+    assert summary["sensors"]["imu"]["accel.x"] == {"min": 0.0, "mean": 0.5, "max": 1.0}
+    devices = {d["id"]: d for d in summary["devices"]}
+    assert devices["AA"] == {
+        "sensor": "bluetooth", "id": "AA", "name": "Phone", "first_seen": 1, "last_seen": 3, "seen": 3,
+        "appeared": 0, "disappeared": 0, "rssi_min": -70, "rssi_mean": -60.0, "rssi_max": -50,
+    }
+    assert (devices["BB"]["seen"], devices["BB"]["appeared"], devices["BB"]["disappeared"]) == (2, 1, 1)
+    assert devices["BB"]["name"] == "Tag"
+    assert summary["events"] == [{"type": "bluetooth_alert", "description": "New Bluetooth device: BB",
+                                  "count": 2, "first_seen": 2, "last_seen": 3}]
+
+
+def test_chunks_respect_budget_and_cap():
+    records = [
+        {"sensor": "wifi", "timestamp": t,
+         "networks": [{"ssid": f"Net-{i}", "bssid": f"00:00:00:00:{i // 256:02x}:{i % 256:02x}",
+                       "rssi": -40 - i % 50, "security": "WPA2"} for i in range(300) if t or i % 2]}
+        for t in range(20)
+    ]
+    summary = rollup(records)
+    parts = chunks(summary, max_tokens=1500, max_chunks=50)
+    assert sum(len(p["devices"]) for p in parts) == 300
+    assert all(estimate_tokens(json.dumps(p, separators=(",", ":"))) <= 1600 for p in parts)
+    # Devices that came and went are packed first
+    assert parts[0]["devices"][0]["appeared"] == 1
+    capped = chunks(summary, max_tokens=1500, max_chunks=2)
+    assert len(capped) == 2
+    assert capped[0]["omitted_devices"] == 300 - sum(len(p["devices"]) for p in capped)
+
+
+def test_summarizer_maps_parts_in_parallel_and_merges():
+    calls = []
+    running = [0, 0]
+
+    async def summarize(part, model, instruction):
+        calls.append(part)
+        running[0] += 1
+        running[1] = max(running)
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        if len(calls) == 2:
+            raise RuntimeError("model crashed")
+        return {"events": [
+            {"timestamp": 1, "type": "rogue_ap", "sensor": "wifi", "level": "info" if len(calls) == 1 else "critical",
+             "description": f"part {len(calls)}", "affected_devices": ["Net-0"], "recommendation": "check"},
+            {"timestamp": 2, "type": "proximity_alert", "sensor": "wifi", "level": "warning",
+             "description": "close", "affected_devices": [], "recommendation": "look"},
+        ]}
+
+    records = [
+        {"sensor": "wifi", "timestamp": t,
+         "networks": [{"ssid": f"Net-{i}", "bssid": f"b{i}", "rssi": -60} for i in range(200)]}
+        for t in range(5)
+    ]
+    summarizer = MapReduceSummarizer(summarize, {"chunk_tokens": 1000, "parallel": 2, "max_chunks": 4})
+    result = asyncio.run(summarizer.summarize(records, "m"))
+    assert len(calls) == 4 and running[1] == 2
+    assert {"window", "sensors", "devices", "events", "omitted_devices"} <= set(calls[0])
+    levels = [(e["type"], e["level"]) for e in result["events"]]
+    assert levels == [("rogue_ap", "critical"), ("proximity_alert", "warning"), ("error", "warning")]
+    assert result["events"][2]["description"] == "LLM summary failed: model crashed"
+
+
+def test_merge_keeps_most_severe_duplicate():
+    low = {"type": "t", "sensor": "wifi", "level": "info", "affected_devices": ["a"], "description": "x"}
+    high = dict(low, level="critical", description="y")
+    assert merge([{"events": [low]}, {"events": [high]}, None])["events"] == [high]
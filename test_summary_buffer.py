@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for the bounded summary buffer
+"""
+
+from summary_buffer import SummaryBuffer, deep_size
+from summarizer import slim
+
+
+def _imu(n):
+    return {"sensor": "imu", "timestamp": n, "n": n, "accel": {"x": 0.1, "y": 0.2, "z": 9.8}, "error": None}
+
+
+def test_slim_keeps_rollup_fields():
+    record = {
+        "sensor": "bluetooth", "timestamp": 5, "error": None, "raw": ["line"],
+        "devices": [{"address": "AA", "name": "Tag", "rssi": -60, "rssi_avg": -61.5, "adverts": 9,
+                     "first_seen": 1, "manufacturer_data": {"76": "0215"}}],
+        "totals": {"adverts": 10, "note": "x"},
+    }
+    assert slim(record) == {
+        "sensor": "bluetooth", "timestamp": 5,
+        "devices": [{"address": "AA", "name": "Tag", "rssi": -60}],
+        "totals": {"adverts": 10},
+    }
+
+
+def test_downsampling_keeps_buffer_bounded():
+    buffer = SummaryBuffer({"capacity": 8, "capacities": {"imu": 10}, "window": 1e9})
+    for n in range(10_000):
+        buffer.append(_imu(n), now=n)
+    for n in range(9):
+        buffer.append({"sensor": "wifi", "timestamp": n, "scan": n}, now=n)
+    records = buffer.drain(now=10_000)
+    imu = [r["n"] for r in records if r["sensor"] == "imu"]
+    wifi = [r["scan"] for r in records if r["sensor"] == "wifi"]
+    # Older IMU samples are thinned, not cut: the window still starts early on
+    assert len(imu) <= 10 and imu == sorted(imu) and imu[-1] == 9999 and imu[0] < 5000
+    # Scans keep the later of each older pair
+    assert wifi == [1, 3, 4, 5, 6, 7, 8]
+    assert buffer.stats()["bytes"] == 0 and len(buffer) == 0
+
+
+def test_window_expiry_and_memory_accounting():
+    buffer = SummaryBuffer({"window": 10, "capacity": 4})
+    for n in range(20):
+        buffer.append(_imu(n), now=n)
+        buffer.append({"timestamp": n, "type": "imu_alert", "description": "moved"}, now=n)
+    stats = buffer.stats()
+    assert stats["entries"] == {"imu": len(buffer._entries["imu"]), "events": len(buffer._entries["events"])}
+    assert all(0 < count <= 4 for count in stats["entries"].values())
+    assert stats["expired"] > 0 and stats["downsampled"] > 0
+    held = sum(deep_size(record) for entries in buffer._entries.values() for _, _, record in entries)
+    assert stats["bytes"] == held
+    records = buffer.drain(now=19)
+    assert min(r["timestamp"] for r in records) >= 9
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Tests for the Linux Wi-Fi scan path: fixture tests for the parsers (nl80211
+dump and iw output), scan notifications and scan failure handling
+"""
+
+import asyncio
+import os
+import socket
+import struct
+
+from sensors import nl80211
+from sensors.nl80211 import freq_to_channel, parse_iw_scan, parse_scan_dump
+from sensors.wifi import WifiSensor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+NL80211_FAMILY_ID = 0x21
+
+
+def _load_nl80211_dump():
+    with open(os.path.join(HERE, "nl80211_scan_dump.hex")) as f:
+        return bytes.fromhex("".join(line.strip() for line in f))
+
+
+def _load_iw_output():
+    with open(os.path.join(HERE, "iw_scan_output.txt")) as f:
+        return f.read()
+
+
+def test_freq_to_channel():
+    assert freq_to_channel(2412) == (1, "2GHz")
+    assert freq_to_channel(2484) == (14, "2GHz")
+    assert freq_to_channel(5180) == (36, "5GHz")
+    assert freq_to_channel(5745) == (149, "5GHz")
+    assert freq_to_channel(6115) == (33, "6GHz")
+
+
+def test_parse_nl80211_dump():
+    networks = parse_scan_dump(_load_nl80211_dump(), NL80211_FAMILY_ID)
+    assert len(networks) == 7
+    by_bssid = {n["bssid"]: n for n in networks}
+    current = by_bssid["a4:2b:b0:11:7e:01"]
+    assert current["ssid"] == "ops-net"
+    assert current["rssi"] == -43
+    assert current["channel"] == "6"
+    assert current["connected"] is True
+    assert by_bssid["a4:2b:b0:11:7e:02"]["security"] == "WPA2/WPA3 Personal"
+    assert by_bssid["f0:9f:c2:55:10:aa"]["security"] == "None"
+    assert by_bssid["00:1d:7e:aa:bb:cc"]["security"] == "WPA Personal"
+    assert by_bssid["02:11:32:9a:00:07"]["security"] == "WPA2 Enterprise"
+    assert by_bssid["02:11:32:9a:00:07"]["band"] == "6GHz"
+    # Hidden network keeps an empty SSID
+    assert by_bssid["c8:d7:19:02:00:10"]["ssid"] == ""
+
+
+def test_parse_nl80211_dump_ignores_other_families():
+    assert parse_scan_dump(_load_nl80211_dump(), NL80211_FAMILY_ID + 1) == []
+
+
+def test_parse_iw_scan():
+    networks = parse_iw_scan(_load_iw_output())
+    assert len(networks) == 7
+    by_bssid = {n["bssid"]: n for n in networks}
+    assert by_bssid["a4:2b:b0:11:7e:01"]["connected"] is True
+    assert by_bssid["a4:2b:b0:11:7e:02"]["frequency"] == 5180
+    assert by_bssid["a4:2b:b0:11:7e:02"]["security"] == "WPA2/WPA3 Personal"
+    assert by_bssid["60:60:1f:23:44:d1"]["ssid"] == "DJI-MAVIC3-44D1"
+    assert by_bssid["8a:15:04:c1:2e:3f"]["security"] == "WEP"
+
+
+def test_parsers_agree():
+    nl = {n["bssid"]: n for n in parse_scan_dump(_load_nl80211_dump(), NL80211_FAMILY_ID)}
+    iw = {n["bssid"]: n for n in parse_iw_scan(_load_iw_output())}
+    for bssid in set(nl) & set(iw):
+        for key in ("ssid", "rssi", "channel", "band", "security", "connected"):
+            assert nl[bssid][key] == iw[bssid][key], (bssid, key)
+
+
+def _notification(cmd, ifindex=3):
+    payload = nl80211._GENLMSGHDR.pack(cmd, 1, 0) + nl80211._attr(
+        nl80211.NL80211_ATTR_IFINDEX, struct.pack("=I", ifindex))
+    return nl80211._NLMSGHDR.pack(nl80211._NLMSGHDR.size + len(payload), NL80211_FAMILY_ID, 0, 0, 0) + payload
+
+
+def test_trigger_scan_ignores_stale_notifications():
+    kernel, events = socket.socketpair(socket.AF_UNIX, socket.SOCK_DGRAM)
+    scanner = nl80211.Nl80211Scanner.__new__(nl80211.Nl80211Scanner)
+    scanner.ifindex, scanner.family_id, scanner.events, scanner.can_trigger = 3, NL80211_FAMILY_ID, events, True
+    replies = []
+
+    def send(family, cmd, flags, attrs=b""):
+        assert cmd == nl80211.NL80211_CMD_TRIGGER_SCAN
+        for event, ifindex in replies:
+            kernel.send(_notification(event, ifindex))
+        return 1
+
+    scanner._send = send
+    scanner._recv_until_done = lambda seq, dump: b""
+    try:
+        # Left over from someone else's scan; must not end ours early
+        kernel.send(_notification(nl80211.NL80211_CMD_NEW_SCAN_RESULTS))
+        replies[:] = [(nl80211.NL80211_CMD_NEW_SCAN_RESULTS, 7), (nl80211.NL80211_CMD_TRIGGER_SCAN, 3),
+                      (nl80211.NL80211_CMD_SCAN_ABORTED, 7), (nl80211.NL80211_CMD_NEW_SCAN_RESULTS, 3)]
+        assert scanner.trigger_scan(timeout=1) is True
+        kernel.send(_notification(nl80211.NL80211_CMD_NEW_SCAN_RESULTS))
+        replies[:] = [(nl80211.NL80211_CMD_TRIGGER_SCAN, 3), (nl80211.NL80211_CMD_SCAN_ABORTED, 3)]
+        assert scanner.trigger_scan(timeout=1) is False
+    finally:
+        kernel.close()
+        events.close()
+
+def _linux_sensor(config):
+    sensor = WifiSensor.__new__(WifiSensor)
+    sensor.config, sensor._running = config, False
+    sensor.is_mac, sensor.is_linux, sensor.is_windows = False, True, False
+    sensor.wifi_interface, sensor.hardware_status, sensor.last_error = "wlan0", "available", None
+    sensor.nl80211, sensor.nl80211_failed = None, False
+    return sensor
+
+
+def test_empty_nl80211_scan_is_a_success():
+    class EmptyScanner:
+        def scan(self):
+            return []
+
+    sensor = _linux_sensor({})
+    sensor.nl80211 = EmptyScanner()
+    assert asyncio.run(sensor._scan_linux_wifi()) == (True, None, [])
+
+
+def test_failed_scans_are_retried():
+    sensor = _linux_sensor({"interval": 0.01, "max_backoff": 0.05})
+    results = [(False, "WiFi scan failed: iw not installed", [])] * 3 + [(True, None, [{"ssid": "ops-net"}])]
+    calls = []
+
+    async def scan():
+        calls.append(len(calls))
+        return results[min(len(calls) - 1, len(results) - 1)]
+
+    async def run():
+        queue = asyncio.Queue()
+        sensor._scan_linux_wifi = scan
+        task = asyncio.ensure_future(sensor.start(queue))
+        while len(calls) < 4:
+            await asyncio.sleep(0.01)
+        sensor.stop()
+        await task
+        return [queue.get_nowait() for _ in range(queue.qsize())]
+
+    records = asyncio.run(asyncio.wait_for(run(), 5))
+    assert records[0]["hardware_status"] == "error"
+    assert records[-1]["hardware_status"] == "available" and records[-1]["networks"] == [{"ssid": "ops-net"}]
+    # Backoff: some loop iterations pass without scanning
+    assert len(records) > len(calls)
+
+
+if __name__ == "__main__":
+    test_freq_to_channel()
+    test_parse_nl80211_dump()
+    test_parse_nl80211_dump_ignores_other_families()
+    test_parse_iw_scan()
+    test_parsers_agree()
+    test_trigger_scan_ignores_stale_notifications()
+    test_empty_nl80211_scan_is_a_success()
+    test_failed_scans_are_retried()
+    print("All Linux Wi-Fi parser tests passed")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Fixture tests for the single-pass macOS Wi-Fi parsers
+"""
+
+import os
+
+from sensors.wifi_parser import find_wifi_device, parse_system_profiler, parse_wdutil_info, unique_by_ssid
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+WDUTIL_INFO = """
+————————————————————————————————————————————————————————————————————
+NETWORK
+————————————————————————————————————————————————————————————————————
+    Primary IPv4         : en0 (Wi-Fi / 1A2B3C4D-0000-0000-0000-000000000000)
+————————————————————————————————————————————————————————————————————
+WIFI
+————————————————————————————————————————————————————————————————————
+    MAC Address          : 8c:85:90:00:00:01 (hw=8c:85:90:00:00:01)
+    Interface Name       : en0
+    Power                : On [On]
+    Op Mode              : STA
+    SSID                 : corp-net
+    BSSID                : a4:2b:b0:11:7e:01
+    RSSI                 : -48 dBm
+    Noise                : -94 dBm
+    Tx Rate              : 864.0 Mbps
+    Security             : WPA2 Personal
+    PHY Mode             : 11ax
+    Channel              : 5g36/80
+————————————————————————————————————————————————————————————————————
+BLUETOOTH
+————————————————————————————————————————————————————————————————————
+    Power                : On
+"""
+
+HARDWARE_PORTS = """
+Hardware Port: Thunderbolt Bridge
+Device: bridge0
+Ethernet Address: N/A
+
+Hardware Port: USB 10/100/1000 LAN
+Device: en7
+Ethernet Address: 00:e0:4c:00:00:01
+
+Hardware Port: Wi-Fi
+Device: en0
+Ethernet Address: 8c:85:90:00:00:01
+"""
+
+
+def test_parse_system_profiler_fixture():
+    with open(os.path.join(HERE, "system_profiler_output.txt")) as f:
+        networks = parse_system_profiler(f.read())
+    assert len(networks) == 13
+    current = networks[0]
+    assert current["ssid"] == "aero"
+    assert current["connected"] is True
+    assert (current["channel"], current["band"], current["width"]) == ("21", "6GHz", "80MHz")
+    assert (current["rssi"], current["noise"]) == (-53, -86)
+    assert current["security"] == "WPA2/WPA3 Personal"
+    assert current["phy_mode"] == "802.11ax"
+    assert all(not n["connected"] for n in networks[1:])
+    assert [n["ssid"] for n in unique_by_ssid(networks)] == ["aero", "Joby-Guest", "Joby-IoT", "Joby-aero"]
+
+
+def test_parse_wdutil_info():
+    networks = parse_wdutil_info(WDUTIL_INFO)
+    assert len(networks) == 1
+    current = networks[0]
+    assert current["ssid"] == "corp-net"
+    assert current["connected"] is True
+    assert (current["rssi"], current["noise"]) == (-48, -94)
+    assert (current["channel"], current["band"], current["width"]) == ("36", "5GHz", "80MHz")
+    assert current["security"] == "WPA2 Personal"
+
+
+def test_find_wifi_device():
+    assert find_wifi_device(HARDWARE_PORTS) == "en0"
+    assert find_wifi_device(HARDWARE_PORTS.replace("Wi-Fi", "Ethernet")) == "en7"
+    assert find_wifi_device("") is None
@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Tests for the binary WebSocket encoding
+"""
+
+import json
+
+import pytest
+
+from ws_codec import pack, pack_batch, unpack
+
+
+def test_round_trip_matches_json():
+    message = {
+        "record": {"sensor": "bluetooth", "timestamp": 1700000000.125, "adverts": 70000,
+                   "devices": [{"address": "AA:BB", "rssi": -61, "rssi_avg": -60.5, "name": None,
+                                "randomized": True, "first_seen": 1.7e9}] * 20,
+                   "error": "é" * 40},
+        "ints": [0, 127, 128, -1, -32, -33, -129, 65536, -40000, 2 ** 40, -2 ** 40],
+        "floats": [0.5, 9.81, 1e300, float("inf")],
+        "fields": {str(n): n for n in range(17)},
+        5: "non-string key",
+    }
+    assert unpack(pack(message)) == json.loads(json.dumps(message))
+    assert unpack(pack_batch({"type": "replay", "seq": 2}, [pack({"n": 1}), pack({"n": 2})])) == {
+        "type": "replay", "seq": 2, "messages": [{"n": 1}, {"n": 2}]
+    }
+
+
+def test_compact_number_encoding():
+    # RSSI fits in one byte, exact floats in float32, timestamps keep float64
+    assert len(pack(-61)) == 2 and len(pack(5)) == 1
+    assert len(pack(-60.5)) == 5 and len(pack(1700000000.125)) == 9
+    assert len(pack({"rssi": -61})) < len(json.dumps({"rssi": -61}, separators=(",", ":")))
+    with pytest.raises(TypeError):
+        pack({"when": object()})
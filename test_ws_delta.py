@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+"""
+Tests for versioned record deltas
+"""
+
+from ws_delta import DeltaEncoder, apply
+
+
+def test_versions_and_deltas_round_trip():
+    encoder = DeltaEncoder()
+    first = {"sensor": "imu", "timestamp": 1, "accel": {"x": 0}, "hardware_status": "available", "error": "x"}
+    second = {"sensor": "imu", "timestamp": 2, "accel": {"x": 0}, "hardware_status": "available"}
+    assert encoder.update("imu", first) == (1, None)
+    version, delta = encoder.update("imu", second)
+    assert version == 2 and encoder.version("imu") == 2 and encoder.version("wifi") == 0
+    assert delta == {"set": {"timestamp": 2}, "unset": ["error"]}
+    assert apply(first, delta) == second
+    assert encoder.update("wifi", {"sensor": "wifi"}) == (1, None)
+
+
+def _bluetooth(n, devices):
+    return {"sensor": "bluetooth", "timestamp": n, "adverts": n * 10,
+            "devices": [{"address": a, "rssi": r, **extra} for a, r, extra in devices]}
+
+
+def test_device_tables_send_only_changes():
+    encoder = DeltaEncoder()
+    first = _bluetooth(1, [("AA", -60, {"name": "Tag"}), ("BB", -70, {}), ("CC", -80, {})])
+    second = _bluetooth(2, [("AA", -60, {}), ("CC", -75, {}), ("DD", -50, {})])
+    encoder.update("bluetooth", first)
+    version, delta = encoder.update("bluetooth", second)
+    assert delta["set"] == {"timestamp": 2, "adverts": 20} and delta["unset"] == []
+    assert delta["tables"] == {"devices": {
+        "key": ["address"],
+        "added": [{"address": "DD", "rssi": -50}],
+        "removed": ["BB"],
+        "changed": {"CC": {"rssi": -75}},
+        "dropped": {"AA": ["name"]},
+    }}
+    rebuilt = apply(first, delta)
+    assert sorted(rebuilt["devices"], key=lambda d: d["address"]) == second["devices"]
+    assert {k: v for k, v in rebuilt.items() if k != "devices"} == {k: v for k, v in second.items() if k != "devices"}
+
+
+def test_keyframes_and_unkeyed_lists():
+    encoder = DeltaEncoder({"keyframe_interval": 3})
+    deltas = [encoder.update("wifi", {"sensor": "wifi", "networks": [{"ssid": "Net", "rssi": -60 - n}]})[1]
+              for n in range(7)]
+    assert [d is None for d in deltas] == [True, False, False, True, False, False, True]
+    assert deltas[1]["tables"]["networks"]["changed"] == {"Net": {"rssi": -61}}
+    # Duplicate keys can't be diffed per device, so the list goes whole
+    duplicated = {"sensor": "wifi", "networks": [{"ssid": "Net"}, {"ssid": "Net"}]}
+    _, delta = encoder.update("wifi", duplicated)
+    assert delta["set"]["networks"] == duplicated["networks"] and "tables" not in delta
+    _, delta = encoder.update("wifi", {"sensor": "wifi"})
+    assert delta == {"set": {}, "unset": ["networks"]}
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+"""
+Tests for the WebSocket broadcast hub
+"""
+
+import asyncio
+import json
+
+import pytest
+
+from ws_codec import unpack
+from ws_hub import BroadcastHub
+
+
+class FakeSocket:
+    def __init__(self, delay=0.0, fail=False):
+        self.delay = delay
+        self.fail = fail
+        self.received = []
+        self.closed = None
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def send_text(self, text):
+        await self.gate.wait()
+        if self.fail:
+            raise ConnectionError("gone")
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.received.append(json.loads(text))
+
+    async def send_bytes(self, data):
+        await self.gate.wait()
+        self.received.append(unpack(data))
+
+    async def close(self, code=1000, reason=""):
+        self.closed = code
+
+
+async def _settle(hub, sockets, count):
+    for _ in range(200):
+        if all(len(ws.received) >= count for ws in sockets):
+            return
+        await asyncio.sleep(0.005)
+
+
+def test_slow_client_does_not_delay_others():
+    async def run():
+        hub = BroadcastHub({"max_queue": 100})
+        fast = [FakeSocket() for _ in range(50)]
+        slow = FakeSocket(delay=0.5)
+        for ws in fast + [slow]:
+            hub.register(ws)
+        await asyncio.sleep(0)
+        for n in range(5):
+            assert hub.publish({"n": n}) == 51
+        await _settle(hub, fast, 5)
+        stats = hub.stats()
+        await hub.close()
+        return fast, slow, stats
+
+    fast, slow, stats = asyncio.run(run())
+    assert all([m["n"] for m in ws.received] == [0, 1, 2, 3, 4] for ws in fast)
+    assert len(slow.received) < 5 and slow.closed == 1000
+    assert stats["clients"] == 51 and stats["published"] == 5
+    lagging = [c for c in stats["per_client"] if c["queued"]]
+    assert len(lagging) == 1 and lagging[0]["lag"] > 0
+
+
+def test_drop_oldest_keeps_latest_messages():
+    async def run():
+        hub = BroadcastHub({"max_queue": 3, "slow_policy": "drop_oldest"})
+        ws = FakeSocket()
+        ws.gate.clear()
+        hub.register(ws)
+        for n in range(10):
+            hub.publish({"n": n})
+        ws.gate.set()
+        await _settle(hub, [ws], 3)
+        stats = hub.stats()["per_client"][0]
+        await hub.close()
+        return ws, stats
+
+    ws, stats = asyncio.run(run())
+    assert [m["n"] for m in ws.received] == [7, 8, 9]
+    assert stats["dropped"] == 7 and stats["sent"] == 3
+
+
+def test_disconnect_policy_and_failed_sends_evict_clients():
+    async def run():
+        hub = BroadcastHub({"max_queue": 2, "slow_policy": "disconnect"})
+        stalled, broken, healthy = FakeSocket(), FakeSocket(fail=True), FakeSocket()
+        stalled.gate.clear()
+        for ws in (stalled, broken, healthy):
+            hub.register(ws)
+        await asyncio.sleep(0)
+        for n in range(4):
+            hub.publish({"n": n})
+            await asyncio.sleep(0)
+        await _settle(hub, [healthy], 4)
+        stats = hub.stats()
+        await hub.close()
+        return stalled, broken, healthy, stats
+
+    stalled, broken, healthy, stats = asyncio.run(run())
+    assert stalled.closed == 1013 and broken.closed == 1011
+    assert [m["n"] for m in healthy.received] == [0, 1, 2, 3]
+    assert stats["clients"] == 1 and stats["evicted"] == 1
+
+
+def test_client_stuck_in_send_is_closed():
+    async def run():
+        hub = BroadcastHub({"send_timeout": 0.05})
+        stuck = FakeSocket()
+        stuck.gate.clear()
+        hub.register(stuck)
+        await asyncio.sleep(0)
+        hub.publish({"n": 0})
+        await asyncio.sleep(0.1)
+        accepted = hub.publish({"n": 1})
+        await asyncio.sleep(0)
+        return hub, stuck, accepted
+
+    hub, stuck, accepted = asyncio.run(run())
+    assert accepted == 0 and len(hub) == 0 and stuck.closed == 1013
+
+
+def test_rate_limited_client_stuck_in_send_is_closed():
+    async def run():
+        hub = BroadcastHub({"send_timeout": 0.05})
+        stuck = FakeSocket()
+        stuck.gate.clear()
+        hub.register(stuck)
+        hub.subscribe(stuck, max_rate=100)
+        await asyncio.sleep(0)
+        hub.publish({"n": 0}, "imu", coalesce=True)
+        await asyncio.sleep(0.1)
+        # Held for the next frame rather than queued, but still checked
+        accepted = hub.publish({"n": 1}, "imu", coalesce=True)
+        await asyncio.sleep(0)
+        return hub, stuck, accepted
+
+    hub, stuck, accepted = asyncio.run(run())
+    assert accepted == 0 and len(hub) == 0 and stuck.closed == 1013
+
+
+def test_subscriptions_filter_and_coalesce_per_client():
+    async def run():
+        hub = BroadcastHub()
+        everything, wall = FakeSocket(), FakeSocket()
+        hub.register(everything)
+        hub.register(wall)
+        assert hub.subscribe(wall, ["bluetooth"], max_rate=20) == {
+            "sensors": ["bluetooth"], "max_rate": 20.0, "mode": "full", "encoding": "json"
+        }
+        await asyncio.sleep(0)
+        for n in range(30):
+            hub.publish({"n": n, "sensor": "imu"}, "imu", coalesce=True)
+            message = {"n": n, "sensor": "bluetooth"}
+            if n == 10:
+                message["alerts"] = [{"issue": "new device"}]
+            hub.publish(message, "bluetooth", coalesce=True)
+            await asyncio.sleep(0.005)
+        hub.publish({"type": "summary"})
+        await asyncio.sleep(0.1)
+        stats = {c["client"]: c for c in hub.stats()["per_client"]}
+        await hub.close()
+        return hub, everything, wall, stats[str(id(wall))]
+
+    hub, everything, wall, stats = asyncio.run(run())
+    assert len(everything.received) == 61
+    bluetooth = [m for m in wall.received if m.get("sensor") == "bluetooth"]
+    assert all(m.get("sensor") != "imu" for m in wall.received)
+    assert {"type": "summary", "seq": 61, "run": hub.run} in wall.received
+    # Roughly one snapshot per 50 ms frame, always ending on the latest
+    assert 2 <= len(bluetooth) < 10 and bluetooth[0]["n"] == 0 and bluetooth[-1]["n"] == 29
+    assert any(m.get("alerts") == [{"issue": "new device"}] for m in bluetooth)
+    assert stats["coalesced"] == 30 - len(bluetooth)
+
+
+def test_subscribe_rejects_unknown_mode():
+    async def run():
+        hub = BroadcastHub()
+        ws = FakeSocket()
+        hub.register(ws)
+        try:
+            with pytest.raises(ValueError):
+                hub.subscribe(ws, mode="binary")
+            assert hub.subscribe(ws, "wifi")["sensors"] == ["wifi"]
+        finally:
+            await hub.close()
+
+    asyncio.run(run())
+
+
+def test_delta_mode_falls_back_to_full_after_a_gap():
+    async def run():
+        hub = BroadcastHub()
+        full, delta = FakeSocket(), FakeSocket()
+        hub.register(full)
+        hub.register(delta)
+        hub.subscribe(delta, mode="delta")
+        await asyncio.sleep(0)
+        for version in (1, 2, 4):
+            hub.publish({"full": version}, "wifi", version=version,
+                        delta={"delta": version} if version > 1 else None)
+            await asyncio.sleep(0)
+        await hub.close()
+        return hub.run, full, delta
+
+    run_id, full, delta = asyncio.run(run())
+    assert full.received == [{"full": 1, "seq": 1, "run": run_id}, {"full": 2, "seq": 2, "run": run_id},
+                             {"full": 4, "seq": 3, "run": run_id}]
+    assert delta.received == [{"full": 1, "seq": 1, "run": run_id}, {"delta": 2, "seq": 2, "run": run_id},
+                              {"full": 4, "seq": 3, "run": run_id}]
+
+
+def test_resume_replays_missed_messages_or_sends_a_snapshot():
+    async def run():
+        hub = BroadcastHub({"replay_size": 5})
+        for n in range(8):
+            hub.publish({"n": n}, "imu" if n % 2 else "wifi", coalesce=True, version=n // 2 + 1)
+        hub.publish({"type": "summary"})
+        sockets = {}
+        # A client from a previous server run may have seen a seq this run has also reached
+        for name, since, run_id, sensors in (
+                ("fresh", None, None, None), ("recent", 6, hub.run, None), ("stale", 2, hub.run, None),
+                ("ahead", 50, hub.run, None), ("restarted", 6, "0ldrun00", None), ("unknown_run", 6, None, None),
+                ("current", 9, hub.run, None), ("wifi", 6, hub.run, ["wifi"])):
+            ws = sockets[name] = FakeSocket()
+            hub.register(ws)
+            if sensors:
+                hub.subscribe(ws, sensors)
+            hub.resume(ws, since, run_id)
+        await asyncio.sleep(0)
+        await hub.close()
+        return hub.run, {name: ws.received[0] for name, ws in sockets.items()}
+
+    run_id, batches = asyncio.run(run())
+    def seqs(batch):
+        return [m["seq"] for m in batch["messages"]]
+    assert batches["fresh"]["type"] == "snapshot" and seqs(batches["fresh"]) == [7, 8]
+    assert batches["recent"] == {"type": "replay", "since": 6, "run": run_id, "seq": 9, "messages": [
+        {"n": 6, "seq": 7, "run": run_id}, {"n": 7, "seq": 8, "run": run_id},
+        {"type": "summary", "seq": 9, "run": run_id}
+    ]}
+    for name in ("stale", "ahead", "restarted", "unknown_run"):
+        assert batches[name]["type"] == "snapshot" and seqs(batches[name]) == [7, 8], name
+    assert batches["current"] == {"type": "replay", "since": 9, "run": run_id, "seq": 9, "messages": []}
+    assert seqs(batches["wifi"]) == [7, 9]
+
+
+def test_resume_coalesces_for_rate_limited_clients():
+    async def run():
+        hub = BroadcastHub()
+        for n in range(6):
+            message = {"n": n}
+            if n == 1:
+                message["alerts"] = ["moved"]
+            hub.publish(message, "imu", coalesce=True, version=n + 1, delta={"d": n})
+        ws = FakeSocket()
+        channel = hub.register(ws)
+        hub.subscribe(ws, max_rate=1, mode="delta")
+        hub.resume(ws, 0, hub.run)
+        hub.publish({"n": 6}, "imu", version=7, delta={"d": 6})
+        await asyncio.sleep(0)
+        await hub.close()
+        return hub.run, ws.received, channel.versions
+
+    run_id, received, versions = asyncio.run(run())
+    assert received[0]["type"] == "replay"
+    assert received[0]["messages"] == [{"n": 5, "alerts": ["moved"], "seq": 6, "run": run_id}]
+    # The next live message continues from the replayed version as a delta
+    assert received[1] == {"d": 6, "seq": 7, "run": run_id} and versions == {"imu": 7}
+
+
+def test_binary_clients_get_the_same_messages_packed():
+    async def run():
+        hub = BroadcastHub()
+        text, binary = FakeSocket(), FakeSocket()
+        hub.register(text)
+        hub.register(binary)
+        hub.subscribe(binary, encoding="binary")
+        hub.publish({"record": {"sensor": "imu", "accel": {"x": 0.5, "y": -9.81}}, "alerts": []}, "imu", coalesce=True)
+        hub.resume(binary, 0, hub.run)
+        await asyncio.sleep(0)
+        await hub.close()
+        return hub.run, text.received, binary.received
+
+    run_id, text, binary = asyncio.run(run())
+    assert binary[0] == text[0]
+    assert binary[1] == {"type": "replay", "since": 0, "run": run_id, "seq": 1, "messages": text}
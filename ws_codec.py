@@ -0,0 +1,211 @@
+"""
+Compact binary encoding for WebSocket messages.
+
+Messages are encoded as MessagePack, which the dashboard decodes with a
+small reader in index.html. Compared with JSON text, numbers go out as
+fixed-width binary (small integers such as RSSI values in one or two
+bytes, floats in 5 bytes when float32 holds them exactly and 9 otherwise),
+strings and containers carry length prefixes instead of quotes, commas and
+escapes, and nothing needs number parsing on the client. Dict keys that
+are not strings are converted the way json.dumps would convert them, so
+both encodings carry the same message.
+"""
+import json
+import struct
+
+ENCODINGS = ("json", "binary")
+
+_F32 = struct.Struct(">f")
+_F64 = struct.Struct(">d")
+
+
+def pack(value) -> bytes:
+    out = bytearray()
+    _pack(value, out)
+    return bytes(out)
+
+
+def _header(out: bytearray, size: int, fix: int, fix_limit: int, codes):
+    if size < fix_limit:
+        out.append(fix | size)
+    elif size <= 0xFFFF:
+        out.append(codes[0])
+        out += size.to_bytes(2, "big")
+    else:
+        out.append(codes[1])
+        out += size.to_bytes(4, "big")
+
+
+def _pack_str(value: str, out: bytearray):
+    data = value.encode("utf-8")
+    size = len(data)
+    if size < 32:
+        out.append(0xA0 | size)
+    elif size <= 0xFF:
+        out.append(0xD9)
+        out.append(size)
+    elif size <= 0xFFFF:
+        out.append(0xDA)
+        out += size.to_bytes(2, "big")
+    else:
+        out.append(0xDB)
+        out += size.to_bytes(4, "big")
+    out += data
+
+
+def _pack_int(value: int, out: bytearray):
+    if 0 <= value < 0x80:
+        out.append(value)
+    elif -32 <= value < 0:
+        out.append(value & 0xFF)
+    elif value >= 0:
+        for code, size in ((0xCC, 1), (0xCD, 2), (0xCE, 4), (0xCF, 8)):
+            if value < 1 << (8 * size):
+                out.append(code)
+                out += value.to_bytes(size, "big")
+                return
+        raise OverflowError(f"integer too large to encode: {value}")
+    else:
+        for code, size in ((0xD0, 1), (0xD1, 2), (0xD2, 4), (0xD3, 8)):
+            if value >= -(1 << (8 * size - 1)):
+                out.append(code)
+                out += value.to_bytes(size, "big", signed=True)
+                return
+        raise OverflowError(f"integer too large to encode: {value}")
+
+
+def _pack_float(value: float, out: bytearray):
+    try:
+        single = _F32.pack(value)
+    except OverflowError:
+        single = None
+    if single is not None and _F32.unpack(single)[0] == value:
+        out.append(0xCA)
+        out += single
+    else:
+        out.append(0xCB)
+        out += _F64.pack(value)
+
+
+def _pack(value, out: bytearray):
+    if value is None:
+        out.append(0xC0)
+    elif value is True:
+        out.append(0xC3)
+    elif value is False:
+        out.append(0xC2)
+    elif isinstance(value, int):
+        _pack_int(value, out)
+    elif isinstance(value, float):
+        _pack_float(value, out)
+    elif isinstance(value, str):
+        _pack_str(value, out)
+    elif isinstance(value, dict):
+        _header(out, len(value), 0x80, 16, (0xDE, 0xDF))
+        for key, item in value.items():
+            _pack_str(key if isinstance(key, str) else json.dumps(key), out)
+            _pack(item, out)
+    elif isinstance(value, (list, tuple)):
+        _header(out, len(value), 0x90, 16, (0xDC, 0xDD))
+        for item in value:
+            _pack(item, out)
+    elif isinstance(value, (bytes, bytearray)):
+        size = len(value)
+        for code, width in ((0xC4, 1), (0xC5, 2), (0xC6, 4)):
+            if size < 1 << (8 * width):
+                out.append(code)
+                out += size.to_bytes(width, "big")
+                break
+        out += value
+    else:
+        raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def pack_batch(header: dict, parts: list) -> bytes:
+    """
+    `header` with a "messages" array of already-packed messages appended.
+    """
+    out = bytearray()
+    _header(out, len(header) + 1, 0x80, 16, (0xDE, 0xDF))
+    for key, item in header.items():
+        _pack_str(key, out)
+        _pack(item, out)
+    _pack_str("messages", out)
+    _header(out, len(parts), 0x90, 16, (0xDC, 0xDD))
+    for part in parts:
+        out += part
+    return bytes(out)
+
+
+def unpack(data: bytes):
+    value, end = _unpack(memoryview(data), 0)
+    if end != len(data):
+        raise ValueError(f"{len(data) - end} trailing bytes")
+    return value
+
+
+_FIXED = {
+    0xCC: (1, False), 0xCD: (2, False), 0xCE: (4, False), 0xCF: (8, False),
+    0xD0: (1, True), 0xD1: (2, True), 0xD2: (4, True), 0xD3: (8, True),
+}
+# Length-prefixed strings and binary: (prefix width, is text)
+_SIZED = {
+    0xD9: (1, True), 0xDA: (2, True), 0xDB: (4, True),
+    0xC4: (1, False), 0xC5: (2, False), 0xC6: (4, False),
+}
+
+
+def _unpack(data: memoryview, pos: int):
+    code = data[pos]
+    pos += 1
+    if code < 0x80:
+        return code, pos
+    if code >= 0xE0:
+        return code - 0x100, pos
+    if code < 0x90:
+        return _unpack_map(data, pos, code & 0x0F)
+    if code < 0xA0:
+        return _unpack_array(data, pos, code & 0x0F)
+    if code < 0xC0:
+        size = code & 0x1F
+        return str(data[pos:pos + size], "utf-8"), pos + size
+    if code == 0xC0:
+        return None, pos
+    if code in (0xC2, 0xC3):
+        return code == 0xC3, pos
+    if code in _FIXED:
+        size, signed = _FIXED[code]
+        return int.from_bytes(data[pos:pos + size], "big", signed=signed), pos + size
+    if code == 0xCA:
+        return _F32.unpack_from(data, pos)[0], pos + 4
+    if code == 0xCB:
+        return _F64.unpack_from(data, pos)[0], pos + 8
+    if code in _SIZED:
+        width, is_text = _SIZED[code]
+        size = int.from_bytes(data[pos:pos + width], "big")
+        pos += width
+        chunk = data[pos:pos + size]
+        return (str(chunk, "utf-8") if is_text else bytes(chunk)), pos + size
+    if code in (0xDC, 0xDD):
+        width = 2 if code == 0xDC else 4
+        return _unpack_array(data, pos + width, int.from_bytes(data[pos:pos + width], "big"))
+    if code in (0xDE, 0xDF):
+        width = 2 if code == 0xDE else 4
+        return _unpack_map(data, pos + width, int.from_bytes(data[pos:pos + width], "big"))
+    raise ValueError(f"unsupported type byte 0x{code:02x}")
+
+
+def _unpack_array(data: memoryview, pos: int, size: int):
+    items = []
+    for _ in range(size):
+        item, pos = _unpack(data, pos)
+        items.append(item)
+    return items, pos
+
+
+def _unpack_map(data: memoryview, pos: int, size: int):
+    result = {}
+    for _ in range(size):
+        key, pos = _unpack(data, pos)
+        result[key], pos = _unpack(data, pos)
+    return result, pos
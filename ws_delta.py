@@ -0,0 +1,155 @@
+"""
+Versioned record deltas for delta-mode WebSocket clients.
+
+A delta holds the top-level fields that changed since the previous record
+of the same sensor:
+
+    {"set": {"timestamp": ..., "adverts": 412}, "unset": ["error"],
+     "tables": {"devices": {"key": ["address"],
+                            "added": [{...}, ...],
+                            "removed": ["AA:BB:..."],
+                            "changed": {"CC:DD:...": {"rssi": -61}},
+                            "dropped": {"CC:DD:...": ["name"]}}}}
+
+Device lists (Wi-Fi networks, Bluetooth devices, 802.11 BSSIDs and probe
+sources) are diffed per device rather than replaced, so a delta grows with
+the number of devices that changed rather than the number present. Entries
+are identified by the first non-empty `key` field. A list with unkeyed or
+repeated entries is sent whole in "set". Applying a table delta keeps
+existing entries in order and appends added ones.
+"""
+
+# List fields holding one entry per device, and the entry fields identifying it
+TABLES = {
+    "wifi": {"networks": ("bssid", "ssid")},
+    "bluetooth": {"devices": ("address",)},
+    "dot11": {"bssids": ("bssid",), "probes": ("mac",)},
+}
+
+
+def diff(previous: dict, current: dict) -> dict:
+    """
+    Top-level fields of `current` that are new or changed since `previous`
+    ("set") and fields that are gone ("unset").
+    """
+    changed = {k: v for k, v in current.items() if k not in previous or previous[k] != v}
+    removed = [k for k in previous if k not in current]
+    return {"set": changed, "unset": removed}
+
+
+def _key(entry: dict, key_fields):
+    return next((entry[f] for f in key_fields if entry.get(f)), None)
+
+
+def keyed(entries, key_fields):
+    """
+    Entries by device key, or None if any entry has no key or a key repeats.
+    """
+    if not isinstance(entries, list):
+        return None
+    table = {}
+    for entry in entries:
+        if not isinstance(entry, dict):
+            return None
+        key = _key(entry, key_fields)
+        if key is None or key in table:
+            return None
+        table[key] = entry
+    return table
+
+
+def table_diff(previous: dict, current: dict, key_fields) -> dict:
+    """
+    Devices added, removed and changed between two keyed tables.
+    """
+    changed = {}
+    dropped = {}
+    for key, entry in current.items():
+        old = previous.get(key)
+        if old is None or old == entry:
+            continue
+        fields = {f: v for f, v in entry.items() if f not in old or old[f] != v}
+        if fields:
+            changed[key] = fields
+        gone = [f for f in old if f not in entry]
+        if gone:
+            dropped[key] = gone
+    delta = {
+        "key": list(key_fields),
+        "added": [entry for key, entry in current.items() if key not in previous],
+        "removed": [key for key in previous if key not in current],
+        "changed": changed,
+    }
+    if dropped:
+        delta["dropped"] = dropped
+    return delta
+
+
+def apply(record: dict, delta: dict) -> dict:
+    """
+    The record a delta produces from the one it was taken against.
+    """
+    result = {k: v for k, v in record.items() if k not in delta.get("unset", ())}
+    result.update(delta.get("set", {}))
+    for field, change in delta.get("tables", {}).items():
+        table = {_key(e, change["key"]): dict(e) for e in record.get(field, [])}
+        for key in change["removed"]:
+            table.pop(key, None)
+        for key, fields in change["changed"].items():
+            table[key].update(fields)
+        for key, gone in change.get("dropped", {}).items():
+            for f in gone:
+                table[key].pop(f, None)
+        for entry in change["added"]:
+            table[_key(entry, change["key"])] = entry
+        result[field] = list(table.values())
+    return result
+
+
+class DeltaEncoder:
+    """
+    Numbers each record of a topic and diffs it against the previous one.
+
+    update() returns (version, delta). A client holding version v-1 applies
+    the delta to reach version v; the hub sends anyone else the full
+    record. Every `keyframe_interval`-th version has no delta, so every
+    client periodically gets a full record and can resynchronize.
+    """
+    def __init__(self, config: dict = None):
+        config = config or {}
+        self.keyframe_interval = max(1, int(config.get("keyframe_interval", 30)))
+        self.tables = config.get("tables", TABLES)
+        self._last = {}
+
+    def update(self, topic: str, record: dict):
+        """
+        Returns (version, delta); delta is None for keyframes.
+        """
+        version, previous, previous_tables = self._last.get(topic, (0, None, None))
+        version += 1
+        tables = {}
+        for field, key_fields in self.tables.get(topic, {}).items():
+            table = keyed(record.get(field), key_fields)
+            if table is not None:
+                # Copies, in case a sensor updates its entries in place
+                tables[field] = {k: dict(e) for k, e in table.items()}
+        # Table fields are stored (and diffed) per device, the rest as is
+        rest = {k: v for k, v in record.items() if k not in tables}
+        delta = None
+        if previous is not None and (version - 1) % self.keyframe_interval:
+            delta = diff(previous, rest)
+            delta["unset"] = [f for f in delta["unset"] if f not in tables]
+            delta["unset"] += [f for f in previous_tables if f not in record]
+            changes = {
+                field: table_diff(previous_tables[field], table, self.tables[topic][field])
+                for field, table in tables.items() if field in previous_tables
+            }
+            # A list keyed now but not before is sent whole
+            delta["set"].update({f: record[f] for f in tables if f not in previous_tables})
+            if changes:
+                delta["tables"] = changes
+        self._last[topic] = (version, rest, tables)
+        return version, delta
+
+    def version(self, topic: str) -> int:
+        return self._last.get(topic, (0, None, None))[0]
@@ -0,0 +1,431 @@
+import asyncio
+import collections
+import json
+import time
+import uuid
+
+import metrics
+from ws_codec import ENCODINGS, pack, pack_batch
+
+WS_SEND_SECONDS = metrics.histogram("websocket_send_seconds", "Time to send one message to one client")
+WS_MESSAGES = metrics.counter("websocket_messages_total", "WebSocket sends by outcome", ["outcome"])
+WS_LAG = metrics.histogram("websocket_delivery_lag_seconds", "Time from publish to send completing per client")
+WS_EVICTIONS = metrics.counter("websocket_evictions_total", "Clients disconnected for falling behind")
+WS_MAX_LAG = metrics.gauge("websocket_client_lag_seconds", "Age of the oldest unsent message for the slowest client")
+
+MODES = ("full", "delta")
+
+
+def encode(message: dict) -> str:
+    # Same encoding as Starlette's send_json
+    return json.dumps(message, ensure_ascii=False, separators=(",", ":"))
+
+
+class _Item:
+    """
+    One published message, shared by every client it is queued for. Each
+    form (full or delta, JSON or binary) is serialized at most once. A
+    batch item's message is a header that its messages are appended to.
+    """
+    __slots__ = ("enqueued", "topic", "version", "message", "delta", "seq", "coalesce", "batch", "_encoded")
+
+    def __init__(self, enqueued: float, message: dict, topic: str = None, version: int = None,
+                 delta: dict = None, seq: int = None, coalesce: bool = False, batch: list = None):
+        self.enqueued = enqueued
+        self.topic = topic
+        self.version = version
+        self.message = message
+        self.delta = delta
+        self.seq = seq
+        self.coalesce = coalesce
+        self.batch = batch
+        self._encoded = {}
+
+    def payload(self, delta: bool = False, binary: bool = False):
+        """
+        The message as str (JSON) or bytes (binary).
+        """
+        key = (delta, binary)
+        data = self._encoded.get(key)
+        if data is None:
+            if self.batch is not None:
+                # Spliced from the messages' cached encodings rather than re-serialized
+                parts = [item.payload(binary=binary) for item in self.batch]
+                if binary:
+                    data = pack_batch(self.message, parts)
+                else:
+                    data = f'{encode(self.message)[:-1]},"messages":[{",".join(parts)}]}}'
+            else:
+                message = self.delta if delta else self.message
+                data = pack(message) if binary else encode(message)
+            self._encoded[key] = data
+        return data
+
+    def with_alerts(self, alerts: list) -> "_Item":
+        """
+        A copy carrying `alerts` ahead of its own, for alerts from snapshots
+        that were coalesced away.
+        """
+        def merged(message):
+            return message and {**message, "alerts": alerts + message.get("alerts", [])}
+        return _Item(self.enqueued, merged(self.message), self.topic, self.version, merged(self.delta),
+                     self.seq, self.coalesce)
+
+
+class _Channel:
+    """
+    One client's subscription, outbound queue and the task that drains it.
+    """
+    def __init__(self, ws, name: str, max_queue: int):
+        self.ws = ws
+        self.name = name
+        self.queue = collections.deque()
+        self.max_queue = max_queue
+        self.ready = asyncio.Event()
+        self.task = None
+        self.closed = False
+        self.sending_since = None
+        # Subscription: None means every sensor; interval 0 means no coalescing
+        self.sensors = None
+        self.interval = 0.0
+        self.mode = "full"
+        self.encoding = "json"
+        # Latest coalesced snapshot per topic, flushed once per interval
+        self.pending = {}
+        self.next_flush = 0.0
+        # Version of the last message sent per topic, for delta mode
+        self.versions = {}
+        self.sent = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.last_lag = 0.0
+        self.max_lag = 0.0
+
+    def wants(self, topic: str) -> bool:
+        return topic is None or self.sensors is None or topic in self.sensors
+
+    def lag(self, now: float) -> float:
+        """
+        How far behind the client is: age of its oldest unsent message.
+        """
+        return now - self.queue[0].enqueued if self.queue else 0.0
+
+    def subscription(self) -> dict:
+        return {
+            "sensors": sorted(self.sensors) if self.sensors is not None else None,
+            "max_rate": 1 / self.interval if self.interval else None,
+            "mode": self.mode,
+            "encoding": self.encoding,
+        }
+
+    def stats(self, now: float) -> dict:
+        return {
+            "client": self.name,
+            **self.subscription(),
+            "queued": len(self.queue),
+            "lag": self.lag(now),
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+        }
+
+
+class BroadcastHub:
+    """
+    Fan-out of dashboard messages to WebSocket clients.
+
+    publish() serializes a message once and appends it to every client's
+    bounded queue without waiting on any socket; a sender task per client
+    drains its queue. When a client's queue is full (`max_queue`), the
+    `slow_policy` decides: "drop_oldest" discards its oldest queued
+    message, "disconnect" closes the client. A client stuck in one send
+    for longer than `send_timeout` seconds is closed on the next publish,
+    whatever the policy. Clients only need async send_text() and close()
+    methods, and send_bytes() if they ask for binary messages.
+
+    Clients may subscribe() to a set of sensors, a maximum update rate,
+    "full" or "delta" payloads and JSON or binary (ws_codec) encoding. Messages published with a topic only reach
+    clients subscribed to it. Coalescible snapshots for a rate-limited
+    client are held back so that only the latest per topic is sent each
+    frame interval. A delta-mode client gets a message's delta form when it
+    was sent the previous version of that topic, and the full form
+    otherwise.
+
+    Published messages are numbered with a "seq" field and tagged with
+    the hub's "run" ID, which is new each time the server starts (seq
+    restarts at 1 with it). The last `replay_size` messages are kept in a
+    ring, along with the latest snapshot per topic. resume() sends a client
+    everything after the seq it last saw in one batch, or the latest
+    snapshots when it is new, has fallen out of the ring or last saw
+    another run.
+    """
+    def __init__(self, config: dict = None):
+        config = config or {}
+        self.max_queue = max(1, int(config.get("max_queue", 256)))
+        self.slow_policy = config.get("slow_policy", "drop_oldest")
+        self.send_timeout = float(config.get("send_timeout", 10))
+        self._channels = {}
+        self._ring = collections.deque(maxlen=max(0, int(config.get("replay_size", 256))))
+        self._latest = {}
+        self.run = uuid.uuid4().hex[:8]
+        self.seq = 0
+        self.evicted = 0
+        WS_MAX_LAG.set_function(self.max_lag)
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def register(self, ws, name: str = None) -> _Channel:
+        channel = _Channel(ws, name or str(id(ws)), self.max_queue)
+        channel.task = asyncio.ensure_future(self._sender(channel))
+        self._channels[ws] = channel
+        return channel
+
+    async def unregister(self, ws):
+        channel = self._channels.pop(ws, None)
+        if channel is None:
+            return
+        channel.closed = True
+        if channel.task is not asyncio.current_task():
+            channel.task.cancel()
+            await asyncio.gather(channel.task, return_exceptions=True)
+
+    async def close(self, code: int = 1000, reason: str = ""):
+        """
+        Close every client and stop the sender tasks.
+        """
+        for ws in list(self._channels):
+            await self.unregister(ws)
+            try:
+                await ws.close(code=code, reason=reason)
+            except Exception as e:
+                print(f"Error closing WebSocket: {e}")
+
+    def subscribe(self, ws, sensors=None, max_rate: float = None, mode: str = "full",
+                  encoding: str = "json") -> dict:
+        """
+        Set a client's subscription. Returns it as applied; raises
+        ValueError for an unknown mode or encoding, or a bad rate.
+        """
+        channel = self._channels.get(ws)
+        if channel is None:
+            raise ValueError("client is not registered")
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}")
+        if encoding not in ENCODINGS:
+            raise ValueError(f"encoding must be one of {', '.join(ENCODINGS)}")
+        max_rate = float(max_rate) if max_rate else 0.0
+        if max_rate < 0:
+            raise ValueError("max_rate must be positive")
+        if isinstance(sensors, str):
+            sensors = [sensors]
+        channel.sensors = set(sensors) if sensors is not None else None
+        channel.interval = 1 / max_rate if max_rate else 0.0
+        channel.mode = mode
+        channel.encoding = encoding
+        # Snapshots of topics no longer wanted are not flushed
+        channel.pending = {t: item for t, item in channel.pending.items() if channel.wants(t)}
+        return channel.subscription()
+
+    def send(self, ws, message: dict) -> bool:
+        """
+        Queue a message for one client.
+        """
+        channel = self._channels.get(ws)
+        if channel is None:
+            return False
+        return self._enqueue(channel, _Item(time.monotonic(), message))
+
+    def publish(self, message: dict, topic: str = None, coalesce: bool = False, version: int = None,
+                delta: dict = None) -> int:
+        """
+        Queue a message for every client subscribed to `topic` (every
+        client when None). `coalesce` marks a snapshot that a newer one of
+        the same topic supersedes; `version` and `delta` give the delta
+        form for delta-mode clients. Sets "seq" and "run" on the message
+        (and delta). Returns how many clients accepted it.
+        """
+        self.seq += 1
+        message["seq"] = self.seq
+        message["run"] = self.run
+        if delta is not None:
+            delta["seq"] = self.seq
+            delta["run"] = self.run
+        item = _Item(time.monotonic(), message, topic, version, delta, self.seq, coalesce)
+        self._ring.append(item)
+        if coalesce:
+            self._latest[topic] = item
+        accepted = 0
+        for channel in list(self._channels.values()):
+            if not channel.wants(topic):
+                continue
+            if coalesce and channel.interval:
+                accepted += self._hold(channel, item)
+            else:
+                accepted += self._enqueue(channel, item)
+        return accepted
+
+    def resume(self, ws, since: int = None, run: str = None) -> int:
+        """
+        Queue, as one message, what a client missed: every message after
+        `since` that it subscribes to ({"type": "replay"}), or the latest
+        snapshot per topic ({"type": "snapshot"}) when `since` is None,
+        older than the ring or from another `run` (before a restart). A
+        rate-limited client only gets the latest snapshot per topic either
+        way. Returns the number of messages in the batch.
+        """
+        channel = self._channels.get(ws)
+        if channel is None:
+            return 0
+        if since is not None and run == self.run and since <= self.seq and (
+                since == self.seq or (self._ring and since >= self._ring[0].seq - 1)):
+            kind = "replay"
+            items = [item for item in self._ring if item.seq > since]
+        else:
+            kind = "snapshot"
+            items = sorted(self._latest.values(), key=lambda item: item.seq)
+        items = [item for item in items if channel.wants(item.topic)]
+        if channel.interval:
+            items = self._coalesce(items)
+        # Batched messages are full records, so deltas continue from them
+        for item in items:
+            if item.version is not None:
+                channel.versions[item.topic] = item.version
+        header = {"type": kind, "since": since, "run": self.run, "seq": self.seq}
+        self._enqueue(channel, _Item(time.monotonic(), header, batch=items))
+        return len(items)
+
+    @staticmethod
+    def _coalesce(items: list) -> list:
+        latest = {}
+        for item in items:
+            if not item.coalesce:
+                continue
+            previous = latest.get(item.topic)
+            alerts = previous.message.get("alerts") if previous is not None else None
+            latest[item.topic] = item.with_alerts(alerts) if alerts else item
+        kept = [item for item in items if not item.coalesce] + list(latest.values())
+        return sorted(kept, key=lambda item: item.seq)
+
+    def _hold(self, channel: _Channel, item: _Item) -> bool:
+        if channel.closed or self._stalled(channel, item.enqueued):
+            return False
+        previous = channel.pending.get(item.topic)
+        if previous is not None:
+            channel.coalesced += 1
+            WS_MESSAGES.inc(outcome="coalesced")
+            # Keep the alerts of superseded snapshots
+            alerts = previous.message.get("alerts")
+            if alerts:
+                item = item.with_alerts(alerts)
+        channel.pending[item.topic] = item
+        channel.ready.set()
+        return True
+
+    def _enqueue(self, channel: _Channel, item: _Item) -> bool:
+        if channel.closed or self._stalled(channel, item.enqueued):
+            return False
+        if len(channel.queue) >= channel.max_queue and self.slow_policy == "disconnect":
+            self._evict(channel, f"{len(channel.queue)} messages behind")
+            return False
+        if len(channel.queue) >= channel.max_queue:
+            channel.queue.popleft()
+            channel.dropped += 1
+            WS_MESSAGES.inc(outcome="dropped")
+        channel.queue.append(item)
+        channel.ready.set()
+        return True
+
+    def _stalled(self, channel: _Channel, now: float) -> bool:
+        """
+        Evict the client if it has been stuck in one send for longer than
+        `send_timeout`. Checked whenever something is queued or held for it.
+        """
+        if channel.sending_since is None or now - channel.sending_since <= self.send_timeout:
+            return False
+        self._evict(channel, "send timed out")
+        return True
+
+    def _evict(self, channel: _Channel, reason: str):
+        print(f"Disconnecting slow WebSocket client {channel.name} ({reason})")
+        self.evicted += 1
+        WS_EVICTIONS.inc()
+        channel.closed = True
+        channel.queue.clear()
+        channel.pending.clear()
+        self._channels.pop(channel.ws, None)
+        channel.task.cancel()
+        asyncio.ensure_future(self._close_quietly(channel.ws, 1013, "client too slow"))
+
+    @staticmethod
+    async def _close_quietly(ws, code: int, reason: str):
+        try:
+            await ws.close(code=code, reason=reason)
+        except Exception:
+            pass
+
+    async def _sender(self, channel: _Channel):
+        while True:
+            if not channel.queue:
+                if not channel.pending:
+                    channel.ready.clear()
+                    await channel.ready.wait()
+                    continue
+                wait = channel.next_flush - time.monotonic()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+                # One frame: the latest snapshot of each topic
+                channel.queue.extend(channel.pending.values())
+                channel.pending.clear()
+                channel.next_flush = time.monotonic() + channel.interval
+            item = channel.queue.popleft()
+            use_delta = (channel.mode == "delta" and item.delta is not None
+                         and channel.versions.get(item.topic) == item.version - 1)
+            start = time.perf_counter()
+            # Watched by _stalled rather than wrapped in wait_for, which costs a task per send
+            channel.sending_since = time.monotonic()
+            try:
+                if channel.encoding == "binary":
+                    await channel.ws.send_bytes(item.payload(use_delta, binary=True))
+                else:
+                    await channel.ws.send_text(item.payload(use_delta))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"WebSocket send to {channel.name} failed: {e}")
+                WS_MESSAGES.inc(outcome="error")
+                self._channels.pop(channel.ws, None)
+                channel.closed = True
+                channel.queue.clear()
+                await self._close_quietly(channel.ws, 1011, "send failed")
+                return
+            finally:
+                channel.sending_since = None
+            WS_SEND_SECONDS.observe(time.perf_counter() - start)
+            if item.version is not None:
+                channel.versions[item.topic] = item.version
+            lag = time.monotonic() - item.enqueued
+            channel.sent += 1
+            channel.last_lag = lag
+            channel.max_lag = max(channel.max_lag, lag)
+            WS_LAG.observe(lag)
+            WS_MESSAGES.inc(outcome="sent")
+
+    def max_lag(self) -> float:
+        now = time.monotonic()
+        return max((channel.lag(now) for channel in self._channels.values()), default=0.0)
+
+    def stats(self) -> dict:
+        now = time.monotonic()
+        clients = [channel.stats(now) for channel in self._channels.values()]
+        return {
+            "clients": len(clients),
+            "published": self.seq,
+            "replayable": len(self._ring),
+            "evicted": self.evicted,
+            "max_lag": max((c["lag"] for c in clients), default=0.0),
+            "per_client": clients,
+        }